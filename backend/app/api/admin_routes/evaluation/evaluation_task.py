@@ -5,7 +5,7 @@ import sqlmodel
 from fastapi import APIRouter, Depends
 from fastapi_pagination import Page
 from fastapi_pagination.ext.sqlmodel import paginate
-from sqlalchemy import func, update
+from sqlalchemy import and_, func, update
 from sqlalchemy.orm import Session
 from sqlmodel import select, case, desc
 
@@ -133,9 +133,7 @@ def list_evaluation_task(
         stmt = stmt.where(EvaluationTask.name.ilike(f"%{params.keyword}%"))
 
     task_page: Page[EvaluationTask] = paginate(session, stmt, params)
-    summaries: List[EvaluationTaskSummary] = []
-    for task in task_page.items:
-        summaries.append(get_summary_for_evaluation_task(task, session))
+    summaries = get_summaries_for_evaluation_tasks(task_page.items, session)
 
     return Page[EvaluationTaskSummary](
         items=summaries,
@@ -172,97 +170,92 @@ def list_evaluation_task_items(
 def get_summary_for_evaluation_task(
     evaluation_task: EvaluationTask, session: Session
 ) -> EvaluationTaskSummary:
-    status_counts = (
+    return get_summaries_for_evaluation_tasks([evaluation_task], session)[0]
+
+
+STATUS_COUNT_LABELS = {
+    EvaluationStatus.NOT_START: "not_start",
+    EvaluationStatus.EVALUATING: "evaluating",
+    EvaluationStatus.DONE: "done",
+    EvaluationStatus.ERROR: "error",
+    EvaluationStatus.CANCEL: "cancel",
+}
+
+
+def get_summaries_for_evaluation_tasks(
+    evaluation_tasks: List[EvaluationTask], session: Session
+) -> List[EvaluationTaskSummary]:
+    """
+    Summarize the evaluation tasks with a single aggregate over their items,
+    grouped by task.
+    """
+    if not evaluation_tasks:
+        return []
+
+    # Only the scored items count in the metric stats.
+    scored = and_(
+        EvaluationTaskItem.status == EvaluationStatus.DONE,
+        EvaluationTaskItem.factual_correctness.isnot(None),
+        EvaluationTaskItem.semantic_similarity.isnot(None),
+    )
+    factual_correctness = case((scored, EvaluationTaskItem.factual_correctness))
+    semantic_similarity = case((scored, EvaluationTaskItem.semantic_similarity))
+
+    rows = (
         session.query(
-            func.count(
-                case(
-                    (EvaluationTaskItem.status == EvaluationStatus.NOT_START, 1),
-                    else_=None,
-                )
-            ).label("not_start"),
-            func.count(
-                case(
-                    (EvaluationTaskItem.status == EvaluationStatus.EVALUATING, 1),
-                    else_=None,
-                )
-            ).label("evaluating"),
-            func.count(
-                case(
-                    (EvaluationTaskItem.status == EvaluationStatus.DONE, 1), else_=None
-                )
-            ).label("done"),
-            func.count(
-                case(
-                    (EvaluationTaskItem.status == EvaluationStatus.ERROR, 1), else_=None
-                )
-            ).label("error"),
-            func.count(
-                case(
-                    (EvaluationTaskItem.status == EvaluationStatus.CANCEL, 1),
-                    else_=None,
-                )
-            ).label("cancel"),
+            EvaluationTaskItem.evaluation_task_id,
+            *[
+                func.count(
+                    case((EvaluationTaskItem.status == status, 1), else_=None)
+                ).label(label)
+                for status, label in STATUS_COUNT_LABELS.items()
+            ],
+            func.avg(factual_correctness).label("avg_factual_correctness"),
+            func.avg(semantic_similarity).label("avg_semantic_similarity"),
+            func.min(factual_correctness).label("min_factual_correctness"),
+            func.min(semantic_similarity).label("min_semantic_similarity"),
+            func.max(factual_correctness).label("max_factual_correctness"),
+            func.max(semantic_similarity).label("max_semantic_similarity"),
+            func.stddev(factual_correctness).label("std_factual_correctness"),
+            func.stddev(semantic_similarity).label("std_semantic_similarity"),
         )
-        .filter(EvaluationTaskItem.evaluation_task_id == evaluation_task.id)
-        .one()
+        .filter(
+            EvaluationTaskItem.evaluation_task_id.in_(
+                [task.id for task in evaluation_tasks]
+            )
+        )
+        .group_by(EvaluationTaskItem.evaluation_task_id)
+        .all()
     )
-
-    stats = {}
-    if status_counts.not_start == 0 and status_counts.evaluating == 0:
-        stats_tuple = (
-            session.query(
-                func.avg(EvaluationTaskItem.factual_correctness).label(
-                    "avg_factual_correctness"
+    rows_by_task_id = {row.evaluation_task_id: row._mapping for row in rows}
+
+    summaries = []
+    for task in evaluation_tasks:
+        row = rows_by_task_id.get(task.id, {})
+        counts = {label: row.get(label, 0) for label in STATUS_COUNT_LABELS.values()}
+        # The stats are only reported once all the items are evaluated.
+        stats = {}
+        if counts["not_start"] == 0 and counts["evaluating"] == 0:
+            stats = row
+
+        summaries.append(
+            EvaluationTaskSummary(
+                summary=EvaluationTaskOverview(
+                    not_start=counts["not_start"],
+                    succeed=counts["done"],
+                    errored=counts["error"],
+                    progressing=counts["evaluating"],
+                    cancel=counts["cancel"],
+                    avg_factual_correctness=stats.get("avg_factual_correctness", 0),
+                    avg_semantic_similarity=stats.get("avg_semantic_similarity", 0),
+                    min_factual_correctness=stats.get("min_factual_correctness", 0),
+                    min_semantic_similarity=stats.get("min_semantic_similarity", 0),
+                    max_factual_correctness=stats.get("max_factual_correctness", 0),
+                    max_semantic_similarity=stats.get("max_semantic_similarity", 0),
+                    std_factual_correctness=stats.get("std_factual_correctness", 0),
+                    std_semantic_similarity=stats.get("std_semantic_similarity", 0),
                 ),
-                func.avg(EvaluationTaskItem.semantic_similarity).label(
-                    "avg_semantic_similarity"
-                ),
-                func.min(EvaluationTaskItem.factual_correctness).label(
-                    "min_factual_correctness"
-                ),
-                func.min(EvaluationTaskItem.semantic_similarity).label(
-                    "min_semantic_similarity"
-                ),
-                func.max(EvaluationTaskItem.factual_correctness).label(
-                    "max_factual_correctness"
-                ),
-                func.max(EvaluationTaskItem.semantic_similarity).label(
-                    "max_semantic_similarity"
-                ),
-                func.stddev(EvaluationTaskItem.factual_correctness).label(
-                    "std_factual_correctness"
-                ),
-                func.stddev(EvaluationTaskItem.semantic_similarity).label(
-                    "std_semantic_similarity"
-                ),
-            )
-            .filter(
-                EvaluationTaskItem.evaluation_task_id == evaluation_task.id,
-                EvaluationTaskItem.status == EvaluationStatus.DONE,
-                EvaluationTaskItem.factual_correctness.isnot(None),
-                EvaluationTaskItem.semantic_similarity.isnot(None),
+                **task.model_dump(),
             )
-            .one()
         )
-
-        stats = dict(stats_tuple._mapping)
-        logger.info(stats)
-
-    return EvaluationTaskSummary(
-        summary=EvaluationTaskOverview(
-            not_start=status_counts.not_start,
-            succeed=status_counts.done,
-            errored=status_counts.error,
-            progressing=status_counts.evaluating,
-            cancel=status_counts.cancel,
-            avg_factual_correctness=stats.get("avg_factual_correctness", 0),
-            avg_semantic_similarity=stats.get("avg_semantic_similarity", 0),
-            min_factual_correctness=stats.get("min_factual_correctness", 0),
-            min_semantic_similarity=stats.get("min_semantic_similarity", 0),
-            max_factual_correctness=stats.get("max_factual_correctness", 0),
-            max_semantic_similarity=stats.get("max_semantic_similarity", 0),
-            std_factual_correctness=stats.get("std_factual_correctness", 0),
-            std_semantic_similarity=stats.get("std_semantic_similarity", 0),
-        ),
-        **evaluation_task.model_dump(),
-    )
+    return summaries
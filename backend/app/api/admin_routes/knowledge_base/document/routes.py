@@ -21,7 +21,11 @@ from app.api.admin_routes.knowledge_base.document.models import (
 )
 from app.exceptions import InternalServerError
 from app.repositories.graph import GraphRepo
-from app.tasks.build_index import build_index_for_document, build_kg_index_for_chunk
+from app.tasks.build_index import (
+    schedule_build_index_for_document,
+    schedule_build_kg_index_for_chunk,
+)
+from app.tasks.scheduler import IndexingLane
 from app.tasks.knowledge_base import stats_for_knowledge_base
 
 
@@ -195,7 +199,7 @@ def rebuild_kb_document_index_by_ids(
         db_session.add(doc)
         db_session.commit()
 
-        build_index_for_document.delay(kb.id, doc.id)
+        schedule_build_index_for_document(kb, doc.id, IndexingLane.INTERACTIVE)
 
     # Retry failed kg index tasks.
     chunks = kb_chunk_repo.fetch_by_document_ids(db_session, document_ids)
@@ -212,7 +216,7 @@ def rebuild_kb_document_index_by_ids(
         db_session.add(chunk)
         db_session.commit()
 
-        build_kg_index_for_chunk.delay(kb.id, chunk.id)
+        schedule_build_kg_index_for_chunk(kb, chunk.id, IndexingLane.INTERACTIVE)
 
     return RebuildIndexResult(
         reindex_document_ids=reindex_document_ids,
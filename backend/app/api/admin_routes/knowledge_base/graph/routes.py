@@ -29,7 +29,11 @@ from app.rag.knowledge_base.index_store import (
 from app.rag.retrievers.knowledge_graph.simple_retriever import (
     KnowledgeGraphSimpleRetriever,
 )
+from app.rag.indices.knowledge_graph.graph_store.entity_dedup import (
+    EntityDedupConfig,
+)
 from app.repositories import knowledge_base_repo
+from app.tasks.knowledge_base import deduplicate_knowledge_base_entities
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -127,6 +131,21 @@ def update_entity(
         raise e
 
 
+@router.post("/admin/knowledge_bases/{kb_id}/graph/entities/deduplicate")
+def deduplicate_entities(
+    session: SessionDep, kb_id: int, config: EntityDedupConfig = EntityDedupConfig()
+) -> dict:
+    try:
+        kb = knowledge_base_repo.must_get(session, kb_id)
+        deduplicate_knowledge_base_entities.delay(kb.id, config.model_dump())
+        return {"detail": f"Triggered entity deduplication of knowledge base #{kb_id}."}
+    except KBNotFound as e:
+        raise e
+    except Exception as e:
+        logger.exception(e)
+        raise InternalServerError()
+
+
 @router.get("/admin/knowledge_bases/{kb_id}/graph/entities/{entity_id}/subgraph")
 def get_entity_subgraph(session: SessionDep, kb_id: int, entity_id: int) -> dict:
     try:
@@ -25,6 +25,9 @@ class KnowledgeBaseCreate(BaseModel):
     )
     llm_id: Optional[int] = None
     embedding_model_id: Optional[int] = None
+    # The leading dimensions of the embeddings to search the candidates with,
+    # see `KnowledgeBase.compact_vector_dimension`.
+    compact_vector_dimension: Optional[int] = Field(default=None, gt=0)
     chunking_config: ChunkingConfig = Field(default_factory=GeneralChunkingConfig)
     data_sources: list[KBDataSourceCreate] = Field(default_factory=list)
 
@@ -68,6 +71,7 @@ class KnowledgeBaseDetail(BaseModel):
     llm: LLMDescriptor | None = None
     embedding_model_id: int | None = None
     embedding_model: EmbeddingModelDescriptor | None = None
+    compact_vector_dimension: int | None = None
     creator: UserDescriptor | None = None
     created_at: datetime | None = None
     updated_at: datetime | None = None
@@ -29,15 +29,16 @@ from app.repositories import (
     data_source_repo,
     knowledge_base_repo,
 )
-from app.tasks import (
-    build_kg_index_for_chunk,
-    build_index_for_document,
+from app.tasks.build_index import (
+    schedule_build_index_for_document,
+    schedule_build_kg_index_for_chunk,
 )
 from app.tasks.knowledge_base import (
     import_documents_for_knowledge_base,
     stats_for_knowledge_base,
     purge_knowledge_base_related_resources,
 )
+from app.tasks.scheduler import IndexingLane
 from ..models import ChatEngineDescriptor
 
 router = APIRouter()
@@ -77,6 +78,7 @@ def create_knowledge_base(
             index_methods=create.index_methods,
             llm_id=create.llm_id,
             embedding_model_id=create.embedding_model_id,
+            compact_vector_dimension=create.compact_vector_dimension,
             chunking_config=create.chunking_config.model_dump(),
             data_sources=data_sources,
             created_by=user.id,
@@ -248,13 +250,13 @@ def retry_failed_tasks(
             session, kb
         )
         for document_id in document_ids:
-            build_index_for_document.delay(kb_id, document_id)
+            schedule_build_index_for_document(kb, document_id, IndexingLane.INTERACTIVE)
         logger.info(f"Triggered {len(document_ids)} documents to rebuilt vector index.")
 
         # Retry failed kg index tasks.
         chunk_ids = knowledge_base_repo.set_failed_chunks_status_to_pending(session, kb)
         for chunk_id in chunk_ids:
-            build_kg_index_for_chunk.delay(kb_id, chunk_id)
+            schedule_build_kg_index_for_chunk(kb, chunk_id, IndexingLane.INTERACTIVE)
         logger.info(
             f"Triggered {len(chunk_ids)} chunks to rebuilt knowledge graph index."
         )
@@ -1,11 +1,9 @@
 import os
-import time
 from typing import List
 from fastapi import APIRouter, UploadFile, HTTPException, status
 
 from app.api.deps import SessionDep, CurrentSuperuserDep
 from app.file_storage import default_file_storage
-from app.utils.uuid6 import uuid7
 from app.models import Upload
 from app.types import MimeTypes
 from app.site_settings import SiteSetting
@@ -52,13 +50,16 @@ def upload_files(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"File type {file_ext} not supported. Supported types: {SUPPORTED_FILE_TYPES.keys()}",
             )
-        file_path = f"uploads/{user.id.hex}/{int(time.time())}-{uuid7().hex}{file_ext}"
-        default_file_storage.save(file_path, file.file)
+        # Uploads with the same content share one stored file.
+        stored_file = default_file_storage.save_content_addressed(
+            "uploads/blobs", file.file, suffix=file_ext
+        )
         uploads.append(
             Upload(
                 name=file.filename,
-                size=default_file_storage.size(file_path),
-                path=file_path,
+                size=stored_file.size,
+                path=stored_file.name,
+                hash=stored_file.hash,
                 mime_type=SUPPORTED_FILE_TYPES[file_ext],
                 user_id=user.id,
             )
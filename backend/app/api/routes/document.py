@@ -1,26 +1,138 @@
-from fastapi import HTTPException, APIRouter
+from datetime import datetime, UTC
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, APIRouter, Request, Response
 from fastapi.responses import StreamingResponse
 from app.api.deps import SessionDep
 from app.repositories import document_repo
-from app.file_storage import get_file_storage
+from app.file_storage import FileStat, get_file_storage
 
 router = APIRouter()
 
 
 @router.get("/documents/{doc_id}/download")
-def download_file(doc_id: int, session: SessionDep):
+def download_file(doc_id: int, request: Request, session: SessionDep):
     doc = document_repo.must_get(session, doc_id)
 
     name = doc.source_uri
     filestorage = get_file_storage()
-    if filestorage.exists(name):
-        file_size = filestorage.size(name)
-        headers = {"Content-Length": str(file_size)}
+    if not filestorage.exists(name):
+        raise HTTPException(status_code=404, detail="File not found")
 
-        def iterfile():
-            with filestorage.open(name) as f:
-                yield from f
+    stat = filestorage.stat(name)
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": f'"{stat.etag}"',
+        "Last-Modified": format_datetime(stat.modified_at, usegmt=True),
+    }
 
-        return StreamingResponse(iterfile(), media_type=doc.mime_type, headers=headers)
-    else:
-        raise HTTPException(status_code=404, detail="File not found")
+    if _is_not_modified(request, stat):
+        return Response(status_code=304, headers=headers)
+
+    byte_range = None
+    range_header = request.headers.get("range")
+    if range_header and _if_range_matches(request, stat):
+        byte_range = _parse_range(range_header, stat.size)
+
+    if byte_range is None:
+        headers["Content-Length"] = str(stat.size)
+        return StreamingResponse(
+            filestorage.iter_bytes(name),
+            media_type=doc.mime_type,
+            headers=headers,
+        )
+
+    start, end = byte_range
+    headers["Content-Length"] = str(end - start + 1)
+    headers["Content-Range"] = f"bytes {start}-{end}/{stat.size}"
+    return StreamingResponse(
+        filestorage.iter_bytes(name, start, end),
+        status_code=206,
+        media_type=doc.mime_type,
+        headers=headers,
+    )
+
+
+def _etag_matches(header: str, stat: FileStat) -> bool:
+    # If-None-Match uses the weak comparison, so the W/ prefix is ignored.
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/").strip('"') == stat.etag:
+            return True
+    return False
+
+
+def _parse_http_date(value: str) -> Optional[datetime]:
+    try:
+        dt = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return dt if dt.tzinfo else dt.replace(tzinfo=UTC)
+
+
+def _is_not_modified(request: Request, stat: FileStat) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-Modified-Since is ignored when If-None-Match is present.
+        return _etag_matches(if_none_match, stat)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None:
+        since = _parse_http_date(if_modified_since)
+        # HTTP dates have a precision of one second.
+        return since is not None and stat.modified_at.replace(microsecond=0) <= since
+    return False
+
+
+def _if_range_matches(request: Request, stat: FileStat) -> bool:
+    """The range is only served if the file has not changed since If-Range."""
+    if_range = request.headers.get("if-range")
+    if if_range is None:
+        return True
+    if if_range.startswith('"'):
+        # If-Range uses the strong comparison.
+        return if_range.strip('"') == stat.etag
+    since = _parse_http_date(if_range)
+    return since is not None and stat.modified_at.replace(microsecond=0) == since
+
+
+def _range_not_satisfiable(size: int) -> HTTPException:
+    return HTTPException(
+        status_code=416,
+        detail="Range not satisfiable",
+        headers={"Content-Range": f"bytes */{size}"},
+    )
+
+
+def _parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single `bytes=` range into an inclusive (start, end) tuple.
+
+    Returns None if the header should be ignored (syntactically invalid or
+    multiple ranges), in which case the whole file is served.
+    """
+    unit, _, ranges = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in ranges:
+        return None
+
+    start_str, sep, end_str = ranges.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if start_str == "":
+            # Suffix range, the last N bytes of the file.
+            suffix_length = int(end_str)
+            if suffix_length <= 0 or size == 0:
+                raise _range_not_satisfiable(size)
+            return max(size - suffix_length, 0), size - 1
+        start = int(start_str)
+        end = int(end_str) if end_str else size - 1
+    except ValueError:
+        return None
+
+    if start >= size:
+        raise _range_not_satisfiable(size)
+    if start > end:
+        return None
+    return start, min(end, size - 1)
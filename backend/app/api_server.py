@@ -9,6 +9,7 @@ from starlette.middleware.cors import CORSMiddleware
 from app.api.main import api_router
 from app.core.config import settings
 from app.site_settings import SiteSetting
+from app.utils.metrics import generate_metrics, setup_metrics
 from app.utils.uuid6 import uuid7
 
 
@@ -31,6 +32,7 @@ if settings.SENTRY_DSN and settings.ENVIRONMENT != "local":
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     SiteSetting.update_db_cache()
+    setup_metrics()
     yield
 
 
@@ -73,3 +75,11 @@ async def identify_browser(request: Request, call_next):
 
 
 app.include_router(api_router, prefix=settings.API_V1_STR)
+
+
+if settings.ENABLE_METRICS_ENDPOINT:
+
+    @app.get("/metrics", include_in_schema=False)
+    def metrics():
+        content, content_type = generate_metrics()
+        return Response(content=content, media_type=content_type)
@@ -1,6 +1,8 @@
 from celery import Celery
+from celery.signals import worker_init
 
 from app.core.config import settings
+from app.utils.metrics import setup_metrics, start_metrics_server
 
 
 app = Celery(
@@ -20,3 +22,11 @@ app.conf.update(
 )
 
 app.autodiscover_tasks(["app"])
+
+
+@worker_init.connect
+def init_worker_metrics(**kwargs):
+    # Forked worker processes inherit the instrumentation from the main process.
+    setup_metrics()
+    if settings.CELERY_WORKER_METRICS_PORT:
+        start_metrics_server(settings.CELERY_WORKER_METRICS_PORT)
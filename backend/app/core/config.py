@@ -78,6 +78,23 @@ class Settings(BaseSettings):
         return self
 
     LOCAL_FILE_STORAGE_PATH: str = "/shared/data"
+    # The text of uploaded PDF, DOCX, PPTX and XLSX files is extracted in child
+    # processes, at most FILE_EXTRACT_MAX_WORKERS at a time per worker process,
+    # each killed after FILE_EXTRACT_TIMEOUT seconds or when its address space
+    # exceeds FILE_EXTRACT_MAX_MEMORY_MB (0 means unlimited).
+    FILE_EXTRACT_MAX_WORKERS: int = 2
+    FILE_EXTRACT_TIMEOUT: int = 600
+    FILE_EXTRACT_MAX_MEMORY_MB: int = 4096
+
+    # The web data sources fetch at most WEB_CRAWLER_MAX_CONCURRENCY pages at a
+    # time (WEB_CRAWLER_MAX_CONCURRENCY_PER_HOST per host). Pages that need
+    # JavaScript are rendered with a pool of WEB_CRAWLER_MAX_BROWSER_CONTEXTS
+    # browser contexts, each recycled after WEB_CRAWLER_PAGES_PER_CONTEXT pages.
+    WEB_CRAWLER_MAX_CONCURRENCY: int = 32
+    WEB_CRAWLER_MAX_CONCURRENCY_PER_HOST: int = 8
+    WEB_CRAWLER_MAX_BROWSER_CONTEXTS: int = 4
+    WEB_CRAWLER_PAGES_PER_CONTEXT: int = 50
+    WEB_CRAWLER_TIMEOUT: int = 30
 
     TIDB_HOST: str = "127.0.0.1"
     TIDB_PORT: int = 4000
@@ -87,9 +104,59 @@ class Settings(BaseSettings):
     TIDB_SSL: bool = True
 
     ENABLE_QUESTION_CACHE: bool = False
+    # Cache the knowledge graphs extracted from the chunks in the database, keyed
+    # by the chunk text, the extraction program and the LLM, so re-indexing an
+    # unchanged chunk replays the cached graph instead of calling the LLM.
+    ENABLE_KG_EXTRACTION_CACHE: bool = True
+
+    # Chat engine configs (with their LLMs, reranker and knowledge bases) are
+    # cached per process, keyed by engine id and updated_at, the TTL bounds the
+    # staleness of the linked models and knowledge bases.
+    CHAT_ENGINE_CACHE_TTL: int = 60
+    CHAT_ENGINE_CACHE_MAX_SIZE: int = 128
+    # The chunk and knowledge graph retrieval results are cached per process,
+    # keyed by the normalized query, the retrieval config and the generation of
+    # the knowledge base, which every write to its data bumps, so they are never
+    # stale, the TTL only bounds how long the unused entries are kept.
+    ENABLE_RETRIEVAL_CACHE: bool = True
+    RETRIEVAL_CACHE_TTL: int = 3600
+    RETRIEVAL_CACHE_MAX_SIZE: int = 1024
+    # Keep the relationship graph of each knowledge base in memory per process,
+    # to expand the entities and count their degrees without querying TiDB. The
+    # knowledge bases with more relationships than the limit (~50 bytes each in
+    # the snapshot) keep using the SQL queries.
+    ENABLE_GRAPH_SNAPSHOT: bool = False
+    GRAPH_SNAPSHOT_MAX_RELATIONSHIPS: int = 2_000_000
+    # The vector searches of the knowledge bases with compact vectors select this
+    # many times more candidates with them, to re-score with the full vectors.
+    COMPACT_VECTOR_OVERSAMPLING: int = 4
+    # The max number of previous messages loaded as the chat history per turn.
+    CHAT_HISTORY_MAX_MESSAGES: int = 100
 
     CELERY_BROKER_URL: str = "redis://redis:6379/0"
     CELERY_RESULT_BACKEND: str = "redis://redis:6379/0"
+    # Serve the Prometheus metrics of the API server on /metrics, without
+    # authentication, only enable it if the endpoint is not publicly reachable.
+    ENABLE_METRICS_ENDPOINT: bool = False
+    # Serve the Prometheus metrics of the Celery workers on this port if set.
+    CELERY_WORKER_METRICS_PORT: int | None = None
+    # Dispatch the indexing tasks by the scheduler (see `app.tasks.scheduler`):
+    # taking turns between the knowledge bases, the interactive tasks first, at
+    # most `INDEXING_MAX_RUNNING_TASKS` running tasks, and a concurrency limit per
+    # LLM and embedding model adapting to the rate limits of the provider.
+    ENABLE_INDEXING_SCHEDULER: bool = True
+    INDEXING_MAX_RUNNING_TASKS: int = 16
+    INDEXING_PROVIDER_CONCURRENCY: int = 4
+    INDEXING_PROVIDER_MAX_CONCURRENCY: int = 16
+    # A dispatched task not finished after this many seconds is no longer counted.
+    INDEXING_TASK_TIMEOUT: int = 3600
+    # Check the queued indexing tasks at this interval (seconds) while waiting.
+    INDEXING_DISPATCH_INTERVAL: int = 10
+    # The purge of the deleted knowledge bases and data sources deletes the rows
+    # in transactions of at most this many rows, pausing this many seconds after
+    # each batch to leave room for the live queries.
+    PURGE_BATCH_SIZE: int = 1000
+    PURGE_BATCH_INTERVAL: float = 0.1
 
     # TODO: move below config to `option` table, it should be configurable by staff in console
     TIDB_AI_CHAT_ENDPOINT: str = "https://tidb.ai/api/v1/chats"
@@ -104,6 +171,13 @@ class Settings(BaseSettings):
     EMBEDDING_MAX_TOKENS: int = 2048
 
     EVALUATION_OPENAI_API_KEY: str | None = None
+    # The evaluation items are evaluated in batches of this size per Celery task,
+    # the answers of a batch are generated and scored with bounded concurrency.
+    EVALUATION_BATCH_SIZE: int = 20
+    EVALUATION_MAX_CONCURRENCY: int = 8
+    # An item left evaluating for longer than this (e.g. its worker was lost) is
+    # claimed again by the next delivery of its batch.
+    EVALUATION_ITEM_TIMEOUT: int = 3600
 
     @computed_field  # type: ignore[misc]
     @property
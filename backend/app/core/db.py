@@ -1,14 +1,24 @@
 import ssl
 import contextlib
-from typing import AsyncGenerator, Generator
+from itertools import chain
+from typing import AsyncGenerator, Generator, Optional
 
 from sqlmodel import create_engine, Session
-from sqlalchemy import event
-from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy import event, inspect, update
+from sqlalchemy.orm import ORMExecuteState, scoped_session, sessionmaker
+from sqlalchemy.orm import Session as ORMSession
 from sqlalchemy.ext.asyncio import create_async_engine
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.core.config import settings
+from app.models.knowledge_base_scoped.table_naming import (
+    CHUNKS_TABLE_PREFIX,
+    ENTITIES_TABLE_PREFIX,
+    KB_CHUNKS_TABLE_PATTERN,
+    KB_ENTITIES_TABLE_PATTERN,
+    KB_RELATIONSHIPS_TABLE_PATTERN,
+    RELATIONSHIPS_TABLE_PREFIX,
+)
 
 
 # TiDB Serverless clusters have a limitation: if there are no active connections for 5 minutes,
@@ -57,6 +67,102 @@ event.listen(engine, "connect", prepare_db_connection)
 event.listen(async_engine.sync_engine, "connect", prepare_db_connection)
 
 
+# Knowledge base generations.
+#
+# Every write to the documents, chunks, entities or relationships of a knowledge
+# base bumps `KnowledgeBase.generation` in the same transaction, so a cache keyed
+# by the generation (see `app.rag.retrievers.cache`) never serves results of the
+# data before a committed write. The writes are collected from the ORM flushes
+# and the INSERT / UPDATE / DELETE statements executed by any session, writes
+# bypassing both (e.g. `bulk_insert_mappings`) call `mark_knowledge_base_changed`.
+
+# The columns tracking the indexing progress, which do not change the results of
+# the retrieval.
+_INDEX_STATUS_COLUMNS = {"index_status", "index_result", "updated_at"}
+_CHANGED_KB_IDS = "changed_knowledge_base_ids"
+
+
+def get_table_knowledge_base_id(table_name: str) -> Optional[int]:
+    """The id of the knowledge base the table belongs to, e.g. `chunks_1`."""
+    for pattern, prefix in (
+        (KB_CHUNKS_TABLE_PATTERN, CHUNKS_TABLE_PREFIX),
+        (KB_ENTITIES_TABLE_PATTERN, ENTITIES_TABLE_PREFIX),
+        (KB_RELATIONSHIPS_TABLE_PATTERN, RELATIONSHIPS_TABLE_PREFIX),
+    ):
+        if pattern.match(table_name or ""):
+            return int(table_name[len(prefix) :])
+    return None
+
+
+def mark_knowledge_base_changed(session: ORMSession, knowledge_base_id: int):
+    """Bump the generation of the knowledge base when the session commits."""
+    session.info.setdefault(_CHANGED_KB_IDS, set()).add(knowledge_base_id)
+
+
+def _get_object_knowledge_base_id(obj) -> Optional[int]:
+    table_name = getattr(obj, "__tablename__", None)
+    if table_name == "documents":
+        return obj.knowledge_base_id
+    return get_table_knowledge_base_id(table_name)
+
+
+def _has_data_changes(obj) -> bool:
+    state = inspect(obj)
+    return any(
+        attr.history.has_changes()
+        for attr in state.attrs
+        if attr.key not in _INDEX_STATUS_COLUMNS
+    )
+
+
+@event.listens_for(ORMSession, "after_flush")
+def _track_flushed_writes(session: ORMSession, flush_context):
+    for obj in chain(session.new, session.deleted, session.dirty):
+        kb_id = _get_object_knowledge_base_id(obj)
+        if kb_id is None:
+            continue
+        if obj in session.dirty and not _has_data_changes(obj):
+            continue
+        mark_knowledge_base_changed(session, kb_id)
+
+
+@event.listens_for(ORMSession, "do_orm_execute")
+def _track_statement_writes(state: ORMExecuteState):
+    if not (state.is_insert or state.is_update or state.is_delete):
+        return
+    table = getattr(state.statement, "table", None)
+    kb_id = get_table_knowledge_base_id(getattr(table, "name", None))
+    if kb_id is not None:
+        mark_knowledge_base_changed(state.session, kb_id)
+
+
+@event.listens_for(ORMSession, "before_commit")
+def _bump_knowledge_base_generations(session: ORMSession):
+    # The pending objects are only flushed after this hook, flush them first to
+    # collect their writes.
+    session.flush()
+    kb_ids = session.info.pop(_CHANGED_KB_IDS, None)
+    if not kb_ids:
+        return
+
+    from app.models.knowledge_base import KnowledgeBase
+
+    session.execute(
+        update(KnowledgeBase)
+        .where(KnowledgeBase.id.in_(kb_ids))
+        # Keep `updated_at`, which tracks the changes of the settings.
+        .values(
+            generation=KnowledgeBase.generation + 1,
+            updated_at=KnowledgeBase.updated_at,
+        )
+    )
+
+
+@event.listens_for(ORMSession, "after_rollback")
+def _reset_changed_knowledge_bases(session: ORMSession):
+    session.info.pop(_CHANGED_KB_IDS, None)
+
+
 def get_db_session() -> Generator[Session, None, None]:
     with Session(engine, expire_on_commit=False) as session:
         yield session
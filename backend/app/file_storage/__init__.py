@@ -1,4 +1,4 @@
-from .base import FileStorage
+from .base import FileStat, FileStorage, StoredFile
 from .local import LocalFileStorage
 
 
@@ -7,3 +7,13 @@ def get_file_storage() -> FileStorage:
 
 
 default_file_storage = get_file_storage()
+
+
+__all__ = [
+    "FileStat",
+    "FileStorage",
+    "StoredFile",
+    "LocalFileStorage",
+    "get_file_storage",
+    "default_file_storage",
+]
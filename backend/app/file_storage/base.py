@@ -1,8 +1,28 @@
-from typing import IO
+from datetime import datetime
+from typing import IO, Iterator, NamedTuple, Optional
 
 from abc import ABC, abstractmethod
 
 
+DEFAULT_BLOCK_SIZE = 1024 * 1024
+
+
+class FileStat(NamedTuple):
+    size: int
+    modified_at: datetime
+    # A strong validator of the file content, without the surrounding quotes.
+    etag: str
+
+
+class StoredFile(NamedTuple):
+    name: str
+    size: int
+    # The SHA-256 hex digest of the file content.
+    hash: str
+    # Whether identical content was already stored, so nothing was written.
+    deduplicated: bool
+
+
 class FileStorage(ABC):
     @abstractmethod
     def open(self, name: str, mode: str = "rb") -> IO:
@@ -12,6 +32,17 @@ class FileStorage(ABC):
     def save(self, name: str, content: IO) -> None:
         raise NotImplementedError
 
+    @abstractmethod
+    def save_content_addressed(
+        self, prefix: str, content: IO, suffix: str = ""
+    ) -> StoredFile:
+        """
+        Save the content under a name derived from its hash, hashing it while it
+        is written. If identical content was already stored under `prefix`, the
+        existing file is reused instead of writing another copy.
+        """
+        raise NotImplementedError
+
     @abstractmethod
     def delete(self, name: str) -> None:
         raise NotImplementedError
@@ -23,3 +54,32 @@ class FileStorage(ABC):
     @abstractmethod
     def size(self, name: str) -> int:
         raise NotImplementedError
+
+    @abstractmethod
+    def stat(self, name: str) -> FileStat:
+        raise NotImplementedError
+
+    def iter_bytes(
+        self,
+        name: str,
+        start: int = 0,
+        end: Optional[int] = None,
+        block_size: int = DEFAULT_BLOCK_SIZE,
+    ) -> Iterator[bytes]:
+        """
+        Yield the bytes of the file from `start` to `end` (inclusive, or to the
+        end of the file if `end` is None) in blocks of `block_size` bytes.
+        """
+        with self.open(name, "rb") as f:
+            f.seek(start)
+            remaining = None if end is None else end - start + 1
+            while remaining is None or remaining > 0:
+                read_size = (
+                    block_size if remaining is None else min(block_size, remaining)
+                )
+                block = f.read(read_size)
+                if not block:
+                    break
+                if remaining is not None:
+                    remaining -= len(block)
+                yield block
@@ -1,7 +1,16 @@
+import hashlib
 import os
+import shutil
+import tempfile
+from datetime import datetime, UTC
 from typing import IO
 
-from app.file_storage.base import FileStorage
+from app.file_storage.base import (
+    DEFAULT_BLOCK_SIZE,
+    FileStat,
+    FileStorage,
+    StoredFile,
+)
 from app.core.config import settings
 
 
@@ -15,8 +24,49 @@ class LocalFileStorage(FileStorage):
     def save(self, name: str, content: IO) -> None:
         path = self.path(name)
         os.makedirs(os.path.dirname(path), exist_ok=True)
-        with open(path, "wb") as f:
-            f.write(content.read())
+        # Write to a temporary file in the same directory and rename it, so a
+        # reader never sees a partially written file.
+        with tempfile.NamedTemporaryFile(
+            dir=os.path.dirname(path), prefix=".tmp-", delete=False
+        ) as f:
+            tmp_path = f.name
+            try:
+                shutil.copyfileobj(content, f, DEFAULT_BLOCK_SIZE)
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+        os.replace(tmp_path, path)
+
+    def save_content_addressed(
+        self, prefix: str, content: IO, suffix: str = ""
+    ) -> StoredFile:
+        # Write to a temporary file next to the final location first, so the
+        # rename is atomic and a partial upload is never visible under its hash.
+        tmp_dir = self.path(os.path.join(prefix, "tmp"))
+        os.makedirs(tmp_dir, exist_ok=True)
+        hasher = hashlib.sha256()
+        size = 0
+        with tempfile.NamedTemporaryFile(dir=tmp_dir, delete=False) as f:
+            tmp_path = f.name
+            try:
+                while block := content.read(DEFAULT_BLOCK_SIZE):
+                    hasher.update(block)
+                    f.write(block)
+                    size += len(block)
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+
+        digest = hasher.hexdigest()
+        name = os.path.join(prefix, digest[:2], f"{digest}{suffix}")
+        path = self.path(name)
+        if os.path.exists(path):
+            os.remove(tmp_path)
+            return StoredFile(name=name, size=size, hash=digest, deduplicated=True)
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)
+        return StoredFile(name=name, size=size, hash=digest, deduplicated=False)
 
     def delete(self, name: str) -> None:
         os.remove(self.path(name))
@@ -26,3 +76,12 @@ class LocalFileStorage(FileStorage):
 
     def size(self, name: str) -> int:
         return os.path.getsize(self.path(name))
+
+    def stat(self, name: str) -> FileStat:
+        st = os.stat(self.path(name))
+        return FileStat(
+            size=st.st_size,
+            modified_at=datetime.fromtimestamp(st.st_mtime, UTC),
+            # Same as nginx, the file is treated as changed when its mtime or size changes.
+            etag=f"{st.st_mtime_ns:x}-{st.st_size:x}",
+        )
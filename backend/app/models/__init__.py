@@ -13,6 +13,7 @@ from .feedback import (
     FeedbackOrigin,
 )
 from .semantic_cache import SemanticCache
+from .kg_extraction_cache import KGExtractionCache
 from .staff_action_log import StaffActionLog
 from .chat_engine import ChatEngine, ChatEngineUpdate
 from .chat import Chat, ChatUpdate, ChatVisibility, ChatFilters, ChatOrigin
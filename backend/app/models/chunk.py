@@ -15,7 +15,11 @@ from llama_index.core.schema import TextNode
 
 from app.models.document import Document
 from app.models.knowledge_base import KnowledgeBase
-from app.models.knowledge_base_scoped.table_naming import get_kb_vector_dims
+from app.models.knowledge_base_scoped.compact_vector import sync_compact_vectors
+from app.models.knowledge_base_scoped.table_naming import (
+    get_kb_compact_vector_dims,
+    get_kb_vector_dims,
+)
 from app.utils.namespace import format_namespace
 from .base import UpdatableBaseModel, UUIDBaseModel
 from app.logger import logger
@@ -31,17 +35,23 @@ class KgIndexStatus(str, enum.Enum):
 
 def get_kb_chunk_model(kb: KnowledgeBase) -> Type[SQLModel]:
     vector_dimension = get_kb_vector_dims(kb)
-    return get_dynamic_chunk_model(vector_dimension, str(kb.id))
+    compact_vector_dimension = get_kb_compact_vector_dims(kb)
+    return get_dynamic_chunk_model(
+        vector_dimension, str(kb.id), compact_vector_dimension
+    )
 
 
 @singleflight_cache
 def get_dynamic_chunk_model(
     vector_dimension: int,
     namespace: Optional[str] = None,
+    compact_vector_dimension: Optional[int] = None,
 ) -> Type[SQLModel]:
     namespace = format_namespace(namespace)
     chunk_table_name = f"chunks_{namespace}"
     chunk_model_name = f"Chunk_{namespace}_{vector_dimension}"
+    if compact_vector_dimension:
+        chunk_model_name += f"_{compact_vector_dimension}"
 
     logger.info(
         "Dynamic create chunk model (dimension: %s, table: %s, model: %s)",
@@ -55,6 +65,10 @@ def get_dynamic_chunk_model(
         text: str = Field(sa_column=Column(Text))
         meta: dict = Field(default={}, sa_column=Column(JSON))
         embedding: list[float] = Field(sa_type=VectorType(vector_dimension))
+        if compact_vector_dimension:
+            embedding_compact: Optional[list[float]] = Field(
+                default=None, sa_type=VectorType(compact_vector_dimension)
+            )
         document_id: int = Field(foreign_key="documents.id", nullable=True)
         relations: dict | list = Field(default={}, sa_column=Column(JSON))
         source_uri: str = Field(max_length=512, nullable=True)
@@ -91,5 +105,7 @@ def get_dynamic_chunk_model(
         },
         table=True,
     )
+    if compact_vector_dimension:
+        sync_compact_vectors(chunk_model, compact_vector_dimension, "embedding")
 
     return chunk_model
@@ -32,6 +32,11 @@ class ContentFormat(str, enum.Enum):
     MARKDOWN = "markdown"
 
 
+# The key of `Document.meta` holding the state of the data source sync, e.g.
+# the HTTP validators of a web page, which is not part of the document metadata.
+SYNC_META_KEY = "sync"
+
+
 class Document(UpdatableBaseModel, table=True):
     # Avoid "expected `enum` but got `str`" error.
     model_config = ConfigDict(use_enum_values=True)
@@ -71,8 +76,11 @@ class Document(UpdatableBaseModel, table=True):
     __tablename__ = "documents"
 
     def to_llama_document(self) -> LlamaDocument:
+        metadata = self.meta
+        if isinstance(metadata, dict) and SYNC_META_KEY in metadata:
+            metadata = {k: v for k, v in metadata.items() if k != SYNC_META_KEY}
         return LlamaDocument(
             id_=str(self.id),
             text=self.content,
-            metadata=self.meta,
+            metadata=metadata,
         )
@@ -13,7 +13,11 @@ from pydantic import BaseModel
 from tidb_vector.sqlalchemy import VectorType
 from sqlalchemy import Index
 from app.models.knowledge_base import KnowledgeBase
-from app.models.knowledge_base_scoped.table_naming import get_kb_vector_dims
+from app.models.knowledge_base_scoped.compact_vector import sync_compact_vectors
+from app.models.knowledge_base_scoped.table_naming import (
+    get_kb_compact_vector_dims,
+    get_kb_vector_dims,
+)
 from app.utils.namespace import format_namespace
 from app.logger import logger
 
@@ -37,17 +41,23 @@ class EntityPublic(BaseModel):
 
 def get_kb_entity_model(kb: KnowledgeBase) -> Type[SQLModel]:
     vector_dimension = get_kb_vector_dims(kb)
-    return get_dynamic_entity_model(vector_dimension, str(kb.id))
+    compact_vector_dimension = get_kb_compact_vector_dims(kb)
+    return get_dynamic_entity_model(
+        vector_dimension, str(kb.id), compact_vector_dimension
+    )
 
 
 @singleflight_cache
 def get_dynamic_entity_model(
     vector_dimension: int,
     namespace: Optional[str] = None,
+    compact_vector_dimension: Optional[int] = None,
 ) -> Type[SQLModel]:
     namespace = format_namespace(namespace)
     entity_table_name = f"entities_{namespace}"
     entity_model_name = f"Entity_{namespace}_{vector_dimension}"
+    if compact_vector_dimension:
+        entity_model_name += f"_{compact_vector_dimension}"
 
     logger.info(
         "Dynamic create entity model (dimension: %s, table: %s, model: %s)",
@@ -65,6 +75,10 @@ def get_dynamic_entity_model(
         synopsis_info: List | Dict | None = Field(default=None, sa_column=Column(JSON))
         description_vec: list[float] = Field(sa_type=VectorType(vector_dimension))
         meta_vec: list[float] = Field(sa_type=VectorType(vector_dimension))
+        if compact_vector_dimension:
+            description_vec_compact: Optional[list[float]] = Field(
+                default=None, sa_type=VectorType(compact_vector_dimension)
+            )
 
         def __hash__(self):
             return hash(self.id)
@@ -75,6 +89,7 @@ def get_dynamic_entity_model(
             return self.model_dump(
                 exclude={
                     "description_vec",
+                    "description_vec_compact",
                     "meta_vec",
                 }
             )
@@ -92,5 +107,7 @@ def get_dynamic_entity_model(
         },
         table=True,
     )
+    if compact_vector_dimension:
+        sync_compact_vectors(entity_model, compact_vector_dimension, "description_vec")
 
     return entity_model
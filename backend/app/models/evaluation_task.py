@@ -2,7 +2,7 @@ import enum
 from uuid import UUID
 from typing import Optional, List
 
-from sqlalchemy import Text, JSON
+from sqlalchemy import Index, Text, JSON
 
 from sqlmodel import (
     Field,
@@ -65,3 +65,9 @@ class EvaluationTaskItem(UpdatableBaseModel, table=True):
         },
     )
     __tablename__ = "evaluation_task_items"
+    # The task summaries count the items of the tasks by status.
+    __table_args__ = (
+        Index(
+            "ix_evaluation_task_items_task_id_status", "evaluation_task_id", "status"
+        ),
+    )
@@ -0,0 +1,12 @@
+from sqlmodel import Field, Column, JSON
+
+from app.models.base import UpdatableBaseModel
+
+
+class KGExtractionCache(UpdatableBaseModel, table=True):
+    # The digest of the chunk text, the extraction program and the LLM, see
+    # `app.rag.indices.knowledge_graph.extraction_cache`.
+    key: str = Field(primary_key=True, max_length=64)
+    value: dict = Field(default_factory=dict, sa_column=Column(JSON))
+
+    __tablename__ = "kg_extraction_cache"
@@ -152,8 +152,17 @@ class KnowledgeBase(SQLModel, table=True):
             "foreign_keys": "KnowledgeBase.embedding_model_id",
         },
     )
+    # Store the leading dimensions of the embeddings as compact vectors with the
+    # vector indexes, the candidates found with them are re-scored with the full
+    # vectors. Fixed when the tables of the knowledge base are created, disabled
+    # if None.
+    compact_vector_dimension: Optional[int] = Field(default=None, nullable=True)
     documents_total: int = Field(default=0)
     data_sources_total: int = Field(default=0)
+    # Bumped in the same transaction as every write to the documents, chunks,
+    # entities or relationships of the knowledge base (see `app.core.db`), the
+    # retrieval cache is keyed by it.
+    generation: int = Field(default=0)
 
     # TODO: Support knowledge-base level permission control.
 
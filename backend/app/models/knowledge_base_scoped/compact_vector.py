@@ -0,0 +1,74 @@
+"""
+The compact vectors of a knowledge base are the leading dimensions of its
+embeddings, stored in a `<column>_compact` column next to the full vectors. The
+vector index is built on the compact column, which is smaller and faster to
+search, and the candidates it finds are re-scored with the full vectors.
+
+Truncated embeddings keep most of their recall with the embedding models trained
+with Matryoshka representation learning (e.g. OpenAI `text-embedding-3-*`),
+which put the most information in the leading dimensions.
+"""
+
+from typing import List, Optional, Sequence, Tuple, Type
+
+from sqlalchemy import ColumnElement, event, inspect
+from sqlmodel import SQLModel
+
+from app.core.config import settings
+
+COMPACT_VECTOR_SUFFIX = "_compact"
+
+
+def get_compact_vector_name(name: str) -> str:
+    return name + COMPACT_VECTOR_SUFFIX
+
+
+def truncate_vector(
+    vector: Optional[Sequence[float]], dims: int
+) -> Optional[List[float]]:
+    if vector is None:
+        return None
+    return [float(v) for v in vector[:dims]]
+
+
+def get_compact_vector_column(model: Type[SQLModel], name: str):
+    return getattr(model, get_compact_vector_name(name), None)
+
+
+def sync_compact_vectors(model: Type[SQLModel], dims: int, *names: str):
+    """
+    Derive the compact vectors from the full vectors when the objects of the model
+    are inserted or their full vectors updated. The bulk inserts bypassing the
+    objects have to set them explicitly.
+    """
+
+    def set_compact_vectors(mapper, connection, target):
+        state = inspect(target)
+        for name in names:
+            if state.attrs[name].history.has_changes() or state.key is None:
+                setattr(
+                    target,
+                    get_compact_vector_name(name),
+                    truncate_vector(getattr(target, name), dims),
+                )
+
+    event.listen(model, "before_insert", set_compact_vectors)
+    event.listen(model, "before_update", set_compact_vectors)
+
+
+def get_candidate_distance(
+    model: Type[SQLModel], name: str, embedding: List[float], limit: int
+) -> Tuple[ColumnElement, int]:
+    """
+    The distance to order the candidates of a vector search by, and how many to
+    select: the distance of the compact vectors if the model has them, with more
+    candidates to re-score by the exact distance, otherwise the exact distance.
+    """
+    compact_column = get_compact_vector_column(model, name)
+    if compact_column is None:
+        return getattr(model, name).cosine_distance(embedding), limit
+    compact_embedding = truncate_vector(embedding, compact_column.type.dim)
+    return (
+        compact_column.cosine_distance(compact_embedding),
+        limit * settings.COMPACT_VECTOR_OVERSAMPLING,
+    )
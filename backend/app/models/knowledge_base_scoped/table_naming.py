@@ -1,5 +1,6 @@
 import logging
 import re
+from typing import Optional
 
 from app.models.knowledge_base import KnowledgeBase
 from app.models.embed_model import DEFAULT_VECTOR_DIMENSION
@@ -53,3 +54,17 @@ def get_kb_vector_dims(kb: KnowledgeBase):
             "of the embedding model is miss."
         )
     return vector_dimension
+
+
+def get_kb_compact_vector_dims(kb: KnowledgeBase) -> Optional[int]:
+    compact_dimension = kb.compact_vector_dimension
+    if not compact_dimension:
+        return None
+    if compact_dimension >= get_kb_vector_dims(kb):
+        logger.warning(
+            "The compact vector dimension of knowledge base #%s is not less than "
+            "the vector dimension, the compact vectors are disabled.",
+            kb.id,
+        )
+        return None
+    return compact_dimension
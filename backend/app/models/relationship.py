@@ -13,7 +13,11 @@ from sqlmodel import (
 from tidb_vector.sqlalchemy import VectorType
 from app.models.entity import get_kb_entity_model
 from app.models.knowledge_base import KnowledgeBase
-from app.models.knowledge_base_scoped.table_naming import get_kb_vector_dims
+from app.models.knowledge_base_scoped.compact_vector import sync_compact_vectors
+from app.models.knowledge_base_scoped.table_naming import (
+    get_kb_compact_vector_dims,
+    get_kb_vector_dims,
+)
 from app.utils.namespace import format_namespace
 from app.logger import logger
 
@@ -32,8 +36,11 @@ class RelationshipPublic(BaseModel):
 
 def get_kb_relationship_model(kb: KnowledgeBase) -> Type[SQLModel]:
     vector_dimension = get_kb_vector_dims(kb)
+    compact_vector_dimension = get_kb_compact_vector_dims(kb)
     entity_model = get_kb_entity_model(kb)
-    return get_dynamic_relationship_model(vector_dimension, str(kb.id), entity_model)
+    return get_dynamic_relationship_model(
+        vector_dimension, str(kb.id), entity_model, compact_vector_dimension
+    )
 
 
 @singleflight_cache
@@ -41,12 +48,15 @@ def get_dynamic_relationship_model(
     vector_dimension: int,
     namespace: Optional[str] = None,
     entity_model: Optional[Type[SQLModel]] = None,
+    compact_vector_dimension: Optional[int] = None,
 ) -> Type[SQLModel]:
     namespace = format_namespace(namespace)
     entity_table_name = entity_model.__tablename__
     entity_model_name = entity_model.__name__
     relationship_table_name = f"relationships_{namespace}"
     relationship_model_name = f"Relationship_{namespace}_{vector_dimension}"
+    if compact_vector_dimension:
+        relationship_model_name += f"_{compact_vector_dimension}"
 
     logger.info(
         "Dynamic create relationship model (dimension: %s, table: %s, model: %s)",
@@ -66,6 +76,10 @@ def get_dynamic_relationship_model(
         document_id: Optional[int] = Field(default=None, nullable=True)
         chunk_id: Optional[UUID] = Field(default=None, nullable=True)
         description_vec: list[float] = Field(sa_type=VectorType(vector_dimension))
+        if compact_vector_dimension:
+            description_vec_compact: Optional[list[float]] = Field(
+                default=None, sa_type=VectorType(compact_vector_dimension)
+            )
 
         def __hash__(self):
             return hash(self.id)
@@ -74,6 +88,7 @@ def get_dynamic_relationship_model(
             obj_dict = self.model_dump(
                 exclude={
                     "description_vec",
+                    "description_vec_compact",
                     "source_entity",
                     "target_entity",
                     "last_modified_at",
@@ -106,5 +121,9 @@ def get_dynamic_relationship_model(
         },
         table=True,
     )
+    if compact_vector_dimension:
+        sync_compact_vectors(
+            relationship_model, compact_vector_dimension, "description_vec"
+        )
 
     return relationship_model
@@ -17,6 +17,9 @@ class Upload(UpdatableBaseModel, table=True):
     name: str = Field(max_length=255)
     size: int = Field(default=0)
     path: str = Field(max_length=255)
+    # The SHA-256 hex digest of the file content, uploads with the same content
+    # share the same path.
+    hash: Optional[str] = Field(default=None, max_length=64, index=True)
     mime_type: MimeTypes = Field(sa_column=Column(String(128), nullable=False))
     user_id: UUID = Field(foreign_key="users.id", nullable=True)
     user: "User" = SQLRelationship(  # noqa:F821
@@ -23,6 +23,8 @@ from app.rag.knowledge_base.index_store import (
     get_kb_tidb_graph_store,
 )
 from app.rag.indices.knowledge_graph import KnowledgeGraphIndex
+from app.rag.indices.knowledge_graph.extraction_cache import KGExtractionCacheStore
+from app.core.config import settings
 from app.models import Document
 from app.rag.node_parser.file.markdown import MarkdownNodeParser
 from app.types import MimeTypes
@@ -145,9 +147,15 @@ class IndexService:
         """
 
         graph_store = get_kb_tidb_graph_store(session, self._knowledge_base)
+        extraction_cache = (
+            KGExtractionCacheStore(session)
+            if settings.ENABLE_KG_EXTRACTION_CACHE
+            else None
+        )
         graph_index: KnowledgeGraphIndex = KnowledgeGraphIndex.from_existing(
             dspy_lm=self._dspy_lm,
             kg_store=graph_store,
+            extraction_cache=extraction_cache,
         )
 
         node = db_chunk.to_llama_text_node()
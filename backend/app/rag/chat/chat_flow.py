@@ -1,5 +1,7 @@
 import json
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, UTC
 from typing import List, Optional, Generator, Tuple, Any
 from urllib.parse import urljoin
@@ -15,6 +17,7 @@ from llama_index.core.prompts.rich import RichPromptTemplate
 
 from sqlmodel import Session
 from app.core.config import settings
+from app.core.db import engine
 from app.exceptions import ChatNotFound
 from app.models import (
     User,
@@ -35,10 +38,16 @@ from app.rag.types import ChatEventType, ChatMessageSate
 from app.rag.utils import parse_goal_response_format
 from app.repositories import chat_repo
 from app.site_settings import SiteSetting
+from app.utils.metrics import CHAT_STAGE_DURATION, observe_stage
 from app.utils.tracing import LangfuseContextManager
 
 logger = logging.getLogger(__name__)
 
+# Resolves the source documents of the answer while the LLM is generating it.
+_source_documents_executor = ThreadPoolExecutor(
+    max_workers=16, thread_name_prefix="source-documents"
+)
+
 
 def parse_chat_messages(
     chat_messages: List[ChatMessage],
@@ -74,13 +83,19 @@ class ChatFlow:
             # FIXME:
             #   only chat owner or superuser can access the chat,
             #   anonymous user can only access anonymous chat by track_id
-            self.db_chat_obj = chat_repo.get(self.db_session, chat_id)
+            self.db_chat_obj = chat_repo.get_with_engine(self.db_session, chat_id)
             if not self.db_chat_obj:
                 raise ChatNotFound(chat_id)
             try:
-                self.engine_config = ChatEngineConfig.load_from_db(
-                    db_session, self.db_chat_obj.engine.name
-                )
+                db_chat_engine = self.db_chat_obj.engine
+                if db_chat_engine.deleted_at is None:
+                    self.engine_config = ChatEngineConfig.load_from_db_chat_engine(
+                        db_session, db_chat_engine
+                    )
+                else:
+                    self.engine_config = ChatEngineConfig.load_from_db(
+                        db_session, db_chat_engine.name
+                    )
                 self.db_chat_engine = self.engine_config.get_db_chat_engine()
             except Exception as e:
                 logger.error(f"Failed to load chat engine config: {e}")
@@ -93,7 +108,11 @@ class ChatFlow:
             )
             self.chat_history = [
                 ChatMessage(role=m.role, content=m.content, additional_kwargs={})
-                for m in chat_repo.get_messages(self.db_session, self.db_chat_obj)
+                for m in chat_repo.get_recent_messages(
+                    self.db_session,
+                    self.db_chat_obj,
+                    limit=settings.CHAT_HISTORY_MAX_MESSAGES,
+                )
             ]
         else:
             self.engine_config = ChatEngineConfig.load_from_db(db_session, engine_name)
@@ -165,19 +184,23 @@ class ChatFlow:
         )
 
     def chat(self) -> Generator[ChatEvent | str, None, None]:
+        self._chat_started_at = time.perf_counter()
         try:
-            with self._trace_manager.observe(
-                trace_name="ChatFlow",
-                user_id=(
-                    self.user.email if self.user else f"anonymous-{self.browser_id}"
-                ),
-                metadata={
-                    "is_external_engine": self.engine_config.is_external_engine,
-                    "chat_engine_config": self.engine_config.screenshot(),
-                },
-                tags=[f"chat_engine:{self.engine_name}"],
-                release=settings.ENVIRONMENT,
-            ) as trace:
+            with (
+                observe_stage("total"),
+                self._trace_manager.observe(
+                    trace_name="ChatFlow",
+                    user_id=(
+                        self.user.email if self.user else f"anonymous-{self.browser_id}"
+                    ),
+                    metadata={
+                        "is_external_engine": self.engine_config.is_external_engine,
+                        "chat_engine_config": self.engine_config.screenshot(),
+                    },
+                    tags=[f"chat_engine:{self.engine_name}"],
+                    release=settings.ENVIRONMENT,
+                ) as trace,
+            ):
                 trace.update(
                     input={
                         "user_question": self.user_question,
@@ -318,9 +341,10 @@ class ChatFlow:
                         ),
                     )
 
-            knowledge_graph, knowledge_graph_context = (
-                self.retrieve_flow.search_knowledge_graph(user_question)
-            )
+            with observe_stage("kg_search"):
+                knowledge_graph, knowledge_graph_context = (
+                    self.retrieve_flow.search_knowledge_graph(user_question)
+                )
 
             span.end(
                 output={
@@ -357,13 +381,14 @@ class ChatFlow:
                 )
 
             prompt_template = RichPromptTemplate(refined_question_prompt)
-            refined_question = self._fast_llm.predict(
-                prompt_template,
-                graph_knowledges=knowledge_graph_context,
-                chat_history=chat_history,
-                question=user_question,
-                current_date=datetime.now().strftime("%Y-%m-%d"),
-            )
+            with observe_stage("refine_question"):
+                refined_question = self._fast_llm.predict(
+                    prompt_template,
+                    graph_knowledges=knowledge_graph_context,
+                    chat_history=chat_history,
+                    question=user_question,
+                    current_date=datetime.now().strftime("%Y-%m-%d"),
+                )
 
             if not annotation_silent:
                 yield ChatEvent(
@@ -407,12 +432,13 @@ class ChatFlow:
                 self.engine_config.llm.clarifying_question_prompt
             )
 
-            prediction = self._fast_llm.predict(
-                prompt_template,
-                graph_knowledges=knowledge_graph_context,
-                chat_history=chat_history,
-                question=user_question,
-            )
+            with observe_stage("clarify_question"):
+                prediction = self._fast_llm.predict(
+                    prompt_template,
+                    graph_knowledges=knowledge_graph_context,
+                    chat_history=chat_history,
+                    question=user_question,
+                )
             # TODO: using structured output to get the clarity result.
             clarity_result = prediction.strip().strip(".\"'!")
             need_clarify = clarity_result.lower() != "false"
@@ -447,7 +473,10 @@ class ChatFlow:
                 ),
             )
 
-            relevance_chunks = self.retrieve_flow.search_relevant_chunks(user_question)
+            with observe_stage("chunk_search"):
+                relevance_chunks = self.retrieve_flow.search_relevant_chunks(
+                    user_question
+                )
 
             span.end(
                 output={
@@ -484,33 +513,38 @@ class ChatFlow:
                 query=user_question,
                 nodes=relevant_chunks,
             )
-            source_documents = self.retrieve_flow.get_source_documents_from_nodes(
-                response.source_nodes
-            )
-            yield ChatEvent(
-                event_type=ChatEventType.MESSAGE_ANNOTATIONS_PART,
-                payload=ChatStreamMessagePayload(
-                    state=ChatMessageSate.SOURCE_NODES,
-                    context=source_documents,
-                ),
+
+            # Look up the source documents concurrently, so that the answer
+            # starts streaming as soon as the LLM emits the first token.
+            source_documents_future = _source_documents_executor.submit(
+                self._resolve_source_documents, response.source_nodes
             )
+            source_documents = None
 
             # Generate response.
-            yield ChatEvent(
-                event_type=ChatEventType.MESSAGE_ANNOTATIONS_PART,
-                payload=ChatStreamMessagePayload(
-                    state=ChatMessageSate.GENERATE_ANSWER,
-                    display="Generating a Precise Answer with AI",
-                ),
-            )
+            yield self._generate_answer_annotation()
             response_text = ""
             for word in response.response_gen:
+                if not response_text and word:
+                    CHAT_STAGE_DURATION.labels("first_token").observe(
+                        time.perf_counter() - self._chat_started_at
+                    )
                 response_text += word
                 yield ChatEvent(
                     event_type=ChatEventType.TEXT_PART,
                     payload=word,
                 )
 
+                if source_documents is None and source_documents_future.done():
+                    source_documents = source_documents_future.result()
+                    yield self._source_nodes_annotation(source_documents)
+                    # Restore the generating state for the client.
+                    yield self._generate_answer_annotation()
+
+            if source_documents is None:
+                source_documents = source_documents_future.result()
+                yield self._source_nodes_annotation(source_documents)
+
             if not response_text:
                 raise Exception("Got empty response from LLM")
 
@@ -523,6 +557,35 @@ class ChatFlow:
 
             return response_text, source_documents
 
+    def _resolve_source_documents(
+        self, nodes: List[NodeWithScore]
+    ) -> List[SourceDocument]:
+        # Runs in a worker thread, so it must not share the request session.
+        with Session(engine) as session:
+            return self.retrieve_flow.get_source_documents_from_nodes(
+                nodes, db_session=session
+            )
+
+    def _source_nodes_annotation(
+        self, source_documents: List[SourceDocument]
+    ) -> ChatEvent:
+        return ChatEvent(
+            event_type=ChatEventType.MESSAGE_ANNOTATIONS_PART,
+            payload=ChatStreamMessagePayload(
+                state=ChatMessageSate.SOURCE_NODES,
+                context=source_documents,
+            ),
+        )
+
+    def _generate_answer_annotation(self) -> ChatEvent:
+        return ChatEvent(
+            event_type=ChatEventType.MESSAGE_ANNOTATIONS_PART,
+            payload=ChatStreamMessagePayload(
+                state=ChatMessageSate.GENERATE_ANSWER,
+                display="Generating a Precise Answer with AI",
+            ),
+        )
+
     def _post_verification(
         self, user_question: str, response_text: str, chat_id: UUID, message_id: int
     ) -> Optional[str]:
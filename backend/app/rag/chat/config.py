@@ -1,7 +1,11 @@
 import logging
+import threading
+import time
 import dspy
 
-from typing import Optional, List
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional, List, NamedTuple, Tuple
 from pydantic import BaseModel, Field
 from sqlmodel import Session
 
@@ -15,6 +19,8 @@ from app.rag.llms.dspy import get_dspy_lm_by_llama_llm
 from app.rag.llms.resolver import get_default_llm, resolve_llm
 from app.rag.rerankers.resolver import get_default_reranker_model, resolve_reranker
 
+from app.core.config import settings
+from app.core.db import engine
 from app.models import (
     LLM as DBLLM,
     RerankerModel as DBRerankerModel,
@@ -71,6 +77,94 @@ class KnowledgeBaseOption(BaseModel):
     )
 
 
+class ChatEngineContext(NamedTuple):
+    llm: Optional[DBLLM]
+    fast_llm: Optional[DBLLM]
+    reranker: Optional[DBRerankerModel]
+    knowledge_bases: List[KnowledgeBase]
+
+
+class ChatEngineContextCache:
+    """
+    Caches the LLMs, reranker and linked knowledge bases of chat engines, so that
+    building the chat engine config on every chat turn does not reload them.
+
+    Entries are keyed by the engine id and `updated_at`, so updating the engine
+    invalidates them immediately, and expire after `ttl` seconds to bound the
+    staleness of the linked models and knowledge bases.
+
+    The cached objects are loaded in a dedicated session and stay detached, each
+    caller gets its own copies merged into its session without emitting SQL.
+    """
+
+    def __init__(self, max_size: int, ttl: int):
+        self._max_size = max_size
+        self._ttl = ttl
+        self._entries: OrderedDict[
+            Tuple[int, Optional[datetime]], Tuple[float, ChatEngineContext]
+        ] = OrderedDict()
+        self._mutex = threading.Lock()
+
+    def get(self, session: Session, db_chat_engine: DBChatEngine) -> ChatEngineContext:
+        key = (db_chat_engine.id, db_chat_engine.updated_at)
+        now = time.time()
+        with self._mutex:
+            entry = self._entries.get(key)
+            if entry and now - entry[0] <= self._ttl:
+                self._entries.move_to_end(key)
+                context = entry[1]
+            else:
+                context = None
+
+        if context is None:
+            context = self._load(db_chat_engine)
+            with self._mutex:
+                self._entries[key] = (now, context)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self._max_size:
+                    self._entries.popitem(last=False)
+
+        return ChatEngineContext(
+            llm=self._merge(session, context.llm),
+            fast_llm=self._merge(session, context.fast_llm),
+            reranker=self._merge(session, context.reranker),
+            knowledge_bases=[
+                self._merge(session, kb) for kb in context.knowledge_bases
+            ],
+        )
+
+    def clear(self):
+        with self._mutex:
+            self._entries.clear()
+
+    @staticmethod
+    def _merge(session: Session, obj):
+        if obj is None:
+            return None
+        return session.merge(obj, load=False)
+
+    @staticmethod
+    def _load(db_chat_engine: DBChatEngine) -> ChatEngineContext:
+        config = ChatEngineConfig.model_validate(db_chat_engine.engine_options)
+        with Session(engine) as session:
+            context = ChatEngineContext(
+                llm=session.get(DBLLM, db_chat_engine.llm_id)
+                if db_chat_engine.llm_id
+                else None,
+                fast_llm=session.get(DBLLM, db_chat_engine.fast_llm_id)
+                if db_chat_engine.fast_llm_id
+                else None,
+                reranker=session.get(DBRerankerModel, db_chat_engine.reranker_id)
+                if db_chat_engine.reranker_id
+                else None,
+                knowledge_bases=knowledge_base_repo.get_by_ids(
+                    session, config.get_linked_knowledge_base_ids()
+                ),
+            )
+            session.expunge_all()
+        return context
+
+
 class ChatEngineConfig(BaseModel):
     external_engine_config: Optional[ExternalChatEngine] = None
 
@@ -92,6 +186,7 @@ class ChatEngineConfig(BaseModel):
     _db_llm: Optional[DBLLM] = None
     _db_fast_llm: Optional[DBLLM] = None
     _db_reranker: Optional[DBRerankerModel] = None
+    _knowledge_bases: Optional[List[KnowledgeBase]] = None
 
     @property
     def is_external_engine(self) -> bool:
@@ -123,11 +218,19 @@ class ChatEngineConfig(BaseModel):
             )
             db_chat_engine = chat_engine_repo.get_default_engine(session)
 
+        return cls.load_from_db_chat_engine(session, db_chat_engine)
+
+    @classmethod
+    def load_from_db_chat_engine(
+        cls, session: Session, db_chat_engine: DBChatEngine
+    ) -> "ChatEngineConfig":
+        context = chat_engine_context_cache.get(session, db_chat_engine)
         obj = cls.model_validate(db_chat_engine.engine_options)
         obj._db_chat_engine = db_chat_engine
-        obj._db_llm = db_chat_engine.llm
-        obj._db_fast_llm = db_chat_engine.fast_llm
-        obj._db_reranker = db_chat_engine.reranker
+        obj._db_llm = context.llm
+        obj._db_fast_llm = context.fast_llm
+        obj._db_reranker = context.reranker
+        obj._knowledge_bases = context.knowledge_bases
         return obj
 
     def get_llama_llm(self, session: Session) -> LLM:
@@ -177,17 +280,26 @@ class ChatEngineConfig(BaseModel):
     def get_metadata_filter(self) -> BaseNodePostprocessor:
         return MetadataPostFilter(self.vector_search.metadata_filters)
 
-    def get_knowledge_bases(self, db_session: Session) -> List[KnowledgeBase]:
+    def get_linked_knowledge_base_ids(self) -> List[int]:
         if not self.knowledge_base:
             return []
         kb_config: KnowledgeBaseOption = self.knowledge_base
         linked_knowledge_base_ids = []
         if len(kb_config.linked_knowledge_bases) == 0:
-            linked_knowledge_base_ids.append(kb_config.linked_knowledge_base.id)
+            if kb_config.linked_knowledge_base:
+                linked_knowledge_base_ids.append(kb_config.linked_knowledge_base.id)
         else:
             linked_knowledge_base_ids.extend(
                 [kb.id for kb in kb_config.linked_knowledge_bases]
             )
+        return linked_knowledge_base_ids
+
+    def get_knowledge_bases(self, db_session: Session) -> List[KnowledgeBase]:
+        if self._knowledge_bases is not None:
+            return self._knowledge_bases
+        linked_knowledge_base_ids = self.get_linked_knowledge_base_ids()
+        if not linked_knowledge_base_ids:
+            return []
         knowledge_bases = knowledge_base_repo.get_by_ids(
             db_session, knowledge_base_ids=linked_knowledge_base_ids
         )
@@ -209,3 +321,9 @@ class ChatEngineConfig(BaseModel):
                 "post_verification_token": True,
             }
         )
+
+
+chat_engine_context_cache = ChatEngineContextCache(
+    max_size=settings.CHAT_ENGINE_CACHE_MAX_SIZE,
+    ttl=settings.CHAT_ENGINE_CACHE_TTL,
+)
@@ -141,16 +141,20 @@ class RetrieveFlow:
         )
         return retriever.retrieve(QueryBundle(user_question))
 
-    def get_documents_from_nodes(self, nodes: List[NodeWithScore]) -> List[DBDocument]:
+    def get_documents_from_nodes(
+        self, nodes: List[NodeWithScore], db_session: Optional[Session] = None
+    ) -> List[DBDocument]:
         document_ids = [n.node.metadata["document_id"] for n in nodes]
-        documents = document_repo.fetch_by_ids(self.db_session, document_ids)
+        documents = document_repo.fetch_by_ids(
+            db_session or self.db_session, document_ids
+        )
         # Keep the original order of document ids, which is sorted by similarity.
         return sorted(documents, key=lambda x: document_ids.index(x.id))
 
     def get_source_documents_from_nodes(
-        self, nodes: List[NodeWithScore]
+        self, nodes: List[NodeWithScore], db_session: Optional[Session] = None
     ) -> List[SourceDocument]:
-        documents = self.get_documents_from_nodes(nodes)
+        documents = self.get_documents_from_nodes(nodes, db_session)
         return [
             SourceDocument(
                 id=doc.id,
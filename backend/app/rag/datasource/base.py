@@ -12,6 +12,9 @@ class BaseDataSource(ABC):
     data_source_id: int
     user_id: UUID
     config: Any
+    # The documents imported before which are no longer in the data source,
+    # known once the documents are loaded.
+    stale_document_ids: list[int]
 
     def __init__(
         self,
@@ -27,6 +30,7 @@ class BaseDataSource(ABC):
         self.knowledge_base_id = knowledge_base_id
         self.data_source_id = data_source_id
         self.user_id = user_id
+        self.stale_document_ids = []
         self.validate_config()
 
     @abstractmethod
@@ -1,13 +1,14 @@
 import logging
-import docx
-import pptx
-import openpyxl
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from pydantic import BaseModel
-from typing import Generator, IO
-from pypdf import PdfReader
+from typing import Generator, Tuple
 
+from app.core.config import settings
 from app.models import Document, Upload
 from app.file_storage import default_file_storage
+from app.rag.file_extractor import FileExtractionError, extract_text, is_extractable
+from app.repositories import document_repo
 from app.types import MimeTypes
 from .base import BaseDataSource
 
@@ -26,77 +27,68 @@ class FileDataSource(BaseDataSource):
             FileConfig.model_validate(f_config)
 
     def load_documents(self) -> Generator[Document, None, None]:
+        # Uploads with the same content share the same path, so the files that
+        # are already imported from this data source are unchanged.
+        imported_paths = document_repo.get_source_uris_by_datasource(
+            self.session, self.data_source_id
+        )
+        uploads = []
         for f_config in self.config:
             upload_id = f_config["file_id"]
             upload = self.session.get(Upload, upload_id)
             if upload is None:
                 logger.error(f"Upload with id {upload_id} not found")
                 continue
-
-            with default_file_storage.open(upload.path) as f:
-                if upload.mime_type == MimeTypes.PDF:
-                    content = extract_text_from_pdf(f)
-                    mime_type = MimeTypes.PLAIN_TXT
-                elif upload.mime_type == MimeTypes.DOCX:
-                    content = extract_text_from_docx(f)
-                    mime_type = MimeTypes.PLAIN_TXT
-                elif upload.mime_type == MimeTypes.PPTX:
-                    content = extract_text_from_pptx(f)
-                    mime_type = MimeTypes.PLAIN_TXT
-                elif upload.mime_type == MimeTypes.XLSX:
-                    content = extract_text_from_xlsx(f)
-                    mime_type = MimeTypes.PLAIN_TXT
-                elif upload.mime_type == MimeTypes.MARKDOWN:
-                    content = f.read()
-                    mime_type = MimeTypes.MARKDOWN
-                else:
-                    content = f.read()
-                    mime_type = upload.mime_type
-
-            document = Document(
-                name=upload.name,
-                hash=hash(content),
-                content=content,
-                mime_type=mime_type,
-                knowledge_base_id=self.knowledge_base_id,
-                data_source_id=self.data_source_id,
-                user_id=self.user_id,
-                source_uri=upload.path,
-                last_modified_at=upload.created_at,
-            )
-            yield document
-
-
-def extract_text_from_pdf(file: IO) -> str:
-    reader = PdfReader(file)
-    return "\n\n".join([page.extract_text() for page in reader.pages])
-
-
-def extract_text_from_docx(file: IO) -> str:
-    document = docx.Document(file)
-    full_text = []
-    for paragraph in document.paragraphs:
-        full_text.append(paragraph.text)
-    return "\n\n".join(full_text)
-
-
-def extract_text_from_pptx(file: IO) -> str:
-    presentation = pptx.Presentation(file)
-    full_text = []
-    for slide in presentation.slides:
-        for shape in slide.shapes:
-            if hasattr(shape, "text"):
-                full_text.append(shape.text)
-    return "\n\n".join(full_text)
+            if upload.path in imported_paths:
+                logger.info(
+                    f"Skip upload #{upload_id}, the same file is already imported"
+                )
+                continue
+            imported_paths.add(upload.path)
+            uploads.append(upload)
+
+        # Extract the files in child processes, a few files ahead of the
+        # consumer, so the extraction overlaps with the indexing of the
+        # previous documents.
+        max_workers = settings.FILE_EXTRACT_MAX_WORKERS
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = deque()
+            for upload in uploads:
+                future = executor.submit(
+                    load_file_content, upload.path, upload.mime_type, upload.hash
+                )
+                pending.append((upload, future))
+                if len(pending) >= max_workers:
+                    yield from self._build_document(*pending.popleft())
+            while pending:
+                yield from self._build_document(*pending.popleft())
+
+    def _build_document(
+        self, upload: Upload, future: Future
+    ) -> Generator[Document, None, None]:
+        try:
+            content, mime_type = future.result()
+        except FileExtractionError as e:
+            logger.error(f"Failed to load upload #{upload.id}: {e}")
+            return
+
+        yield Document(
+            name=upload.name,
+            hash=hash(content),
+            content=content,
+            mime_type=mime_type,
+            knowledge_base_id=self.knowledge_base_id,
+            data_source_id=self.data_source_id,
+            user_id=self.user_id,
+            source_uri=upload.path,
+            last_modified_at=upload.created_at,
+        )
 
 
-def extract_text_from_xlsx(file: IO) -> str:
-    wb = openpyxl.load_workbook(file)
-    full_text = []
-    for sheet in wb.worksheets:
-        full_text.append(f"Sheet: {sheet.title}")
-        sheet_string = "\n".join(
-            ",".join(map(str, row)) for row in sheet.iter_rows(values_only=True)
-        )
-        full_text.append(sheet_string)
-    return "\n\n".join(full_text)
+def load_file_content(
+    path: str, mime_type: str, content_hash: str | None
+) -> Tuple[str, str]:
+    if is_extractable(mime_type):
+        return extract_text(path, mime_type, content_hash), MimeTypes.PLAIN_TXT
+    with default_file_storage.open(path) as f:
+        return f.read(), mime_type
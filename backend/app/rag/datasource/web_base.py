@@ -1,53 +1,181 @@
+import hashlib
 import logging
 from datetime import datetime, UTC
-from typing import Generator
-from playwright.sync_api import sync_playwright
+from email.utils import parsedate_to_datetime
+from typing import Generator, Mapping, Optional
 from bs4 import BeautifulSoup
 from markdownify import MarkdownConverter
+from sqlmodel import Session
 
-from app.models import Document
+from app.models import Document, DocIndexTaskStatus
+from app.models.document import SYNC_META_KEY
 from app.rag.datasource.consts import IGNORE_TAGS, IGNORE_CLASSES
+from app.rag.datasource.web_crawler import PageValidators, WebPage, crawl_web_pages
+from app.repositories import document_repo
 
 logger = logging.getLogger(__name__)
 
 
+def content_digest(content: str) -> str:
+    """A digest of the content which is stable across processes, fits `Document.hash`."""
+    return hashlib.blake2b(content.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def html_to_markdown(html: str) -> str:
+    soup = BeautifulSoup(html, "html.parser")
+    for t in IGNORE_TAGS:
+        for tag in soup.find_all(t):
+            tag.extract()
+    for c in IGNORE_CLASSES:
+        for tag in soup.find_all(class_=c):
+            tag.extract()
+    return MarkdownConverter().convert_soup(soup)
+
+
+def _parse_last_modified(value: Optional[str]) -> datetime:
+    if value:
+        try:
+            dt = parsedate_to_datetime(value)
+            return dt if dt.tzinfo else dt.replace(tzinfo=UTC)
+        except (TypeError, ValueError):
+            pass
+    return datetime.now(UTC)
+
+
 def load_web_documents(
-    knowledge_base_id: int, data_source_id: int, urls: list[str]
-) -> Generator[Document, None, None]:
-    visited = set()
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        for url in urls:
-            page = browser.new_page()
-            response = page.goto(url)
-            final_url = page.url
-            if final_url in visited:
-                continue
+    session: Session,
+    knowledge_base_id: int,
+    data_source_id: int,
+    urls: list[str],
+    render_js: Optional[bool] = None,
+    sitemap_lastmods: Optional[Mapping[str, Optional[str]]] = None,
+) -> Generator[Document, None, list[int]]:
+    """
+    Load the web pages as documents, syncing with the documents imported by
+    previous runs of the data source:
+
+    - A page whose `<lastmod>` in the sitemap is unchanged is not fetched.
+    - A page crawled before is fetched with a conditional request using the
+      stored ETag / Last-Modified, and not downloaded if it is not modified.
+    - A page whose content digest is unchanged is not re-indexed.
+
+    The existing document of a changed page is yielded with the new content and
+    its index status reset to NOT_STARTED, so it is re-indexed. The existing
+    document of an unchanged page whose validators changed is yielded with its
+    index status untouched, so only its sync state is saved.
+
+    The existing documents are matched by the URL they were requested with, or
+    by the final URL after the redirects (the documents imported before the sync
+    state was stored only have the latter).
+
+    Returns the ids of the existing documents whose pages are no longer in the
+    URLs, to be deleted.
+    """
+    sitemap_lastmods = sitemap_lastmods or {}
 
-            if response.status >= 400:
-                logger.error(
-                    f"Failed to load page: {url}, response status: {response.status()}, skipping"
-                )
+    # The sync states of the imported documents, by the URL they were requested
+    # with and by their final URL.
+    existing: dict[int, tuple[str, dict]] = {}
+    by_url: dict[str, int] = {}
+    by_final_url: dict[str, int] = {}
+    states = document_repo.get_sync_states_by_datasource(session, data_source_id)
+    for doc_id, source_uri, doc_hash, meta in states:
+        state = meta.get(SYNC_META_KEY, {}) if isinstance(meta, dict) else {}
+        existing[doc_id] = (doc_hash, state)
+        if "url" in state:
+            by_url[state["url"]] = doc_id
+        by_final_url[source_uri] = doc_id
+
+    def find_existing(url: str) -> Optional[int]:
+        doc_id = by_url.get(url)
+        return doc_id if doc_id is not None else by_final_url.get(url)
+
+    matched_ids = set()
+    crawl_urls = []
+    validators = {}
+    for url in dict.fromkeys(urls):
+        doc_id = find_existing(url)
+        if doc_id is not None:
+            matched_ids.add(doc_id)
+            _, state = existing[doc_id]
+            lastmod = sitemap_lastmods.get(url)
+            if lastmod and lastmod == state.get("sitemap_lastmod"):
                 continue
-            soup = BeautifulSoup(page.content(), "html.parser")
-            for t in IGNORE_TAGS:
-                for tag in soup.find_all(t):
-                    tag.extract()
-            for c in IGNORE_CLASSES:
-                for tag in soup.find_all(class_=c):
-                    tag.extract()
-            content = MarkdownConverter().convert_soup(soup)
-            title = page.title()
-            visited.add(final_url)
-            document = Document(
-                name=title,
-                hash=hash(content),
+            validators[url] = PageValidators(
+                etag=state.get("etag"), last_modified=state.get("last_modified")
+            )
+        crawl_urls.append(url)
+    logger.info(
+        f"Crawling {len(crawl_urls)} of {len(urls)} URLs, "
+        f"the others are unchanged since the last sync"
+    )
+
+    crawled_pages = 0
+    for page in crawl_web_pages(crawl_urls, render_js=render_js, validators=validators):
+        crawled_pages += 1
+        state = {
+            "url": page.url,
+            "etag": page.etag,
+            "last_modified": page.last_modified,
+            "sitemap_lastmod": sitemap_lastmods.get(page.url),
+        }
+
+        doc_id = find_existing(page.url)
+        if doc_id is None:
+            doc_id = by_final_url.get(page.final_url)
+        if doc_id is None:
+            content = html_to_markdown(page.html)
+            yield Document(
+                name=page.title,
+                hash=content_digest(content),
                 content=content,
                 mime_type="text/plain",
                 knowledge_base_id=knowledge_base_id,
                 data_source_id=data_source_id,
-                source_uri=final_url,
-                last_modified_at=datetime.now(UTC),
+                source_uri=page.final_url,
+                meta={SYNC_META_KEY: state},
+                last_modified_at=_parse_last_modified(page.last_modified),
             )
-            yield document
-        browser.close()
+            continue
+
+        matched_ids.add(doc_id)
+        doc_hash, old_state = existing[doc_id]
+        if page.not_modified:
+            content, digest = None, doc_hash
+        else:
+            content = html_to_markdown(page.html)
+            digest = content_digest(content)
+        if digest == doc_hash and state == old_state:
+            continue
+        document = document_repo.must_get(session, doc_id)
+        document.meta = {**_meta_dict(document), SYNC_META_KEY: state}
+        if digest != doc_hash:
+            _update_content(document, page, content, digest)
+        yield document
+
+    stale_ids = []
+    for doc_id, (_, state) in existing.items():
+        if doc_id in matched_ids:
+            continue
+        # A document without the requested URL may be the redirect target of a
+        # page which failed to load this time.
+        if "url" not in state and crawled_pages < len(crawl_urls):
+            continue
+        stale_ids.append(doc_id)
+    if stale_ids:
+        logger.info(f"{len(stale_ids)} documents are no longer in the web pages")
+    return stale_ids
+
+
+def _meta_dict(document: Document) -> dict:
+    return document.meta if isinstance(document.meta, dict) else {}
+
+
+def _update_content(document: Document, page: WebPage, content: str, digest: str):
+    document.name = page.title
+    document.hash = digest
+    document.content = content
+    document.source_uri = page.final_url
+    document.last_modified_at = _parse_last_modified(page.last_modified)
+    document.index_status = DocIndexTaskStatus.NOT_STARTED
+    document.index_result = None
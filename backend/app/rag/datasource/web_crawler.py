@@ -0,0 +1,358 @@
+"""
+Concurrent web crawler used by the web data sources.
+
+Pages are first fetched with plain HTTP. Only pages that look like they need
+JavaScript to render their content (or every page, if the data source asks for
+it) are rendered with Chromium, using a bounded pool of browser contexts that
+are recycled after a number of pages to bound their memory. The number of
+concurrent requests is limited both globally and per host.
+
+The crawler runs on an event loop in a background thread, the pages are handed
+over to the synchronous `crawl_web_pages` generator through a bounded queue, so
+the crawling continues while the consumer indexes the previous pages.
+
+Pages crawled before can be given with the validators (ETag / Last-Modified) of
+their last response, they are then fetched with a conditional request, and are
+yielded without content and flagged as `not_modified` if the server answers
+that they have not been modified.
+"""
+
+import asyncio
+import logging
+import queue
+import re
+import threading
+from dataclasses import dataclass
+from typing import AsyncIterator, Generator, Mapping, Optional, Tuple
+from urllib.parse import urlparse
+
+import httpx
+from bs4 import BeautifulSoup
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = "Mozilla/5.0 (compatible; AutoFlowCrawler/1.0)"
+
+# Markers of client-side rendered pages, whose static HTML is only a shell.
+JS_APP_MARKERS = re.compile(
+    r'<div[^>]+id=["\'](root|app|__next|__nuxt)["\'][^>]*>\s*</div>'
+    r"|enable javascript to run this app"
+    r"|you need to enable javascript",
+    re.IGNORECASE,
+)
+# A page whose static HTML has less visible text than this is rendered by the
+# browser, in case its content is loaded by scripts.
+MIN_STATIC_TEXT_LENGTH = 200
+
+
+@dataclass
+class WebPage:
+    url: str
+    final_url: str
+    html: str
+    title: str
+    # The validators of the HTTP response, for the conditional requests of the next crawl.
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    # Whether the server answered a conditional request with 304, the page has no content.
+    not_modified: bool = False
+
+
+@dataclass
+class PageValidators:
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+    def to_headers(self) -> dict[str, str]:
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+def inspect_static_html(html: str) -> Tuple[str, bool]:
+    """Returns the title of the page and whether it needs JavaScript to render."""
+    soup = BeautifulSoup(html, "html.parser")
+    title = soup.title.get_text(strip=True) if soup.title else ""
+    if JS_APP_MARKERS.search(html):
+        return title, True
+    for tag in soup(["script", "style", "noscript", "template"]):
+        tag.extract()
+    body = soup.body or soup
+    return title, len(body.get_text(" ", strip=True)) < MIN_STATIC_TEXT_LENGTH
+
+
+class BrowserPool:
+    """
+    A bounded pool of Chromium browser contexts. The browser is launched on the
+    first use, and a context is closed and replaced after it has rendered
+    `pages_per_context` pages.
+    """
+
+    def __init__(self, max_contexts: int, pages_per_context: int, timeout: float):
+        self._max_contexts = max_contexts
+        self._pages_per_context = pages_per_context
+        self._timeout = timeout
+        self._playwright = None
+        self._browser = None
+        self._launch_lock = asyncio.Lock()
+        self._contexts: Optional[asyncio.Queue] = None
+
+    async def _ensure_browser(self):
+        async with self._launch_lock:
+            if self._browser is not None:
+                return
+            from playwright.async_api import async_playwright
+
+            self._playwright = await async_playwright().start()
+            self._browser = await self._playwright.chromium.launch(headless=True)
+            self._contexts = asyncio.Queue()
+            for _ in range(self._max_contexts):
+                self._contexts.put_nowait((await self._new_context(), 0))
+
+    async def _new_context(self):
+        return await self._browser.new_context(user_agent=USER_AGENT)
+
+    async def render(self, url: str) -> Optional[WebPage]:
+        await self._ensure_browser()
+        context, used = await self._contexts.get()
+        page = None
+        try:
+            page = await context.new_page()
+            response = await page.goto(url, timeout=self._timeout * 1000)
+            if response is None or response.status >= 400:
+                logger.error(
+                    f"Failed to load page: {url}, response status: "
+                    f"{response.status if response else 'None'}, skipping"
+                )
+                return None
+            return WebPage(
+                url=url,
+                final_url=page.url,
+                html=await page.content(),
+                title=await page.title(),
+            )
+        finally:
+            if page is not None:
+                await page.close()
+            used += 1
+            if used >= self._pages_per_context:
+                await context.close()
+                context, used = await self._new_context(), 0
+            self._contexts.put_nowait((context, used))
+
+    async def close(self):
+        if self._browser is not None:
+            await self._browser.close()
+            await self._playwright.stop()
+
+
+class WebCrawler:
+    def __init__(
+        self,
+        render_js: Optional[bool] = None,
+        max_concurrency: int = settings.WEB_CRAWLER_MAX_CONCURRENCY,
+        max_concurrency_per_host: int = settings.WEB_CRAWLER_MAX_CONCURRENCY_PER_HOST,
+        max_browser_contexts: int = settings.WEB_CRAWLER_MAX_BROWSER_CONTEXTS,
+        pages_per_context: int = settings.WEB_CRAWLER_PAGES_PER_CONTEXT,
+        timeout: float = settings.WEB_CRAWLER_TIMEOUT,
+    ):
+        """
+        Args:
+            render_js: Whether to render the pages with the browser, if None, only
+                the pages that look like they need JavaScript are rendered.
+        """
+        self._render_js = render_js
+        self._max_concurrency = max_concurrency
+        self._max_concurrency_per_host = max_concurrency_per_host
+        self._timeout = timeout
+        self._browser_pool = BrowserPool(
+            max_browser_contexts, pages_per_context, timeout
+        )
+        self._host_semaphores: dict[str, asyncio.Semaphore] = {}
+
+    def _host_semaphore(self, url: str) -> asyncio.Semaphore:
+        host = urlparse(url).netloc
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(
+                self._max_concurrency_per_host
+            )
+        return self._host_semaphores[host]
+
+    async def _fetch_static(
+        self,
+        client: httpx.AsyncClient,
+        url: str,
+        validators: Optional[PageValidators] = None,
+    ) -> Tuple[Optional[WebPage], bool]:
+        """
+        Returns the page and whether it should be rendered by the browser instead,
+        the page is None if it failed to load.
+        """
+        headers = validators.to_headers() if validators else {}
+        response = await client.get(url, headers=headers)
+        if response.status_code == 304:
+            page = WebPage(
+                url=url,
+                final_url=url,
+                html="",
+                title="",
+                etag=response.headers.get("etag", validators.etag),
+                last_modified=response.headers.get(
+                    "last-modified", validators.last_modified
+                ),
+                not_modified=True,
+            )
+            return page, False
+        if response.status_code >= 400:
+            logger.error(
+                f"Failed to load page: {url}, response status: {response.status_code}, skipping"
+            )
+            return None, False
+        content_type = response.headers.get("content-type", "text/html")
+        if "html" not in content_type:
+            logger.error(f"Skip page {url} with content type {content_type}")
+            return None, False
+        html = response.text
+        if self._render_js:
+            title, needs_browser = "", True
+        else:
+            # Parse in a thread, so the event loop keeps serving the other requests.
+            title, needs_js = await asyncio.to_thread(inspect_static_html, html)
+            needs_browser = self._render_js is None and needs_js
+        page = WebPage(
+            url=url,
+            final_url=str(response.url),
+            html=html,
+            title=title,
+            etag=response.headers.get("etag"),
+            last_modified=response.headers.get("last-modified"),
+        )
+        return page, needs_browser
+
+    async def _crawl_one(
+        self,
+        client: httpx.AsyncClient,
+        url: str,
+        validators: Optional[PageValidators] = None,
+    ) -> Optional[WebPage]:
+        async with self._host_semaphore(url):
+            try:
+                if self._render_js and validators is None:
+                    return await self._browser_pool.render(url)
+                # A page crawled before is checked with a conditional request
+                # first, even if it is always rendered by the browser.
+                page, needs_browser = await self._fetch_static(client, url, validators)
+                if page is None or page.not_modified or not needs_browser:
+                    return page
+                rendered = await self._browser_pool.render(url)
+                if rendered is not None:
+                    rendered.etag = page.etag
+                    rendered.last_modified = page.last_modified
+                return rendered
+            except Exception as e:
+                logger.error(f"Error processing URL {url}: {e}")
+                return None
+
+    async def crawl(
+        self,
+        urls: list[str],
+        validators: Optional[Mapping[str, PageValidators]] = None,
+    ) -> AsyncIterator[WebPage]:
+        """
+        Crawl the URLs concurrently, yielding the pages as they complete.
+
+        Args:
+            validators: The validators of the pages crawled before by URL, the
+                pages not modified since are yielded as `not_modified`.
+        """
+        validators = validators or {}
+        visited = set()
+        pending: set[asyncio.Task] = set()
+        url_iter = iter(dict.fromkeys(urls))
+        async with httpx.AsyncClient(
+            follow_redirects=True,
+            timeout=self._timeout,
+            headers={"User-Agent": USER_AGENT},
+            limits=httpx.Limits(max_connections=self._max_concurrency),
+        ) as client:
+            try:
+                while True:
+                    for url in url_iter:
+                        pending.add(
+                            asyncio.create_task(
+                                self._crawl_one(client, url, validators.get(url))
+                            )
+                        )
+                        if len(pending) >= self._max_concurrency:
+                            break
+                    if not pending:
+                        break
+                    done, pending = await asyncio.wait(
+                        pending, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    for task in done:
+                        page = task.result()
+                        if page is None or page.final_url in visited:
+                            continue
+                        visited.add(page.final_url)
+                        yield page
+            finally:
+                for task in pending:
+                    task.cancel()
+                await self._browser_pool.close()
+
+
+_DONE = object()
+
+
+def crawl_web_pages(
+    urls: list[str],
+    render_js: Optional[bool] = None,
+    validators: Optional[Mapping[str, PageValidators]] = None,
+) -> Generator[WebPage, None, None]:
+    """Crawl the URLs with a `WebCrawler` running in a background thread."""
+    pages: queue.Queue = queue.Queue(maxsize=settings.WEB_CRAWLER_MAX_CONCURRENCY)
+    stopped = threading.Event()
+
+    def put(item):
+        # Block until the consumer takes the item, unless it has stopped.
+        while not stopped.is_set():
+            try:
+                pages.put(item, timeout=1)
+                return
+            except queue.Full:
+                continue
+
+    async def produce():
+        crawler = WebCrawler(render_js=render_js)
+        loop = asyncio.get_running_loop()
+        async for page in crawler.crawl(urls, validators):
+            await loop.run_in_executor(None, put, page)
+            if stopped.is_set():
+                break
+
+    def run():
+        try:
+            asyncio.run(produce())
+            put(_DONE)
+        except BaseException as e:
+            put(e)
+
+    thread = threading.Thread(target=run, name="web-crawler", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = pages.get()
+            if item is _DONE:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stopped.set()
+        thread.join()
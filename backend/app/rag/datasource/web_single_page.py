@@ -1,6 +1,6 @@
 import logging
 from pydantic import BaseModel
-from typing import Generator, List
+from typing import Generator, List, Optional
 
 from app.models import Document
 from app.rag.datasource.base import BaseDataSource
@@ -11,6 +11,8 @@ logger = logging.getLogger(__name__)
 
 class WebSinglePageConfig(BaseModel):
     urls: List[str]
+    # See WebSitemapConfig.render_js.
+    render_js: Optional[bool] = None
 
 
 class WebSinglePageDataSource(BaseDataSource):
@@ -24,4 +26,10 @@ class WebSinglePageDataSource(BaseDataSource):
         else:
             urls = self.config["urls"]
 
-        yield from load_web_documents(self.knowledge_base_id, self.data_source_id, urls)
+        self.stale_document_ids = yield from load_web_documents(
+            self.session,
+            self.knowledge_base_id,
+            self.data_source_id,
+            urls,
+            render_js=self.config.get("render_js"),
+        )
@@ -1,5 +1,5 @@
 import logging
-from typing import Generator
+from typing import Generator, Optional
 from urllib.parse import urlparse, urljoin
 
 import requests
@@ -15,6 +15,9 @@ logger = logging.getLogger(__name__)
 
 class WebSitemapConfig(BaseModel):
     url: str
+    # Render every page with the browser if True, never if False, and only the
+    # pages that look like they need JavaScript if None.
+    render_js: Optional[bool] = None
 
 
 def _ensure_absolute_url(source_url: str, maybe_relative_url: str) -> str:
@@ -23,15 +26,17 @@ def _ensure_absolute_url(source_url: str, maybe_relative_url: str) -> str:
     return maybe_relative_url
 
 
-def extract_urls_from_sitemap(sitemap_url: str) -> list[str]:
+def extract_urls_from_sitemap(sitemap_url: str) -> dict[str, Optional[str]]:
+    """Returns the URLs in the sitemap, mapped to their `<lastmod>` if any."""
     response = requests.get(sitemap_url)
     response.raise_for_status()
 
     soup = BeautifulSoup(response.content, "html.parser")
-    result = [
-        _ensure_absolute_url(sitemap_url, loc_tag.text)
-        for loc_tag in soup.find_all("loc")
-    ]
+    result = {}
+    for loc_tag in soup.find_all("loc"):
+        url = _ensure_absolute_url(sitemap_url, loc_tag.text.strip())
+        lastmod_tag = loc_tag.find_next_sibling("lastmod")
+        result[url] = lastmod_tag.text.strip() if lastmod_tag else None
     if not result:
         raise ValueError(f"No URLs found in sitemap {sitemap_url}")
     return result
@@ -43,6 +48,13 @@ class WebSitemapDataSource(BaseDataSource):
 
     def load_documents(self) -> Generator[Document, None, None]:
         sitemap_url = self.config["url"]
-        urls = extract_urls_from_sitemap(sitemap_url)
-        logger.info(f"Found {len(urls)} URLs in sitemap {sitemap_url}")
-        yield from load_web_documents(self.knowledge_base_id, self.data_source_id, urls)
+        lastmods = extract_urls_from_sitemap(sitemap_url)
+        logger.info(f"Found {len(lastmods)} URLs in sitemap {sitemap_url}")
+        self.stale_document_ids = yield from load_web_documents(
+            self.session,
+            self.knowledge_base_id,
+            self.data_source_id,
+            list(lastmods),
+            render_js=self.config.get("render_js"),
+            sitemap_lastmods=lastmods,
+        )
@@ -0,0 +1,162 @@
+"""
+Text extraction of the uploaded PDF, DOCX, PPTX and XLSX files.
+
+Extraction runs in a child process bounded by a timeout and a memory limit, so
+a large or malformed file can neither block the Celery worker for minutes nor
+OOM it. The Celery prefork workers are daemonic processes, which are not
+allowed to own a multiprocessing pool, so each extraction is a subprocess and
+the number of concurrent extractions per worker process is bounded by a
+semaphore.
+
+The child process streams the extracted text to stdout part by part (page by
+page, paragraph by paragraph, sheet by sheet) instead of accumulating it.
+"""
+
+import io
+import os
+import subprocess
+import sys
+import threading
+from typing import IO, Iterator
+
+from app.core.config import settings
+from app.file_storage import default_file_storage
+from app.types import MimeTypes
+
+PART_SEPARATOR = "\n\n"
+# The directory containing the `app` package, the working directory of the child process.
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+
+
+class FileExtractionError(Exception):
+    pass
+
+
+def iter_text_from_pdf(file: IO) -> Iterator[str]:
+    from pypdf import PdfReader
+
+    reader = PdfReader(file)
+    for page in reader.pages:
+        yield page.extract_text()
+
+
+def iter_text_from_docx(file: IO) -> Iterator[str]:
+    import docx
+
+    document = docx.Document(file)
+    for paragraph in document.paragraphs:
+        yield paragraph.text
+
+
+def iter_text_from_pptx(file: IO) -> Iterator[str]:
+    import pptx
+
+    presentation = pptx.Presentation(file)
+    for slide in presentation.slides:
+        for shape in slide.shapes:
+            if hasattr(shape, "text"):
+                yield shape.text
+
+
+def iter_text_from_xlsx(file: IO) -> Iterator[str]:
+    import openpyxl
+
+    # Read-only mode streams the rows instead of loading the whole workbook.
+    wb = openpyxl.load_workbook(file, read_only=True)
+    try:
+        for sheet in wb.worksheets:
+            yield f"Sheet: {sheet.title}"
+            yield "\n".join(
+                ",".join(map(str, row)) for row in sheet.iter_rows(values_only=True)
+            )
+    finally:
+        wb.close()
+
+
+TEXT_ITERATORS = {
+    MimeTypes.PDF: iter_text_from_pdf,
+    MimeTypes.DOCX: iter_text_from_docx,
+    MimeTypes.PPTX: iter_text_from_pptx,
+    MimeTypes.XLSX: iter_text_from_xlsx,
+}
+
+
+def is_extractable(mime_type: str) -> bool:
+    return mime_type in TEXT_ITERATORS
+
+
+_extraction_semaphore = threading.BoundedSemaphore(settings.FILE_EXTRACT_MAX_WORKERS)
+
+
+def _cache_path(content_hash: str) -> str:
+    return f"uploads/extracted/{content_hash}.txt"
+
+
+def extract_text(path: str, mime_type: str, content_hash: str | None = None) -> str:
+    """
+    Extract the text of the stored file in a child process. If the content hash
+    is given, the extracted text is cached by it, so identical files are only
+    extracted once.
+    """
+    if content_hash and default_file_storage.exists(_cache_path(content_hash)):
+        with default_file_storage.open(_cache_path(content_hash)) as f:
+            return f.read().decode("utf-8")
+
+    with _extraction_semaphore:
+        try:
+            proc = subprocess.run(
+                [
+                    sys.executable,
+                    "-m",
+                    __name__,
+                    path,
+                    mime_type,
+                    str(settings.FILE_EXTRACT_MAX_MEMORY_MB),
+                ],
+                cwd=BACKEND_DIR,
+                capture_output=True,
+                timeout=settings.FILE_EXTRACT_TIMEOUT,
+            )
+        except subprocess.TimeoutExpired:
+            raise FileExtractionError(
+                f"Extracting text from {path} timed out after {settings.FILE_EXTRACT_TIMEOUT}s"
+            )
+    if proc.returncode != 0:
+        stderr = proc.stderr.decode("utf-8", errors="replace").strip()
+        raise FileExtractionError(
+            f"Failed to extract text from {path} (exit code {proc.returncode}): "
+            f"{stderr[-1000:]}"
+        )
+
+    text = proc.stdout.decode("utf-8")
+    if content_hash:
+        # The file is saved atomically, a concurrent or later extraction never
+        # reads a partially written cache entry.
+        default_file_storage.save(_cache_path(content_hash), io.BytesIO(proc.stdout))
+    return text
+
+
+def _limit_memory(max_memory_mb: int):
+    if max_memory_mb <= 0:
+        return
+    import resource
+
+    limit = max_memory_mb * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def main():
+    path, mime_type, max_memory_mb = sys.argv[1:4]
+    _limit_memory(int(max_memory_mb))
+
+    out = sys.stdout.buffer
+    with default_file_storage.open(path) as f:
+        for i, part in enumerate(TEXT_ITERATORS[mime_type](f)):
+            if i > 0:
+                out.write(PART_SEPARATOR.encode("utf-8"))
+            out.write(part.encode("utf-8"))
+    out.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,7 @@ from llama_index.core.storage.docstore.types import RefDocInfo
 from llama_index.core.storage.storage_context import StorageContext
 from llama_index.core.schema import BaseNode, TransformComponent
 import llama_index.core.instrumentation as instrument
+from app.rag.indices.knowledge_graph.extraction_cache import KGExtractionCacheStore
 from app.rag.indices.knowledge_graph.extractor import SimpleGraphExtractor
 from app.rag.indices.knowledge_graph.graph_store import KnowledgeGraphStore
 
@@ -26,6 +27,9 @@ class KnowledgeGraphIndex(BaseIndex[IndexLPG]):
             A list of nodes to insert into the index.
         dspy_lm (dspy.BaseLLM):
             The language model of dspy to use for extracting triplets.
+        extraction_cache (Optional[KGExtractionCacheStore]):
+            The cache of the extracted triplets, keyed by the chunk text, the
+            extraction program and the language model.
         callback_manager (Optional[CallbackManager]):
             The callback manager to use.
         transformations (Optional[List[TransformComponent]]):
@@ -44,12 +48,14 @@ class KnowledgeGraphIndex(BaseIndex[IndexLPG]):
         dspy_lm: dspy.LM,
         kg_store: KnowledgeGraphStore,
         nodes: Optional[Sequence[BaseNode]] = None,
+        extraction_cache: Optional[KGExtractionCacheStore] = None,
         # parent class params
         callback_manager: Optional[CallbackManager] = None,
         **kwargs: Any,
     ) -> None:
         self._dspy_lm = dspy_lm
         self._kg_store = kg_store
+        self._extraction_cache = extraction_cache
         super().__init__(
             nodes=nodes,
             callback_manager=callback_manager,
@@ -84,7 +90,9 @@ class KnowledgeGraphIndex(BaseIndex[IndexLPG]):
         if len(nodes) == 0:
             return nodes
 
-        extractor = SimpleGraphExtractor(dspy_lm=self._dspy_lm)
+        extractor = SimpleGraphExtractor(
+            dspy_lm=self._dspy_lm, cache=self._extraction_cache
+        )
         for node in nodes:
             entities_df, rel_df = extractor.extract(
                 text=node.get_content(),
@@ -0,0 +1,87 @@
+import hashlib
+import json
+import logging
+from typing import Any, Optional
+
+import dspy
+from pydantic import BaseModel
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session
+
+from app.models import KGExtractionCache
+
+logger = logging.getLogger(__name__)
+
+# The LM settings which do not change the output of the model.
+_IGNORED_LM_KWARGS = {"api_key", "timeout", "num_retries"}
+
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def get_program_version(program: dspy.Module) -> str:
+    """
+    The version of the extraction program: a digest of the instructions, the
+    fields and the (compiled) demos of its predictors, which make up the prompts.
+    """
+    parts = []
+    for name, predictor in program.named_predictors():
+        signature = predictor.signature
+        parts.append(
+            {
+                "name": name,
+                "instructions": signature.instructions,
+                "fields": {
+                    field_name: [
+                        _describe_type(field.annotation),
+                        field.json_schema_extra,
+                    ]
+                    for field_name, field in signature.fields.items()
+                },
+                "demos": predictor.demos,
+            }
+        )
+    return _sha256(json.dumps(parts, sort_keys=True, default=str))
+
+
+def _describe_type(annotation: Any) -> Any:
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation.model_json_schema()
+    return str(annotation)
+
+
+def get_lm_identity(dspy_lm: dspy.LM) -> str:
+    """The model and the settings of the LM which affect its output."""
+    kwargs = {k: v for k, v in dspy_lm.kwargs.items() if k not in _IGNORED_LM_KWARGS}
+    return json.dumps({"model": dspy_lm.model, **kwargs}, sort_keys=True, default=str)
+
+
+def get_extraction_cache_key(text: str, program_version: str, lm_identity: str) -> str:
+    return _sha256(f"{_sha256(text)}:{program_version}:{lm_identity}")
+
+
+class KGExtractionCacheStore:
+    """
+    The knowledge graphs extracted from the chunks, persisted in the
+    `kg_extraction_cache` table, so a re-index or a rebuild of the knowledge
+    graph replays them instead of calling the LLM again.
+    """
+
+    def __init__(self, session: Session):
+        self._session = session
+
+    def get(self, key: str) -> Optional[dict]:
+        entry = self._session.get(KGExtractionCache, key)
+        return entry.value if entry is not None else None
+
+    def set(self, key: str, value: dict) -> None:
+        # Written in a session of its own, so the transaction of the caller is
+        # neither committed nor rolled back by the cache.
+        with Session(self._session.get_bind()) as session:
+            try:
+                session.merge(KGExtractionCache(key=key, value=value))
+                session.commit()
+            except IntegrityError:
+                # Another worker has cached the same extraction concurrently.
+                session.rollback()
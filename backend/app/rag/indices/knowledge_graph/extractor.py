@@ -7,6 +7,12 @@ from typing import Mapping, Optional, List
 from dspy import Predict
 from llama_index.core.schema import BaseNode
 
+from app.rag.indices.knowledge_graph.extraction_cache import (
+    KGExtractionCacheStore,
+    get_extraction_cache_key,
+    get_lm_identity,
+    get_program_version,
+)
 from app.rag.indices.knowledge_graph.schema import (
     Entity,
     Relationship,
@@ -130,24 +136,43 @@ class Extractor(dspy.Module):
 
 class SimpleGraphExtractor:
     def __init__(
-        self, dspy_lm: dspy.LM, complied_extract_program_path: Optional[str] = None
+        self,
+        dspy_lm: dspy.LM,
+        complied_extract_program_path: Optional[str] = None,
+        cache: Optional[KGExtractionCacheStore] = None,
     ):
         self.extract_prog = Extractor(dspy_lm=dspy_lm)
         if complied_extract_program_path is not None:
             self.extract_prog.load(complied_extract_program_path)
+        self._cache = cache
+        if cache is not None:
+            self._program_version = get_program_version(self.extract_prog)
+            self._lm_identity = get_lm_identity(dspy_lm)
 
     def extract(self, text: str, node: BaseNode):
-        pred = self.extract_prog(text=text)
+        knowledge = self._extract_knowledge(text)
         metadata = get_relation_metadata_from_node(node)
 
         # Ensure all entities have proper metadata dictionary structure
-        for entity in pred.knowledge.entities:
+        for entity in knowledge.entities:
             if entity.metadata is None or not isinstance(entity.metadata, dict):
                 entity.metadata = {"topic": "Unknown", "status": "auto-generated"}
 
-        return self._to_df(
-            pred.knowledge.entities, pred.knowledge.relationships, metadata
-        )
+        return self._to_df(knowledge.entities, knowledge.relationships, metadata)
+
+    def _extract_knowledge(self, text: str) -> KnowledgeGraph:
+        if self._cache is None:
+            return self.extract_prog(text=text).knowledge
+
+        key = get_extraction_cache_key(text, self._program_version, self._lm_identity)
+        cached = self._cache.get(key)
+        if cached is not None:
+            logger.debug(f"Replaying the cached knowledge graph <key: {key}>.")
+            return KnowledgeGraph.model_validate(cached)
+
+        knowledge = self.extract_prog(text=text).knowledge
+        self._cache.set(key, knowledge.model_dump(mode="json"))
+        return knowledge
 
     def _to_df(
         self,
@@ -0,0 +1,322 @@
+"""
+The batch deduplication of the entities of a knowledge base.
+
+The entities extracted from different chunks often describe the same thing, the
+duplicates inflate the degrees of the entities and the fan-out of the multi-hop
+retrieval. Instead of comparing every pair of entities, the deduplication:
+
+1. finds the candidate pairs with the vector index, by searching the nearest
+   entities of each entity (blocking);
+2. merges the pairs with the same normalized name within `merge_distance`
+   without the LLM, and asks the LLM to merge the ambiguous pairs (the same
+   name but further, or different names but closer than `merge_distance`);
+3. rewrites the relationships of the duplicates to the kept entity of each
+   cluster and deletes the duplicates, in bulk.
+"""
+
+import logging
+import re
+import unicodedata
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple, Type
+
+import dspy
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from pydantic import BaseModel
+from sqlalchemy import case, delete, update
+from sqlalchemy.orm.attributes import flag_modified
+from sqlmodel import Session, SQLModel, select
+
+from app.models import EntityType
+from app.models.knowledge_base_scoped.compact_vector import get_candidate_distance
+from app.rag.indices.knowledge_graph.graph_store.helpers import (
+    get_entity_description_embedding,
+    get_entity_metadata_embedding,
+)
+from app.rag.indices.knowledge_graph.graph_store.tidb_graph_store import (
+    MergeEntitiesProgram,
+)
+from app.rag.indices.knowledge_graph.schema import Entity
+
+logger = logging.getLogger(__name__)
+
+_NAME_SEPARATORS = re.compile(r"[\s\-_.,:;'\"`()\[\]{}]+")
+
+
+def normalize_entity_name(name: str) -> str:
+    """Make the names only differing in case, width, spaces or punctuation equal."""
+    name = unicodedata.normalize("NFKC", name).casefold()
+    return " ".join(_NAME_SEPARATORS.sub(" ", name).split())
+
+
+class EntityDedupConfig(BaseModel):
+    # The number of nearest entities searched for each entity.
+    neighbors: int = 5
+    # The max description distance of the candidate pairs.
+    candidate_distance: float = 0.2
+    # The pairs with the same normalized name within this distance are merged
+    # without the LLM.
+    merge_distance: float = 0.1
+    # The max number of ambiguous pairs sent to the LLM per run, 0 disables it.
+    max_llm_calls: int = 100
+    batch_size: int = 500
+
+
+@dataclass
+class EntityDedupResult:
+    candidate_pairs: int = 0
+    llm_calls: int = 0
+    merged_entities: int = 0
+    # The kept entity of each duplicate.
+    merges: Dict[int, int] = field(default_factory=dict)
+
+
+class _DisjointSet:
+    def __init__(self):
+        self._parents: Dict[int, int] = {}
+
+    def find(self, x: int) -> int:
+        parent = self._parents.setdefault(x, x)
+        if parent != x:
+            parent = self._parents[x] = self.find(parent)
+        return parent
+
+    def union(self, x: int, y: int) -> int:
+        # The oldest entity of a cluster is kept.
+        root_x, root_y = self.find(x), self.find(y)
+        root, child = min(root_x, root_y), max(root_x, root_y)
+        self._parents[child] = root
+        return root
+
+    def merges(self) -> Dict[int, int]:
+        return {x: self.find(x) for x in self._parents if self.find(x) != x}
+
+
+class EntityDeduplicator:
+    def __init__(
+        self,
+        entity_db_model: Type[SQLModel],
+        relationship_db_model: Type[SQLModel],
+        dspy_lm: Optional[dspy.LM],
+        embed_model: BaseEmbedding,
+        config: EntityDedupConfig = EntityDedupConfig(),
+    ):
+        self._entity_model = entity_db_model
+        self._relationship_model = relationship_db_model
+        self._dspy_lm = dspy_lm
+        self._embed_model = embed_model
+        self._config = config
+        self._merge_entities_prog = MergeEntitiesProgram()
+
+    def run(self, session: Session) -> EntityDedupResult:
+        result = EntityDedupResult()
+        pairs = list(self.find_candidate_pairs(session))
+        result.candidate_pairs = len(pairs)
+
+        clusters, merged_entities = self.decide(session, pairs, result)
+        result.merges = clusters.merges()
+        result.merged_entities = len(result.merges)
+        if result.merges:
+            self.apply(session, result.merges, merged_entities)
+            session.commit()
+
+        logger.info(
+            "Deduplicated the entities of %s: %d candidate pairs, %d LLM calls, "
+            "%d entities merged.",
+            self._entity_model.__tablename__,
+            result.candidate_pairs,
+            result.llm_calls,
+            result.merged_entities,
+        )
+        return result
+
+    def find_candidate_pairs(
+        self, session: Session
+    ) -> Iterable[Tuple[int, int, float]]:
+        """The pairs of the entities within the candidate distance, by the vector index."""
+        model = self._entity_model
+        seen = set()
+        last_id = 0
+        while True:
+            entities = session.exec(
+                select(model.id, model.description_vec)
+                .where(model.entity_type == EntityType.original, model.id > last_id)
+                .order_by(model.id)
+                .limit(self._config.batch_size)
+            ).all()
+            if not entities:
+                break
+            last_id = entities[-1].id
+
+            for entity_id, embedding in entities:
+                embedding = list(embedding)
+                distance = model.description_vec.cosine_distance(embedding)
+                candidate_distance, candidate_limit = get_candidate_distance(
+                    model, "description_vec", embedding, self._config.neighbors + 1
+                )
+                candidates = (
+                    select(model.id)
+                    .where(model.entity_type == EntityType.original)
+                    .order_by(candidate_distance)
+                    .limit(candidate_limit)
+                    .subquery()
+                )
+                neighbors = session.exec(
+                    select(model.id, distance.label("distance"))
+                    .join(candidates, model.id == candidates.c.id)
+                    .where(model.id != entity_id)
+                    .order_by(distance)
+                    .limit(self._config.neighbors)
+                ).all()
+                for neighbor_id, neighbor_distance in neighbors:
+                    if neighbor_distance > self._config.candidate_distance:
+                        break
+                    pair = (min(entity_id, neighbor_id), max(entity_id, neighbor_id))
+                    if pair not in seen:
+                        seen.add(pair)
+                        yield pair[0], pair[1], neighbor_distance
+
+    def decide(
+        self,
+        session: Session,
+        pairs: List[Tuple[int, int, float]],
+        result: EntityDedupResult,
+    ) -> Tuple[_DisjointSet, Dict[int, Entity]]:
+        """
+        Cluster the duplicated entities, returns the clusters and the entities
+        merged by the LLM, by the id of the entity of the pair kept at the time.
+        """
+        entity_ids = {i for a, b, _ in pairs for i in (a, b)}
+        names = self._get_names(session, entity_ids)
+        clusters = _DisjointSet()
+        merged_entities: Dict[int, Entity] = {}
+
+        ambiguous_pairs = []
+        for a, b, distance in sorted(pairs, key=lambda p: p[2]):
+            same_name = normalize_entity_name(names[a]) == normalize_entity_name(
+                names[b]
+            )
+            if same_name and distance <= self._config.merge_distance:
+                clusters.union(a, b)
+            elif same_name or distance <= self._config.merge_distance:
+                ambiguous_pairs.append((a, b))
+
+        for a, b in ambiguous_pairs:
+            if clusters.find(a) == clusters.find(b):
+                continue
+            if result.llm_calls >= self._config.max_llm_calls:
+                logger.info(
+                    "Reached the limit of %d LLM calls, skip the remaining "
+                    "ambiguous pairs.",
+                    self._config.max_llm_calls,
+                )
+                break
+            root_a, root_b = clusters.find(a), clusters.find(b)
+            entities = [
+                merged_entities.get(root) or self._get_entity(session, root)
+                for root in (root_a, root_b)
+            ]
+            result.llm_calls += 1
+            merged_entity = self._try_merge_entities(entities)
+            if merged_entity is not None:
+                merged_entities.pop(root_a, None)
+                merged_entities.pop(root_b, None)
+                merged_entities[clusters.union(root_a, root_b)] = merged_entity
+
+        return clusters, merged_entities
+
+    def apply(
+        self,
+        session: Session,
+        merges: Dict[int, int],
+        merged_entities: Dict[int, Entity],
+    ):
+        """Point the relationships of the duplicates to the kept entities, then delete the duplicates."""
+        relationship_model = self._relationship_model
+        duplicate_ids = list(merges.keys())
+        for i in range(0, len(duplicate_ids), self._config.batch_size):
+            batch = {
+                d: merges[d] for d in duplicate_ids[i : i + self._config.batch_size]
+            }
+            for column in ("source_entity_id", "target_entity_id"):
+                entity_id = getattr(relationship_model, column)
+                session.exec(
+                    update(relationship_model)
+                    .where(entity_id.in_(list(batch)))
+                    .values({column: case(batch, value=entity_id)})
+                )
+
+        kept_ids = set(merges.values())
+        # The relationships between the duplicates of an entity now loop on it.
+        session.exec(
+            delete(relationship_model).where(
+                relationship_model.source_entity_id
+                == relationship_model.target_entity_id,
+                relationship_model.source_entity_id.in_(kept_ids),
+            )
+        )
+
+        for synopsis_entity in session.exec(
+            select(self._entity_model).where(
+                self._entity_model.entity_type == EntityType.synopsis
+            )
+        ):
+            synopsis_info = synopsis_entity.synopsis_info or {}
+            members = synopsis_info.get("entities") or []
+            if any(m in merges for m in members):
+                synopsis_info["entities"] = list(
+                    dict.fromkeys(merges.get(m, m) for m in members)
+                )
+                synopsis_entity.synopsis_info = synopsis_info
+                flag_modified(synopsis_entity, "synopsis_info")
+
+        for i in range(0, len(duplicate_ids), self._config.batch_size):
+            session.exec(
+                delete(self._entity_model).where(
+                    self._entity_model.id.in_(
+                        duplicate_ids[i : i + self._config.batch_size]
+                    )
+                )
+            )
+
+        for entity_id, merged_entity in merged_entities.items():
+            entity = session.get(self._entity_model, entity_id)
+            entity.description = merged_entity.description
+            entity.meta = merged_entity.metadata
+            entity.description_vec = get_entity_description_embedding(
+                entity.name, entity.description, self._embed_model
+            )
+            entity.meta_vec = get_entity_metadata_embedding(
+                entity.meta, self._embed_model
+            )
+            session.add(entity)
+
+    def _get_names(self, session: Session, entity_ids: set) -> Dict[int, str]:
+        names = {}
+        entity_ids = list(entity_ids)
+        for i in range(0, len(entity_ids), self._config.batch_size):
+            rows = session.exec(
+                select(self._entity_model.id, self._entity_model.name).where(
+                    self._entity_model.id.in_(
+                        entity_ids[i : i + self._config.batch_size]
+                    )
+                )
+            ).all()
+            names.update({entity_id: name for entity_id, name in rows})
+        return names
+
+    def _get_entity(self, session: Session, entity_id: int) -> Entity:
+        entity = session.get(self._entity_model, entity_id)
+        return Entity(
+            name=entity.name, description=entity.description, metadata=entity.meta
+        )
+
+    def _try_merge_entities(self, entities: List[Entity]) -> Optional[Entity]:
+        if self._dspy_lm is None:
+            return None
+        try:
+            with dspy.settings.context(lm=self._dspy_lm):
+                return self._merge_entities_prog(entities=entities).merged_entity
+        except Exception as e:
+            logger.error(f"Failed to merge entities: {e}", exc_info=True)
+            return None
@@ -0,0 +1,300 @@
+"""
+An in-process snapshot of the relationship graph of a knowledge base, which
+serves the multi-hop expansion and the entity degrees from memory, so the graph
+store only queries TiDB for the vector distances and the final payloads of the
+relationships and entities.
+
+The snapshot stores the edges in compressed sparse row (CSR) arrays: the edges
+sorted by source (and by target), with the offsets of each entity's edges. It is
+tied to the generation of the knowledge base (see `app.core.db`). When the
+generation changes, the relationships appended since the snapshot are loaded
+incrementally if the existing ones are unchanged, otherwise the snapshot is
+reloaded.
+"""
+
+import logging
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple, Type
+
+import numpy as np
+from sqlmodel import Session, SQLModel, func, select
+
+from app.core.config import settings
+from app.rag.retrievers.cache import get_knowledge_base_generation
+
+logger = logging.getLogger(__name__)
+
+# The aggregates of the relationships (count, sum of ids, sources, targets and
+# weights) used to detect whether the relationships of a snapshot were changed.
+Fingerprint = Tuple[int, int, int, int, int]
+
+
+def _empty() -> np.ndarray:
+    return np.zeros(0, dtype=np.int64)
+
+
+@dataclass(frozen=True)
+class GraphSnapshot:
+    generation: int
+    # The edges, sorted by relationship id.
+    relationship_ids: np.ndarray
+    sources: np.ndarray
+    targets: np.ndarray
+    weights: np.ndarray
+    # The sorted ids of the entities with any edge, the position of an entity
+    # in this array is its index in the CSR arrays below.
+    entity_ids: np.ndarray
+    # The edges (positions in the arrays above) going out of the entity `i` are
+    # `out_edges[out_offsets[i]:out_offsets[i + 1]]`, the same for `in_*`.
+    out_offsets: np.ndarray
+    out_edges: np.ndarray
+    in_offsets: np.ndarray
+    in_edges: np.ndarray
+
+    @classmethod
+    def build(
+        cls,
+        generation: int,
+        relationship_ids: np.ndarray,
+        sources: np.ndarray,
+        targets: np.ndarray,
+        weights: np.ndarray,
+    ) -> "GraphSnapshot":
+        order = np.argsort(relationship_ids, kind="stable")
+        relationship_ids = relationship_ids[order]
+        sources, targets, weights = sources[order], targets[order], weights[order]
+
+        entity_ids = np.unique(np.concatenate([sources, targets]))
+        out_offsets, out_edges = cls._csr(
+            np.searchsorted(entity_ids, sources), len(entity_ids)
+        )
+        in_offsets, in_edges = cls._csr(
+            np.searchsorted(entity_ids, targets), len(entity_ids)
+        )
+        return cls(
+            generation=generation,
+            relationship_ids=relationship_ids,
+            sources=sources,
+            targets=targets,
+            weights=weights,
+            entity_ids=entity_ids,
+            out_offsets=out_offsets,
+            out_edges=out_edges,
+            in_offsets=in_offsets,
+            in_edges=in_edges,
+        )
+
+    @staticmethod
+    def _csr(rows: np.ndarray, n: int) -> Tuple[np.ndarray, np.ndarray]:
+        offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=n), out=offsets[1:])
+        return offsets, np.argsort(rows, kind="stable")
+
+    def extend(
+        self,
+        generation: int,
+        relationship_ids: np.ndarray,
+        sources: np.ndarray,
+        targets: np.ndarray,
+        weights: np.ndarray,
+    ) -> "GraphSnapshot":
+        """A new snapshot with the appended relationships."""
+        return GraphSnapshot.build(
+            generation,
+            np.concatenate([self.relationship_ids, relationship_ids]),
+            np.concatenate([self.sources, sources]),
+            np.concatenate([self.targets, targets]),
+            np.concatenate([self.weights, weights]),
+        )
+
+    @property
+    def max_relationship_id(self) -> int:
+        return int(self.relationship_ids[-1]) if len(self.relationship_ids) else 0
+
+    @property
+    def fingerprint(self) -> Fingerprint:
+        return (
+            len(self.relationship_ids),
+            int(self.relationship_ids.sum()),
+            int(self.sources.sum()),
+            int(self.targets.sum()),
+            int(self.weights.sum()),
+        )
+
+    def __len__(self) -> int:
+        return len(self.relationship_ids)
+
+    def _entity_indexes(self, entity_ids: Iterable[int]) -> np.ndarray:
+        ids = np.fromiter(entity_ids, dtype=np.int64)
+        indexes = np.searchsorted(self.entity_ids, ids)
+        found = indexes < len(self.entity_ids)
+        found[found] = self.entity_ids[indexes[found]] == ids[found]
+        return indexes[found]
+
+    def _edges(
+        self, offsets: np.ndarray, edges: np.ndarray, indexes: np.ndarray
+    ) -> np.ndarray:
+        if len(indexes) == 0:
+            return _empty()
+        return np.concatenate(
+            [edges[offsets[i] : offsets[i + 1]] for i in indexes.tolist()]
+        )
+
+    def out_edges_of(self, entity_ids: Iterable[int]) -> np.ndarray:
+        return self._edges(
+            self.out_offsets, self.out_edges, self._entity_indexes(entity_ids)
+        )
+
+    def in_edges_of(self, entity_ids: Iterable[int]) -> np.ndarray:
+        return self._edges(
+            self.in_offsets, self.in_edges, self._entity_indexes(entity_ids)
+        )
+
+    def degrees(self, entity_ids: Iterable[int]) -> Dict[int, Dict[str, int]]:
+        """The same result as `TiDBGraphStore.fetch_entity_degrees`."""
+        entity_ids = list(entity_ids)
+        degrees = {
+            entity_id: {"in_degree": 0, "out_degree": 0} for entity_id in entity_ids
+        }
+        indexes = self._entity_indexes(entity_ids)
+        in_degrees = self.in_offsets[indexes + 1] - self.in_offsets[indexes]
+        out_degrees = self.out_offsets[indexes + 1] - self.out_offsets[indexes]
+        for entity_id, in_degree, out_degree in zip(
+            self.entity_ids[indexes].tolist(), in_degrees.tolist(), out_degrees.tolist()
+        ):
+            degrees[entity_id] = {"in_degree": in_degree, "out_degree": out_degree}
+        return degrees
+
+    def outgoing_relationship_ids(
+        self,
+        entity_ids: Iterable[int],
+        exclude_relationship_ids: Iterable[int] = (),
+        min_weight: Optional[int] = None,
+    ) -> List[int]:
+        edges = self.out_edges_of(entity_ids)
+        if min_weight is not None:
+            edges = edges[self.weights[edges] >= min_weight]
+        relationship_ids = self.relationship_ids[edges]
+        exclude = np.fromiter(exclude_relationship_ids, dtype=np.int64)
+        if len(exclude):
+            relationship_ids = relationship_ids[~np.isin(relationship_ids, exclude)]
+        return relationship_ids.tolist()
+
+    def neighbor_relationship_ids(self, entity_ids: Iterable[int]) -> List[int]:
+        """The relationships from or to the entities."""
+        entity_ids = list(entity_ids)
+        edges = np.union1d(self.out_edges_of(entity_ids), self.in_edges_of(entity_ids))
+        return self.relationship_ids[edges].tolist()
+
+
+class GraphSnapshotCache:
+    """The graph snapshots of the knowledge bases, shared by the sessions of the process."""
+
+    def __init__(self, max_relationships: int):
+        self._max_relationships = max_relationships
+        self._snapshots: Dict[int, GraphSnapshot] = {}
+        # The generation at which a knowledge base was too large for a snapshot.
+        self._oversized: Dict[int, int] = {}
+        self._locks: Dict[int, threading.Lock] = defaultdict(threading.Lock)
+        self._mutex = threading.Lock()
+
+    def get(
+        self,
+        session: Session,
+        knowledge_base_id: int,
+        relationship_model: Type[SQLModel],
+    ) -> Optional[GraphSnapshot]:
+        """
+        The snapshot of the current generation of the knowledge base, or None if
+        it has more relationships than the limit.
+        """
+        generation = get_knowledge_base_generation(session, knowledge_base_id)
+        snapshot = self._snapshots.get(knowledge_base_id)
+        if snapshot is not None and snapshot.generation == generation:
+            return snapshot
+        if self._oversized.get(knowledge_base_id) == generation:
+            return None
+
+        with self._mutex:
+            lock = self._locks[knowledge_base_id]
+        with lock:
+            snapshot = self._snapshots.get(knowledge_base_id)
+            if snapshot is not None and snapshot.generation == generation:
+                return snapshot
+            snapshot = self._refresh(session, relationship_model, generation, snapshot)
+            if snapshot is None:
+                self._snapshots.pop(knowledge_base_id, None)
+                self._oversized[knowledge_base_id] = generation
+            else:
+                self._snapshots[knowledge_base_id] = snapshot
+            return snapshot
+
+    def clear(self):
+        with self._mutex:
+            self._snapshots.clear()
+            self._oversized.clear()
+
+    def _refresh(
+        self,
+        session: Session,
+        model: Type[SQLModel],
+        generation: int,
+        snapshot: Optional[GraphSnapshot],
+    ) -> Optional[GraphSnapshot]:
+        if snapshot is not None:
+            # The existing relationships are unchanged, only load the new ones.
+            fingerprint = session.exec(
+                select(
+                    func.count(model.id),
+                    func.coalesce(func.sum(model.id), 0),
+                    func.coalesce(func.sum(model.source_entity_id), 0),
+                    func.coalesce(func.sum(model.target_entity_id), 0),
+                    func.coalesce(func.sum(model.weight), 0),
+                ).where(model.id <= snapshot.max_relationship_id)
+            ).one()
+            if tuple(int(v) for v in fingerprint) == snapshot.fingerprint:
+                edges = self._load_edges(
+                    session, model, model.id > snapshot.max_relationship_id
+                )
+                if len(snapshot) + len(edges[0]) <= self._max_relationships:
+                    logger.debug(
+                        "Extend the graph snapshot of %s with %d relationships.",
+                        model.__tablename__,
+                        len(edges[0]),
+                    )
+                    return snapshot.extend(generation, *edges)
+                return None
+
+        count = session.exec(select(func.count(model.id))).one()
+        if count > self._max_relationships:
+            logger.info(
+                "Skip the graph snapshot of %s, %d relationships exceed the limit.",
+                model.__tablename__,
+                count,
+            )
+            return None
+        logger.info(
+            "Load the graph snapshot of %s (%d relationships).",
+            model.__tablename__,
+            count,
+        )
+        return GraphSnapshot.build(generation, *self._load_edges(session, model))
+
+    @staticmethod
+    def _load_edges(
+        session: Session, model: Type[SQLModel], *where
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        rows = session.exec(
+            select(
+                model.id, model.source_entity_id, model.target_entity_id, model.weight
+            ).where(*where)
+        ).all()
+        edges = np.array(rows, dtype=np.int64).reshape(-1, 4)
+        return edges[:, 0], edges[:, 1], edges[:, 2], edges[:, 3]
+
+
+graph_snapshots = GraphSnapshotCache(
+    max_relationships=settings.GRAPH_SNAPSHOT_MAX_RELATIONSHIPS
+)
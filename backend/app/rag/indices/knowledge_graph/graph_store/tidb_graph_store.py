@@ -15,6 +15,7 @@ from sqlalchemy.orm import aliased, defer, joinedload, noload
 from tidb_vector.sqlalchemy import VectorAdaptor
 from sqlalchemy import or_, desc
 
+from app.core.config import settings
 from app.core.db import engine
 from app.rag.indices.knowledge_graph.graph_store.helpers import (
     get_entity_description_embedding,
@@ -27,11 +28,20 @@ from app.rag.indices.knowledge_graph.graph_store.helpers import (
     DEFAULT_DEGREE_COEFFICIENT,
 )
 from app.rag.indices.knowledge_graph.graph_store.schema import KnowledgeGraphStore
+from app.rag.indices.knowledge_graph.graph_store.snapshot import (
+    GraphSnapshot,
+    graph_snapshots,
+)
 from app.rag.indices.knowledge_graph.schema import (
     Entity,
     Relationship,
     SynopsisEntity,
 )
+from app.rag.retrievers.cache import (
+    get_knowledge_base_generation,
+    get_retrieval_cache_key,
+    retrieval_cache,
+)
 from app.rag.retrievers.knowledge_graph.schema import (
     RetrievedEntity,
     RetrievedRelationship,
@@ -42,6 +52,10 @@ from app.models import (
     EntityType,
     Document,
 )
+from app.models.knowledge_base_scoped.compact_vector import (
+    get_candidate_distance,
+    get_compact_vector_column,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -125,9 +139,11 @@ class TiDBGraphStore(KnowledgeGraphStore):
                 engine, tables=[self._entity_model.__table__]
             )
 
-            # Add HNSW index to accelerate ann queries.
+            # Add HNSW index to accelerate ann queries, on the compact vectors if
+            # any, the full vectors only re-score the candidates.
             VectorAdaptor(engine).create_vector_index(
-                self._entity_model.description_vec, tidb_vector.DistanceMetric.COSINE
+                self._get_indexed_vector_column(self._entity_model, "description_vec"),
+                tidb_vector.DistanceMetric.COSINE,
             )
             VectorAdaptor(engine).create_vector_index(
                 self._entity_model.meta_vec, tidb_vector.DistanceMetric.COSINE
@@ -148,7 +164,9 @@ class TiDBGraphStore(KnowledgeGraphStore):
 
             # Add HNSW index to accelerate ann queries.
             VectorAdaptor(engine).create_vector_index(
-                self._relationship_model.description_vec,
+                self._get_indexed_vector_column(
+                    self._relationship_model, "description_vec"
+                ),
                 tidb_vector.DistanceMetric.COSINE,
             )
 
@@ -190,11 +208,39 @@ class TiDBGraphStore(KnowledgeGraphStore):
                 f"Entities table <{entities_table_name}> is not existed, not action to do."
             )
 
+    @staticmethod
+    def _get_indexed_vector_column(model: Type[SQLModel], name: str):
+        compact_column = get_compact_vector_column(model, name)
+        return compact_column if compact_column is not None else getattr(model, name)
+
     def close_session(self) -> None:
         # Always call this method is necessary to make sure the session is closed
         if self._owns_session:
             self._session.close()
 
+    def get_graph_snapshot(
+        self, session: Optional[Session] = None
+    ) -> Optional[GraphSnapshot]:
+        """
+        The in-memory snapshot of the relationship graph, or None if it is disabled
+        or unavailable, in which case the graph is queried from the database.
+        """
+        if not settings.ENABLE_GRAPH_SNAPSHOT or self.knowledge_base is None:
+            return None
+        try:
+            return graph_snapshots.get(
+                session or self._session,
+                self.knowledge_base.id,
+                self._relationship_model,
+            )
+        except Exception as e:
+            logger.warning(
+                "Failed to load the graph snapshot of knowledge base #%s: %s",
+                self.knowledge_base.id,
+                e,
+            )
+            return None
+
     def save(self, chunk_id, entities_df, relationships_df):
         if entities_df.empty or relationships_df.empty:
             logger.info(
@@ -485,6 +531,66 @@ class TiDBGraphStore(KnowledgeGraphStore):
         # experimental feature to filter relationships based on meta, can be removed in the future
         relationship_meta_filters: dict = {},
         session: Optional[Session] = None,
+    ) -> Tuple[List[RetrievedEntity], List[RetrievedRelationship]]:
+        # The results of a query are cached, unless the embedding is given.
+        if embedding or not settings.ENABLE_RETRIEVAL_CACHE:
+            return self._retrieve_with_weight(
+                query,
+                embedding,
+                depth,
+                include_meta,
+                with_degree,
+                relationship_meta_filters,
+                session,
+            )
+
+        key = get_retrieval_cache_key(
+            "knowledge_graph",
+            self.knowledge_base.id,
+            get_knowledge_base_generation(
+                session or self._session, self.knowledge_base.id
+            ),
+            query,
+            {
+                "depth": depth,
+                "include_meta": include_meta,
+                "with_degree": with_degree,
+                "relationship_meta_filters": relationship_meta_filters,
+            },
+        )
+        cached = retrieval_cache.get(key)
+        if cached is None:
+            entities, relationships = self._retrieve_with_weight(
+                query,
+                embedding,
+                depth,
+                include_meta,
+                with_degree,
+                relationship_meta_filters,
+                session,
+            )
+            # Cache the plain data, the callers may modify the returned objects.
+            cached = (
+                [e.model_dump() for e in entities],
+                [r.model_dump() for r in relationships],
+            )
+            retrieval_cache.set(key, cached)
+            return entities, relationships
+
+        return (
+            [RetrievedEntity.model_validate(e) for e in cached[0]],
+            [RetrievedRelationship.model_validate(r) for r in cached[1]],
+        )
+
+    def _retrieve_with_weight(
+        self,
+        query: str,
+        embedding: list,
+        depth: int,
+        include_meta: bool,
+        with_degree: bool,
+        relationship_meta_filters: dict,
+        session: Optional[Session],
     ) -> Tuple[List[RetrievedEntity], List[RetrievedRelationship]]:
         if not embedding:
             assert query, "Either query or embedding must be provided"
@@ -598,6 +704,10 @@ class TiDBGraphStore(KnowledgeGraphStore):
         }
         session = session or self._session
 
+        snapshot = self.get_graph_snapshot(session)
+        if snapshot is not None:
+            return snapshot.degrees(entity_ids)
+
         try:
             # Fetch out-degrees
             out_degree_query = (
@@ -646,57 +756,97 @@ class TiDBGraphStore(KnowledgeGraphStore):
         relationship_meta_filters: Dict = {},
         session: Optional[Session] = None,
     ) -> Tuple[List[SQLModel], List[SQLModel]]:
-        # select the relationships to rank
-        subquery = (
-            select(
-                self._relationship_model,
-                self._relationship_model.description_vec.cosine_distance(
-                    embedding
-                ).label("embedding_distance"),
+        session = session or self._session
+        snapshot = self.get_graph_snapshot(session) if visited_entities else None
+        if snapshot is not None:
+            # Rank the relationships going out of the visited entities, found in
+            # the snapshot, instead of filtering the nearest relationships of
+            # the whole graph by their source.
+            candidate_ids = snapshot.outgoing_relationship_ids(
+                visited_entities,
+                exclude_relationship_ids=visited_relationships,
+                min_weight=0,
+            )
+            distance = self._relationship_model.description_vec.cosine_distance(
+                embedding
+            )
+            query = (
+                select(self._relationship_model, distance.label("embedding_distance"))
+                .options(
+                    defer(self._relationship_model.description_vec),
+                    joinedload(self._relationship_model.source_entity)
+                    .defer(self._entity_model.meta_vec)
+                    .defer(self._entity_model.description_vec),
+                    joinedload(self._relationship_model.target_entity)
+                    .defer(self._entity_model.meta_vec)
+                    .defer(self._entity_model.description_vec),
+                )
+                .where(self._relationship_model.id.in_(candidate_ids))
             )
-            .options(defer(self._relationship_model.description_vec))
-            .order_by(asc("embedding_distance"))
-            .limit(limit * 10)
-        ).subquery()
 
-        relationships_alias = aliased(self._relationship_model, subquery)
+            if relationship_meta_filters:
+                for k, v in relationship_meta_filters.items():
+                    query = query.where(self._relationship_model.meta[k] == v)
 
-        query = (
-            select(relationships_alias, text("embedding_distance"))
-            .options(
-                defer(relationships_alias.description_vec),
-                joinedload(relationships_alias.source_entity)
-                .defer(self._entity_model.meta_vec)
-                .defer(self._entity_model.description_vec),
-                joinedload(relationships_alias.target_entity)
-                .defer(self._entity_model.meta_vec)
-                .defer(self._entity_model.description_vec),
-            )
-            .where(relationships_alias.weight >= 0)
-        )
+            if distance_range != (0.0, 1.0):
+                query = query.where(distance.between(*distance_range))
 
-        if relationship_meta_filters:
-            for k, v in relationship_meta_filters.items():
-                query = query.where(relationships_alias.meta[k] == v)
+            query = query.order_by(asc("embedding_distance")).limit(limit)
+        else:
+            # select the relationships to rank, by the distance of the compact
+            # vectors if any, the exact distance ranks them below
+            candidate_distance, candidate_limit = get_candidate_distance(
+                self._relationship_model, "description_vec", embedding, limit * 10
+            )
+            subquery = (
+                select(
+                    self._relationship_model,
+                    self._relationship_model.description_vec.cosine_distance(
+                        embedding
+                    ).label("embedding_distance"),
+                )
+                .options(defer(self._relationship_model.description_vec))
+                .order_by(candidate_distance)
+                .limit(candidate_limit)
+            ).subquery()
 
-        if visited_relationships:
-            query = query.where(subquery.c.id.notin_(visited_relationships))
+            relationships_alias = aliased(self._relationship_model, subquery)
 
-        if distance_range != (0.0, 1.0):
-            # embedding_distance between the range
-            query = query.where(
-                text(
-                    "embedding_distance >= :min_distance AND embedding_distance <= :max_distance"
+            query = (
+                select(relationships_alias, text("embedding_distance"))
+                .options(
+                    defer(relationships_alias.description_vec),
+                    joinedload(relationships_alias.source_entity)
+                    .defer(self._entity_model.meta_vec)
+                    .defer(self._entity_model.description_vec),
+                    joinedload(relationships_alias.target_entity)
+                    .defer(self._entity_model.meta_vec)
+                    .defer(self._entity_model.description_vec),
                 )
-            ).params(min_distance=distance_range[0], max_distance=distance_range[1])
+                .where(relationships_alias.weight >= 0)
+            )
 
-        if visited_entities:
-            query = query.where(subquery.c.source_entity_id.in_(visited_entities))
+            if relationship_meta_filters:
+                for k, v in relationship_meta_filters.items():
+                    query = query.where(relationships_alias.meta[k] == v)
+
+            if visited_relationships:
+                query = query.where(subquery.c.id.notin_(visited_relationships))
+
+            if distance_range != (0.0, 1.0):
+                # embedding_distance between the range
+                query = query.where(
+                    text(
+                        "embedding_distance >= :min_distance AND embedding_distance <= :max_distance"
+                    )
+                ).params(min_distance=distance_range[0], max_distance=distance_range[1])
 
-        query = query.order_by(asc("embedding_distance")).limit(limit)
+            if visited_entities:
+                query = query.where(subquery.c.source_entity_id.in_(visited_entities))
+
+            query = query.order_by(asc("embedding_distance")).limit(limit)
 
         # Order by embedding distance and apply limit
-        session = session or self._session
         relationships = session.exec(query).all()
 
         if len(relationships) <= rank_n:
@@ -764,6 +914,14 @@ class TiDBGraphStore(KnowledgeGraphStore):
         session = session or self._session
 
         # Create a subquery with a larger limit and include the distance
+        candidate_distance, candidate_limit = get_candidate_distance(
+            self._entity_model,
+            "description_vec",
+            embedding,
+            post_filter_multiplier * top_k
+            if entity_type != EntityType.original
+            else top_k,
+        )
         subquery = (
             select(
                 self._entity_model,
@@ -771,12 +929,8 @@ class TiDBGraphStore(KnowledgeGraphStore):
                     "distance"
                 ),
             )
-            .order_by(asc("distance"))
-            .limit(
-                post_filter_multiplier * top_k
-                if entity_type != EntityType.original
-                else top_k
-            )
+            .order_by(candidate_distance)
+            .limit(candidate_limit)
             .subquery()
         )
 
@@ -811,6 +965,20 @@ class TiDBGraphStore(KnowledgeGraphStore):
             query = query.where(self._entity_model.entity_type == entity_type)
             hint = text("/*+ read_from_storage(tikv[entities]) */")
             query = query.prefix_with(hint)
+        elif (
+            get_compact_vector_column(self._entity_model, "description_vec") is not None
+        ):
+            # Re-score the candidates found with the compact vectors.
+            candidate_distance, candidate_limit = get_candidate_distance(
+                self._entity_model, "description_vec", embedding, top_k
+            )
+            candidates = (
+                select(self._entity_model.id)
+                .order_by(candidate_distance)
+                .limit(candidate_limit)
+                .subquery()
+            )
+            query = query.join(candidates, self._entity_model.id == candidates.c.id)
 
         query = query.order_by(
             self._entity_model.description_vec.cosine_distance(embedding)
@@ -972,6 +1140,16 @@ class TiDBGraphStore(KnowledgeGraphStore):
                 break
 
             # Query relationships for current level
+            snapshot = self.get_graph_snapshot()
+            if snapshot is not None:
+                neighbor_filter = self._relationship_model.id.in_(
+                    snapshot.neighbor_relationship_ids(current_level_nodes)
+                )
+            else:
+                neighbor_filter = or_(
+                    self._relationship_model.source_entity_id.in_(current_level_nodes),
+                    self._relationship_model.target_entity_id.in_(current_level_nodes),
+                )
             relationships = self._session.exec(
                 select(
                     self._relationship_model,
@@ -991,16 +1169,7 @@ class TiDBGraphStore(KnowledgeGraphStore):
                     .defer(self._entity_model.meta_vec)
                     .defer(self._entity_model.description_vec),
                 )
-                .where(
-                    or_(
-                        self._relationship_model.source_entity_id.in_(
-                            current_level_nodes
-                        ),
-                        self._relationship_model.target_entity_id.in_(
-                            current_level_nodes
-                        ),
-                    )
-                )
+                .where(neighbor_filter)
                 .order_by(desc("similarity"))
                 .limit(max_neighbors * 2)  # Fetch more results to account for filtering
             ).all()
@@ -3,6 +3,7 @@ import tidb_vector
 import sqlalchemy
 
 from typing import Any, List, Optional, Type
+from uuid import UUID
 from llama_index.core.schema import BaseNode, MetadataMode, TextNode
 from llama_index.core.bridge.pydantic import PrivateAttr
 from llama_index.core.vector_stores.types import (
@@ -23,7 +24,16 @@ from sqlmodel import (
     alias,
 )
 from tidb_vector.sqlalchemy import VectorAdaptor
-from app.core.db import engine
+from app.core.db import (
+    engine,
+    get_table_knowledge_base_id,
+    mark_knowledge_base_changed,
+)
+from app.models.knowledge_base_scoped.compact_vector import (
+    get_candidate_distance,
+    get_compact_vector_column,
+    truncate_vector,
+)
 
 
 logger = logging.getLogger(__name__)
@@ -79,9 +89,16 @@ class TiDBVectorStore(BasePydanticVectorStore):
                 engine, tables=[self._chunk_db_model.__table__]
             )
 
-            # Add HNSW index to accelerate ann queries.
+            # Add HNSW index to accelerate ann queries, on the compact vectors if
+            # any, the full vectors only re-score the candidates.
+            compact_column = get_compact_vector_column(
+                self._chunk_db_model, "embedding"
+            )
             VectorAdaptor(engine).create_vector_index(
-                self._chunk_db_model.embedding, tidb_vector.DistanceMetric.COSINE
+                compact_column
+                if compact_column is not None
+                else self._chunk_db_model.embedding,
+                tidb_vector.DistanceMetric.COSINE,
             )
 
             logger.info(f"Chunk table <{table_name}> has been created successfully.")
@@ -127,6 +144,7 @@ class TiDBVectorStore(BasePydanticVectorStore):
         Returns:
             List[str]: List of node IDs that were added.
         """
+        compact_column = get_compact_vector_column(self._chunk_db_model, "embedding")
         items = []
         for n in nodes:
             items.append(
@@ -141,8 +159,17 @@ class TiDBVectorStore(BasePydanticVectorStore):
                     "source_uri": add_kwargs.get("source_uri"),
                 }
             )
+            if compact_column is not None:
+                # The bulk insert bypasses the model events deriving it.
+                items[-1]["embedding_compact"] = truncate_vector(
+                    n.get_embedding(), compact_column.type.dim
+                )
 
         self._session.bulk_insert_mappings(self._chunk_db_model, items)
+        # The bulk insert bypasses the session events tracking the writes.
+        kb_id = get_table_knowledge_base_id(self._chunk_db_model.__tablename__)
+        if kb_id is not None:
+            mark_knowledge_base_changed(self._session, kb_id)
         self._session.commit()
         return [i["id"] for i in items]
 
@@ -198,10 +225,16 @@ class TiDBVectorStore(BasePydanticVectorStore):
             for f in query.filters.filters:
                 subquery = subquery.stmt(self._chunk_db_model.meta[f.key] == f.value)
 
+        # Select the candidates by the distance of the compact vectors if any,
+        # then rank them by the exact distance.
+        candidate_distance, candidate_limit = get_candidate_distance(
+            self._chunk_db_model,
+            "embedding",
+            query.query_embedding,
+            query.similarity_top_k * self._oversampling_factor,
+        )
         sub = alias(
-            subquery.order_by(asc("distance"))
-            .limit(query.similarity_top_k * self._oversampling_factor)
-            .subquery(),
+            subquery.order_by(candidate_distance).limit(candidate_limit).subquery(),
             "sub",
         )
         stmt = (
@@ -221,41 +254,55 @@ class TiDBVectorStore(BasePydanticVectorStore):
         similarities = []
         ids = []
         for row in results:
-            # Check if metadata contains required fields for node reconstruction
-            # to avoid async event loop issues in metadata_dict_to_node
-            if (
-                isinstance(row.meta, dict)
-                and "_node_content" in row.meta
-                and "_node_type" in row.meta
-            ):
-                try:
-                    node = metadata_dict_to_node(row.meta)
-                    node.id_ = str(row.id)
-                    node.metadata["document_id"] = row.document_id
-                    node.set_content(row.text)
-                except Exception as e:
-                    # NOTE: deprecated legacy logic for backward compatibility
-                    logger.warning(
-                        f"Failed to parse metadata dict (error: {e}), falling back to legacy logic.",
-                        exc_info=True,
-                    )
-                    node = TextNode(
-                        id_=str(row.id),
-                        text=row.text,
-                        metadata=row.meta,
-                    )
-            else:
-                # Use legacy logic directly if metadata doesn't contain required fields
-                node = TextNode(
-                    id_=str(row.id),
-                    text=row.text,
-                    metadata=row.meta,
-                )
             similarities.append((1 - row.distance) if row.distance is not None else 0)
             ids.append(str(row.id))
-            nodes.append(node)
+            nodes.append(self._row_to_node(row))
         return VectorStoreQueryResult(
             nodes=nodes,
             similarities=similarities,
             ids=ids,
         )
+
+    def get_nodes_by_ids(self, node_ids: List[str]) -> List[BaseNode]:
+        """
+        Get the nodes by their ids, in the order of the ids, skipping the nodes
+        which no longer exist.
+        """
+        stmt = select(
+            self._chunk_db_model.id,
+            self._chunk_db_model.text,
+            self._chunk_db_model.meta,
+            self._chunk_db_model.document_id,
+        ).where(self._chunk_db_model.id.in_([UUID(node_id) for node_id in node_ids]))
+        nodes = {
+            str(row.id): self._row_to_node(row) for row in self._session.exec(stmt)
+        }
+        return [nodes[node_id] for node_id in node_ids if node_id in nodes]
+
+    @staticmethod
+    def _row_to_node(row) -> BaseNode:
+        # Check if metadata contains required fields for node reconstruction
+        # to avoid async event loop issues in metadata_dict_to_node
+        if (
+            isinstance(row.meta, dict)
+            and "_node_content" in row.meta
+            and "_node_type" in row.meta
+        ):
+            try:
+                node = metadata_dict_to_node(row.meta)
+                node.id_ = str(row.id)
+                node.metadata["document_id"] = row.document_id
+                node.set_content(row.text)
+                return node
+            except Exception as e:
+                # NOTE: deprecated legacy logic for backward compatibility
+                logger.warning(
+                    f"Failed to parse metadata dict (error: {e}), falling back to legacy logic.",
+                    exc_info=True,
+                )
+        # Use legacy logic directly if metadata doesn't contain required fields
+        return TextNode(
+            id_=str(row.id),
+            text=row.text,
+            metadata=row.meta,
+        )
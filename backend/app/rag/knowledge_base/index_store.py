@@ -7,6 +7,10 @@ from app.models.entity import get_kb_entity_model
 from app.rag.knowledge_base.config import get_kb_dspy_llm, get_kb_embed_model
 from app.models.relationship import get_kb_relationship_model
 from app.rag.indices.knowledge_graph.graph_store import TiDBGraphStore, TiDBGraphEditor
+from app.rag.indices.knowledge_graph.graph_store.entity_dedup import (
+    EntityDedupConfig,
+    EntityDeduplicator,
+)
 from app.rag.indices.vector_search.vector_store.tidb_vector_store import TiDBVectorStore
 
 
@@ -58,3 +62,15 @@ def get_kb_tidb_graph_editor(session: Session, kb: KnowledgeBase) -> TiDBGraphEd
         relationship_db_model=relationship_db_model,
         embed_model=embed_model,
     )
+
+
+def get_kb_entity_deduplicator(
+    session: Session, kb: KnowledgeBase, config: EntityDedupConfig = EntityDedupConfig()
+) -> EntityDeduplicator:
+    return EntityDeduplicator(
+        entity_db_model=get_kb_entity_model(kb),
+        relationship_db_model=get_kb_relationship_model(kb),
+        dspy_lm=get_kb_dspy_llm(session, kb) if config.max_llm_calls else None,
+        embed_model=get_kb_embed_model(session, kb),
+        config=config,
+    )
@@ -1,5 +1,5 @@
 import re
-from typing import Any, Dict, List, Optional, Sequence, Callable
+from typing import Any, Dict, List, Optional, Sequence, Callable, Tuple
 
 from llama_index.core.callbacks.base import CallbackManager
 from llama_index.core.node_parser import SentenceSplitter
@@ -13,6 +13,19 @@ from llama_index.core.bridge.pydantic import Field, PrivateAttr
 DEFAULT_CHUNK_HEADER_LEVEL = 2
 DEFAULT_CHUNK_SIZE = 1200
 
+HEADER_PATTERN = re.compile(r"^(#+)\s(.*)")
+
+
+class _ParseCache:
+    """
+    Per-document memo shared by the recursive splitting of oversized sections,
+    which re-splits and re-measures the same texts at every level.
+    """
+
+    def __init__(self):
+        self.token_sizes: Dict[str, int] = {}
+        self.sections: Dict[Tuple[str, int, str], List[Tuple[str, dict]]] = {}
+
 
 class MarkdownNodeParser(NodeParser):
     """Markdown node parser.
@@ -34,6 +47,7 @@ class MarkdownNodeParser(NodeParser):
         le=6,
     )
     _tokenizer: Callable = PrivateAttr()
+    _fallback_splitters: Dict[int, SentenceSplitter] = PrivateAttr(default_factory=dict)
 
     def __init__(
         self,
@@ -96,7 +110,6 @@ class MarkdownNodeParser(NodeParser):
                 self.chunk_size * 0.7,
                 self.chunk_size * 1.1,
             )
-            nodes = []
             for sn in splitted_nodes:
                 header_level = sn.metadata.get("Header_Level")
                 if header_level:
@@ -109,11 +122,15 @@ class MarkdownNodeParser(NodeParser):
                                 f"{'#' * _hl} {sn.metadata[f'Header_{_hl}']}\n\n"
                                 + sn.text
                             )
-                n = build_nodes_from_splits([sn.text], node, id_func=self.id_func)[0]
-                if self.include_metadata:
-                    n.metadata = {**node.metadata, **sn.metadata}
-                nodes.append(n)
-            all_nodes.extend(nodes)
+            all_nodes.extend(
+                self._build_nodes_from_splits(
+                    [
+                        (sn.text, {**node.metadata, **sn.metadata})
+                        for sn in splitted_nodes
+                    ],
+                    node,
+                )
+            )
 
         return all_nodes
 
@@ -124,58 +141,89 @@ class MarkdownNodeParser(NodeParser):
         chunk_size_small_threshold: float,
         chunk_size_large_threshold: float,
     ) -> List[TextNode]:
-        # print(chunk_header_level, chunk_size_small_threshold, chunk_size_large_threshold)
         """Get nodes from document."""
+        return self._get_nodes_from_node(
+            node,
+            chunk_header_level,
+            chunk_size_small_threshold,
+            chunk_size_large_threshold,
+            _ParseCache(),
+        )
+
+    def _get_nodes_from_node(
+        self,
+        node: BaseNode,
+        chunk_header_level: int,
+        chunk_size_small_threshold: float,
+        chunk_size_large_threshold: float,
+        cache: _ParseCache,
+    ) -> List[TextNode]:
         text = node.get_content(metadata_mode=MetadataMode.NONE)
-        markdown_nodes = []
-        lines = text.split("\n")
-        metadata: Dict[str, str] = node.metadata
+        sections = self._split_sections(text, node.metadata, chunk_header_level, cache)
+        markdown_nodes = self._build_nodes_from_splits(sections, node)
+        return self._normalize_node_sizes(
+            markdown_nodes,
+            chunk_size_small_threshold,
+            chunk_size_large_threshold,
+            cache,
+        )
+
+    def _split_sections(
+        self,
+        text: str,
+        metadata: Dict[str, str],
+        chunk_header_level: int,
+        cache: _ParseCache,
+    ) -> List[Tuple[str, dict]]:
+        """Split the text into sections at the headers of the chunk header level."""
+        cache_key = (text, chunk_header_level, repr(sorted(metadata.items())))
+        cached = cache.sections.get(cache_key)
+        if cached is not None:
+            return cached
+
+        sections = []
         code_block = False
-        current_section = ""
+        current_section: List[str] = []
         first_header = True
 
-        for line in lines:
+        for line in text.split("\n"):
             if line.lstrip().startswith("```"):
                 code_block = not code_block
-            header_match = re.match(r"^(#+)\s(.*)", line)
-            if header_match and not code_block:
+            header_match = (
+                HEADER_PATTERN.match(line)
+                if not code_block and line.startswith("#")
+                else None
+            )
+            if header_match:
                 current_header_level = len(header_match.group(1).strip())
-                if current_section != "" and current_header_level == chunk_header_level:
+                if current_section and current_header_level == chunk_header_level:
                     if first_header:
                         # skip the first header, merge it with the first section (usually the title of the document)
                         first_header = False
                     else:
-                        markdown_nodes.append(
-                            self._build_node_from_split(
-                                current_section.strip(), node, metadata
-                            )
-                        )
-                        current_section = ""
+                        sections.append(("\n".join(current_section).strip(), metadata))
+                        current_section = []
                 if current_header_level <= chunk_header_level:
                     metadata = self._update_metadata(
                         metadata, header_match.group(2), current_header_level
                     )
-                current_section += line + "\n"
-            else:
-                current_section += line + "\n"
+            current_section.append(line)
 
-        markdown_nodes.append(
-            self._build_node_from_split(current_section.strip(), node, metadata)
-        )
-        return self._normalize_node_sizes(
-            markdown_nodes, chunk_size_small_threshold, chunk_size_large_threshold
-        )
+        sections.append(("\n".join(current_section).strip(), metadata))
+        cache.sections[cache_key] = sections
+        return sections
 
     def _normalize_node_sizes(
         self,
         nodes: List[TextNode],
         chunk_size_small_threshold: float,
         chunk_size_large_threshold: float,
+        cache: _ParseCache,
     ) -> List[TextNode]:
         # 1. Split the big node into multiple small nodes
         # 2. Merge the small nodes into a big node if they are too small
         # 3. Make all the nodes as much as possible close to the chunk size
-        nodes_token_size = [self._token_size(node.text) for node in nodes]
+        nodes_token_size = [self._token_size(node.text, cache) for node in nodes]
         normalized_nodes = []
         buffer = []
         node_count = len(nodes)
@@ -218,18 +266,19 @@ class MarkdownNodeParser(NodeParser):
                 buffer.clear()
             elif this_chunk_size > chunk_size_large_threshold:
                 # split into multiple nodes with next header level and bigger chunk size
-                md_splitted_nodes = self.get_nodes_from_node(
+                md_splitted_nodes = self._get_nodes_from_node(
                     node,
                     self.chunk_header_level + 1,
                     chunk_size_small_threshold,
                     chunk_size_large_threshold * 1.1,
+                    cache,
                 )
                 for n in md_splitted_nodes:
-                    _chunk_size = self._token_size(n.text)
+                    _chunk_size = self._token_size(n.text, cache)
                     if _chunk_size > chunk_size_large_threshold * 1.1:
                         # using sentence splitter to split the node if it's still too large
-                        sentence_splitted_nodes = SentenceSplitter(
-                            chunk_size=int(chunk_size_large_threshold), separator="\n\n"
+                        sentence_splitted_nodes = self._get_fallback_splitter(
+                            int(chunk_size_large_threshold)
                         ).get_nodes_from_documents([n])
                         normalized_nodes.extend(sentence_splitted_nodes)
                     else:
@@ -258,19 +307,39 @@ class MarkdownNodeParser(NodeParser):
         updated_headers["Header_Level"] = new_header_level
         return updated_headers
 
-    def _build_node_from_split(
+    def _build_nodes_from_splits(
         self,
-        text_split: str,
+        splits: List[Tuple[str, dict]],
         node: BaseNode,
-        metadata: dict,
-    ) -> TextNode:
-        """Build node from single text split."""
-        node = build_nodes_from_splits([text_split], node, id_func=self.id_func)[0]
+    ) -> List[TextNode]:
+        """Build nodes from text splits and their metadata.
 
+        The splits are built in one call, so the hash of the source node, which
+        covers its whole text, is computed once rather than once per split.
+        """
+        nodes = build_nodes_from_splits(
+            [text for text, _ in splits], node, id_func=self.id_func
+        )
         if self.include_metadata:
-            node.metadata = {**node.metadata, **metadata}
+            for n, (_, metadata) in zip(nodes, splits):
+                n.metadata = {**n.metadata, **metadata}
+        return nodes
 
-        return node
+    def _get_fallback_splitter(self, chunk_size: int) -> SentenceSplitter:
+        splitter = self._fallback_splitters.get(chunk_size)
+        if splitter is None:
+            splitter = SentenceSplitter(
+                chunk_size=chunk_size,
+                separator="\n\n",
+            )
+            self._fallback_splitters[chunk_size] = splitter
+        return splitter
 
-    def _token_size(self, text: str) -> int:
-        return len(self._tokenizer(text))
+    def _token_size(self, text: str, cache: Optional[_ParseCache] = None) -> int:
+        if cache is None:
+            return len(self._tokenizer(text))
+        size = cache.token_sizes.get(text)
+        if size is None:
+            size = len(self._tokenizer(text))
+            cache.token_sizes[text] = size
+        return size
@@ -0,0 +1,91 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+from pydantic import BaseModel
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.models import KnowledgeBase
+
+
+class RetrievalCache:
+    """
+    Caches the results of the chunk and knowledge graph retrieval of a knowledge
+    base, so repeated questions skip the embedding, the vector search and the
+    reranking.
+
+    Entries are keyed by the normalized query, the retrieval config and the
+    generation of the knowledge base, which is bumped in the same transaction as
+    every write to its data, so the cached results are never stale: a write just
+    makes the entries of the previous generation unreachable, until they expire
+    after `ttl` seconds or are evicted by newer entries.
+    """
+
+    def __init__(self, max_size: int, ttl: int):
+        self._max_size = max_size
+        self._ttl = ttl
+        self._entries: OrderedDict[str, Tuple[float, Any]] = OrderedDict()
+        self._mutex = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._mutex:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if now - entry[0] > self._ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, value: Any):
+        with self._mutex:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._mutex:
+            self._entries.clear()
+
+
+def normalize_query(query: str) -> str:
+    """Make the near-identical queries, which only differ in case or spaces, equal."""
+    return " ".join(query.split()).casefold()
+
+
+def get_knowledge_base_generation(session: Session, knowledge_base_id: int) -> int:
+    # Select the column instead of loading the knowledge base, which may be a
+    # detached copy merged into the session without being refreshed.
+    return session.exec(
+        select(KnowledgeBase.generation).where(KnowledgeBase.id == knowledge_base_id)
+    ).one()
+
+
+def get_retrieval_cache_key(
+    kind: str,
+    knowledge_base_id: int,
+    generation: int,
+    query: str,
+    config: BaseModel | dict,
+) -> str:
+    if isinstance(config, BaseModel):
+        config = config.model_dump(mode="json")
+    payload = json.dumps(
+        [kind, knowledge_base_id, generation, normalize_query(query), config],
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+retrieval_cache = RetrievalCache(
+    max_size=settings.RETRIEVAL_CACHE_MAX_SIZE,
+    ttl=settings.RETRIEVAL_CACHE_TTL,
+)
@@ -11,6 +11,7 @@ from llama_index.core.schema import NodeWithScore, QueryBundle
 import llama_index.core.instrumentation as instrument
 from sqlmodel import SQLModel
 
+from app.core.config import settings
 from app.models.chunk import get_kb_chunk_model
 from app.rag.knowledge_base.config import get_kb_embed_model
 from app.rag.rerankers.resolver import resolve_reranker_by_id
@@ -21,9 +22,15 @@ from app.rag.retrievers.chunk.schema import (
     ChunkRetriever,
 )
 from app.rag.retrievers.chunk.helpers import map_nodes_to_chunks
+from app.rag.retrievers.cache import (
+    get_knowledge_base_generation,
+    get_retrieval_cache_key,
+    retrieval_cache,
+)
 from app.rag.indices.vector_search.vector_store.tidb_vector_store import TiDBVectorStore
 from app.rag.postprocessors.metadata_post_filter import MetadataPostFilter
 from app.repositories import knowledge_base_repo, document_repo
+from app.utils.metrics import observe_stage, track_sql_time
 
 logger = logging.getLogger(__name__)
 
@@ -71,34 +78,73 @@ class ChunkSimpleRetriever(BaseRetriever, ChunkRetriever):
 
         # Reranker
         reranker_config = config.reranker
+        self._reranker = None
         if reranker_config and reranker_config.enabled:
-            reranker = resolve_reranker_by_id(
+            self._reranker = resolve_reranker_by_id(
                 db_session, reranker_config.model_id, reranker_config.top_n
             )
-            node_postprocessors.append(reranker)
+            node_postprocessors.append(self._reranker)
 
         self._node_postprocessors = node_postprocessors
 
     @dispatcher.span
     def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        # The results of a query are cached, unless the embedding is given or
+        # computed from other strings than the query.
+        if (
+            not settings.ENABLE_RETRIEVAL_CACHE
+            or query_bundle.embedding is not None
+            or query_bundle.embedding_strs != [query_bundle.query_str]
+        ):
+            return self._retrieve_nodes(query_bundle)
+
+        key = get_retrieval_cache_key(
+            "chunk",
+            self._kb.id,
+            get_knowledge_base_generation(self._db_session, self._kb.id),
+            query_bundle.query_str,
+            self._config,
+        )
+        cached = retrieval_cache.get(key)
+        if cached is not None:
+            # Only the ids and the scores are cached, the chunks are loaded by id.
+            scores = dict(cached)
+            nodes = self._vector_store.get_nodes_by_ids(list(scores.keys()))
+            return [
+                NodeWithScore(node=node, score=scores[node.node_id]) for node in nodes
+            ]
+
+        nodes = self._retrieve_nodes(query_bundle)
+        retrieval_cache.set(key, [(n.node.node_id, n.score) for n in nodes])
+        return nodes
+
+    def _retrieve_nodes(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
         if query_bundle.embedding is None and len(query_bundle.embedding_strs) > 0:
             query_bundle.embedding = self._embed_model.get_agg_embedding_from_queries(
                 query_bundle.embedding_strs
             )
 
-        result = self._vector_store.query(
-            VectorStoreQuery(
-                query_str=query_bundle.query_str,
-                query_embedding=query_bundle.embedding,
-                similarity_top_k=self._config.similarity_top_k or self._config.top_k,
+        with track_sql_time("chunk"):
+            result = self._vector_store.query(
+                VectorStoreQuery(
+                    query_str=query_bundle.query_str,
+                    query_embedding=query_bundle.embedding,
+                    similarity_top_k=self._config.similarity_top_k
+                    or self._config.top_k,
+                )
             )
-        )
         nodes = self._build_node_list_from_query_result(result)
 
         for node_postprocessor in self._node_postprocessors:
-            nodes = node_postprocessor.postprocess_nodes(
-                nodes, query_bundle=query_bundle
-            )
+            if node_postprocessor is self._reranker:
+                with observe_stage("rerank"):
+                    nodes = node_postprocessor.postprocess_nodes(
+                        nodes, query_bundle=query_bundle
+                    )
+            else:
+                nodes = node_postprocessor.postprocess_nodes(
+                    nodes, query_bundle=query_bundle
+                )
 
         return nodes[: self._config.top_k]
 
@@ -18,6 +18,7 @@ from app.rag.retrievers.knowledge_graph.schema import (
 from app.rag.knowledge_base.config import get_kb_embed_model, get_kb_dspy_llm
 from app.rag.indices.knowledge_graph.graph_store import TiDBGraphStore
 from app.repositories import knowledge_base_repo
+from app.utils.metrics import track_sql_time
 
 
 class KnowledgeGraphSimpleRetriever(BaseRetriever, KnowledgeGraphRetriever):
@@ -57,14 +58,15 @@ class KnowledgeGraphSimpleRetriever(BaseRetriever, KnowledgeGraphRetriever):
         if self.config.metadata_filter and self.config.metadata_filter.enabled:
             metadata_filters = self.config.metadata_filter.filters
 
-        entities, relationships = self._kg_store.retrieve_with_weight(
-            query_bundle.query_str,
-            embedding=[],
-            depth=self.config.depth,
-            include_meta=self.config.include_meta,
-            with_degree=self.config.with_degree,
-            relationship_meta_filters=metadata_filters,
-        )
+        with track_sql_time("knowledge_graph"):
+            entities, relationships = self._kg_store.retrieve_with_weight(
+                query_bundle.query_str,
+                embedding=[],
+                depth=self.config.depth,
+                include_meta=self.config.include_meta,
+                with_degree=self.config.with_degree,
+                relationship_meta_filters=metadata_filters,
+            )
         return [
             NodeWithScore(
                 node=KnowledgeGraphNode(
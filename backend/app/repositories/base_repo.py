@@ -1,4 +1,7 @@
-from sqlmodel import Session, SQLModel, select
+from typing import Iterator
+
+from sqlalchemy import ColumnElement
+from sqlmodel import Session, SQLModel, delete, select
 
 
 class BaseRepo:
@@ -15,3 +18,32 @@ class BaseRepo:
         session.commit()
         session.refresh(obj)
         return obj
+
+
+def delete_in_batches(
+    session: Session,
+    model: type[SQLModel],
+    *where: ColumnElement[bool],
+    batch_size: int,
+) -> Iterator[int]:
+    """
+    Delete the rows matching the conditions in batches of `batch_size` rows, each
+    batch in its own transaction, yields the number of rows deleted by each batch.
+
+    The batches are selected in the order of the primary key after the last one
+    (keyset), so the deleted rows are not scanned again, and the conditions are
+    checked again when deleting, in case the rows changed meanwhile. Stopping in
+    the middle leaves the remaining rows for the next run.
+    """
+    last_id = None
+    while True:
+        stmt = select(model.id).where(*where).order_by(model.id).limit(batch_size)
+        if last_id is not None:
+            stmt = stmt.where(model.id > last_id)
+        ids = session.exec(stmt).all()
+        if not ids:
+            return
+        last_id = ids[-1]
+        result = session.exec(delete(model).where(model.id.in_(ids), *where))
+        session.commit()
+        yield result.rowcount
@@ -4,6 +4,7 @@ from typing import Optional, List, Dict, Any
 from datetime import datetime, UTC, date, timedelta
 from collections import defaultdict
 
+from sqlalchemy.orm import joinedload
 from sqlmodel import select, Session, or_, func, case, desc, col
 from fastapi_pagination import Params, Page
 from fastapi_pagination.ext.sqlmodel import paginate
@@ -61,6 +62,18 @@ class ChatRepo(BaseRepo):
             select(Chat).where(Chat.id == chat_id, Chat.deleted_at == None)
         ).first()
 
+    def get_with_engine(
+        self,
+        session: Session,
+        chat_id: UUID,
+    ) -> Optional[Chat]:
+        # Load the chat engine in the same query, it's needed by every chat turn.
+        return session.exec(
+            select(Chat)
+            .options(joinedload(Chat.engine))
+            .where(Chat.id == chat_id, Chat.deleted_at == None)
+        ).first()
+
     def must_get(
         self,
         session: Session,
@@ -108,6 +121,21 @@ class ChatRepo(BaseRepo):
             .order_by(ChatMessage.ordinal.asc())
         ).all()
 
+    def get_recent_messages(
+        self,
+        session: Session,
+        chat: Chat,
+        limit: int,
+    ) -> List[ChatMessage]:
+        """Return the latest `limit` messages of the chat, in ascending order."""
+        messages = session.exec(
+            select(ChatMessage)
+            .where(ChatMessage.chat_id == chat.id)
+            .order_by(ChatMessage.ordinal.desc())
+            .limit(limit)
+        ).all()
+        return list(reversed(messages))
+
     def get_message(
         self,
         session: Session,
@@ -1,8 +1,8 @@
-from typing import Type
+from typing import Iterator, Type
 
 from sqlalchemy import func, delete
 from sqlmodel import Session, select, SQLModel
-from app.repositories.base_repo import BaseRepo
+from app.repositories.base_repo import BaseRepo, delete_in_batches
 
 from app.models import (
     Document as DBDocument,
@@ -46,14 +46,18 @@ class ChunkRepo(BaseRepo):
     def count(self, session: Session):
         return session.scalar(select(func.count(self.model_cls.id)))
 
-    def delete_by_datasource(self, session: Session, datasource_id: int):
+    def delete_by_datasource_in_batches(
+        self, session: Session, datasource_id: int, batch_size: int
+    ) -> Iterator[int]:
         doc_ids_subquery = select(DBDocument.id).where(
             DBDocument.data_source_id == datasource_id
         )
-        stmt = delete(self.model_cls).where(
-            self.model_cls.document_id.in_(doc_ids_subquery)
+        return delete_in_batches(
+            session,
+            self.model_cls,
+            self.model_cls.document_id.in_(doc_ids_subquery),
+            batch_size=batch_size,
         )
-        session.exec(stmt)
 
     def delete_by_document(self, session: Session, document_id: int):
         stmt = delete(self.model_cls).where(self.model_cls.document_id == document_id)
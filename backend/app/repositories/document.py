@@ -1,13 +1,13 @@
-from typing import Type
+from typing import Iterator, Type
 
-from sqlmodel import select, Session, or_, delete
+from sqlmodel import select, Session, or_
 from fastapi_pagination import Params, Page
 from fastapi_pagination.ext.sqlmodel import paginate
 
 from app.api.admin_routes.knowledge_base.document.models import DocumentFilters
 from app.exceptions import DocumentNotFound
 from app.models import Document
-from app.repositories.base_repo import BaseRepo
+from app.repositories.base_repo import BaseRepo, delete_in_batches
 
 
 class DocumentRepo(BaseRepo):
@@ -66,13 +66,46 @@ class DocumentRepo(BaseRepo):
             raise DocumentNotFound(doc_id)
         return doc
 
-    def delete_by_datasource(self, session: Session, datasource_id: int):
-        stmt = delete(Document).where(Document.data_source_id == datasource_id)
-        session.exec(stmt)
+    def delete_by_datasource_in_batches(
+        self, session: Session, datasource_id: int, batch_size: int
+    ) -> Iterator[int]:
+        return delete_in_batches(
+            session,
+            Document,
+            Document.data_source_id == datasource_id,
+            batch_size=batch_size,
+        )
+
+    def delete_by_knowledge_base_in_batches(
+        self, session: Session, kb_id: int, batch_size: int
+    ) -> Iterator[int]:
+        return delete_in_batches(
+            session,
+            Document,
+            Document.knowledge_base_id == kb_id,
+            batch_size=batch_size,
+        )
+
+    def get_source_uris_by_datasource(
+        self, session: Session, datasource_id: int
+    ) -> set[str]:
+        stmt = select(Document.source_uri).where(
+            Document.data_source_id == datasource_id
+        )
+        return set(session.exec(stmt).all())
 
     def fetch_by_ids(self, session: Session, document_ids: list[int]) -> list[Document]:
         stmt = select(Document).where(Document.id.in_(document_ids))
         return session.exec(stmt).all()
 
+    def get_sync_states_by_datasource(
+        self, session: Session, datasource_id: int
+    ) -> list[tuple[int, str, str, dict | list]]:
+        """Returns the (id, source_uri, hash, meta) of the documents of the data source."""
+        stmt = select(
+            Document.id, Document.source_uri, Document.hash, Document.meta
+        ).where(Document.data_source_id == datasource_id)
+        return list(session.exec(stmt).all())
+
 
 document_repo = DocumentRepo()
@@ -1,5 +1,6 @@
-from typing import Type
+from typing import Iterator, Type
 
+from sqlalchemy import ColumnElement, exists
 from sqlmodel import Session, select, func, delete, SQLModel
 
 from app.models.document import Document
@@ -7,6 +8,7 @@ from app.models.knowledge_base import KnowledgeBase
 from app.models.chunk import get_kb_chunk_model
 from app.models.entity import get_kb_entity_model
 from app.models.relationship import get_kb_relationship_model
+from app.repositories.base_repo import delete_in_batches
 
 
 class GraphRepo:
@@ -26,33 +28,46 @@ class GraphRepo:
     def count_relationships(self, session: Session):
         return session.scalar(select(func.count(self.relationship_model.id)))
 
+    def _orphaned_entity_conditions(self) -> list[ColumnElement[bool]]:
+        # Two anti-joins on the indexed foreign keys, instead of an outer join on
+        # either of them, which can't use the indexes.
+        relationship_model = self.relationship_model
+        return [
+            ~exists().where(
+                relationship_model.source_entity_id == self.entity_model.id
+            ),
+            ~exists().where(
+                relationship_model.target_entity_id == self.entity_model.id
+            ),
+        ]
+
     def delete_orphaned_entities(self, session: Session):
-        orphaned_entity_ids = (
-            select(self.entity_model.id)
-            .outerjoin(
-                self.relationship_model,
-                (self.relationship_model.target_entity_id == self.entity_model.id)
-                | (self.relationship_model.source_entity_id == self.entity_model.id),
-            )
-            .where(self.relationship_model.id.is_(None))
-            .scalar_subquery()
-        )
-        stmt = delete(self.entity_model).where(
-            self.entity_model.id.in_(orphaned_entity_ids)
-        )
+        stmt = delete(self.entity_model).where(*self._orphaned_entity_conditions())
         session.exec(stmt)
 
-    def delete_data_source_relationships(self, session: Session, datasource_id: int):
-        doc_ids_subquery = select(Document.id).where(
-            Document.data_source_id == datasource_id
+    def delete_orphaned_entities_in_batches(
+        self, session: Session, batch_size: int
+    ) -> Iterator[int]:
+        return delete_in_batches(
+            session,
+            self.entity_model,
+            *self._orphaned_entity_conditions(),
+            batch_size=batch_size,
         )
-        chunk_ids_subquery = select(self.chunk_model.id).where(
-            self.chunk_model.document_id.in_(doc_ids_subquery)
+
+    def delete_data_source_relationships_in_batches(
+        self, session: Session, datasource_id: int, batch_size: int
+    ) -> Iterator[int]:
+        # The chunk and the document of each relationship are looked up by their
+        # primary keys, the relationships table has no index on `chunk_id`.
+        from_data_source = exists().where(
+            self.chunk_model.id == self.relationship_model.chunk_id,
+            Document.id == self.chunk_model.document_id,
+            Document.data_source_id == datasource_id,
         )
-        stmt = delete(self.relationship_model).where(
-            self.relationship_model.chunk_id.in_(chunk_ids_subquery)
+        return delete_in_batches(
+            session, self.relationship_model, from_data_source, batch_size=batch_size
         )
-        session.exec(stmt)
 
     def delete_document_relationships(self, session: Session, document_id: int):
         chunk_ids_subquery = select(self.chunk_model.id).where(
@@ -8,6 +8,7 @@ from .build_index import (
 )
 
 from .evaluate import add_evaluation_task
+from .scheduler import dispatch_indexing_tasks
 
 
 __all__ = [
@@ -16,4 +17,5 @@ __all__ = [
     "import_documents_for_knowledge_base",
     "purge_kb_datasource_related_resources",
     "add_evaluation_task",
+    "dispatch_indexing_tasks",
 ]
@@ -1,14 +1,17 @@
 import traceback
 from uuid import UUID
 from sqlmodel import Session
+from celery.signals import task_postrun
 from celery.utils.log import get_task_logger
 
 from app.celery import app as celery_app
+from app.core.config import settings
 from app.core.db import engine
 from app.models import (
     Document as DBDocument,
     DocIndexTaskStatus,
     KgIndexStatus,
+    KnowledgeBase,
 )
 from app.models.chunk import get_kb_chunk_model
 from app.models.knowledge_base import IndexMethod
@@ -16,15 +19,56 @@ from app.rag.build_index import IndexService
 from app.rag.knowledge_base.config import get_kb_llm, get_kb_embed_model
 from app.repositories import knowledge_base_repo
 from app.repositories.chunk import ChunkRepo
+from app.tasks.scheduler import (
+    IndexingLane,
+    get_kb_embedding_provider_key,
+    get_kb_llm_provider_key,
+    indexing_scheduler,
+    is_rate_limit_error,
+    on_indexing_task_finished,
+)
 
 logger = get_task_logger(__name__)
 
 
+def schedule_build_index_for_document(
+    kb: KnowledgeBase,
+    document_id: int,
+    lane: IndexingLane = IndexingLane.BULK,
+):
+    indexing_scheduler.submit(
+        kb.id,
+        build_index_for_document.name,
+        [kb.id, document_id, lane.value],
+        get_kb_embedding_provider_key(kb),
+        lane,
+    )
+
+
+def schedule_build_kg_index_for_chunk(
+    kb: KnowledgeBase,
+    chunk_id: UUID,
+    lane: IndexingLane = IndexingLane.BULK,
+):
+    indexing_scheduler.submit(
+        kb.id,
+        build_kg_index_for_chunk.name,
+        [kb.id, chunk_id],
+        get_kb_llm_provider_key(kb),
+        lane,
+    )
+
+
 # TODO: refactor: divide into two tasks: build_vector_index_for_document and build_kg_index_for_document
 
 
 @celery_app.task(bind=True)
-def build_index_for_document(self, knowledge_base_id: int, document_id: int):
+def build_index_for_document(
+    self,
+    knowledge_base_id: int,
+    document_id: int,
+    lane: str = IndexingLane.BULK.value,
+):
     # Pre-check before building index.
     with Session(engine, expire_on_commit=False) as session:
         kb = knowledge_base_repo.must_get(session, knowledge_base_id)
@@ -68,8 +112,18 @@ def build_index_for_document(self, knowledge_base_id: int, document_id: int):
             session.add(db_document)
             session.commit()
             logger.info(f"Built vector index for document #{document_id} successfully.")
-    except Exception:
+    except Exception as e:
         with Session(engine) as session:
+            if is_rate_limit_error(e) and settings.ENABLE_INDEXING_SCHEDULER:
+                logger.warning(
+                    f"Rate limited building vector index for document #{document_id}, retry later."
+                )
+                db_document.index_status = DocIndexTaskStatus.PENDING
+                session.add(db_document)
+                session.commit()
+                indexing_scheduler.report_rate_limited(self.request.id)
+                return
+
             error_msg = traceback.format_exc()
             logger.error(
                 f"Failed to build vector index for document {document_id}: {error_msg}"
@@ -89,11 +143,11 @@ def build_index_for_document(self, knowledge_base_id: int, document_id: int):
         chunk_repo = ChunkRepo(get_kb_chunk_model(kb))
         chunks = chunk_repo.get_document_chunks(session, document_id)
         for chunk in chunks:
-            build_kg_index_for_chunk.delay(knowledge_base_id, chunk.id)
+            schedule_build_kg_index_for_chunk(kb, chunk.id, IndexingLane(lane))
 
 
-@celery_app.task
-def build_kg_index_for_chunk(knowledge_base_id: int, chunk_id: UUID):
+@celery_app.task(bind=True)
+def build_kg_index_for_chunk(self, knowledge_base_id: int, chunk_id: UUID):
     with Session(engine, expire_on_commit=False) as session:
         kb = knowledge_base_repo.must_get(session, knowledge_base_id)
 
@@ -131,8 +185,18 @@ def build_kg_index_for_chunk(knowledge_base_id: int, chunk_id: UUID):
             logger.info(
                 f"Built knowledge graph index for chunk #{chunk_id} successfully."
             )
-    except Exception:
+    except Exception as e:
         with Session(engine) as session:
+            if is_rate_limit_error(e) and settings.ENABLE_INDEXING_SCHEDULER:
+                logger.warning(
+                    f"Rate limited building knowledge graph index for chunk #{chunk_id}, retry later."
+                )
+                db_chunk.index_status = KgIndexStatus.PENDING
+                session.add(db_chunk)
+                session.commit()
+                indexing_scheduler.report_rate_limited(self.request.id)
+                return
+
             error_msg = traceback.format_exc()
             logger.error(
                 f"Failed to build knowledge graph index for chunk #{chunk_id}",
@@ -142,3 +206,8 @@ def build_kg_index_for_chunk(knowledge_base_id: int, chunk_id: UUID):
             db_chunk.index_result = error_msg
             session.add(db_chunk)
             session.commit()
+
+
+# Only the scheduled tasks are reported to the scheduler when they finish.
+task_postrun.connect(on_indexing_task_finished, sender=build_index_for_document)
+task_postrun.connect(on_indexing_task_finished, sender=build_kg_index_for_chunk)
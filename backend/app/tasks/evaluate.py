@@ -1,5 +1,9 @@
 import logging
+import math
 import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, UTC
+from functools import lru_cache
 
 from llama_index.core.base.llms.types import ChatMessage
 
@@ -10,7 +14,11 @@ from ragas import EvaluationDataset, evaluate
 from ragas.embeddings import LlamaIndexEmbeddingsWrapper
 from ragas.llms import LlamaIndexLLMWrapper
 from ragas.metrics import FactualCorrectness, SemanticSimilarity
-from sqlmodel import Session, select
+from ragas.metrics.base import Metric
+from ragas.run_config import RunConfig
+from sqlalchemy import and_, bindparam, or_
+from sqlalchemy.orm import lazyload
+from sqlmodel import Session, select, update
 from celery.utils.log import get_task_logger
 from tenacity import retry, stop_after_attempt, wait_fixed
 
@@ -44,87 +52,159 @@ def add_evaluation_task(evaluation_task_id: int):
         f"[add_evaluation_task] Enter with evaluation task #{evaluation_task_id}"
     )
 
-    with Session(engine, expire_on_commit=False) as session:
+    with Session(engine) as session:
         evaluation_task = session.get(EvaluationTask, evaluation_task_id)
         if evaluation_task is None:
             logger.error(f"Evaluation task #{evaluation_task_id} is not found")
             return
 
-        # get eval items
-        eval_item_stmt = select(EvaluationTaskItem).where(
-            EvaluationTaskItem.evaluation_task_id == evaluation_task_id
+        eval_item_stmt = select(EvaluationTaskItem.id).where(
+            EvaluationTaskItem.evaluation_task_id == evaluation_task_id,
+            EvaluationTaskItem.status == EvaluationStatus.NOT_START,
         )
-        eval_item_list = session.exec(eval_item_stmt).all()
-        logger.info(f"[add_evaluation_task] get {len(eval_item_list)} evaluation items")
-        for eval_item in eval_item_list:
-            logger.debug(type(eval_item))
-            logger.debug(
-                f"[add_evaluation_task] deal with evaluation item #{eval_item.id}"
-            )
-            add_evaluation_task_item.delay(eval_item.id)
+        eval_item_ids = session.exec(eval_item_stmt).all()
+
+    batch_size = settings.EVALUATION_BATCH_SIZE
+    logger.info(
+        f"[add_evaluation_task] get {len(eval_item_ids)} evaluation items, "
+        f"evaluate them in batches of {batch_size}"
+    )
+    for i in range(0, len(eval_item_ids), batch_size):
+        evaluate_task_items.delay(eval_item_ids[i : i + batch_size])
 
 
 @celery_app.task
 def add_evaluation_task_item(evaluation_task_item_id: int):
+    # Kept for the tasks queued before the items were evaluated in batches.
+    evaluate_task_items.delay([evaluation_task_item_id])
+
+
+def claim_evaluation_items(
+    session: Session, evaluation_task_item_ids: list[int]
+) -> list[EvaluationTaskItem]:
+    """
+    Claim the items to evaluate, marking them as evaluating. The rows are locked
+    while claimed, so each item is claimed by a single delivery of its batch.
+
+    The items not started are claimed, as well as the items left evaluating for
+    longer than `EVALUATION_ITEM_TIMEOUT`, whose worker was lost.
+    """
+    now = datetime.now(UTC)
+    stale_before = now - timedelta(seconds=settings.EVALUATION_ITEM_TIMEOUT)
+    items = session.exec(
+        select(EvaluationTaskItem)
+        # Only lock the item rows, not the rows of their task and user.
+        .options(lazyload("*"))
+        .where(
+            EvaluationTaskItem.id.in_(evaluation_task_item_ids),
+            or_(
+                EvaluationTaskItem.status == EvaluationStatus.NOT_START,
+                and_(
+                    EvaluationTaskItem.status == EvaluationStatus.EVALUATING,
+                    EvaluationTaskItem.updated_at < stale_before,
+                ),
+            ),
+        )
+        .with_for_update()
+    ).all()
+    if items:
+        session.exec(
+            update(EvaluationTaskItem)
+            .where(EvaluationTaskItem.id.in_([item.id for item in items]))
+            .values(status=EvaluationStatus.EVALUATING, updated_at=now)
+        )
+    session.commit()
+    return items
+
+
+@celery_app.task
+def evaluate_task_items(evaluation_task_item_ids: list[int]):
     logger.info(
-        f"Enter add_evaluation_task_item with evaluation item #{evaluation_task_item_id}"
+        f"Enter evaluate_task_items with evaluation items {evaluation_task_item_ids}"
     )
 
     with Session(engine, expire_on_commit=False) as session:
-        evaluation_task_item = session.get(EvaluationTaskItem, evaluation_task_item_id)
-        if evaluation_task_item is None:
-            logger.error(f"Evaluation item #{evaluation_task_item_id} is not found")
-            return
-        if evaluation_task_item.status != EvaluationStatus.NOT_START:
-            logger.error(
-                f"Evaluation item #{evaluation_task_item_id} is not in not start state"
-            )
-            return
-    try:
-        if evaluation_task_item.response is None or evaluation_task_item.response == "":
-            response, _ = generate_answer_by_autoflow(
-                [ChatMessage(role="assistant", content=evaluation_task_item.query)],
-                evaluation_task_item.chat_engine,
+        items = claim_evaluation_items(session, evaluation_task_item_ids)
+        # The items evaluated by another delivery of the batch are checked
+        # again once they would be stale, in case its worker is lost.
+        evaluating_ids = session.exec(
+            select(EvaluationTaskItem.id).where(
+                EvaluationTaskItem.id.in_(evaluation_task_item_ids),
+                EvaluationTaskItem.id.not_in([item.id for item in items]),
+                EvaluationTaskItem.status == EvaluationStatus.EVALUATING,
             )
-            if response is None or response == "":
-                raise Exception("Autoflow response is empty")
-
-            logger.info(
-                f"Got response from autoflow for evaluation item #{evaluation_task_item_id}, {response}"
+        ).all()
+    if evaluating_ids:
+        evaluate_task_items.apply_async(
+            (evaluating_ids,), countdown=settings.EVALUATION_ITEM_TIMEOUT
+        )
+    if not items:
+        logger.info("No evaluation items to evaluate")
+        return
+
+    errors: dict[int, str] = {}
+    with ThreadPoolExecutor(
+        max_workers=settings.EVALUATION_MAX_CONCURRENCY
+    ) as executor:
+        futures = {
+            item.id: executor.submit(
+                generate_answer_by_autoflow,
+                [ChatMessage(role="assistant", content=item.query)],
+                item.chat_engine,
             )
-            evaluation_task_item.response = response
-            logger.info(f"Successfully get response item #{evaluation_task_item_id}")
-
-            with Session(engine, expire_on_commit=False) as session:
-                session.merge(evaluation_task_item)
-                session.commit()
-
-        evaluate_task(evaluation_task_item)
-
-    except Exception as e:
-        logger.error(f"Failed to evaluate item #{evaluation_task_item_id}, error: {e}")
-        evaluation_task_item.error_msg = traceback.format_exc()
-        evaluation_task_item.status = EvaluationStatus.ERROR
-
-        with Session(engine, expire_on_commit=False) as session:
-            session.merge(evaluation_task_item)
-            session.commit()
-
-
-def evaluate_task(evaluation_task_item: EvaluationTaskItem):
-    logger.info(f"Enter evaluate_task with evaluation item #{evaluation_task_item.id}")
-    ragas_list = [
-        {
-            "user_input": evaluation_task_item.query,
-            "reference": evaluation_task_item.reference,
-            "response": evaluation_task_item.response,
+            for item in items
+            if not item.response
         }
-    ]
-    logger.debug(f"Response data {evaluation_task_item.response}")
+        for item in items:
+            if item.id not in futures:
+                continue
+            try:
+                response, _ = futures[item.id].result()
+                if response is None or response == "":
+                    raise Exception("Autoflow response is empty")
+                item.response = response
+            except Exception as e:
+                logger.error(f"Failed to get response of item #{item.id}, error: {e}")
+                errors[item.id] = traceback.format_exc()
+
+    answered = [item for item in items if item.id not in errors]
+    if answered:
+        try:
+            scores = score_evaluation_items(answered)
+        except Exception as e:
+            logger.error(
+                f"Failed to evaluate items {evaluation_task_item_ids}, error: {e}"
+            )
+            error_msg = traceback.format_exc()
+            scores = [None] * len(answered)
+            errors.update((item.id, error_msg) for item in answered)
+        for item, score in zip(answered, scores):
+            if item.id in errors:
+                continue
+            if score is None:
+                errors[item.id] = "RAGAS failed to compute the metrics of the item"
+                continue
+            item.factual_correctness = score[FactualCorrectness.name]
+            item.semantic_similarity = score[SemanticSimilarity.name]
+
+    for item in items:
+        if item.id in errors:
+            item.status = EvaluationStatus.ERROR
+            item.error_msg = errors[item.id]
+        else:
+            item.status = EvaluationStatus.DONE
+
+    with Session(engine) as session:
+        save_evaluation_results(session, items)
+        session.commit()
+    logger.info(
+        f"Evaluated {len(items) - len(errors)} items, {len(errors)} items failed"
+    )
 
-    ragas_dataset = EvaluationDataset.from_list(ragas_list)
-    logger.debug(f"Dataset {ragas_dataset.to_pandas().head()}")
 
+@lru_cache(maxsize=1)
+def get_evaluation_metrics() -> list[Metric]:
+    """The metrics and their LLM / embedding clients are reused by the tasks of a worker."""
     evaluator_llm = LlamaIndexLLMWrapper(
         OpenAI(model="gpt-4o", api_key=settings.EVALUATION_OPENAI_API_KEY)
     )
@@ -133,51 +213,84 @@ def evaluate_task(evaluation_task_item: EvaluationTaskItem):
             model="text-embedding-3-large", api_key=settings.EVALUATION_OPENAI_API_KEY
         )
     )
-
-    metrics = [
+    return [
         # LLMContextRecall(llm=evaluator_llm),  # retrieved_contexts required
         FactualCorrectness(llm=evaluator_llm),
         # Faithfulness(llm=evaluator_llm),  # retrieved_contexts required
         SemanticSimilarity(embeddings=evaluator_embeddings),
     ]
 
-    try:
-        eval_result = evaluate(
-            dataset=ragas_dataset,
-            metrics=metrics,
-            raise_exceptions=True,
-            show_progress=False,
+
+def score_evaluation_items(items: list[EvaluationTaskItem]) -> list[dict | None]:
+    """
+    Score the items with a single RAGAS run. Returns the scores of each item,
+    or None for the items RAGAS failed to score.
+    """
+    ragas_dataset = EvaluationDataset.from_list(
+        [
+            {
+                "user_input": item.query,
+                "reference": item.reference,
+                "response": item.response,
+            }
+            for item in items
+        ]
+    )
+    metric_names = [FactualCorrectness.name, SemanticSimilarity.name]
+
+    # A failed sample gets NaN scores instead of failing the whole batch.
+    eval_result = evaluate(
+        dataset=ragas_dataset,
+        metrics=get_evaluation_metrics(),
+        run_config=RunConfig(max_workers=settings.EVALUATION_MAX_CONCURRENCY),
+        raise_exceptions=False,
+        show_progress=False,
+    )
+    result_list = eval_result.to_pandas().to_dict(orient="records")
+    if len(result_list) != len(items):
+        raise Exception(
+            f"RAGAS returned {len(result_list)} results for {len(items)} items"
         )
+    return [
+        None if any(math.isnan(r[name]) for name in metric_names) else r
+        for r in result_list
+    ]
 
-        logger.debug("eval_result to_pandas")
-        result_list = eval_result.to_pandas().to_dict(orient="records")
-        logger.debug(f"result list {result_list}")
-        if len(result_list) != 1:
-            raise Exception(
-                f"Item {evaluation_task_item.id} cannot get evaluation from ragas"
-            )
 
-        logger.debug(f"result {result_list[0]}")
-        evaluation_task_item.factual_correctness = result_list[0][
-            FactualCorrectness.name
-        ]
-        evaluation_task_item.semantic_similarity = result_list[0][
-            SemanticSimilarity.name
-        ]
-        evaluation_task_item.status = EvaluationStatus.DONE
-
-        logger.info(f"Result evaluation item #{evaluation_task_item}")
-        with Session(engine, expire_on_commit=False) as session:
-            session.merge(evaluation_task_item)
-            session.commit()
-    except Exception as e:
-        logger.error(f"Failed to evaluate item #{evaluation_task_item.id}, error: {e}")
-        evaluation_task_item.error_msg = traceback.format_exc()
-        evaluation_task_item.status = EvaluationStatus.ERROR
-
-        with Session(engine, expire_on_commit=False) as session:
-            session.merge(evaluation_task_item)
-            session.commit()
+def save_evaluation_results(session: Session, items: list[EvaluationTaskItem]):
+    """
+    Write the results back in a single batched UPDATE, the items cancelled
+    during the evaluation are left untouched.
+    """
+    table = EvaluationTaskItem.__table__
+    stmt = (
+        table.update()
+        .where(
+            table.c.id == bindparam("item_id"),
+            table.c.status == EvaluationStatus.EVALUATING,
+        )
+        .values(
+            status=bindparam("new_status"),
+            response=bindparam("new_response"),
+            error_msg=bindparam("new_error_msg"),
+            factual_correctness=bindparam("new_factual_correctness"),
+            semantic_similarity=bindparam("new_semantic_similarity"),
+        )
+    )
+    session.execute(
+        stmt,
+        [
+            {
+                "item_id": item.id,
+                "new_status": item.status,
+                "new_response": item.response,
+                "new_error_msg": item.error_msg,
+                "new_factual_correctness": item.factual_correctness,
+                "new_semantic_similarity": item.semantic_similarity,
+            }
+            for item in items
+        ],
+    )
 
 
 @retry(stop=stop_after_attempt(2), wait=wait_fixed(5))
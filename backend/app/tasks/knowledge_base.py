@@ -1,22 +1,28 @@
+import time
+from typing import Iterator
+
 from celery.utils.log import get_task_logger
 from sqlalchemy import delete
 from sqlmodel import Session
 
 from app.celery import app as celery_app
+from app.core.config import settings
 from app.core.db import engine
-from app.exceptions import KBNotFound
+from app.exceptions import KBDataSourceNotFound, KBNotFound
 from app.models import (
-    Document,
+    DocIndexTaskStatus,
     KnowledgeBaseDataSource,
     DataSource,
 )
 from app.rag.datasource import get_data_source_loader
 from app.repositories import knowledge_base_repo, document_repo
-from .build_index import build_index_for_document
+from .build_index import schedule_build_index_for_document
 from ..models.chunk import get_kb_chunk_model
 from ..models.entity import get_kb_entity_model
 from ..models.relationship import get_kb_relationship_model
+from ..rag.indices.knowledge_graph.graph_store.entity_dedup import EntityDedupConfig
 from ..rag.knowledge_base.index_store import (
+    get_kb_entity_deduplicator,
     get_kb_tidb_vector_store,
     get_kb_tidb_graph_store,
 )
@@ -65,11 +71,46 @@ def import_documents_from_kb_datasource(kb_id: int, data_source_id: int):
                 data_source.config,
             )
 
+            chunk_model = get_kb_chunk_model(kb)
+            chunk_repo = ChunkRepo(chunk_model)
+            graph_repo = GraphRepo(
+                get_kb_entity_model(kb), get_kb_relationship_model(kb), chunk_model
+            )
+            reindexed = False
             for document in loader.load_documents():
+                # A data source may yield a document it imported before, which is
+                # re-indexed only if its content changed (the loader resets its
+                # index status), otherwise only its metadata is saved.
+                if document.id is not None:
+                    if document.index_status != DocIndexTaskStatus.NOT_STARTED:
+                        session.add(document)
+                        session.commit()
+                        continue
+                    graph_repo.delete_document_relationships(session, document.id)
+                    chunk_repo.delete_by_document(session, document.id)
+                    reindexed = True
+                    logger.info(
+                        f"Document #{document.id} changed, deleted its index to rebuild it."
+                    )
+
                 session.add(document)
                 session.commit()
 
-                build_index_for_document.delay(kb_id, document.id)
+                schedule_build_index_for_document(kb, document.id)
+
+            for document_id in loader.stale_document_ids:
+                graph_repo.delete_document_relationships(session, document_id)
+                chunk_repo.delete_by_document(session, document_id)
+                session.delete(document_repo.must_get(session, document_id))
+                session.commit()
+                reindexed = True
+                logger.info(
+                    f"Document #{document_id} is no longer in the data source, deleted it."
+                )
+
+            if reindexed:
+                graph_repo.delete_orphaned_entities(session)
+                session.commit()
 
         stats_for_knowledge_base.delay(kb_id)
         logger.info(
@@ -105,7 +146,40 @@ def stats_for_knowledge_base(kb_id: int):
 
 
 @celery_app.task
-def purge_knowledge_base_related_resources(kb_id: int):
+def deduplicate_knowledge_base_entities(kb_id: int, config: dict = {}):
+    try:
+        with Session(engine) as session:
+            kb = knowledge_base_repo.must_get(session, kb_id)
+            deduplicator = get_kb_entity_deduplicator(
+                session, kb, EntityDedupConfig.model_validate(config)
+            )
+            result = deduplicator.run(session)
+
+        logger.info(
+            f"Successfully merged {result.merged_entities} duplicated entities "
+            f"of knowledge base #{kb_id}"
+        )
+    except KBNotFound:
+        logger.error(f"Knowledge base #{kb_id} is not found")
+    except Exception as e:
+        logger.exception(
+            f"Failed to deduplicate entities of knowledge base #{kb_id}", exc_info=e
+        )
+
+
+def _purge_in_batches(task, progress: dict, step: str, batches: Iterator[int]) -> int:
+    """Run the batches of a purge step, reporting the progress as the task state."""
+    progress[step] = 0
+    for deleted in batches:
+        progress[step] += deleted
+        task.update_state(state="PROGRESS", meta=progress)
+        # Leave room for the live queries between the batches.
+        time.sleep(settings.PURGE_BATCH_INTERVAL)
+    return progress[step]
+
+
+@celery_app.task(bind=True, max_retries=5)
+def purge_knowledge_base_related_resources(self, kb_id: int):
     """
     Purge all resources related to a knowledge base.
 
@@ -116,98 +190,163 @@ def purge_knowledge_base_related_resources(kb_id: int):
             - vector index
             - knowledge graph index
         - data sources
-    """
-
-    with Session(engine) as session:
-        knowledge_base = knowledge_base_repo.must_get(
-            session, kb_id, show_soft_deleted=True
-        )
-        assert knowledge_base.deleted_at is not None
 
-        data_source_ids = [datasource.id for datasource in knowledge_base.data_sources]
+    The rows are deleted in batches, if the task fails in the middle, the retry
+    continues with the remaining ones.
+    """
 
-        # Drop entities_{kb_id}, relationships_{kb_id} tables.
-        tidb_graph_store = get_kb_tidb_graph_store(session, knowledge_base)
-        tidb_graph_store.drop_table_schema()
-        logger.info(
-            f"Dropped tidb graph store of knowledge base #{kb_id} successfully."
-        )
+    try:
+        with Session(engine) as session:
+            knowledge_base = knowledge_base_repo.must_get(
+                session, kb_id, show_soft_deleted=True
+            )
+            assert knowledge_base.deleted_at is not None
 
-        # Drop chunks_{kb_id} table.
-        tidb_vector_store = get_kb_tidb_vector_store(session, knowledge_base)
-        tidb_vector_store.drop_table_schema()
+            data_source_ids = [
+                datasource.id for datasource in knowledge_base.data_sources
+            ]
 
-        logger.info(
-            f"Dropped tidb vector store of knowledge base #{kb_id} successfully."
-        )
+            # Drop entities_{kb_id}, relationships_{kb_id} tables.
+            tidb_graph_store = get_kb_tidb_graph_store(session, knowledge_base)
+            tidb_graph_store.drop_table_schema()
+            logger.info(
+                f"Dropped tidb graph store of knowledge base #{kb_id} successfully."
+            )
 
-        # Delete documents.
-        stmt = delete(Document).where(Document.knowledge_base_id == kb_id)
-        session.exec(stmt)
-        logger.info(f"Deleted documents of knowledge base #{kb_id} successfully.")
+            # Drop chunks_{kb_id} table.
+            tidb_vector_store = get_kb_tidb_vector_store(session, knowledge_base)
+            tidb_vector_store.drop_table_schema()
+            session.commit()
 
-        # Delete data sources and links.
-        if len(data_source_ids) > 0:
-            stmt = delete(KnowledgeBaseDataSource).where(
-                KnowledgeBaseDataSource.knowledge_base_id == kb_id
-            )
-            session.exec(stmt)
             logger.info(
-                f"Deleted linked data sources of knowledge base #{kb_id} successfully."
+                f"Dropped tidb vector store of knowledge base #{kb_id} successfully."
             )
 
-            stmt = delete(DataSource).where(DataSource.id.in_(data_source_ids))
-            session.exec(stmt)
+            # Delete documents.
+            progress = {}
+            deleted = _purge_in_batches(
+                self,
+                progress,
+                "documents",
+                document_repo.delete_by_knowledge_base_in_batches(
+                    session, kb_id, settings.PURGE_BATCH_SIZE
+                ),
+            )
             logger.info(
-                f"Deleted data sources {', '.join([f'#{did}' for did in data_source_ids])} successfully."
+                f"Deleted {deleted} documents of knowledge base #{kb_id} successfully."
             )
 
-        # Delete knowledge base.
-        session.delete(knowledge_base)
-        logger.info(f"Deleted knowledge base #{kb_id} successfully.")
+            # Delete data sources and links.
+            if len(data_source_ids) > 0:
+                stmt = delete(KnowledgeBaseDataSource).where(
+                    KnowledgeBaseDataSource.knowledge_base_id == kb_id
+                )
+                session.exec(stmt)
+                logger.info(
+                    f"Deleted linked data sources of knowledge base #{kb_id} successfully."
+                )
+
+                stmt = delete(DataSource).where(DataSource.id.in_(data_source_ids))
+                session.exec(stmt)
+                logger.info(
+                    f"Deleted data sources {', '.join([f'#{did}' for did in data_source_ids])} successfully."
+                )
+
+            # Delete knowledge base.
+            session.delete(knowledge_base)
+            logger.info(f"Deleted knowledge base #{kb_id} successfully.")
 
-        session.commit()
+            session.commit()
+    except KBNotFound:
+        logger.info(f"Knowledge base #{kb_id} is already purged")
+    except Exception as e:
+        logger.exception(
+            f"Failed to purge knowledge base #{kb_id}, retry later", exc_info=e
+        )
+        raise self.retry(exc=e, countdown=60)
 
 
-@celery_app.task
-def purge_kb_datasource_related_resources(kb_id: int, datasource_id: int):
+@celery_app.task(bind=True, max_retries=5)
+def purge_kb_datasource_related_resources(self, kb_id: int, datasource_id: int):
     """
     Purge all resources related to the deleted datasource in the knowledge base.
-    """
 
-    with Session(engine) as session:
-        kb = knowledge_base_repo.must_get(session, kb_id, show_soft_deleted=True)
-        datasource = knowledge_base_repo.must_get_kb_datasource(
-            session, kb, datasource_id, show_soft_deleted=True
-        )
-        assert datasource.deleted_at is not None
+    The rows are deleted in batches, if the task fails in the middle, the retry
+    continues with the remaining ones.
+    """
 
-        chunk_model = get_kb_chunk_model(kb)
-        entity_model = get_kb_entity_model(kb)
-        relationship_model = get_kb_relationship_model(kb)
+    try:
+        with Session(engine) as session:
+            kb = knowledge_base_repo.must_get(session, kb_id, show_soft_deleted=True)
+            datasource = knowledge_base_repo.must_get_kb_datasource(
+                session, kb, datasource_id, show_soft_deleted=True
+            )
+            assert datasource.deleted_at is not None
+
+            chunk_model = get_kb_chunk_model(kb)
+            entity_model = get_kb_entity_model(kb)
+            relationship_model = get_kb_relationship_model(kb)
+
+            chunk_repo = ChunkRepo(chunk_model)
+            graph_repo = GraphRepo(entity_model, relationship_model, chunk_model)
+            batch_size = settings.PURGE_BATCH_SIZE
+            progress = {}
+
+            # The relationships are found by their chunks, delete them first.
+            deleted = _purge_in_batches(
+                self,
+                progress,
+                "relationships",
+                graph_repo.delete_data_source_relationships_in_batches(
+                    session, datasource_id, batch_size
+                ),
+            )
+            logger.info(
+                f"Deleted {deleted} relationships generated by chunks from data source #{datasource_id} successfully."
+            )
 
-        chunk_repo = ChunkRepo(chunk_model)
-        graph_repo = GraphRepo(entity_model, relationship_model, chunk_model)
+            deleted = _purge_in_batches(
+                self,
+                progress,
+                "entities",
+                graph_repo.delete_orphaned_entities_in_batches(session, batch_size),
+            )
+            logger.info(f"Deleted {deleted} orphaned entities successfully.")
+
+            deleted = _purge_in_batches(
+                self,
+                progress,
+                "chunks",
+                chunk_repo.delete_by_datasource_in_batches(
+                    session, datasource_id, batch_size
+                ),
+            )
+            logger.info(
+                f"Deleted {deleted} chunks from data source #{datasource_id} successfully."
+            )
 
-        graph_repo.delete_data_source_relationships(session, datasource_id)
-        logger.info(
-            f"Deleted relationships generated by chunks from data source #{datasource_id} successfully."
-        )
+            deleted = _purge_in_batches(
+                self,
+                progress,
+                "documents",
+                document_repo.delete_by_datasource_in_batches(
+                    session, datasource_id, batch_size
+                ),
+            )
+            logger.info(
+                f"Deleted {deleted} documents from data source #{datasource_id} successfully."
+            )
 
-        graph_repo.delete_orphaned_entities(session)
-        logger.info("Deleted orphaned entities successfully.")
+            session.delete(datasource)
+            logger.info(f"Deleted data source #{datasource_id} successfully.")
 
-        chunk_repo.delete_by_datasource(session, datasource_id)
-        logger.info(f"Deleted chunks from data source #{datasource_id} successfully.")
+            session.commit()
 
-        document_repo.delete_by_datasource(session, datasource_id)
-        logger.info(
-            f"Deleted documents from data source #{datasource_id} successfully."
+        stats_for_knowledge_base.delay(kb_id)
+    except (KBNotFound, KBDataSourceNotFound):
+        logger.info(f"Data source #{datasource_id} is already purged")
+    except Exception as e:
+        logger.exception(
+            f"Failed to purge data source #{datasource_id}, retry later", exc_info=e
         )
-
-        session.delete(datasource)
-        logger.info(f"Deleted data source #{datasource_id} successfully.")
-
-        session.commit()
-
-    stats_for_knowledge_base.delay(kb_id)
+        raise self.retry(exc=e, countdown=60)
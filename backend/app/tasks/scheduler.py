@@ -0,0 +1,280 @@
+"""
+The scheduler of the indexing tasks.
+
+Instead of sending all the indexing tasks of a knowledge base to the broker at
+once, where a large upload makes the other knowledge bases wait behind it, the
+tasks are kept in a queue per knowledge base in Redis, and dispatched to Celery:
+
+- taking turns between the knowledge bases (round robin), so a small knowledge
+  base does not wait behind a large one;
+- the tasks of the interactive lane (e.g. re-index requests from the UI) before
+  the tasks of the bulk lane (e.g. data source imports), each lane with its own
+  Celery queue;
+- with at most `INDEXING_MAX_RUNNING_TASKS` running tasks, and a limit of
+  running tasks per LLM or embedding model, which is halved when a task hits a
+  rate limit (the task is queued again) and grows back with the successful
+  tasks (additive increase, multiplicative decrease).
+
+The tasks are dispatched when submitted and when a dispatched task finishes or
+hits a rate limit, a task not finished after `INDEXING_TASK_TIMEOUT` seconds is
+no longer counted.
+"""
+
+import enum
+import time
+import uuid
+from typing import Any, List, Optional
+
+import redis
+from celery.utils.log import get_task_logger
+from kombu.utils import json
+
+from app.celery import app as celery_app
+from app.core.config import settings
+from app.models import KnowledgeBase
+
+logger = get_task_logger(__name__)
+
+KEY_PREFIX = "indexing_scheduler"
+
+
+class IndexingLane(str, enum.Enum):
+    INTERACTIVE = "interactive"
+    BULK = "bulk"
+
+    @property
+    def queue(self) -> str:
+        return f"indexing_{self.value}"
+
+
+def get_kb_llm_provider_key(kb: KnowledgeBase) -> str:
+    if kb.llm is None:
+        return "llm:default"
+    return f"llm:{kb.llm.provider}:{kb.llm.model}"
+
+
+def get_kb_embedding_provider_key(kb: KnowledgeBase) -> str:
+    if kb.embedding_model is None:
+        return "embedding:default"
+    return f"embedding:{kb.embedding_model.provider}:{kb.embedding_model.model}"
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """Whether the error, or one of its causes, is a rate limit error of a provider (HTTP 429)."""
+    while error is not None:
+        if getattr(error, "status_code", None) == 429:
+            return True
+        if "RateLimit" in type(error).__name__:
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+def increase_limit(limit: float) -> float:
+    # Grows by ~1 after `limit` successful tasks.
+    return min(limit + 1 / limit, settings.INDEXING_PROVIDER_MAX_CONCURRENCY)
+
+
+def decrease_limit(limit: float) -> float:
+    return max(limit / 2, 1)
+
+
+class IndexingScheduler:
+    def __init__(self, redis_url: str):
+        self._redis_url = redis_url
+        self._client: Optional[redis.Redis] = None
+
+    @property
+    def client(self) -> redis.Redis:
+        if self._client is None:
+            self._client = redis.Redis.from_url(self._redis_url, decode_responses=True)
+        return self._client
+
+    @staticmethod
+    def _key(*parts: Any) -> str:
+        return ":".join([KEY_PREFIX, *(str(p) for p in parts)])
+
+    def submit(
+        self,
+        kb_id: int,
+        task_name: str,
+        args: List[Any],
+        provider: str,
+        lane: IndexingLane = IndexingLane.BULK,
+    ):
+        if not settings.ENABLE_INDEXING_SCHEDULER:
+            celery_app.send_task(task_name, args=args, queue=lane.queue)
+            return
+
+        payload = {
+            "kb_id": kb_id,
+            "task": task_name,
+            "args": args,
+            "provider": provider,
+            "lane": lane.value,
+        }
+        self._enqueue(payload)
+        self.dispatch()
+
+    def _enqueue(self, payload: dict, front: bool = False):
+        lane, kb_id = payload["lane"], payload["kb_id"]
+        pipe = self.client.pipeline()
+        if front:
+            pipe.lpush(self._key(lane, "kb", kb_id), json.dumps(payload))
+        else:
+            pipe.rpush(self._key(lane, "kb", kb_id), json.dumps(payload))
+        pipe.sadd(self._key(lane, "kbs"), kb_id)
+        added = pipe.execute()[1]
+        if added:
+            self.client.rpush(self._key(lane, "ring"), kb_id)
+
+    def dispatch(self):
+        """Dispatch the queued tasks until the limits are reached."""
+        # The tasks left by a concurrent dispatch are dispatched later.
+        pending = True
+        lock = self.client.lock(self._key("lock"), timeout=60, blocking_timeout=5)
+        if lock.acquire():
+            try:
+                self._remove_expired_tasks()
+                pending = False
+                for lane in IndexingLane:
+                    pending = self._dispatch_lane(lane) or pending
+            finally:
+                lock.release()
+
+        # Make sure the queued tasks are dispatched even if no task finishes.
+        if pending and self.client.set(
+            self._key("redispatch"), 1, nx=True, ex=settings.INDEXING_DISPATCH_INTERVAL
+        ):
+            dispatch_indexing_tasks.apply_async(
+                countdown=settings.INDEXING_DISPATCH_INTERVAL
+            )
+
+    def _dispatch_lane(self, lane: IndexingLane) -> bool:
+        """Returns whether tasks remain queued in the lane."""
+        ring = self._key(lane.value, "ring")
+        ring_size = self.client.llen(ring)
+        idle_turns = 0
+        while idle_turns < ring_size:
+            if self._running_count() >= settings.INDEXING_MAX_RUNNING_TASKS:
+                return True
+            kb_id = self.client.lmove(ring, ring, "LEFT", "RIGHT")
+            queue = self._key(lane.value, "kb", kb_id)
+            raw_payload = self.client.lindex(queue, 0)
+            if raw_payload is None:
+                self._remove_from_ring(lane, kb_id)
+                ring_size -= 1
+                continue
+
+            payload = json.loads(raw_payload)
+            provider = payload["provider"]
+            if self._running_count(provider) >= int(self._get_limit(provider)):
+                idle_turns += 1
+                continue
+
+            self.client.lpop(queue)
+            self._send(payload)
+            idle_turns = 0
+        return ring_size > 0
+
+    def _remove_from_ring(self, lane: IndexingLane, kb_id: str):
+        ring = self._key(lane.value, "ring")
+        self.client.lrem(ring, 1, kb_id)
+        self.client.srem(self._key(lane.value, "kbs"), kb_id)
+        # A task submitted meanwhile, whose knowledge base was still in the set,
+        # must not be left out of the ring.
+        if self.client.llen(
+            self._key(lane.value, "kb", kb_id)
+        ) > 0 and self.client.sadd(self._key(lane.value, "kbs"), kb_id):
+            self.client.rpush(ring, kb_id)
+
+    def _send(self, payload: dict):
+        task_id = str(uuid.uuid4())
+        deadline = time.time() + settings.INDEXING_TASK_TIMEOUT
+        pipe = self.client.pipeline()
+        pipe.zadd(self._key("running"), {task_id: deadline})
+        pipe.zadd(self._key("running", payload["provider"]), {task_id: deadline})
+        pipe.hset(self._key("tasks"), task_id, json.dumps(payload))
+        pipe.execute()
+        celery_app.send_task(
+            payload["task"],
+            args=payload["args"],
+            queue=IndexingLane(payload["lane"]).queue,
+            task_id=task_id,
+        )
+
+    def _running_count(self, provider: Optional[str] = None) -> int:
+        if provider is None:
+            return self.client.zcard(self._key("running"))
+        return self.client.zcard(self._key("running", provider))
+
+    def _remove_expired_tasks(self):
+        now = time.time()
+        for task_id in self.client.zrangebyscore(self._key("running"), "-inf", now):
+            self._remove_task(task_id)
+
+    def _remove_task(self, task_id: str) -> Optional[dict]:
+        raw_payload = self.client.hget(self._key("tasks"), task_id)
+        if raw_payload is None:
+            return None
+        payload = json.loads(raw_payload)
+        pipe = self.client.pipeline()
+        pipe.zrem(self._key("running"), task_id)
+        pipe.zrem(self._key("running", payload["provider"]), task_id)
+        pipe.hdel(self._key("tasks"), task_id)
+        pipe.execute()
+        return payload
+
+    def _get_limit(self, provider: str) -> float:
+        limit = self.client.get(self._key("limit", provider))
+        if limit is None:
+            return settings.INDEXING_PROVIDER_CONCURRENCY
+        return float(limit)
+
+    def _set_limit(self, provider: str, limit: float):
+        self.client.set(self._key("limit", provider), limit)
+
+    def report_rate_limited(self, task_id: str):
+        """
+        The task hit a rate limit of its provider: decrease the limit of the
+        provider and queue the task again.
+        """
+        payload = self._remove_task(task_id)
+        if payload is None:
+            return
+        provider = payload["provider"]
+        limit = decrease_limit(self._get_limit(provider))
+        self._set_limit(provider, limit)
+        logger.warning(
+            f"Indexing task {payload['task']} hit the rate limit of {provider}, "
+            f"decrease its concurrency limit to {int(limit)}."
+        )
+        self._enqueue(payload, front=True)
+        self.dispatch()
+
+    def report_finished(self, task_id: str):
+        payload = self._remove_task(task_id)
+        if payload is None:
+            return
+        provider = payload["provider"]
+        self._set_limit(provider, increase_limit(self._get_limit(provider)))
+        self.dispatch()
+
+
+indexing_scheduler = IndexingScheduler(settings.CELERY_BROKER_URL)
+
+
+@celery_app.task
+def dispatch_indexing_tasks():
+    indexing_scheduler.client.delete(indexing_scheduler._key("redispatch"))
+    indexing_scheduler.dispatch()
+
+
+# Connected to the postrun signal of the scheduled tasks, see `app.tasks.build_index`.
+def on_indexing_task_finished(task_id: str = None, **kwargs):
+    if not settings.ENABLE_INDEXING_SCHEDULER:
+        return
+    try:
+        indexing_scheduler.report_finished(task_id)
+    except redis.RedisError as e:
+        logger.warning(f"Failed to report the indexing task {task_id} finished: {e}")
@@ -0,0 +1,237 @@
+"""
+Built-in Prometheus metrics, they do not depend on any external tracing service.
+
+The API server exposes them on `/metrics`, Celery workers expose them on
+`CELERY_WORKER_METRICS_PORT` when it is set. When the server or the worker runs
+multiple processes, set the `PROMETHEUS_MULTIPROC_DIR` environment variable to
+an empty writable directory so that the metrics of all processes are collected.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Optional, Tuple
+
+from llama_index.core.instrumentation import get_dispatcher
+from llama_index.core.instrumentation.event_handlers import BaseEventHandler
+from llama_index.core.instrumentation.events import BaseEvent
+from llama_index.core.instrumentation.events.embedding import (
+    EmbeddingEndEvent,
+    EmbeddingStartEvent,
+)
+from llama_index.core.instrumentation.events.llm import (
+    LLMChatEndEvent,
+    LLMChatStartEvent,
+    LLMCompletionEndEvent,
+    LLMCompletionStartEvent,
+)
+from llama_index.core.instrumentation.events.rerank import (
+    ReRankEndEvent,
+    ReRankStartEvent,
+)
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Histogram,
+    generate_latest,
+    multiprocess,
+    start_http_server,
+)
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    120.0,
+)
+
+CHAT_STAGE_DURATION = Histogram(
+    "chat_stage_duration_seconds",
+    "Duration of the chat flow stages.",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+MODEL_CALL_DURATION = Histogram(
+    "model_call_duration_seconds",
+    "Duration of the embedding, LLM and reranker calls.",
+    ["kind", "model"],
+    buckets=LATENCY_BUCKETS,
+)
+RETRIEVER_SQL_DURATION = Histogram(
+    "retriever_sql_duration_seconds",
+    "Total time spent in SQL statements by one retrieval.",
+    ["retriever"],
+    buckets=LATENCY_BUCKETS,
+)
+
+
+@contextmanager
+def observe_stage(stage: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        CHAT_STAGE_DURATION.labels(stage).observe(time.perf_counter() - start)
+
+
+# SQL time per retriever.
+
+
+class _SQLTimer:
+    def __init__(self):
+        self.total = 0.0
+
+
+_current_sql_timer: ContextVar[Optional[_SQLTimer]] = ContextVar(
+    "current_sql_timer", default=None
+)
+
+
+@contextmanager
+def track_sql_time(retriever: str):
+    """
+    Sum up the time of the SQL statements executed inside the block and observe
+    it once under the retriever label.
+    """
+    timer = _SQLTimer()
+    token = _current_sql_timer.set(timer)
+    try:
+        yield
+    finally:
+        _current_sql_timer.reset(token)
+        RETRIEVER_SQL_DURATION.labels(retriever).observe(timer.total)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_sql_timer.get() is not None:
+        conn.info.setdefault("metrics_query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    timer = _current_sql_timer.get()
+    start_times = conn.info.get("metrics_query_start_time")
+    if timer is not None and start_times:
+        timer.total += time.perf_counter() - start_times.pop()
+
+
+# Embedding, LLM and reranker calls.
+
+_START_EVENTS = {
+    EmbeddingStartEvent: "embedding",
+    LLMChatStartEvent: "llm",
+    LLMCompletionStartEvent: "llm",
+    ReRankStartEvent: "reranker",
+}
+_END_EVENTS = {
+    EmbeddingEndEvent: "embedding",
+    LLMChatEndEvent: "llm",
+    LLMCompletionEndEvent: "llm",
+    ReRankEndEvent: "reranker",
+}
+_MAX_PENDING_CALLS = 10000
+_pending_calls: OrderedDict[Tuple[str, str], Tuple[float, str]] = OrderedDict()
+_pending_calls_mutex = threading.Lock()
+
+
+def _get_model_name(e: BaseEvent) -> str:
+    if isinstance(e, ReRankStartEvent):
+        return e.model_name or "unknown"
+    model_dict = getattr(e, "model_dict", None) or {}
+    return str(
+        model_dict.get("model")
+        or model_dict.get("model_name")
+        or model_dict.get("class_name")
+        or "unknown"
+    )
+
+
+class ModelCallMetricsHandler(BaseEventHandler):
+    """
+    Observes the duration between the start and end events of the embedding,
+    LLM and reranker calls, which share the span id of the call.
+    """
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "ModelCallMetricsHandler"
+
+    def handle(self, event: BaseEvent, **kwargs: Any) -> Any:
+        start_kind = _START_EVENTS.get(type(event))
+        if start_kind is not None:
+            key = (event.span_id, start_kind)
+            with _pending_calls_mutex:
+                _pending_calls[key] = (time.perf_counter(), _get_model_name(event))
+                # Calls that failed never emit an end event, drop the oldest ones.
+                while len(_pending_calls) > _MAX_PENDING_CALLS:
+                    _pending_calls.popitem(last=False)
+            return
+
+        end_kind = _END_EVENTS.get(type(event))
+        if end_kind is not None:
+            with _pending_calls_mutex:
+                pending: Optional[Tuple[float, str]] = _pending_calls.pop(
+                    (event.span_id, end_kind), None
+                )
+            if pending is not None:
+                start, model = pending
+                MODEL_CALL_DURATION.labels(end_kind, model).observe(
+                    time.perf_counter() - start
+                )
+
+
+_setup_lock = threading.Lock()
+_is_setup = False
+
+
+def setup_metrics():
+    """Register the SQL and model call instrumentation, it's safe to call it twice."""
+    global _is_setup
+    from app.core.db import engine
+
+    with _setup_lock:
+        if _is_setup:
+            return
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        get_dispatcher().add_event_handler(ModelCallMetricsHandler())
+        _is_setup = True
+
+
+def _get_registry() -> CollectorRegistry:
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def generate_metrics() -> Tuple[bytes, str]:
+    return generate_latest(_get_registry()), CONTENT_TYPE_LATEST
+
+
+def start_metrics_server(port: int):
+    try:
+        start_http_server(port, registry=_get_registry())
+        logger.info(f"Serving metrics on port {port}")
+    except OSError as e:
+        # Another worker sharing the same multiprocess directory may already
+        # serve the metrics on this port.
+        logger.warning(f"Failed to serve metrics on port {port}: {e}")
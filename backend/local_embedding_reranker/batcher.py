@@ -0,0 +1,184 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    """Raised when a batcher cannot accept more pending items."""
+
+
+class BatcherClosedError(Exception):
+    """Raised when submitting to a batcher closed after its model was evicted."""
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent requests against one model into a single inference call.
+
+    Each request submits a list of items (sentences, or query/passage pairs). The
+    worker waits at most `max_wait_ms` after the first pending request for more
+    requests to arrive, then runs `fn` on the concatenated items of up to
+    `max_batch_size` items and splits the outputs back per request. Requests are
+    never split, so a single request larger than `max_batch_size` runs alone.
+
+    Inference runs on a dedicated single-threaded executor, so one model only
+    runs one batch at a time while the event loop keeps accepting requests.
+
+    The batcher is not thread-safe, all its methods must be called on the event
+    loop.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fn: Callable[[list], Sequence],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5,
+        max_queue_size: int = 1024,
+    ):
+        self.name = name
+        self._fn = fn
+        self._max_batch_size = max_batch_size
+        self._max_wait = max_wait_ms / 1000
+        self._max_queue_size = max_queue_size
+        self._pending: list[tuple[list, asyncio.Future]] = []
+        self._pending_items = 0
+        self._has_pending: Optional[asyncio.Event] = None
+        self._batch_full: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._closed = False
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix=f"batcher-{name}"
+        )
+
+    @property
+    def pending_items(self) -> int:
+        return self._pending_items
+
+    def _ensure_worker(self):
+        if self._worker is None or self._worker.done():
+            self._has_pending = asyncio.Event()
+            self._batch_full = asyncio.Event()
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def submit(self, items: list) -> list:
+        if self._closed:
+            raise BatcherClosedError(f"Batcher {self.name} is closed")
+        if not items:
+            return []
+        if self._pending_items + len(items) > self._max_queue_size:
+            raise QueueFullError(
+                f"Batcher {self.name} has {self._pending_items} pending items, "
+                f"cannot accept {len(items)} more (max: {self._max_queue_size})"
+            )
+
+        self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((items, future))
+        self._pending_items += len(items)
+        self._has_pending.set()
+        if self._pending_items >= self._max_batch_size:
+            self._batch_full.set()
+        return await future
+
+    def _take_batch(self) -> list[tuple[list, asyncio.Future]]:
+        batch = []
+        batch_size = 0
+        while self._pending:
+            items, future = self._pending[0]
+            if batch and batch_size + len(items) > self._max_batch_size:
+                break
+            self._pending.pop(0)
+            self._pending_items -= len(items)
+            if future.cancelled():
+                continue
+            batch.append((items, future))
+            batch_size += len(items)
+        if not self._pending:
+            self._has_pending.clear()
+        if self._pending_items < self._max_batch_size:
+            self._batch_full.clear()
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while not (self._closed and not self._pending):
+            await self._has_pending.wait()
+
+            # Give concurrent requests a short window to join the batch, no more
+            # requests join a closed batcher.
+            if not self._closed:
+                try:
+                    await asyncio.wait_for(self._batch_full.wait(), self._max_wait)
+                except asyncio.TimeoutError:
+                    pass
+
+            batch = self._take_batch()
+            if not batch:
+                continue
+
+            flat_items = [item for items, _ in batch for item in items]
+            try:
+                outputs = await loop.run_in_executor(
+                    self._executor, self._fn, flat_items
+                )
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            offset = 0
+            for items, future in batch:
+                if not future.done():
+                    future.set_result(outputs[offset : offset + len(items)])
+                offset += len(items)
+
+        self._executor.shutdown(wait=False)
+
+    def close(self):
+        """
+        Stop accepting requests. The pending requests still run, then the worker
+        exits and releases the executor.
+        """
+        self._closed = True
+        if self._worker is None or self._worker.done():
+            self._executor.shutdown(wait=False)
+        else:
+            # Wake the worker up to drain the pending requests and exit.
+            self._has_pending.set()
+
+
+class LRUDict(OrderedDict):
+    """
+    A bounded dict that evicts the least recently used entry, calling
+    `on_evict(key, value)` for every evicted entry.
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        on_evict: Optional[Callable[[str, Any], None]] = None,
+    ):
+        super().__init__()
+        self.max_size = max_size
+        self.on_evict = on_evict
+
+    def get(self, key, default=None):
+        if key not in self:
+            return default
+        self.move_to_end(key)
+        return super().__getitem__(key)
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        while len(self) > self.max_size:
+            evicted_key, evicted_value = self.popitem(last=False)
+            logger.info(f"Evicting model {evicted_key} from the model pool")
+            if self.on_evict is not None:
+                self.on_evict(evicted_key, evicted_value)
@@ -0,0 +1,117 @@
+"""
+Benchmark QPS and latency of the local embedding / reranker server.
+
+Usage:
+
+    python benchmark.py --target embedding --concurrency 1,4,16,64 --requests 512
+    python benchmark.py --target reranker --passages 10 --concurrency 1,8,32
+
+Compare runs with different `EMBEDDING_MAX_BATCH_SIZE`, `MAX_BATCH_WAIT_MS` and
+`TORCH_NUM_THREADS` settings to tune the server for the CPU it runs on.
+"""
+
+import argparse
+import json
+import random
+import statistics
+import string
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+def random_sentence(num_words: int) -> str:
+    return " ".join(
+        "".join(random.choices(string.ascii_lowercase, k=random.randint(3, 9)))
+        for _ in range(num_words)
+    )
+
+
+def build_payload(args) -> dict:
+    if args.target == "embedding":
+        payload = {
+            "sentences": [random_sentence(args.words) for _ in range(args.sentences)]
+        }
+    else:
+        payload = {
+            "query": random_sentence(8),
+            "passages": [random_sentence(args.words) for _ in range(args.passages)],
+        }
+    if args.model:
+        payload["model"] = args.model
+    return payload
+
+
+def send_request(url: str, payload: dict) -> tuple[float, bool]:
+    data = json.dumps(payload).encode("utf-8")
+    req = urllib.request.Request(
+        url, data=data, headers={"Content-Type": "application/json"}
+    )
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=300) as resp:
+            resp.read()
+        ok = True
+    except urllib.error.HTTPError:
+        ok = False
+    return time.perf_counter() - start, ok
+
+
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(int(round(p / 100 * (len(values) - 1))), len(values) - 1)
+    return values[index]
+
+
+def run(args, concurrency: int):
+    url = f"{args.base_url.rstrip('/')}/api/v1/{args.target}"
+    payloads = [build_payload(args) for _ in range(args.requests)]
+
+    # Warm up the model so loading time is not measured.
+    send_request(url, payloads[0])
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(lambda p: send_request(url, p), payloads))
+    elapsed = time.perf_counter() - start
+
+    latencies = [latency for latency, ok in results if ok]
+    errors = sum(1 for _, ok in results if not ok)
+    print(
+        f"concurrency={concurrency:<4} "
+        f"qps={len(latencies) / elapsed:8.2f} "
+        f"p50={percentile(latencies, 50) * 1000:8.1f}ms "
+        f"p95={percentile(latencies, 95) * 1000:8.1f}ms "
+        f"p99={percentile(latencies, 99) * 1000:8.1f}ms "
+        f"mean={statistics.fmean(latencies) * 1000 if latencies else 0:8.1f}ms "
+        f"errors={errors}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--base-url", default="http://127.0.0.1:5001")
+    parser.add_argument(
+        "--target", choices=["embedding", "reranker"], default="embedding"
+    )
+    parser.add_argument("--model", default=None)
+    parser.add_argument("--concurrency", default="1,4,16,64")
+    parser.add_argument("--requests", type=int, default=256)
+    parser.add_argument(
+        "--sentences", type=int, default=1, help="Sentences per embedding request"
+    )
+    parser.add_argument(
+        "--passages", type=int, default=10, help="Passages per reranker request"
+    )
+    parser.add_argument("--words", type=int, default=32, help="Words per sentence")
+    args = parser.parse_args()
+
+    for concurrency in [int(c) for c in args.concurrency.split(",")]:
+        run(args, concurrency)
+
+
+if __name__ == "__main__":
+    main()
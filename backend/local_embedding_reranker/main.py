@@ -1,11 +1,21 @@
+import asyncio
 import logging
+import threading
+from typing import Any, Callable, NamedTuple, Optional
+
+import numpy as np
+import torch
 import uvicorn
 from pydantic import BaseModel
-from fastapi import FastAPI, APIRouter
+from fastapi import FastAPI, APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from sentence_transformers import SentenceTransformer, CrossEncoder
 from contextlib import asynccontextmanager
 from environs import Env
 
+from batcher import BatcherClosedError, LRUDict, MicroBatcher, QueueFullError
+from onnx_backend import ONNXEmbeddingModel, ONNXRerankerModel
+
 env = Env()
 env.read_env()
 
@@ -26,6 +36,37 @@ DEFAULT_EMBEDDING_MODEL = env.str("DEFAULT_EMBEDDING_MODEL", default="BAAI/bge-m
 DEFAULT_RERANKER_MODEL = env.str(
     "DEFAULT_RERANKER_MODEL", default="BAAI/bge-reranker-v2-m3"
 )
+
+# Dynamic batching: concurrent requests to the same model are coalesced into
+# one inference call of at most MAX_BATCH_SIZE items, waiting at most
+# MAX_BATCH_WAIT_MS for the batch to fill up.
+EMBEDDING_MAX_BATCH_SIZE = env.int("EMBEDDING_MAX_BATCH_SIZE", default=32)
+RERANKER_MAX_BATCH_SIZE = env.int("RERANKER_MAX_BATCH_SIZE", default=64)
+MAX_BATCH_WAIT_MS = env.float("MAX_BATCH_WAIT_MS", default=5)
+# Backpressure: requests are rejected with 503 once this many items are queued
+# for a single model.
+MAX_QUEUE_SIZE = env.int("MAX_QUEUE_SIZE", default=2048)
+# Warm pool: the number of models of each kind kept loaded in memory.
+MAX_LOADED_MODELS = env.int("MAX_LOADED_MODELS", default=2)
+# CPU tuning: 0 keeps the torch defaults.
+TORCH_NUM_THREADS = env.int("TORCH_NUM_THREADS", default=0)
+TORCH_NUM_INTEROP_THREADS = env.int("TORCH_NUM_INTEROP_THREADS", default=0)
+
+# Inference backend: "torch" runs the models with PyTorch, "onnx" exports them
+# to ONNX (optionally int8-quantized) and runs them with onnxruntime.
+INFERENCE_BACKEND = env.str(
+    "INFERENCE_BACKEND",
+    default="torch",
+    validate=lambda v: v in ("torch", "onnx"),
+)
+ONNX_QUANTIZE = env.bool("ONNX_QUANTIZE", default=False)
+ONNX_CACHE_DIR = env.str("ONNX_CACHE_DIR", default="~/.cache/onnx_models")
+
+if TORCH_NUM_THREADS > 0:
+    torch.set_num_threads(TORCH_NUM_THREADS)
+if TORCH_NUM_INTEROP_THREADS > 0:
+    torch.set_num_interop_threads(TORCH_NUM_INTEROP_THREADS)
+
 router = APIRouter()
 
 
@@ -34,33 +75,125 @@ def healthz():
     return "OK"
 
 
-EMBEDDING_MODEL_DICT: dict[str, SentenceTransformer] = {}
-RERANKER_MODEL_DICT: dict[str, CrossEncoder] = {}
+class LoadedModel(NamedTuple):
+    """A model of the pool with its batcher, evicted together."""
+
+    model: Any
+    batcher: MicroBatcher
+
+
+# The event loop of the server, the batchers of the evicted models are closed on
+# it as the models are loaded (and evicted) in the threadpool.
+_event_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _close_evicted_model(_model_name: str, loaded_model: LoadedModel):
+    if _event_loop is None:
+        loaded_model.batcher.close()
+    else:
+        _event_loop.call_soon_threadsafe(loaded_model.batcher.close)
+
+
+EMBEDDING_MODEL_DICT: LRUDict = LRUDict(
+    max_size=MAX_LOADED_MODELS, on_evict=_close_evicted_model
+)
+RERANKER_MODEL_DICT: LRUDict = LRUDict(
+    max_size=MAX_LOADED_MODELS, on_evict=_close_evicted_model
+)
+_model_load_lock = threading.Lock()
 
 
-def get_embedding_model(model_name: str) -> SentenceTransformer:
-    global EMBEDDING_MODEL_DICT
-    embed_model = EMBEDDING_MODEL_DICT.get(model_name)
-    if not embed_model:
+def _load_embedding_model(model_name: str) -> LoadedModel:
+    if INFERENCE_BACKEND == "onnx":
+        embed_model = ONNXEmbeddingModel(
+            model_name=model_name,
+            cache_dir=ONNX_CACHE_DIR,
+            quantize=ONNX_QUANTIZE,
+            num_threads=TORCH_NUM_THREADS,
+        )
+    else:
         embed_model = SentenceTransformer(
             model_name_or_path=model_name,
             trust_remote_code=True,
         )
-        EMBEDDING_MODEL_DICT[model_name] = embed_model
-    return embed_model
+    batcher = MicroBatcher(
+        name=f"embedding:{model_name}",
+        # Normalization is applied per request after the batch returns.
+        fn=lambda sentences: embed_model.encode(
+            sentences=sentences,
+            batch_size=EMBEDDING_MAX_BATCH_SIZE,
+            normalize_embeddings=False,
+        ),
+        max_batch_size=EMBEDDING_MAX_BATCH_SIZE,
+        max_wait_ms=MAX_BATCH_WAIT_MS,
+        max_queue_size=MAX_QUEUE_SIZE,
+    )
+    return LoadedModel(embed_model, batcher)
 
 
-def get_reranker_model(model_name: str) -> CrossEncoder:
-    global RERANKER_MODEL_DICT
-    reranker_model = RERANKER_MODEL_DICT.get(model_name)
-    if not reranker_model:
+def _load_reranker_model(model_name: str) -> LoadedModel:
+    if INFERENCE_BACKEND == "onnx":
+        reranker_model = ONNXRerankerModel(
+            model_name=model_name,
+            cache_dir=ONNX_CACHE_DIR,
+            quantize=ONNX_QUANTIZE,
+            num_threads=TORCH_NUM_THREADS,
+        )
+    else:
         reranker_model = CrossEncoder(
             model_name=model_name,
             automodel_args={"torch_dtype": "auto"},
             trust_remote_code=True,
         )
-        RERANKER_MODEL_DICT[model_name] = reranker_model
-    return reranker_model
+    batcher = MicroBatcher(
+        name=f"reranker:{model_name}",
+        fn=lambda sentence_pairs: reranker_model.predict(
+            sentence_pairs,
+            batch_size=RERANKER_MAX_BATCH_SIZE,
+            convert_to_numpy=True,
+        ),
+        max_batch_size=RERANKER_MAX_BATCH_SIZE,
+        max_wait_ms=MAX_BATCH_WAIT_MS,
+        max_queue_size=MAX_QUEUE_SIZE,
+    )
+    return LoadedModel(reranker_model, batcher)
+
+
+def get_embedding_model(model_name: str) -> LoadedModel:
+    with _model_load_lock:
+        loaded_model = EMBEDDING_MODEL_DICT.get(model_name)
+        if loaded_model is None:
+            loaded_model = _load_embedding_model(model_name)
+            EMBEDDING_MODEL_DICT[model_name] = loaded_model
+        return loaded_model
+
+
+def get_reranker_model(model_name: str) -> LoadedModel:
+    with _model_load_lock:
+        loaded_model = RERANKER_MODEL_DICT.get(model_name)
+        if loaded_model is None:
+            loaded_model = _load_reranker_model(model_name)
+            RERANKER_MODEL_DICT[model_name] = loaded_model
+        return loaded_model
+
+
+async def submit_to_model(
+    get_model: Callable[[str], LoadedModel], model_name: str, items: list
+) -> list:
+    while True:
+        loaded_model = await run_in_threadpool(get_model, model_name)
+        try:
+            return await loaded_model.batcher.submit(items)
+        except BatcherClosedError:
+            # The model was evicted meanwhile, load it again.
+            continue
+        except QueueFullError as e:
+            logger.warning(str(e))
+            raise HTTPException(
+                status_code=503,
+                detail="Server is busy, please retry later.",
+                headers={"Retry-After": "1"},
+            )
 
 
 class EmbeddingRequest(BaseModel):
@@ -75,12 +208,13 @@ class EmbeddingResponse(BaseModel):
 
 
 @router.post("/embedding")
-def get_texts_embedding(request: EmbeddingRequest) -> EmbeddingResponse:
-    embed_model = get_embedding_model(model_name=request.model)
-    embeddings = embed_model.encode(
-        sentences=request.sentences,
-        normalize_embeddings=request.normalize_embeddings,
+async def get_texts_embedding(request: EmbeddingRequest) -> EmbeddingResponse:
+    embeddings = np.asarray(
+        await submit_to_model(get_embedding_model, request.model, request.sentences)
     )
+    if request.normalize_embeddings and len(embeddings) > 0:
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        embeddings = embeddings / np.clip(norms, 1e-12, None)
     return EmbeddingResponse(
         model=request.model,
         embeddings=embeddings.tolist(),
@@ -99,15 +233,16 @@ class RerankerResponse(BaseModel):
 
 
 @router.post("/reranker")
-def reranker_texts(request: RerankerRequest) -> RerankerResponse:
-    reranker_model = get_reranker_model(request.model)
+async def reranker_texts(request: RerankerRequest) -> RerankerResponse:
     sentence_pairs = [(request.query, p) for p in request.passages]
-    scores = reranker_model.predict(sentence_pairs, convert_to_tensor=True)
-    return RerankerResponse(model=request.model, scores=scores.tolist())
+    scores = await submit_to_model(get_reranker_model, request.model, sentence_pairs)
+    return RerankerResponse(model=request.model, scores=np.asarray(scores).tolist())
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    global _event_loop
+    _event_loop = asyncio.get_running_loop()
     if PRE_LOAD_DEFAULT_EMBEDDING_MODEL:
         logger.info(f"Loading default embedding model: {DEFAULT_EMBEDDING_MODEL}")
         get_embedding_model(DEFAULT_EMBEDDING_MODEL)
@@ -117,6 +252,11 @@ async def lifespan(app: FastAPI):
         get_reranker_model(DEFAULT_RERANKER_MODEL)
         logger.info("Default reranker model loaded")
     yield
+    for loaded_model in [
+        *EMBEDDING_MODEL_DICT.values(),
+        *RERANKER_MODEL_DICT.values(),
+    ]:
+        loaded_model.batcher.close()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -0,0 +1,240 @@
+"""
+ONNX Runtime inference backend for the local embedding / reranker server.
+
+Models are exported to ONNX with optimum on first use (optionally dynamically
+quantized to int8) and cached on disk, so later starts only load the cached
+files. The wrappers expose the subset of the `SentenceTransformer.encode` and
+`CrossEncoder.predict` interfaces used by `main.py`, so the HTTP contract does
+not change with the backend.
+
+Requires the extra dependencies in `requirements-onnx.txt`.
+"""
+
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FP32_MODEL_FILE = "model.onnx"
+INT8_MODEL_FILE = "model_quantized.onnx"
+
+
+def _check_dependencies():
+    try:
+        import onnxruntime  # noqa: F401
+        import optimum.onnxruntime  # noqa: F401
+    except ImportError as e:
+        raise ImportError(
+            "The onnx inference backend requires optimum and onnxruntime, "
+            "please install them with `pip install -r requirements-onnx.txt`"
+        ) from e
+
+
+def _session_options(num_threads: int):
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if num_threads > 0:
+        options.intra_op_num_threads = num_threads
+    return options
+
+
+def _model_cache_dir(cache_dir: str, model_name: str, quantize: bool) -> Path:
+    variant = "int8" if quantize else "fp32"
+    return Path(cache_dir).expanduser() / model_name.replace("/", "--") / variant
+
+
+def _export_model(model_cls, model_name: str, cache_dir: str, quantize: bool) -> Path:
+    from optimum.onnxruntime import ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    from transformers import AutoTokenizer
+
+    fp32_dir = _model_cache_dir(cache_dir, model_name, quantize=False)
+    if not (fp32_dir / FP32_MODEL_FILE).exists():
+        logger.info(f"Exporting {model_name} to ONNX: {fp32_dir}")
+        model = model_cls.from_pretrained(
+            model_name, export=True, trust_remote_code=True
+        )
+        model.save_pretrained(fp32_dir)
+        AutoTokenizer.from_pretrained(model_name).save_pretrained(fp32_dir)
+
+    if not quantize:
+        return fp32_dir
+
+    int8_dir = _model_cache_dir(cache_dir, model_name, quantize=True)
+    if not (int8_dir / INT8_MODEL_FILE).exists():
+        logger.info(f"Quantizing {model_name} to int8: {int8_dir}")
+        quantizer = ORTQuantizer.from_pretrained(fp32_dir, file_name=FP32_MODEL_FILE)
+        qconfig = AutoQuantizationConfig.avx2(is_static=False, per_channel=False)
+        quantizer.quantize(
+            save_dir=int8_dir,
+            quantization_config=qconfig,
+            use_external_data_format=True,
+        )
+        AutoTokenizer.from_pretrained(fp32_dir).save_pretrained(int8_dir)
+    return int8_dir
+
+
+def _load_model(
+    model_cls, model_name: str, cache_dir: str, quantize: bool, num_threads: int
+):
+    from transformers import AutoTokenizer
+
+    model_dir = _export_model(model_cls, model_name, cache_dir, quantize)
+    model = model_cls.from_pretrained(
+        model_dir,
+        file_name=INT8_MODEL_FILE if quantize else FP32_MODEL_FILE,
+        session_options=_session_options(num_threads),
+        provider="CPUExecutionProvider",
+    )
+    tokenizer = AutoTokenizer.from_pretrained(model_dir)
+    return model, tokenizer
+
+
+def _read_sentence_transformers_config(model_name: str) -> tuple[str, Optional[int]]:
+    """
+    Returns the pooling mode and the max sequence length that sentence-transformers
+    would use for the model, so the ONNX outputs match the PyTorch ones.
+    """
+    from huggingface_hub import snapshot_download
+
+    if os.path.isdir(model_name):
+        model_path = Path(model_name)
+    else:
+        model_path = Path(
+            snapshot_download(model_name, allow_patterns=["*.json", "*/*.json"])
+        )
+
+    max_seq_length = None
+    st_config_path = model_path / "sentence_bert_config.json"
+    if st_config_path.exists():
+        max_seq_length = json.loads(st_config_path.read_text()).get("max_seq_length")
+
+    pooling_mode = "mean"
+    modules_path = model_path / "modules.json"
+    if modules_path.exists():
+        for module in json.loads(modules_path.read_text()):
+            if not module["type"].endswith("Pooling"):
+                continue
+            pooling_config_path = model_path / module["path"] / "config.json"
+            if not pooling_config_path.exists():
+                continue
+            pooling_config = json.loads(pooling_config_path.read_text())
+            if pooling_config.get("pooling_mode_cls_token"):
+                pooling_mode = "cls"
+            elif pooling_config.get("pooling_mode_lasttoken"):
+                pooling_mode = "lasttoken"
+    return pooling_mode, max_seq_length
+
+
+class ONNXEmbeddingModel:
+    def __init__(
+        self,
+        model_name: str,
+        cache_dir: str,
+        quantize: bool = False,
+        num_threads: int = 0,
+    ):
+        _check_dependencies()
+        from optimum.onnxruntime import ORTModelForFeatureExtraction
+
+        self.model_name = model_name
+        self.model, self.tokenizer = _load_model(
+            ORTModelForFeatureExtraction, model_name, cache_dir, quantize, num_threads
+        )
+        self.pooling_mode, self.max_seq_length = _read_sentence_transformers_config(
+            model_name
+        )
+
+    def _pool(self, hidden_states: np.ndarray, attention_mask: np.ndarray):
+        if self.pooling_mode == "cls":
+            return hidden_states[:, 0]
+        if self.pooling_mode == "lasttoken":
+            last_indexes = attention_mask.sum(axis=1) - 1
+            return hidden_states[np.arange(len(hidden_states)), last_indexes]
+        mask = attention_mask[..., None].astype(hidden_states.dtype)
+        return (hidden_states * mask).sum(axis=1) / np.clip(
+            mask.sum(axis=1), 1e-9, None
+        )
+
+    def encode(
+        self,
+        sentences: list[str],
+        batch_size: int = 32,
+        normalize_embeddings: bool = False,
+    ) -> np.ndarray:
+        results = []
+        for start in range(0, len(sentences), batch_size):
+            inputs = self.tokenizer(
+                sentences[start : start + batch_size],
+                padding=True,
+                truncation=True,
+                max_length=self.max_seq_length,
+                return_tensors="np",
+            )
+            outputs = self.model(**inputs)
+            embeddings = self._pool(outputs.last_hidden_state, inputs["attention_mask"])
+            if normalize_embeddings:
+                norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+                embeddings = embeddings / np.clip(norms, 1e-12, None)
+            results.append(embeddings.astype(np.float32))
+        if not results:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.concatenate(results)
+
+
+class ONNXRerankerModel:
+    def __init__(
+        self,
+        model_name: str,
+        cache_dir: str,
+        quantize: bool = False,
+        num_threads: int = 0,
+        max_length: Optional[int] = None,
+    ):
+        _check_dependencies()
+        from optimum.onnxruntime import ORTModelForSequenceClassification
+
+        self.model_name = model_name
+        self.model, self.tokenizer = _load_model(
+            ORTModelForSequenceClassification,
+            model_name,
+            cache_dir,
+            quantize,
+            num_threads,
+        )
+        self.max_length = max_length
+
+    def predict(
+        self,
+        sentence_pairs: list[tuple[str, str]],
+        batch_size: int = 32,
+        convert_to_numpy: bool = True,
+    ) -> np.ndarray:
+        results = []
+        for start in range(0, len(sentence_pairs), batch_size):
+            batch = sentence_pairs[start : start + batch_size]
+            inputs = self.tokenizer(
+                [query for query, _ in batch],
+                [passage for _, passage in batch],
+                padding=True,
+                truncation="longest_first",
+                max_length=self.max_length,
+                return_tensors="np",
+            )
+            logits = self.model(**inputs).logits
+            # Same as CrossEncoder: single-label models are activated by sigmoid.
+            if logits.shape[1] == 1:
+                scores = 1 / (1 + np.exp(-logits[:, 0]))
+            else:
+                scores = logits
+            results.append(scores.astype(np.float32))
+        if not results:
+            return np.zeros((0,), dtype=np.float32)
+        return np.concatenate(results)
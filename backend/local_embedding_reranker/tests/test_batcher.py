@@ -0,0 +1,48 @@
+import asyncio
+
+import pytest
+
+from batcher import BatcherClosedError, LRUDict, MicroBatcher
+
+
+def test_batches_concurrent_requests():
+    batches = []
+
+    def fn(items):
+        batches.append(list(items))
+        return [item * 2 for item in items]
+
+    async def run():
+        batcher = MicroBatcher("test", fn, max_batch_size=4, max_wait_ms=50)
+        results = await asyncio.gather(
+            batcher.submit([1, 2]), batcher.submit([3]), batcher.submit([4, 5])
+        )
+        batcher.close()
+        return results
+
+    assert asyncio.run(run()) == [[2, 4], [6], [8, 10]]
+    assert batches == [[1, 2, 3], [4, 5]]
+
+
+def test_close_drains_pending_requests():
+    async def run():
+        batcher = MicroBatcher("test", lambda items: items, max_wait_ms=50)
+        pending = asyncio.ensure_future(batcher.submit([1, 2]))
+        await asyncio.sleep(0)
+        batcher.close()
+        with pytest.raises(BatcherClosedError):
+            await batcher.submit([3])
+        return await pending
+
+    assert asyncio.run(run()) == [1, 2]
+
+
+def test_lru_dict_evicts_least_recently_used():
+    evicted = []
+    models = LRUDict(max_size=2, on_evict=lambda key, _: evicted.append(key))
+    models["a"] = 1
+    models["b"] = 2
+    models.get("a")
+    models["c"] = 3
+    assert evicted == ["b"]
+    assert list(models) == ["a", "c"]
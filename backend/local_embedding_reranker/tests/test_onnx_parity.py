@@ -0,0 +1,74 @@
+"""
+Checks that the onnx inference backend produces the same outputs as PyTorch.
+
+Run from the `local_embedding_reranker` directory with the onnx dependencies
+installed:
+
+    pip install -r requirements-onnx.txt pytest
+    python -m pytest tests/test_onnx_parity.py
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip("onnxruntime")
+pytest.importorskip("optimum.onnxruntime")
+sentence_transformers = pytest.importorskip("sentence_transformers")
+
+from onnx_backend import ONNXEmbeddingModel, ONNXRerankerModel  # noqa: E402
+
+EMBEDDING_MODEL = os.getenv("PARITY_EMBEDDING_MODEL", "BAAI/bge-m3")
+RERANKER_MODEL = os.getenv("PARITY_RERANKER_MODEL", "BAAI/bge-reranker-v2-m3")
+
+SENTENCES = [
+    "TiDB is an open-source distributed SQL database.",
+    "TiKV is a distributed transactional key-value database.",
+    "TiFlash is the columnar storage extension of TiDB.",
+    "天气很好，适合出去散步。",
+]
+QUERY = "What is TiDB?"
+
+
+def cosine_similarity(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return (a * b).sum(axis=1)
+
+
+@pytest.mark.parametrize("quantize,min_similarity", [(False, 0.999), (True, 0.97)])
+def test_embedding_parity(tmp_path_factory, quantize, min_similarity):
+    cache_dir = str(tmp_path_factory.getbasetemp() / "onnx_models")
+    torch_model = sentence_transformers.SentenceTransformer(
+        EMBEDDING_MODEL, trust_remote_code=True
+    )
+    onnx_model = ONNXEmbeddingModel(
+        EMBEDDING_MODEL, cache_dir=cache_dir, quantize=quantize
+    )
+
+    expected = torch_model.encode(SENTENCES, normalize_embeddings=True)
+    actual = onnx_model.encode(SENTENCES, normalize_embeddings=True)
+
+    assert actual.shape == expected.shape
+    assert cosine_similarity(actual, expected).min() >= min_similarity
+
+
+@pytest.mark.parametrize("quantize,tolerance", [(False, 1e-3), (True, 5e-2)])
+def test_reranker_parity(tmp_path_factory, quantize, tolerance):
+    cache_dir = str(tmp_path_factory.getbasetemp() / "onnx_models")
+    torch_model = sentence_transformers.CrossEncoder(
+        RERANKER_MODEL, trust_remote_code=True
+    )
+    onnx_model = ONNXRerankerModel(
+        RERANKER_MODEL, cache_dir=cache_dir, quantize=quantize
+    )
+    pairs = [(QUERY, passage) for passage in SENTENCES]
+
+    expected = torch_model.predict(pairs, convert_to_numpy=True)
+    actual = onnx_model.predict(pairs)
+
+    assert actual.shape == expected.shape
+    assert np.abs(actual - expected).max() <= tolerance
+    # The ranking must be preserved, it's what the reranker is used for.
+    assert list(np.argsort(-actual)) == list(np.argsort(-expected))
@@ -0,0 +1,95 @@
+from uuid import UUID
+
+from sqlalchemy import Column, Integer, MetaData, Table, create_engine, insert
+from sqlmodel import Session, select
+
+from app.models import Document
+from app.models.chunk import get_dynamic_chunk_model
+from app.models.entity import get_dynamic_entity_model
+from app.models.relationship import get_dynamic_relationship_model
+from app.repositories import document_repo
+from app.repositories.chunk import ChunkRepo
+from app.repositories.graph import GraphRepo
+
+
+def test_delete_data_source_in_batches():
+    entity_model = get_dynamic_entity_model(4, "purge_test")
+    relationship_model = get_dynamic_relationship_model(4, "purge_test", entity_model)
+    chunk_model = get_dynamic_chunk_model(4, "purge_test")
+    engine = create_engine("sqlite://")
+    for model in (chunk_model, entity_model, relationship_model):
+        model.__table__.create(engine)
+    # Only the columns of the documents used by the deletes, SQLite can't create
+    # the MySQL types of the others.
+    documents = Table(
+        "documents",
+        MetaData(),
+        Column("id", Integer, primary_key=True),
+        Column("data_source_id", Integer),
+    )
+    documents.create(engine)
+
+    with Session(engine) as session:
+        for doc_id, data_source_id in enumerate([1, 1, 1, 2], 1):
+            session.exec(
+                insert(documents).values(id=doc_id, data_source_id=data_source_id)
+            )
+            session.add(
+                chunk_model(
+                    id=UUID(int=doc_id),
+                    hash="",
+                    text="",
+                    document_id=doc_id,
+                    embedding=[1, 0, 0, 0],
+                )
+            )
+        for entity_id in range(1, 6):
+            session.add(
+                entity_model(
+                    id=entity_id,
+                    name=f"{entity_id}",
+                    description="",
+                    description_vec=[1, 0, 0, 0],
+                    meta_vec=[1, 0, 0, 0],
+                )
+            )
+        # Entity 4 has no relationships, entity 5 only one of the data source kept.
+        for relationship_id, (source, target, doc_id) in enumerate(
+            [(1, 2, 1), (2, 3, 2), (3, 1, 3), (1, 5, 4)], 1
+        ):
+            session.add(
+                relationship_model(
+                    id=relationship_id,
+                    description="",
+                    source_entity_id=source,
+                    target_entity_id=target,
+                    chunk_id=UUID(int=doc_id),
+                    description_vec=[1, 0, 0, 0],
+                )
+            )
+        session.commit()
+
+    chunk_repo = ChunkRepo(chunk_model)
+    graph_repo = GraphRepo(entity_model, relationship_model, chunk_model)
+    with Session(engine) as session:
+        assert list(
+            graph_repo.delete_data_source_relationships_in_batches(session, 1, 2)
+        ) == [2, 1]
+        assert list(graph_repo.delete_orphaned_entities_in_batches(session, 2)) == [
+            2,
+            1,
+        ]
+        assert list(chunk_repo.delete_by_datasource_in_batches(session, 1, 2)) == [
+            2,
+            1,
+        ]
+        assert list(document_repo.delete_by_datasource_in_batches(session, 1, 2)) == [
+            2,
+            1,
+        ]
+
+    with Session(engine) as session:
+        assert session.exec(select(relationship_model.id)).all() == [4]
+        assert session.exec(select(entity_model.id)).all() == [1, 5]
+        assert session.exec(select(Document.id)).all() == [4]
+        assert len(session.exec(select(chunk_model.id)).all()) == 1
@@ -0,0 +1,140 @@
+import statistics
+import time
+from logging import getLogger
+from typing import Any, List
+from unittest.mock import MagicMock
+
+from llama_index.core.base.llms.types import (
+    CompletionResponse,
+    CompletionResponseGen,
+    LLMMetadata,
+)
+from llama_index.core.llms import CustomLLM
+from llama_index.core.llms.callbacks import llm_completion_callback
+from llama_index.core.schema import NodeWithScore, TextNode
+
+from app.rag.chat.chat_flow import ChatFlow
+from app.rag.chat.config import ChatEngineConfig
+from app.rag.chat.retrieve.retrieve_flow import SourceDocument
+from app.rag.chat.stream_protocol import ChatEvent
+from app.rag.types import ChatEventType, ChatMessageSate
+
+logger = getLogger(__name__)
+
+FIRST_TOKEN_LATENCY = 0.05
+TOKEN_LATENCY = 0.005
+SOURCE_DOCUMENTS_LATENCY = 0.3
+TOKENS = ["TiDB ", "is ", "an ", "open-source ", "distributed ", "database."] * 20
+
+
+class FakeStreamingLLM(CustomLLM):
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(is_chat_model=False)
+
+    @llm_completion_callback()
+    def complete(self, prompt: str, formatted: bool = False, **kwargs: Any):
+        return CompletionResponse(text="".join(TOKENS))
+
+    @llm_completion_callback()
+    def stream_complete(
+        self, prompt: str, formatted: bool = False, **kwargs: Any
+    ) -> CompletionResponseGen:
+        def gen() -> CompletionResponseGen:
+            time.sleep(FIRST_TOKEN_LATENCY)
+            text = ""
+            for token in TOKENS:
+                text += token
+                yield CompletionResponse(text=text, delta=token)
+                time.sleep(TOKEN_LATENCY)
+
+        return gen()
+
+
+class SlowRetrieveFlow:
+    def get_source_documents_from_nodes(
+        self, nodes: List[NodeWithScore], db_session=None
+    ) -> List[SourceDocument]:
+        time.sleep(SOURCE_DOCUMENTS_LATENCY)
+        return [
+            SourceDocument(
+                id=n.node.metadata["document_id"],
+                name=f"doc-{n.node.metadata['document_id']}",
+            )
+            for n in nodes
+        ]
+
+
+def new_chat_flow() -> ChatFlow:
+    flow = ChatFlow.__new__(ChatFlow)
+    flow.user_question = "What is TiDB?"
+    flow.engine_config = ChatEngineConfig()
+    flow.retrieve_flow = SlowRetrieveFlow()
+    flow._llm = FakeStreamingLLM()
+    flow._trace_manager = MagicMock()
+    flow._trace_manager.span.return_value.__exit__.return_value = False
+    flow._chat_started_at = time.perf_counter()
+    return flow
+
+
+def run_generate_answer() -> tuple[float, list[ChatEvent], str, list]:
+    flow = new_chat_flow()
+    relevant_chunks = [
+        NodeWithScore(
+            node=TextNode(text="TiDB is a database.", metadata={"document_id": i}),
+            score=1.0,
+        )
+        for i in range(3)
+    ]
+
+    start = time.perf_counter()
+    ttft = None
+    events = []
+    gen = flow._generate_answer(
+        user_question=flow.user_question,
+        knowledge_graph_context="",
+        relevant_chunks=relevant_chunks,
+    )
+    try:
+        while True:
+            event = next(gen)
+            if ttft is None and event.event_type == ChatEventType.TEXT_PART:
+                ttft = time.perf_counter() - start
+            events.append(event)
+    except StopIteration as e:
+        response_text, source_documents = e.value
+
+    return ttft, events, response_text, source_documents
+
+
+def test_answer_streams_before_source_documents_resolve():
+    # Warm up, the first run includes one-off costs like loading the tokenizer.
+    run_generate_answer()
+    ttft, events, response_text, source_documents = run_generate_answer()
+
+    # The first token must not wait for the source documents lookup.
+    assert ttft < SOURCE_DOCUMENTS_LATENCY
+    assert response_text == "".join(TOKENS)
+
+    # The source documents are still emitted once, after they are resolved.
+    source_nodes_events = [
+        e
+        for e in events
+        if e.event_type == ChatEventType.MESSAGE_ANNOTATIONS_PART
+        and e.payload.state == ChatMessageSate.SOURCE_NODES
+    ]
+    assert len(source_nodes_events) == 1
+    assert [d.id for d in source_nodes_events[0].payload.context] == [0, 1, 2]
+    assert [d.id for d in source_documents] == [0, 1, 2]
+
+
+def test_ttft_benchmark():
+    ttfts = [run_generate_answer()[0] for _ in range(5)]
+    median_ttft = statistics.median(ttfts)
+    logger.info(
+        f"TTFT median: {median_ttft * 1000:.1f}ms, "
+        f"max: {max(ttfts) * 1000:.1f}ms "
+        f"(LLM first token: {FIRST_TOKEN_LATENCY * 1000:.0f}ms, "
+        f"source documents lookup: {SOURCE_DOCUMENTS_LATENCY * 1000:.0f}ms)"
+    )
+    assert median_ttft < FIRST_TOKEN_LATENCY + SOURCE_DOCUMENTS_LATENCY / 2
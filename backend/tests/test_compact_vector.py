@@ -0,0 +1,79 @@
+import numpy as np
+from sqlalchemy import create_engine
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.models.entity import get_dynamic_entity_model
+from app.models.knowledge_base_scoped.compact_vector import (
+    get_candidate_distance,
+    truncate_vector,
+)
+
+
+def test_compact_vectors_follow_the_full_vectors():
+    entity_model = get_dynamic_entity_model(8, "compact_test", 2)
+    engine = create_engine("sqlite://")
+    entity_model.__table__.create(engine)
+
+    with Session(engine) as session:
+        entity = entity_model(
+            name="TiDB",
+            description="A distributed database.",
+            description_vec=[1, 2, 3, 4, 5, 6, 7, 8],
+            meta_vec=[0] * 8,
+        )
+        session.add(entity)
+        session.commit()
+        assert list(entity.description_vec_compact) == [1.0, 2.0]
+
+        entity.description_vec = [8, 7, 6, 5, 4, 3, 2, 1]
+        session.commit()
+        assert list(entity.description_vec_compact) == [8.0, 7.0]
+        assert "description_vec_compact" not in entity.screenshot()
+
+    candidate_distance, limit = get_candidate_distance(
+        entity_model, "description_vec", [1.0] * 8, 10
+    )
+    assert "description_vec_compact" in str(candidate_distance)
+    assert limit == 10 * settings.COMPACT_VECTOR_OVERSAMPLING
+
+    full_model = get_dynamic_entity_model(8, "compact_test_full")
+    candidate_distance, limit = get_candidate_distance(
+        full_model, "description_vec", [1.0] * 8, 10
+    )
+    assert "description_vec_compact" not in str(candidate_distance)
+    assert limit == 10
+
+
+def test_two_stage_search_recall():
+    # Embeddings with the information concentrated in the leading dimensions,
+    # like the ones of the models trained with Matryoshka representation learning.
+    rng = np.random.default_rng(0)
+    dims, compact_dims, top_k = 512, 128, 10
+    scales = 1 / np.sqrt(np.arange(1, dims + 1))
+    embeddings = rng.standard_normal((20_000, dims)) * scales
+    queries = embeddings[rng.choice(len(embeddings), 50)] + (
+        rng.standard_normal((50, dims)) * scales * 0.5
+    )
+
+    def cosine_distances(vectors, query):
+        return 1 - vectors @ query / (
+            np.linalg.norm(vectors, axis=1) * np.linalg.norm(query)
+        )
+
+    compact_embeddings = np.array(
+        [truncate_vector(e, compact_dims) for e in embeddings]
+    )
+    recalls = []
+    for query in queries:
+        expected = np.argsort(cosine_distances(embeddings, query))[:top_k]
+        compact_query = np.array(truncate_vector(query, compact_dims))
+        candidates = np.argsort(cosine_distances(compact_embeddings, compact_query))[
+            : top_k * settings.COMPACT_VECTOR_OVERSAMPLING
+        ]
+        actual = candidates[
+            np.argsort(cosine_distances(embeddings[candidates], query))[:top_k]
+        ]
+        recalls.append(len(set(expected) & set(actual)) / top_k)
+
+    assert np.mean(recalls) >= 0.9
@@ -0,0 +1,96 @@
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.routes import document as document_routes
+from app.core.config import settings
+from app.core.db import get_db_session
+
+CONTENT = bytes(range(256)) * 8192
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    (tmp_path / "uploads").mkdir()
+    (tmp_path / "uploads" / "doc.pdf").write_bytes(CONTENT)
+    monkeypatch.setattr(settings, "LOCAL_FILE_STORAGE_PATH", str(tmp_path))
+    monkeypatch.setattr(
+        document_routes.document_repo,
+        "must_get",
+        lambda session, doc_id: SimpleNamespace(
+            source_uri="uploads/doc.pdf", mime_type="application/pdf"
+        ),
+    )
+
+    app = FastAPI()
+    app.include_router(document_routes.router)
+    app.dependency_overrides[get_db_session] = lambda: None
+    return TestClient(app)
+
+
+def test_download_whole_file(client):
+    resp = client.get("/documents/1/download")
+    assert resp.status_code == 200
+    assert resp.content == CONTENT
+    assert resp.headers["content-length"] == str(len(CONTENT))
+    assert resp.headers["accept-ranges"] == "bytes"
+
+
+@pytest.mark.parametrize(
+    "range_header, start, end",
+    [
+        ("bytes=0-99", 0, 99),
+        ("bytes=1000-", 1000, len(CONTENT) - 1),
+        ("bytes=-500", len(CONTENT) - 500, len(CONTENT) - 1),
+        ("bytes=100-99999999", 100, len(CONTENT) - 1),
+    ],
+)
+def test_download_range(client, range_header, start, end):
+    resp = client.get("/documents/1/download", headers={"Range": range_header})
+    assert resp.status_code == 206
+    assert resp.content == CONTENT[start : end + 1]
+    assert resp.headers["content-range"] == f"bytes {start}-{end}/{len(CONTENT)}"
+
+
+def test_download_range_not_satisfiable(client):
+    resp = client.get(
+        "/documents/1/download", headers={"Range": f"bytes={len(CONTENT)}-"}
+    )
+    assert resp.status_code == 416
+    assert resp.headers["content-range"] == f"bytes */{len(CONTENT)}"
+
+
+def test_download_conditional_get(client):
+    resp = client.get("/documents/1/download")
+    etag = resp.headers["etag"]
+    last_modified = resp.headers["last-modified"]
+
+    resp = client.get("/documents/1/download", headers={"If-None-Match": etag})
+    assert resp.status_code == 304
+    assert resp.content == b""
+
+    resp = client.get(
+        "/documents/1/download", headers={"If-Modified-Since": last_modified}
+    )
+    assert resp.status_code == 304
+
+    resp = client.get("/documents/1/download", headers={"If-None-Match": '"stale"'})
+    assert resp.status_code == 200
+
+
+def test_download_if_range(client):
+    etag = client.get("/documents/1/download").headers["etag"]
+
+    resp = client.get(
+        "/documents/1/download", headers={"Range": "bytes=0-9", "If-Range": etag}
+    )
+    assert resp.status_code == 206
+
+    # The file changed since the client fetched the first part.
+    resp = client.get(
+        "/documents/1/download", headers={"Range": "bytes=0-9", "If-Range": '"old"'}
+    )
+    assert resp.status_code == 200
+    assert resp.content == CONTENT
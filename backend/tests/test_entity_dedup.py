@@ -0,0 +1,99 @@
+from llama_index.core.embeddings import MockEmbedding
+from sqlalchemy import create_engine
+from sqlmodel import Session, select
+
+from app.models import EntityType
+from app.models.entity import get_dynamic_entity_model
+from app.models.relationship import get_dynamic_relationship_model
+from app.rag.indices.knowledge_graph.graph_store.entity_dedup import (
+    EntityDeduplicator,
+    normalize_entity_name,
+)
+from app.rag.indices.knowledge_graph.schema import Entity
+
+
+def test_normalize_entity_name():
+    assert normalize_entity_name(" TiDB-Server ") == "tidb server"
+    assert normalize_entity_name("ＴｉＤＢ  server") == "tidb server"
+    assert normalize_entity_name("TiKV") != normalize_entity_name("TiDB")
+
+
+def test_deduplicate_entities():
+    entity_model = get_dynamic_entity_model(4, "dedup_test")
+    relationship_model = get_dynamic_relationship_model(4, "dedup_test", entity_model)
+    engine = create_engine("sqlite://")
+    entity_model.__table__.create(engine)
+    relationship_model.__table__.create(engine)
+
+    with Session(engine) as session:
+        for entity_id, name in enumerate(["TiDB", "tidb", "TiDB Server", "PD"], 1):
+            session.add(
+                entity_model(
+                    id=entity_id,
+                    name=name,
+                    description=f"{name}.",
+                    description_vec=[1, 0, 0, 0],
+                    meta_vec=[1, 0, 0, 0],
+                )
+            )
+        session.add(
+            entity_model(
+                id=5,
+                name="Database",
+                description="Database.",
+                description_vec=[1, 0, 0, 0],
+                meta_vec=[1, 0, 0, 0],
+                entity_type=EntityType.synopsis,
+                synopsis_info={"topic": "database", "entities": [1, 2, 4]},
+            )
+        )
+        for relationship_id, (source, target) in enumerate([(2, 4), (1, 2), (4, 3)], 1):
+            session.add(
+                relationship_model(
+                    id=relationship_id,
+                    description=f"{source} -> {target}",
+                    source_entity_id=source,
+                    target_entity_id=target,
+                    description_vec=[1, 0, 0, 0],
+                )
+            )
+        session.commit()
+
+    deduplicator = EntityDeduplicator(
+        entity_model,
+        relationship_model,
+        dspy_lm=None,
+        embed_model=MockEmbedding(embed_dim=4),
+    )
+    deduplicator.find_candidate_pairs = lambda session: [
+        # The same name and close: merged without the LLM.
+        (1, 2, 0.05),
+        # Different names but close: decided by the LLM.
+        (1, 3, 0.08),
+        # Different names and further: not duplicated.
+        (2, 4, 0.15),
+    ]
+    llm_calls = []
+
+    def merge_entities(entities):
+        llm_calls.append([e.name for e in entities])
+        return Entity(name="TiDB", description="The TiDB server.", metadata={})
+
+    deduplicator._try_merge_entities = merge_entities
+
+    with Session(engine) as session:
+        result = deduplicator.run(session)
+
+    assert result.merges == {2: 1, 3: 1}
+    assert llm_calls == [["TiDB", "TiDB Server"]]
+    with Session(engine) as session:
+        entities = {e.id: e for e in session.exec(select(entity_model))}
+        assert entities.keys() == {1, 4, 5}
+        assert entities[1].description == "The TiDB server."
+        assert entities[5].synopsis_info["entities"] == [1, 4]
+        relationships = {
+            r.id: (r.source_entity_id, r.target_entity_id)
+            for r in session.exec(select(relationship_model))
+        }
+        # The relationship between the duplicates is deleted.
+        assert relationships == {1: (1, 4), 3: (4, 1)}
@@ -0,0 +1,122 @@
+from datetime import datetime, timedelta, UTC
+
+from ragas.metrics import FactualCorrectness, SemanticSimilarity
+from sqlalchemy import create_engine
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.models import EvaluationStatus, EvaluationTaskItem
+from app.tasks import evaluate
+from app.tasks.evaluate import claim_evaluation_items, evaluate_task_items
+
+
+def new_engine():
+    engine = create_engine("sqlite://")
+    EvaluationTaskItem.__table__.create(engine)
+    return engine
+
+
+def add_items(engine, *statuses, updated_at=None):
+    with Session(engine, expire_on_commit=False) as session:
+        items = [
+            EvaluationTaskItem(
+                evaluation_task_id=1,
+                chat_engine="default",
+                status=status,
+                query="What is TiDB?",
+                reference="A distributed SQL database.",
+                response="",
+                updated_at=updated_at,
+            )
+            for status in statuses
+        ]
+        session.add_all(items)
+        session.commit()
+    return [item.id for item in items]
+
+
+def get_statuses(engine, ids):
+    with Session(engine) as session:
+        rows = session.exec(
+            select(EvaluationTaskItem.id, EvaluationTaskItem.status).where(
+                EvaluationTaskItem.id.in_(ids)
+            )
+        ).all()
+        return dict(rows)
+
+
+def test_items_are_claimed_once():
+    engine = new_engine()
+    ids = add_items(
+        engine,
+        EvaluationStatus.NOT_START,
+        EvaluationStatus.NOT_START,
+        EvaluationStatus.DONE,
+    )
+
+    with Session(engine, expire_on_commit=False) as session:
+        claimed = claim_evaluation_items(session, ids)
+    assert sorted(item.id for item in claimed) == ids[:2]
+    assert get_statuses(engine, ids) == {
+        ids[0]: EvaluationStatus.EVALUATING,
+        ids[1]: EvaluationStatus.EVALUATING,
+        ids[2]: EvaluationStatus.DONE,
+    }
+
+    # A redelivery of the batch claims nothing.
+    with Session(engine) as session:
+        assert claim_evaluation_items(session, ids) == []
+
+
+def test_stale_items_are_claimed_again():
+    engine = new_engine()
+    timeout = timedelta(seconds=settings.EVALUATION_ITEM_TIMEOUT)
+    stale_ids = add_items(
+        engine,
+        EvaluationStatus.EVALUATING,
+        updated_at=datetime.now(UTC) - timeout - timedelta(minutes=1),
+    )
+    running_ids = add_items(
+        engine, EvaluationStatus.EVALUATING, updated_at=datetime.now(UTC)
+    )
+
+    with Session(engine, expire_on_commit=False) as session:
+        claimed = claim_evaluation_items(session, stale_ids + running_ids)
+    assert [item.id for item in claimed] == stale_ids
+
+    # Claimed again, the item is no longer stale.
+    with Session(engine) as session:
+        assert claim_evaluation_items(session, stale_ids) == []
+
+
+def test_redelivered_batch_checks_the_running_items_later(monkeypatch):
+    engine = new_engine()
+    new_ids = add_items(engine, EvaluationStatus.NOT_START)
+    running_ids = add_items(
+        engine, EvaluationStatus.EVALUATING, updated_at=datetime.now(UTC)
+    )
+    monkeypatch.setattr(evaluate, "engine", engine)
+    monkeypatch.setattr(
+        evaluate, "generate_answer_by_autoflow", lambda *args: ("TiDB is a DB.", [])
+    )
+    monkeypatch.setattr(
+        evaluate,
+        "score_evaluation_items",
+        lambda items: [
+            {FactualCorrectness.name: 1.0, SemanticSimilarity.name: 0.9} for _ in items
+        ],
+    )
+    scheduled = []
+    monkeypatch.setattr(
+        evaluate_task_items,
+        "apply_async",
+        lambda args, countdown: scheduled.append((args, countdown)),
+    )
+
+    evaluate_task_items(new_ids + running_ids)
+
+    assert get_statuses(engine, new_ids + running_ids) == {
+        new_ids[0]: EvaluationStatus.DONE,
+        running_ids[0]: EvaluationStatus.EVALUATING,
+    }
+    assert scheduled == [((running_ids,), settings.EVALUATION_ITEM_TIMEOUT)]
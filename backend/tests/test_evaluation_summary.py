@@ -0,0 +1,96 @@
+import statistics
+import uuid
+
+from sqlalchemy import create_engine, event
+from sqlmodel import Session
+
+from app.api.admin_routes.evaluation.evaluation_task import (
+    get_summaries_for_evaluation_tasks,
+)
+from app.models import EvaluationStatus, EvaluationTask, EvaluationTaskItem
+
+
+class StdDev:
+    """SQLite has no STDDEV aggregate."""
+
+    def __init__(self):
+        self.values = []
+
+    def step(self, value):
+        if value is not None:
+            self.values.append(value)
+
+    def finalize(self):
+        return statistics.pstdev(self.values) if self.values else None
+
+
+def new_engine():
+    engine = create_engine("sqlite://")
+
+    @event.listens_for(engine, "connect")
+    def register_stddev(dbapi_conn, _):
+        dbapi_conn.create_aggregate("stddev", 1, StdDev)
+
+    EvaluationTaskItem.__table__.create(engine)
+    return engine
+
+
+def new_item(task_id, status, factual_correctness=None, semantic_similarity=None):
+    return EvaluationTaskItem(
+        evaluation_task_id=task_id,
+        chat_engine="default",
+        status=status,
+        query="What is TiDB?",
+        reference="A distributed SQL database.",
+        response="",
+        factual_correctness=factual_correctness,
+        semantic_similarity=semantic_similarity,
+    )
+
+
+def test_summaries_are_computed_in_one_query():
+    engine = new_engine()
+    user_id = uuid.uuid4()
+    tasks = [
+        EvaluationTask(id=i, name=f"task-{i}", user_id=user_id, dataset_id=1)
+        for i in (1, 2, 3)
+    ]
+    with Session(engine) as session:
+        session.add_all(
+            [
+                new_item(1, EvaluationStatus.DONE, 0.5, 0.9),
+                new_item(1, EvaluationStatus.DONE, 1.0, 0.7),
+                new_item(1, EvaluationStatus.ERROR),
+                new_item(1, EvaluationStatus.CANCEL),
+                new_item(2, EvaluationStatus.DONE, 0.2, 0.2),
+                new_item(2, EvaluationStatus.NOT_START),
+                new_item(2, EvaluationStatus.EVALUATING),
+            ]
+        )
+        session.commit()
+
+        statements = []
+        event.listen(
+            engine,
+            "before_cursor_execute",
+            lambda conn, cursor, statement, *args: statements.append(statement),
+        )
+        summaries = get_summaries_for_evaluation_tasks(tasks, session)
+
+    assert len(statements) == 1
+    assert [s.id for s in summaries] == [1, 2, 3]
+
+    finished = summaries[0].summary
+    assert (finished.succeed, finished.errored, finished.cancel) == (2, 1, 1)
+    assert finished.avg_factual_correctness == 0.75
+    assert finished.min_semantic_similarity == 0.7
+    assert finished.max_semantic_similarity == 0.9
+    assert finished.std_factual_correctness == 0.25
+
+    # The stats are only reported once all the items are evaluated.
+    running = summaries[1].summary
+    assert (running.not_start, running.progressing, running.succeed) == (1, 1, 1)
+    assert running.avg_factual_correctness == 0
+
+    empty = summaries[2].summary
+    assert (empty.not_start, empty.succeed, empty.errored) == (0, 0, 0)
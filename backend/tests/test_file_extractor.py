@@ -0,0 +1,62 @@
+import io
+
+import docx
+import openpyxl
+import pytest
+
+from app.core.config import settings
+from app.file_storage import default_file_storage
+from app.rag.file_extractor import FileExtractionError, extract_text
+from app.types import MimeTypes
+
+
+@pytest.fixture(autouse=True)
+def storage_path(tmp_path, monkeypatch):
+    # The child process reads the settings from the environment.
+    monkeypatch.setenv("LOCAL_FILE_STORAGE_PATH", str(tmp_path))
+    monkeypatch.setattr(settings, "LOCAL_FILE_STORAGE_PATH", str(tmp_path))
+    return tmp_path
+
+
+def save(name: str, build) -> str:
+    buf = io.BytesIO()
+    build(buf)
+    buf.seek(0)
+    default_file_storage.save(name, buf)
+    return name
+
+
+def test_extract_docx_and_cache(storage_path):
+    def build(buf):
+        document = docx.Document()
+        document.add_paragraph("TiDB is a distributed SQL database.")
+        document.add_paragraph("It is MySQL compatible.")
+        document.save(buf)
+
+    path = save("uploads/doc.docx", build)
+    text = extract_text(path, MimeTypes.DOCX, content_hash="abc")
+    assert text == "TiDB is a distributed SQL database.\n\nIt is MySQL compatible."
+
+    # The second extraction is served from the cache by the content hash.
+    default_file_storage.delete(path)
+    assert extract_text(path, MimeTypes.DOCX, content_hash="abc") == text
+
+
+def test_extract_xlsx():
+    def build(buf):
+        wb = openpyxl.Workbook()
+        wb.active.title = "Versions"
+        wb.active.append(["version", "date"])
+        wb.active.append(["v8.5.0", "2024-12-19"])
+        wb.save(buf)
+
+    path = save("uploads/sheet.xlsx", build)
+    assert extract_text(path, MimeTypes.XLSX) == (
+        "Sheet: Versions\n\nversion,date\nv8.5.0,2024-12-19"
+    )
+
+
+def test_extract_invalid_file():
+    path = save("uploads/broken.pdf", lambda buf: buf.write(b"not a pdf"))
+    with pytest.raises(FileExtractionError):
+        extract_text(path, MimeTypes.PDF)
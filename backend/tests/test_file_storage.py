@@ -0,0 +1,57 @@
+import hashlib
+import io
+
+import pytest
+
+from app.core.config import settings
+from app.file_storage import LocalFileStorage
+
+
+def test_save_content_addressed_deduplicates(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "LOCAL_FILE_STORAGE_PATH", str(tmp_path))
+    storage = LocalFileStorage()
+    content = b"TiDB is a distributed SQL database.\n" * 100_000
+
+    first = storage.save_content_addressed("uploads/blobs", io.BytesIO(content), ".md")
+    second = storage.save_content_addressed("uploads/blobs", io.BytesIO(content), ".md")
+    other = storage.save_content_addressed("uploads/blobs", io.BytesIO(b"other"), ".md")
+
+    assert first.hash == hashlib.sha256(content).hexdigest()
+    assert first.size == len(content)
+    assert not first.deduplicated
+    assert second.deduplicated
+    assert second.name == first.name
+    assert other.name != first.name
+    with storage.open(first.name) as f:
+        assert f.read() == content
+    # No temporary files are left behind.
+    assert list((tmp_path / "uploads/blobs/tmp").iterdir()) == []
+    # The uploads of the same content share one file, next to the other content.
+    blobs = [p for p in (tmp_path / "uploads/blobs").rglob("*.md") if p.is_file()]
+    assert len(blobs) == 2
+
+
+class FailingReader(io.BytesIO):
+    """Fails after the first block, like a process crashing in the middle of a write."""
+
+    def read(self, size=-1):
+        if self.tell() > 0:
+            raise OSError("disk full")
+        return super().read(size)
+
+
+def test_save_replaces_the_file_atomically(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "LOCAL_FILE_STORAGE_PATH", str(tmp_path))
+    storage = LocalFileStorage()
+    storage.save("uploads/extracted/abc.txt", io.BytesIO(b"complete"))
+
+    with pytest.raises(OSError):
+        storage.save("uploads/extracted/abc.txt", FailingReader(b"x" * 10_000_000))
+    with pytest.raises(OSError):
+        storage.save("uploads/extracted/def.txt", FailingReader(b"x" * 10_000_000))
+
+    # The failed writes are not visible, nor left behind.
+    with storage.open("uploads/extracted/abc.txt") as f:
+        assert f.read() == b"complete"
+    assert not storage.exists("uploads/extracted/def.txt")
+    assert [p.name for p in (tmp_path / "uploads/extracted").iterdir()] == ["abc.txt"]
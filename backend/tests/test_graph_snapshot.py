@@ -0,0 +1,130 @@
+import logging
+import time
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import create_engine, delete, text
+from sqlmodel import Field, Session, SQLModel
+
+from app.rag.indices.knowledge_graph.graph_store.snapshot import (
+    GraphSnapshot,
+    GraphSnapshotCache,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class FakeRelationship(SQLModel, table=True):
+    __tablename__ = "relationships_1"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    source_entity_id: int
+    target_entity_id: int
+    weight: int = 0
+
+
+def new_engine():
+    engine = create_engine("sqlite://")
+    FakeRelationship.__table__.create(engine)
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                "CREATE TABLE knowledge_bases (id INTEGER PRIMARY KEY, "
+                "generation INTEGER NOT NULL DEFAULT 0, updated_at DATETIME)"
+            )
+        )
+        conn.execute(text("INSERT INTO knowledge_bases (id) VALUES (1)"))
+    return engine
+
+
+def test_graph_snapshot_is_refreshed_with_the_knowledge_base():
+    engine = new_engine()
+    with Session(engine) as session:
+        # 1 -> 2 -> 3 -> 4, 1 -> 3, and 5 -> 1 with a negative weight.
+        for i, (source, target, weight) in enumerate(
+            [(1, 2, 1), (2, 3, 1), (3, 4, 1), (1, 3, 2), (5, 1, -1)], start=1
+        ):
+            session.add(
+                FakeRelationship(
+                    id=i,
+                    source_entity_id=source,
+                    target_entity_id=target,
+                    weight=weight,
+                )
+            )
+        session.commit()
+
+    snapshots = GraphSnapshotCache(max_relationships=100)
+    loads = []
+    load_edges = snapshots._load_edges
+    snapshots._load_edges = lambda *args: loads.append(args[2:]) or load_edges(*args)
+
+    with Session(engine) as session:
+        snapshot = snapshots.get(session, 1, FakeRelationship)
+        assert snapshot.degrees([1, 3, 9]) == {
+            1: {"in_degree": 1, "out_degree": 2},
+            3: {"in_degree": 2, "out_degree": 1},
+            9: {"in_degree": 0, "out_degree": 0},
+        }
+        assert sorted(snapshot.outgoing_relationship_ids([1, 5], min_weight=0)) == [
+            1,
+            4,
+        ]
+        assert snapshot.outgoing_relationship_ids(
+            [1], exclude_relationship_ids={1}
+        ) == [4]
+        assert snapshot.neighbor_relationship_ids([1]) == [1, 4, 5]
+        # Unchanged knowledge base, the same snapshot.
+        assert snapshots.get(session, 1, FakeRelationship) is snapshot
+
+    # The new relationships are appended to the snapshot.
+    with Session(engine) as session:
+        session.add(FakeRelationship(id=6, source_entity_id=4, target_entity_id=6))
+        session.commit()
+        snapshot = snapshots.get(session, 1, FakeRelationship)
+    assert len(loads) == 2 and len(loads[1]) == 1
+    assert snapshot.outgoing_relationship_ids([4]) == [6]
+
+    # Deleting relationships reloads the snapshot.
+    with Session(engine) as session:
+        session.exec(delete(FakeRelationship).where(FakeRelationship.id == 2))
+        session.commit()
+        snapshot = snapshots.get(session, 1, FakeRelationship)
+    assert len(loads) == 3 and len(loads[2]) == 0
+    assert sorted(snapshot.outgoing_relationship_ids([1, 2, 3, 4])) == [1, 3, 4, 6]
+    assert snapshot.degrees([2])[2] == {"in_degree": 1, "out_degree": 0}
+
+    # The knowledge bases over the limit have no snapshot.
+    with Session(engine) as session:
+        assert (
+            GraphSnapshotCache(max_relationships=2).get(session, 1, FakeRelationship)
+            is None
+        )
+
+
+def test_graph_snapshot_hop_benchmark():
+    rng = np.random.default_rng(0)
+    n_entities, n_relationships = 100_000, 1_000_000
+    snapshot = GraphSnapshot.build(
+        generation=0,
+        relationship_ids=np.arange(1, n_relationships + 1),
+        sources=rng.integers(0, n_entities, n_relationships),
+        targets=rng.integers(0, n_entities, n_relationships),
+        weights=np.zeros(n_relationships, dtype=np.int64),
+    )
+    seeds = rng.choice(n_entities, 1000, replace=False).tolist()
+
+    # The candidates of a hop of the weighted search, from the visited entities.
+    for n_seeds in (10, 100, 1000):
+        start = time.perf_counter()
+        candidates = snapshot.outgoing_relationship_ids(seeds[:n_seeds])
+        logger.info(
+            "Found %d candidate relationships of %d entities in %.1fms.",
+            len(candidates),
+            n_seeds,
+            (time.perf_counter() - start) * 1000,
+        )
+    degrees = snapshot.degrees(seeds[:10])
+    assert sum(d["out_degree"] for d in degrees.values()) == len(
+        snapshot.outgoing_relationship_ids(seeds[:10])
+    )
@@ -0,0 +1,271 @@
+from collections import defaultdict
+
+import pytest
+
+from app.core.config import settings
+from app.tasks import scheduler
+from app.tasks.scheduler import (
+    IndexingLane,
+    IndexingScheduler,
+    decrease_limit,
+    increase_limit,
+    is_rate_limit_error,
+)
+
+
+class RateLimitError(Exception):
+    pass
+
+
+class HTTPStatusError(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def test_is_rate_limit_error():
+    assert is_rate_limit_error(RateLimitError())
+    assert is_rate_limit_error(HTTPStatusError(429))
+    assert not is_rate_limit_error(HTTPStatusError(500))
+    assert not is_rate_limit_error(ValueError())
+
+    try:
+        try:
+            raise HTTPStatusError(429)
+        except HTTPStatusError as e:
+            raise RuntimeError("Failed to extract the graph") from e
+    except RuntimeError as e:
+        assert is_rate_limit_error(e)
+
+
+def test_adaptive_limit():
+    limit = 8.0
+    limit = decrease_limit(limit)
+    assert limit == 4
+    # About one more running task after a full round of successful tasks.
+    for _ in range(4):
+        limit = increase_limit(limit)
+    assert 4.9 < limit < 5
+
+    assert decrease_limit(1) == 1
+    assert (
+        increase_limit(settings.INDEXING_PROVIDER_MAX_CONCURRENCY)
+        == settings.INDEXING_PROVIDER_MAX_CONCURRENCY
+    )
+
+
+class StubRedis:
+    """The subset of the Redis commands used by the scheduler, in memory."""
+
+    def __init__(self):
+        self.values = {}
+        self.lists = defaultdict(list)
+        self.sets = defaultdict(set)
+        self.zsets = defaultdict(dict)
+        self.hashes = defaultdict(dict)
+
+    def pipeline(self):
+        return StubPipeline(self)
+
+    def lock(self, name, timeout=None, blocking_timeout=None):
+        return StubLock()
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.values:
+            return None
+        self.values[key] = str(value)
+        return True
+
+    def delete(self, *keys):
+        for key in keys:
+            self.values.pop(key, None)
+
+    def rpush(self, key, value):
+        self.lists[key].append(str(value))
+        return len(self.lists[key])
+
+    def lpush(self, key, value):
+        self.lists[key].insert(0, str(value))
+        return len(self.lists[key])
+
+    def lpop(self, key):
+        return self.lists[key].pop(0) if self.lists[key] else None
+
+    def lindex(self, key, index):
+        items = self.lists[key]
+        return items[index] if -len(items) <= index < len(items) else None
+
+    def llen(self, key):
+        return len(self.lists[key])
+
+    def lrem(self, key, count, value):
+        items = self.lists[key]
+        if str(value) in items:
+            items.remove(str(value))
+            return 1
+        return 0
+
+    def lmove(self, src, dst, src_side, dst_side):
+        assert (src_side, dst_side) == ("LEFT", "RIGHT")
+        value = self.lists[src].pop(0)
+        self.lists[dst].append(value)
+        return value
+
+    def sadd(self, key, value):
+        added = str(value) not in self.sets[key]
+        self.sets[key].add(str(value))
+        return int(added)
+
+    def srem(self, key, value):
+        self.sets[key].discard(str(value))
+
+    def zadd(self, key, mapping):
+        self.zsets[key].update(mapping)
+
+    def zrem(self, key, member):
+        self.zsets[key].pop(member, None)
+
+    def zcard(self, key):
+        return len(self.zsets[key])
+
+    def zrangebyscore(self, key, min, max):
+        return [m for m, score in self.zsets[key].items() if score <= max]
+
+    def hset(self, key, field, value):
+        self.hashes[key][field] = value
+
+    def hget(self, key, field):
+        return self.hashes[key].get(field)
+
+    def hdel(self, key, field):
+        self.hashes[key].pop(field, None)
+
+
+class StubPipeline:
+    def __init__(self, client):
+        self._client = client
+        self._calls = []
+
+    def __getattr__(self, name):
+        def call(*args, **kwargs):
+            self._calls.append((getattr(self._client, name), args, kwargs))
+
+        return call
+
+    def execute(self):
+        return [method(*args, **kwargs) for method, args, kwargs in self._calls]
+
+
+class StubLock:
+    def acquire(self):
+        return True
+
+    def release(self):
+        pass
+
+
+@pytest.fixture
+def indexing(monkeypatch):
+    """The scheduler, and the (kb_id, document_id) of the tasks sent to Celery."""
+    client = StubRedis()
+    indexing_scheduler = IndexingScheduler("redis://stub")
+    indexing_scheduler._client = client
+    sent = []
+
+    def send_task(name, args, queue, task_id=None):
+        sent.append((task_id, args[0], args[1], queue))
+
+    monkeypatch.setattr(scheduler.celery_app, "send_task", send_task)
+    monkeypatch.setattr(
+        scheduler.dispatch_indexing_tasks, "apply_async", lambda countdown: None
+    )
+    monkeypatch.setattr(settings, "ENABLE_INDEXING_SCHEDULER", True)
+    monkeypatch.setattr(settings, "INDEXING_MAX_RUNNING_TASKS", 100)
+    monkeypatch.setattr(settings, "INDEXING_PROVIDER_CONCURRENCY", 4)
+    return indexing_scheduler, sent
+
+
+def submit(indexing_scheduler, kb_id, document_id, provider="llm:a", lane="bulk"):
+    indexing_scheduler.submit(
+        kb_id, "build", [kb_id, document_id], provider, IndexingLane(lane)
+    )
+
+
+def test_knowledge_bases_take_turns(indexing, monkeypatch):
+    indexing_scheduler, sent = indexing
+    monkeypatch.setattr(settings, "INDEXING_MAX_RUNNING_TASKS", 0)
+    for document_id in range(4):
+        submit(indexing_scheduler, 1, document_id)
+    for document_id in range(2):
+        submit(indexing_scheduler, 2, document_id)
+    assert sent == []
+
+    monkeypatch.setattr(settings, "INDEXING_MAX_RUNNING_TASKS", 4)
+    indexing_scheduler.dispatch()
+    assert [(kb_id, doc_id) for _, kb_id, doc_id, _ in sent] == [
+        (1, 0),
+        (2, 0),
+        (1, 1),
+        (2, 1),
+    ]
+
+    # The knowledge base with queued tasks gets the free slots.
+    indexing_scheduler.report_finished(sent[1][0])
+    assert [(kb_id, doc_id) for _, kb_id, doc_id, _ in sent[4:]] == [(1, 2)]
+
+
+def test_interactive_lane_goes_first(indexing, monkeypatch):
+    indexing_scheduler, sent = indexing
+    monkeypatch.setattr(settings, "INDEXING_MAX_RUNNING_TASKS", 0)
+    submit(indexing_scheduler, 1, 0, lane="bulk")
+    submit(indexing_scheduler, 2, 0, lane="interactive")
+
+    monkeypatch.setattr(settings, "INDEXING_MAX_RUNNING_TASKS", 1)
+    indexing_scheduler.dispatch()
+    assert [(kb_id, queue) for _, kb_id, _, queue in sent] == [
+        (2, "indexing_interactive")
+    ]
+
+    indexing_scheduler.report_finished(sent[0][0])
+    assert [(kb_id, queue) for _, kb_id, _, queue in sent[1:]] == [(1, "indexing_bulk")]
+
+
+def test_running_tasks_are_limited_per_provider(indexing, monkeypatch):
+    indexing_scheduler, sent = indexing
+    monkeypatch.setattr(settings, "INDEXING_PROVIDER_CONCURRENCY", 2)
+    for document_id in range(3):
+        submit(indexing_scheduler, 1, document_id, provider="llm:a")
+    submit(indexing_scheduler, 2, 0, provider="llm:b")
+
+    # The third task of provider a waits, the task of provider b does not.
+    assert [(kb_id, doc_id) for _, kb_id, doc_id, _ in sent] == [
+        (1, 0),
+        (1, 1),
+        (2, 0),
+    ]
+
+    indexing_scheduler.report_finished(sent[0][0])
+    assert [(kb_id, doc_id) for _, kb_id, doc_id, _ in sent[3:]] == [(1, 2)]
+
+
+def test_rate_limited_task_is_requeued_and_dispatched(indexing, monkeypatch):
+    indexing_scheduler, sent = indexing
+    submit(indexing_scheduler, 1, 0)
+    submit(indexing_scheduler, 1, 1)
+    monkeypatch.setattr(settings, "INDEXING_MAX_RUNNING_TASKS", 2)
+    submit(indexing_scheduler, 1, 2)
+    assert len(sent) == 2
+
+    # The limit of the provider is halved, and the task is queued again in
+    # front of its knowledge base, and dispatched once a slot is free.
+    indexing_scheduler.report_rate_limited(sent[0][0])
+    assert indexing_scheduler._get_limit("llm:a") == 2
+    assert [(kb_id, doc_id) for _, kb_id, doc_id, _ in sent[2:]] == [(1, 0)]
+    assert sent[2][0] != sent[0][0]
+
+    # The task id is no longer tracked, its postrun report is a no-op.
+    indexing_scheduler.report_finished(sent[0][0])
+    assert len(sent) == 3
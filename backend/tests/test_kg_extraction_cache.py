@@ -0,0 +1,97 @@
+from types import SimpleNamespace
+
+import dspy
+from llama_index.core.schema import TextNode
+from sqlalchemy import create_engine
+from sqlmodel import Session, select
+
+from app.models import KGExtractionCache
+from app.rag.indices.knowledge_graph.extraction_cache import KGExtractionCacheStore
+from app.rag.indices.knowledge_graph.extractor import SimpleGraphExtractor
+from app.rag.indices.knowledge_graph.schema import (
+    Entity,
+    KnowledgeGraph,
+    Relationship,
+)
+
+TEXT = "TiDB uses TiKV as its storage engine."
+
+
+def new_extractor(session, calls, **lm_kwargs):
+    extractor = SimpleGraphExtractor(
+        dspy.LM(model="openai/gpt-4o-mini", api_key="fake", **lm_kwargs),
+        cache=KGExtractionCacheStore(session),
+    )
+
+    def extract_prog(text):
+        calls.append(text)
+        return SimpleNamespace(
+            knowledge=KnowledgeGraph(
+                entities=[
+                    Entity(name="TiDB", description="A database.", metadata={}),
+                    Entity(
+                        name="TiKV",
+                        description="A storage engine.",
+                        metadata={"topic": "storage"},
+                    ),
+                ],
+                relationships=[
+                    Relationship(
+                        source_entity="TiDB",
+                        target_entity="TiKV",
+                        relationship_desc="TiDB uses TiKV.",
+                    )
+                ],
+            )
+        )
+
+    extractor.extract_prog = extract_prog
+    return extractor
+
+
+def test_extraction_is_replayed_from_cache():
+    engine = create_engine("sqlite://")
+    KGExtractionCache.__table__.create(engine)
+    node = TextNode(id_="chunk-1", text=TEXT)
+    calls = []
+
+    with Session(engine) as session:
+        entities_df, relationships_df = new_extractor(session, calls).extract(
+            TEXT, node
+        )
+    assert len(calls) == 1
+
+    # A rebuild replays the cached triplets and covariates.
+    with Session(engine) as session:
+        cached_entities_df, cached_relationships_df = new_extractor(
+            session, calls
+        ).extract(TEXT, node)
+    assert len(calls) == 1
+    assert cached_entities_df.to_dict("records") == entities_df.to_dict("records")
+    assert cached_relationships_df.to_dict("records") == relationships_df.to_dict(
+        "records"
+    )
+    assert cached_relationships_df.iloc[0]["meta"]["chunk_id"] == "chunk-1"
+
+    # A different text or LLM setting is extracted again.
+    with Session(engine) as session:
+        new_extractor(session, calls).extract(TEXT + " TiKV is written in Rust.", node)
+        new_extractor(session, calls, temperature=0.7).extract(TEXT, node)
+        assert len(calls) == 3
+        assert len(session.exec(select(KGExtractionCache)).all()) == 3
+
+
+def test_cache_writes_leave_the_caller_transaction_alone(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/cache.db")
+    KGExtractionCache.__table__.create(engine)
+
+    with Session(engine) as session:
+        session.add(KGExtractionCache(key="pending", value={}))
+        KGExtractionCacheStore(session).set("extracted", {"entities": []})
+        # The pending changes of the caller are neither committed nor dropped.
+        assert len(session.new) == 1
+        session.rollback()
+
+    with Session(engine) as session:
+        keys = session.exec(select(KGExtractionCache.key)).all()
+    assert keys == ["extracted"]
@@ -0,0 +1,105 @@
+import random
+import time
+from logging import getLogger
+
+from llama_index.core.schema import Document
+
+from app.rag.node_parser.file.markdown import MarkdownNodeParser
+
+logger = getLogger(__name__)
+
+API_REFERENCE_SIZE = 5 * 1024 * 1024
+WORDS = [
+    "cluster",
+    "region",
+    "table",
+    "index",
+    "returns",
+    "the",
+    "of",
+    "parameter",
+    "timeout",
+    "optional",
+    "request",
+    "response",
+    "string",
+    "integer",
+]
+
+
+def whitespace_tokenizer(text: str) -> list[str]:
+    return text.split()
+
+
+def build_api_reference(size: int, seed: int = 42) -> str:
+    """Generate a markdown API reference of roughly `size` bytes."""
+    rng = random.Random(seed)
+
+    def sentence(n: int) -> str:
+        return " ".join(rng.choice(WORDS) for _ in range(n)) + "."
+
+    lines = ["# API Reference", "", sentence(30), ""]
+    total = 0
+    api_id = 0
+    while total < size:
+        api_id += 1
+        section = [f"## Endpoint {api_id}", "", sentence(rng.randint(20, 80)), ""]
+        for param_id in range(rng.randint(1, 8)):
+            section += [
+                f"### Parameter {api_id}.{param_id}",
+                "",
+                "| Name | Type | Description |",
+                "| ---- | ---- | ----------- |",
+                f"| param_{param_id} | string | {sentence(12)} |",
+                "",
+                sentence(rng.randint(10, 120)),
+                "",
+            ]
+        section += [
+            "```json",
+            "# not a header",
+            f'{{"id": {api_id}, "status": "ok"}}',
+            "```",
+            "",
+        ]
+        if api_id % 50 == 0:
+            # An oversized section without sub headers, which has to be split
+            # by the fallback sentence splitter.
+            section += [sentence(20) for _ in range(200)]
+        total += sum(len(line) + 1 for line in section)
+        lines += section
+    return "\n".join(lines)
+
+
+def parse(text: str) -> list:
+    parser = MarkdownNodeParser(chunk_size=400, tokenizer=whitespace_tokenizer)
+    return parser.get_nodes_from_documents([Document(text=text)])
+
+
+def test_markdown_node_parser_keeps_sections():
+    text = build_api_reference(64 * 1024)
+    nodes = parse(text)
+
+    assert len(nodes) > 1
+    for node in nodes:
+        assert node.text.strip()
+    assert any(n.metadata.get("Header_2") == "Endpoint 1" for n in nodes)
+    # Lines inside code blocks are never treated as headers.
+    assert not any(n.metadata.get("Header_1") == "not a header" for n in nodes)
+
+
+def test_markdown_node_parser_benchmark():
+    text = build_api_reference(API_REFERENCE_SIZE)
+
+    start = time.perf_counter()
+    nodes = parse(text)
+    elapsed = time.perf_counter() - start
+
+    size_mb = len(text) / 1024 / 1024
+    logger.info(
+        f"Parsed {size_mb:.1f}MB markdown into {len(nodes)} nodes "
+        f"in {elapsed:.2f}s ({size_mb / elapsed:.2f}MB/s)"
+    )
+    # Guard against regressions to quadratic behavior, which takes minutes on
+    # a document of this size.
+    assert elapsed < 60
@@ -0,0 +1,141 @@
+from types import SimpleNamespace
+from typing import Optional
+
+from llama_index.core.schema import NodeWithScore, QueryBundle, TextNode
+from sqlalchemy import create_engine, delete, text
+from sqlmodel import Field, Session, SQLModel, select
+
+from app.core.config import settings
+from app.core.db import get_table_knowledge_base_id
+from app.rag.retrievers.cache import (
+    RetrievalCache,
+    get_knowledge_base_generation,
+    get_retrieval_cache_key,
+)
+from app.rag.retrievers.chunk import simple_retriever
+from app.rag.retrievers.chunk.schema import VectorSearchRetrieverConfig
+from app.rag.retrievers.chunk.simple_retriever import ChunkSimpleRetriever
+from app.rag.retrievers.knowledge_graph.schema import KnowledgeGraphRetrieverConfig
+
+
+class FakeChunk(SQLModel, table=True):
+    __tablename__ = "chunks_1"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    text: str
+    index_status: str = "not_started"
+
+
+def new_engine():
+    engine = create_engine("sqlite://")
+    FakeChunk.__table__.create(engine)
+    # The columns of the knowledge base used by the generation tracking, the
+    # MySQL types of the others are not supported by SQLite.
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                "CREATE TABLE knowledge_bases (id INTEGER PRIMARY KEY, "
+                "generation INTEGER NOT NULL DEFAULT 0, updated_at DATETIME)"
+            )
+        )
+        conn.execute(text("INSERT INTO knowledge_bases (id) VALUES (1)"))
+    return engine
+
+
+def test_writes_bump_the_knowledge_base_generation():
+    assert get_table_knowledge_base_id(FakeChunk.__tablename__) == 1
+    assert get_table_knowledge_base_id("documents") is None
+    engine = new_engine()
+
+    def generation():
+        with Session(engine) as session:
+            return get_knowledge_base_generation(session, 1)
+
+    with Session(engine) as session:
+        session.add(FakeChunk(id=1, text="TiDB is a distributed database."))
+        session.commit()
+    assert generation() == 1
+
+    # Updating the indexing status does not change the retrieval results.
+    with Session(engine) as session:
+        chunk = session.get(FakeChunk, 1)
+        chunk.index_status = "completed"
+        session.commit()
+    assert generation() == 1
+
+    with Session(engine) as session:
+        chunk = session.get(FakeChunk, 1)
+        chunk.text = "TiDB is a distributed SQL database."
+        session.commit()
+    assert generation() == 2
+
+    # The writes of a rolled back transaction are not counted.
+    with Session(engine) as session:
+        session.exec(delete(FakeChunk))
+        session.rollback()
+        session.commit()
+    assert generation() == 2
+
+    with Session(engine) as session:
+        session.exec(delete(FakeChunk))
+        session.commit()
+        assert len(session.exec(select(FakeChunk)).all()) == 0
+    assert generation() == 3
+
+
+def test_retrieval_cache_key():
+    config = KnowledgeGraphRetrieverConfig()
+    key = get_retrieval_cache_key("knowledge_graph", 1, 3, "What is TiDB?", config)
+
+    # Near-identical queries share the entry.
+    assert key == get_retrieval_cache_key(
+        "knowledge_graph", 1, 3, "  what is  TiDB? ", config
+    )
+    # A write to the knowledge base or another config misses it.
+    assert key != get_retrieval_cache_key(
+        "knowledge_graph", 1, 4, "What is TiDB?", config
+    )
+    assert key != get_retrieval_cache_key(
+        "knowledge_graph", 1, 3, "What is TiDB?", config.model_copy(update={"depth": 3})
+    )
+
+    cache = RetrievalCache(max_size=1, ttl=60)
+    cache.set(key, [("chunk-1", 0.9)])
+    assert cache.get(key) == [("chunk-1", 0.9)]
+    cache.set("other", [])
+    assert cache.get(key) is None
+
+
+def test_chunk_retrieval_cache_is_bypassed_for_given_embeddings(monkeypatch):
+    monkeypatch.setattr(settings, "ENABLE_RETRIEVAL_CACHE", True)
+    monkeypatch.setattr(
+        simple_retriever, "get_knowledge_base_generation", lambda session, kb_id: 1
+    )
+    monkeypatch.setattr(simple_retriever, "retrieval_cache", RetrievalCache(10, 60))
+    retriever = ChunkSimpleRetriever.__new__(ChunkSimpleRetriever)
+    retriever._kb = SimpleNamespace(id=1)
+    retriever._db_session = None
+    retriever._config = VectorSearchRetrieverConfig()
+    retriever._vector_store = SimpleNamespace(
+        get_nodes_by_ids=lambda ids: [TextNode(id_=node_id) for node_id in ids]
+    )
+    calls = []
+
+    def retrieve_nodes(query_bundle):
+        calls.append(query_bundle)
+        node_id = f"chunk-{len(calls)}"
+        return [NodeWithScore(node=TextNode(id_=node_id), score=0.9)]
+
+    retriever._retrieve_nodes = retrieve_nodes
+
+    def retrieve(query_bundle):
+        return [n.node.node_id for n in retriever._retrieve(query_bundle)]
+
+    assert retrieve(QueryBundle("What is TiDB?")) == ["chunk-1"]
+    assert retrieve(QueryBundle("What is TiDB?")) == ["chunk-1"]
+    # The same text with another embedding, or embedded from other strings.
+    assert retrieve(QueryBundle("What is TiDB?", embedding=[0.1, 0.2])) == ["chunk-2"]
+    assert retrieve(QueryBundle("What is TiDB?", custom_embedding_strs=["TiDB"])) == [
+        "chunk-3"
+    ]
+    assert len(calls) == 3
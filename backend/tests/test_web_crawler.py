@@ -0,0 +1,69 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.rag.datasource.web_crawler import crawl_web_pages, inspect_static_html
+
+PAGE_LATENCY = 0.1
+PARAGRAPH = "TiDB is an open-source distributed SQL database. " * 10
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        time.sleep(PAGE_LATENCY)
+        if self.path == "/missing":
+            self.send_response(404)
+            self.end_headers()
+            return
+        if self.path == "/redirect":
+            self.send_response(302)
+            self.send_header("Location", "/page/0")
+            self.end_headers()
+            return
+        body = f"<html><head><title>Page {self.path}</title></head><body><p>{PARAGRAPH}</p></body></html>"
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.end_headers()
+        self.wfile.write(body.encode())
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def base_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+def test_inspect_static_html():
+    title, needs_js = inspect_static_html(
+        f"<html><head><title>Doc</title></head><body><p>{PARAGRAPH}</p></body></html>"
+    )
+    assert title == "Doc"
+    assert not needs_js
+
+    _, needs_js = inspect_static_html(
+        '<html><body><div id="root"></div><script src="/app.js"></script></body></html>'
+    )
+    assert needs_js
+
+
+def test_crawl_static_pages_concurrently(base_url):
+    urls = [f"{base_url}/page/{i}" for i in range(40)]
+    urls += [f"{base_url}/missing", f"{base_url}/redirect"]
+
+    start = time.perf_counter()
+    pages = list(crawl_web_pages(urls, render_js=False))
+    elapsed = time.perf_counter() - start
+
+    # The redirect lands on a visited page and the missing page is skipped.
+    assert sorted(p.final_url for p in pages) == sorted(urls[:40])
+    assert all(p.title == f"Page {p.final_url[len(base_url) :]}" for p in pages)
+    # Sequential crawling takes at least 42 * PAGE_LATENCY.
+    assert elapsed < len(urls) * PAGE_LATENCY / 2
@@ -0,0 +1,184 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.models import DocIndexTaskStatus, Document
+from app.models.document import SYNC_META_KEY
+from app.rag.datasource import web_base
+from app.rag.datasource.web_base import content_digest, load_web_documents
+from app.rag.datasource.web_sitemap import extract_urls_from_sitemap
+
+PARAGRAPH = "TiDB is an open-source distributed SQL database. " * 10
+
+
+class Site:
+    def __init__(self):
+        # path -> (etag, body text)
+        self.pages = {
+            f"/page/{i}": (f"v1-{i}", f"Page {i}. {PARAGRAPH}") for i in range(4)
+        }
+        self.lastmods = {path: "2024-01-01" for path in self.pages}
+        # path -> redirect target path
+        self.redirects = {}
+        self.requests = []
+        self.lock = threading.Lock()
+
+
+@pytest.fixture
+def site():
+    site = Site()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/sitemap.xml":
+                urls = "".join(
+                    f"<url><loc>{path}</loc><lastmod>{lastmod}</lastmod></url>"
+                    for path, lastmod in site.lastmods.items()
+                )
+                self._send(200, {"Content-Type": "application/xml"}, urls)
+                return
+
+            with site.lock:
+                site.requests.append(self.path)
+            if self.path in site.redirects:
+                self._send(301, {"Location": site.redirects[self.path]})
+                return
+            etag, text = site.pages[self.path]
+            if self.headers.get("If-None-Match") == f'"{etag}"':
+                self._send(304, {"ETag": f'"{etag}"'})
+                return
+            body = f"<html><head><title>{self.path}</title></head><body><p>{text}</p></body></html>"
+            self._send(
+                200,
+                {"Content-Type": "text/html; charset=utf-8", "ETag": f'"{etag}"'},
+                body,
+            )
+
+        def _send(self, status, headers, body=""):
+            self.send_response(status)
+            for k, v in headers.items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(body.encode())
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    site.base_url = f"http://127.0.0.1:{server.server_port}"
+    yield site
+    server.shutdown()
+
+
+class FakeDocumentRepo:
+    """Keeps the documents in memory instead of the database."""
+
+    def __init__(self):
+        self.documents: dict[int, Document] = {}
+
+    def save(self, documents):
+        for doc in documents:
+            if doc.id is None:
+                doc.id = len(self.documents) + 1
+            doc.index_status = DocIndexTaskStatus.COMPLETED
+            self.documents[doc.id] = doc
+
+    def get_sync_states_by_datasource(self, session, datasource_id):
+        return [(d.id, d.source_uri, d.hash, d.meta) for d in self.documents.values()]
+
+    def must_get(self, session, doc_id):
+        return self.documents[doc_id]
+
+
+def sync(site, repo):
+    """Returns the loaded documents and the ids of the stale documents."""
+    site.requests.clear()
+    lastmods = extract_urls_from_sitemap(f"{site.base_url}/sitemap.xml")
+    loader = load_web_documents(
+        None, 1, 1, list(lastmods), render_js=False, sitemap_lastmods=lastmods
+    )
+    documents = []
+    while True:
+        try:
+            documents.append(next(loader))
+        except StopIteration as stop:
+            return documents, stop.value
+
+
+def test_resync_only_reindexes_changed_pages(site, monkeypatch):
+    repo = FakeDocumentRepo()
+    monkeypatch.setattr(web_base, "document_repo", repo)
+
+    documents, _ = sync(site, repo)
+    assert len(documents) == 4
+    assert all(d.hash == content_digest(d.content) for d in documents)
+    assert all(d.meta[SYNC_META_KEY]["etag"] for d in documents)
+    # The sync state is not part of the metadata of the indexed document.
+    assert documents[0].to_llama_document().metadata == {}
+    repo.save(documents)
+    ids = {d.source_uri: d.id for d in documents}
+
+    # Nothing changed: the pages with an unchanged lastmod are not even fetched.
+    assert sync(site, repo) == ([], [])
+    assert site.requests == []
+
+    # Page 0 changed, page 1 got a new ETag with the same content, and page 2
+    # was touched in the sitemap only.
+    site.pages["/page/0"] = ("v2-0", f"Page 0 changed. {PARAGRAPH}")
+    site.pages["/page/1"] = ("v2-1", site.pages["/page/1"][1])
+    for path in ("/page/0", "/page/1", "/page/2"):
+        site.lastmods[path] = "2024-02-01"
+
+    documents = {d.source_uri: d for d in sync(site, repo)[0]}
+    assert sorted(site.requests) == ["/page/0", "/page/1", "/page/2"]
+
+    # The changed page is re-indexed, in place of the existing document.
+    changed = documents[f"{site.base_url}/page/0"]
+    assert changed.id == ids[changed.source_uri]
+    assert changed.index_status == DocIndexTaskStatus.NOT_STARTED
+    assert "Page 0 changed" in changed.content
+    # The other pages only have their sync state updated.
+    for path in ("/page/1", "/page/2"):
+        doc = documents[f"{site.base_url}{path}"]
+        assert doc.index_status == DocIndexTaskStatus.COMPLETED
+        assert doc.meta[SYNC_META_KEY]["sitemap_lastmod"] == "2024-02-01"
+    assert documents[f"{site.base_url}/page/1"].meta[SYNC_META_KEY]["etag"] == '"v2-1"'
+    assert len(documents) == 3
+
+
+def test_resync_matches_legacy_documents_by_final_url(site, monkeypatch):
+    repo = FakeDocumentRepo()
+    monkeypatch.setattr(web_base, "document_repo", repo)
+
+    # Page 0 redirects to page 4, and was imported before the sync state was
+    # stored: the document only has the final URL.
+    site.pages["/page/4"] = ("v1-4", f"Page 4. {PARAGRAPH}")
+    site.redirects["/page/0"] = "/page/4"
+    documents, _ = sync(site, repo)
+    for doc in documents:
+        doc.meta = {}
+    repo.save(documents)
+    legacy = next(d for d in documents if d.source_uri.endswith("/page/4"))
+
+    documents, stale_ids = sync(site, repo)
+    assert len(repo.documents) == 4
+    assert {d.id for d in documents} == set(repo.documents)
+    # The content is unchanged, only the sync state is saved.
+    assert all(d.index_status == DocIndexTaskStatus.COMPLETED for d in documents)
+    assert legacy.meta[SYNC_META_KEY]["url"] == f"{site.base_url}/page/0"
+    assert stale_ids == []
+
+
+def test_resync_reports_the_pages_removed_from_the_sitemap(site, monkeypatch):
+    repo = FakeDocumentRepo()
+    monkeypatch.setattr(web_base, "document_repo", repo)
+
+    documents, _ = sync(site, repo)
+    repo.save(documents)
+    ids = {d.source_uri: d.id for d in documents}
+
+    del site.lastmods["/page/3"]
+    assert sync(site, repo) == ([], [ids[f"{site.base_url}/page/3"]])
@@ -1,7 +1,7 @@
 from enum import Enum
-from typing import List, Optional
+from typing import Dict, List, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from autoflow.configs.models.llms import LLMConfig
 from autoflow.configs.models.embeddings import EmbeddingModelConfig
 from autoflow.configs.models.rerankers import RerankerConfig
@@ -17,6 +17,35 @@ class IndexMethod(str, Enum):
 
 DEFAULT_INDEX_METHODS = [IndexMethod.VECTOR_SEARCH]
 
+# Ingestion Config
+
+
+class IngestionConfig(BaseModel):
+    """
+    The concurrency settings of the ingestion pipeline of `KnowledgeBase.add`,
+    which runs the stages load -> chunk -> embed -> store -> knowledge graph
+    extraction concurrently, connected by bounded queues.
+    """
+
+    # The max number of items buffered between two stages, which bounds the
+    # memory used by the documents in flight.
+    queue_size: int = Field(default=16, ge=1)
+    chunk_workers: int = Field(default=4, ge=1)
+    embed_workers: int = Field(default=2, ge=1)
+    # The max number of chunks (across documents) embedded per request.
+    embed_batch_size: int = Field(default=64, ge=1)
+    store_workers: int = Field(default=1, ge=1)
+    # The max number of documents written to the document store at once.
+    store_batch_size: int = Field(default=16, ge=1)
+    kg_workers: int = Field(default=4, ge=1)
+    # The max estimated tokens of the short chunks packed into one knowledge
+    # graph extraction call, 0 extracts each chunk with its own calls.
+    kg_pack_token_budget: int = Field(default=0, ge=0)
+    # The max requests per minute by model provider (e.g. {"openai": 500}),
+    # shared by the embedding and the knowledge graph extraction requests.
+    rate_limits: Dict[str, int] = Field(default_factory=dict)
+
+
 # Knowledge Base Config
 
 
@@ -1,19 +1,17 @@
 import logging
 import uuid
 from typing import List, Optional, Any
-from functools import partial
-from os import cpu_count
-from concurrent.futures import ThreadPoolExecutor
 
 from pydantic import Field, PrivateAttr
 from sqlalchemy import Engine
 from llama_index.core.base.llms.types import ChatResponse
 
 from autoflow.chunkers.base import Chunker
-from autoflow.chunkers.helper import get_chunker_for_datatype
-from autoflow.configs.knowledge_base import IndexMethod
+from autoflow.configs.knowledge_base import IndexMethod, IngestionConfig
 from autoflow.data_types import DataType, guess_datatype
+from autoflow.knowledge_base.ingestion import IngestionPipeline, ProgressCallback
 from autoflow.knowledge_base.prompts import QA_WITH_KNOWLEDGE_PROMPT_TEMPLATE
+from autoflow.knowledge_graph.extractors.cache import KGExtractionCache
 from autoflow.knowledge_graph.index import KnowledgeGraphIndex
 from autoflow.loaders.base import Loader
 from autoflow.loaders.helper import get_loader_for_datatype
@@ -23,6 +21,7 @@ from autoflow.models.llms.dspy import get_dspy_lm_by_llm
 from autoflow.models.rerank_models import RerankModel
 from autoflow.types import BaseComponent, SearchMode
 from autoflow.storage.doc_store import DocumentSearchResult, Document
+from autoflow.utils.rate_limit import ProviderRateLimiters
 
 logger = logging.getLogger(__name__)
 
@@ -45,7 +44,18 @@ class KnowledgeBase(BaseComponent):
         embedding_model: Optional[EmbeddingModel] = None,
         rerank_model: Optional[RerankModel] = None,
         max_workers: Optional[int] = None,
+        ingestion_config: Optional[IngestionConfig] = None,
+        kg_extraction_cache: Optional[KGExtractionCache] = None,
     ):
+        """
+        Args:
+            max_workers: Deprecated, use `ingestion_config` instead. If set, the
+                number of chunking and knowledge graph extraction workers.
+            ingestion_config: The concurrency settings and the provider rate
+                limits of `add`.
+            kg_extraction_cache: The cache of the knowledge graphs extracted
+                from the chunks, to rebuild the knowledge graph without LLM calls.
+        """
         super().__init__(
             namespace=namespace,
             name=name,
@@ -56,9 +66,16 @@ class KnowledgeBase(BaseComponent):
         self._llm = llm
         self._embedding_model = embedding_model
         self._reranker_model = rerank_model
+        self._kg_extraction_cache = kg_extraction_cache
+        if ingestion_config is None:
+            ingestion_config = IngestionConfig()
+            if max_workers is not None:
+                ingestion_config.chunk_workers = max_workers
+                ingestion_config.kg_workers = max_workers
+        self._ingestion_config = ingestion_config
+        self._rate_limiters = ProviderRateLimiters(ingestion_config.rate_limits)
         self._init_stores()
         self._init_indexes()
-        self._max_workers = max_workers or cpu_count()
 
     def _init_stores(self):
         from autoflow.storage.doc_store.tidb_doc_store import TiDBDocumentStore
@@ -83,6 +100,8 @@ class KnowledgeBase(BaseComponent):
             kg_store=self._kg_store,
             dspy_lm=self._dspy_lm,
             embedding_model=self._embedding_model,
+            extraction_cache=self._kg_extraction_cache,
+            pack_token_budget=self._ingestion_config.kg_pack_token_budget,
         )
 
     def class_name(self):
@@ -100,6 +119,7 @@ class KnowledgeBase(BaseComponent):
         data_type: Optional[DataType] = None,
         loader: Optional[Loader] = None,
         chunker: Optional[Chunker] = None,
+        progress_callback: Optional[ProgressCallback] = None,
     ) -> List[Document]:
         if data_type is None:
             data_type = guess_datatype(source)
@@ -109,23 +129,14 @@ class KnowledgeBase(BaseComponent):
         if loader is None:
             loader = get_loader_for_datatype(data_type)
 
-        with ThreadPoolExecutor(max_workers=self._max_workers) as executor:
-            build_index_for_document = partial(
-                self.build_index_for_document, chunker=chunker
-            )
-
-            results = executor.map(build_index_for_document, loader.load(source))
-
-        return_documents = []
-        for result in results:
-            return_documents.append(result)
-        return return_documents
+        pipeline = self._new_ingestion_pipeline(chunker)
+        return pipeline.run(loader.load(source), progress_callback)
 
     def build_index_for_document(
         self,
         document: Document,
         chunker: Optional[Chunker] = None,
-    ) -> List[Document]:
+    ) -> Document:
         """
         Build index for a document.
 
@@ -134,25 +145,24 @@ class KnowledgeBase(BaseComponent):
             chunker: The chunker to use to chunk the document.
 
         Returns:
-            A list of documents that are the result of indexing the original document.
+            The document stored with its chunks.
         """
         # TODO: handle duplicate documents.
-        if chunker is None:
-            chunker = get_chunker_for_datatype(document.data_type)
-
-        chunked_document = chunker.chunk(document)
-        self.add_document(chunked_document)
-
-        if IndexMethod.KNOWLEDGE_GRAPH in self.index_methods:
-
-            def add_chunk_to_kg(chunk):
-                logger.info("Adding chunk <id: %s> to knowledge graph.", chunk.id)
-                self._kg_index.add_chunk(chunk)
-
-            with ThreadPoolExecutor(max_workers=self._max_workers) as executor:
-                list(executor.map(add_chunk_to_kg, chunked_document.chunks))
-
-        return chunked_document
+        return self._new_ingestion_pipeline(chunker).run([document])[0]
+
+    def _new_ingestion_pipeline(
+        self, chunker: Optional[Chunker] = None
+    ) -> IngestionPipeline:
+        with_kg = IndexMethod.KNOWLEDGE_GRAPH in self.index_methods
+        return IngestionPipeline(
+            doc_store=self._doc_store,
+            embedding_model=self._embedding_model,
+            kg_index=self._kg_index if with_kg else None,
+            chunker=chunker,
+            config=self._ingestion_config,
+            rate_limiters=self._rate_limiters,
+            llm_model_name=getattr(self._llm, "model", None),
+        )
 
     # Document management.
 
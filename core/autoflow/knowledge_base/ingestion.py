@@ -0,0 +1,396 @@
+"""
+The ingestion pipeline of `KnowledgeBase.add`.
+
+The documents flow through the stages load -> chunk -> embed -> store ->
+knowledge graph extraction. Each stage runs its own pool of worker threads and
+is connected to the next one by a bounded queue, so the stages overlap across
+documents, a slow stage applies backpressure to the upstream stages instead of
+letting the documents pile up in memory, and the total number of threads is
+fixed by the config instead of multiplying with nested pools.
+
+The embed stage batches the chunks across documents, the store stage writes
+several documents per call, the knowledge graph stage may pack several short
+chunks into one extraction call, and the embedding and LLM requests are throttled
+by the rate limits of their model provider.
+"""
+
+import logging
+import math
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from autoflow.chunkers.base import Chunker
+from autoflow.chunkers.helper import get_chunker_for_datatype
+from autoflow.configs.knowledge_base import IngestionConfig
+from autoflow.knowledge_graph.extractors.packed import estimate_tokens
+from autoflow.models.embedding_models import EmbeddingModel
+from autoflow.storage.doc_store import Document
+from autoflow.storage.doc_store.base import DocumentStore
+from autoflow.utils.rate_limit import ProviderRateLimiters
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+@dataclass
+class IngestionProgress:
+    loaded: int = 0
+    chunked: int = 0
+    embedded_chunks: int = 0
+    stored: int = 0
+    kg_extracted_chunks: int = 0
+    completed: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def documents_per_second(self) -> float:
+        return self.completed / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def chunks_per_second(self) -> float:
+        return self.embedded_chunks / self.elapsed if self.elapsed > 0 else 0.0
+
+
+ProgressCallback = Callable[[IngestionProgress], None]
+
+
+class IngestionPipeline:
+    """
+    Args:
+        doc_store: The document store the chunked documents are added to.
+        embedding_model: The model embedding the chunks before they are stored,
+            if None, the document store is responsible for the embedding.
+        kg_index: The knowledge graph index the chunks are added to, if any.
+        chunker: The chunker of the documents, if None, it is chosen by the
+            data type of each document.
+        llm_model_name: The name of the LLM used by the knowledge graph
+            extraction, to apply the rate limit of its provider.
+    """
+
+    def __init__(
+        self,
+        doc_store: DocumentStore,
+        embedding_model: Optional[EmbeddingModel] = None,
+        kg_index: Optional[Any] = None,
+        chunker: Optional[Chunker] = None,
+        config: Optional[IngestionConfig] = None,
+        rate_limiters: Optional[ProviderRateLimiters] = None,
+        llm_model_name: Optional[str] = None,
+    ):
+        self._doc_store = doc_store
+        self._embedding_model = embedding_model
+        self._kg_index = kg_index
+        self._chunker = chunker
+        self._config = config or IngestionConfig()
+        rate_limiters = rate_limiters or ProviderRateLimiters(self._config.rate_limits)
+        self._embed_limiter = rate_limiters.for_model(
+            getattr(embedding_model, "model_name", None)
+        )
+        self._kg_limiter = rate_limiters.for_model(llm_model_name)
+
+    def run(
+        self,
+        documents: Iterable[Document],
+        progress_callback: Optional[ProgressCallback] = None,
+    ) -> List[Document]:
+        """
+        Ingest the documents, returns the stored documents in the order of the
+        input. Raises the first error of any stage, after the pipeline is drained.
+        """
+        run = _PipelineRun(self, progress_callback)
+        return run.execute(documents)
+
+    # Stage handlers, called by the worker threads with a batch of items.
+
+    def _chunk(self, document: Document) -> Document:
+        chunker = self._chunker or get_chunker_for_datatype(document.data_type)
+        return chunker.chunk(document)
+
+    def _embed(self, documents: List[Document]) -> int:
+        chunks = [
+            chunk
+            for doc in documents
+            for chunk in doc.chunks or []
+            if chunk.text_vec is None
+        ]
+        batch_size = self._config.embed_batch_size
+        # The model may split a batch into several requests of its own size.
+        model_batch_size = getattr(self._embedding_model, "embed_batch_size", None)
+        for i in range(0, len(chunks), batch_size):
+            batch = chunks[i : i + batch_size]
+            if self._embed_limiter is not None:
+                self._embed_limiter.acquire(
+                    math.ceil(len(batch) / (model_batch_size or len(batch)))
+                )
+            vectors = self._embedding_model.get_text_embedding_batch(
+                [chunk.text for chunk in batch]
+            )
+            for chunk, vector in zip(batch, vectors):
+                chunk.text_vec = vector
+        return len(chunks)
+
+    def _store(self, documents: List[Document]) -> List[Document]:
+        return self._doc_store.add(documents)
+
+    def _extract_kg(self, chunk) -> None:
+        if self._kg_limiter is not None:
+            self._kg_limiter.acquire()
+        logger.info("Adding chunk <id: %s> to knowledge graph.", chunk.id)
+        self._kg_index.add_chunk(chunk)
+
+    def _extract_kg_packed(self, chunks: List[Any]) -> None:
+        if self._kg_limiter is not None:
+            tokens = sum(estimate_tokens(chunk.text) for chunk in chunks)
+            self._kg_limiter.acquire(
+                math.ceil(tokens / self._config.kg_pack_token_budget)
+            )
+        logger.info("Adding %d chunks to knowledge graph.", len(chunks))
+        self._kg_index.add_chunks(chunks)
+
+
+class _PipelineRun:
+    """The state of a single run of the pipeline."""
+
+    def __init__(
+        self,
+        pipeline: IngestionPipeline,
+        progress_callback: Optional[ProgressCallback] = None,
+    ):
+        self._pipeline = pipeline
+        self._config = pipeline._config
+        self._progress_callback = progress_callback
+        self._progress = IngestionProgress()
+        self._results: Dict[int, Document] = {}
+        self._pending_kg_chunks: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self._error: Optional[BaseException] = None
+        self._started_at = 0.0
+
+    def execute(self, documents: Iterable[Document]) -> List[Document]:
+        config = self._config
+        pipeline = self._pipeline
+        with_embed = pipeline._embedding_model is not None
+        with_kg = pipeline._kg_index is not None
+
+        def new_queue() -> queue.Queue:
+            return queue.Queue(maxsize=config.queue_size)
+
+        chunk_q, store_q = new_queue(), new_queue()
+        embed_q = new_queue() if with_embed else store_q
+        kg_q = new_queue() if with_kg else None
+        store_workers, kg_workers = config.store_workers, config.kg_workers
+
+        threads = []
+        if with_kg and config.kg_pack_token_budget > 0:
+            threads += self._start_stage(
+                "kg",
+                kg_workers,
+                kg_q,
+                self._handle_kg_packed,
+                batch_size=config.kg_pack_token_budget,
+                item_size=lambda item: estimate_tokens(item[1].text),
+            )
+        elif with_kg:
+            threads += self._start_stage("kg", kg_workers, kg_q, self._handle_kg)
+        threads += self._start_stage(
+            "store",
+            store_workers,
+            store_q,
+            self._handle_store(kg_q),
+            batch_size=config.store_batch_size,
+            outbox=kg_q,
+            outbox_workers=kg_workers,
+        )
+        if with_embed:
+            threads += self._start_stage(
+                "embed",
+                config.embed_workers,
+                embed_q,
+                self._handle_embed(store_q),
+                batch_size=config.embed_batch_size,
+                item_size=lambda item: len(item[1].chunks or []) or 1,
+                outbox=store_q,
+                outbox_workers=store_workers,
+            )
+        threads += self._start_stage(
+            "chunk",
+            config.chunk_workers,
+            chunk_q,
+            self._handle_chunk(embed_q),
+            outbox=embed_q,
+            outbox_workers=config.embed_workers if with_embed else store_workers,
+        )
+
+        self._started_at = time.perf_counter()
+        try:
+            for index, document in enumerate(documents):
+                if self._error is not None:
+                    break
+                chunk_q.put((index, document))
+                self._update_progress(loaded=1)
+        except BaseException as e:
+            self._fail("load", e)
+        finally:
+            for _ in range(config.chunk_workers):
+                chunk_q.put(_STOP)
+            for thread in threads:
+                thread.join()
+
+        if self._error is not None:
+            raise self._error
+
+        progress = self._progress
+        logger.info(
+            "Ingested %d documents (%d chunks) in %.2fs, %.2f documents/s.",
+            progress.completed,
+            progress.embedded_chunks,
+            progress.elapsed,
+            progress.documents_per_second,
+        )
+        return [self._results[i] for i in sorted(self._results)]
+
+    # Stages.
+
+    def _start_stage(
+        self,
+        name: str,
+        workers: int,
+        inbox: queue.Queue,
+        handle: Callable[[List[Any]], None],
+        batch_size: int = 1,
+        item_size: Callable[[Any], int] = lambda item: 1,
+        outbox: Optional[queue.Queue] = None,
+        outbox_workers: int = 0,
+    ) -> List[threading.Thread]:
+        remaining = [workers]
+        remaining_lock = threading.Lock()
+
+        def work():
+            stopped = False
+            while not stopped:
+                batch, stopped = self._take(inbox, batch_size, item_size)
+                # After a failure, the items are drained without being processed,
+                # so the upstream stages are never blocked on a full queue.
+                if batch and self._error is None:
+                    try:
+                        handle(batch)
+                    except BaseException as e:
+                        self._fail(name, e)
+            with remaining_lock:
+                remaining[0] -= 1
+                is_last = remaining[0] == 0
+            if is_last and outbox is not None:
+                for _ in range(outbox_workers):
+                    outbox.put(_STOP)
+
+        threads = [
+            threading.Thread(target=work, name=f"ingestion-{name}-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in threads:
+            thread.start()
+        return threads
+
+    @staticmethod
+    def _take(
+        inbox: queue.Queue, batch_size: int, item_size: Callable[[Any], int]
+    ) -> Tuple[List[Any], bool]:
+        """
+        Take an item, and the items already queued up to `batch_size`, returns
+        the batch and whether the stop signal was received.
+        """
+        item = inbox.get()
+        if item is _STOP:
+            return [], True
+        batch, size = [item], item_size(item)
+        while size < batch_size:
+            try:
+                item = inbox.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+            size += item_size(item)
+        return batch, False
+
+    def _handle_chunk(self, outbox: queue.Queue):
+        def handle(batch: List[Tuple[int, Document]]):
+            for index, document in batch:
+                chunked = self._pipeline._chunk(document)
+                self._update_progress(chunked=1)
+                outbox.put((index, chunked))
+
+        return handle
+
+    def _handle_embed(self, outbox: queue.Queue):
+        def handle(batch: List[Tuple[int, Document]]):
+            embedded = self._pipeline._embed([document for _, document in batch])
+            self._update_progress(embedded_chunks=embedded)
+            for item in batch:
+                outbox.put(item)
+
+        return handle
+
+    def _handle_store(self, kg_outbox: Optional[queue.Queue]):
+        def handle(batch: List[Tuple[int, Document]]):
+            stored = self._pipeline._store([document for _, document in batch])
+            self._update_progress(stored=len(stored))
+            for (index, _), document in zip(batch, stored):
+                self._results[index] = document
+                if kg_outbox is None or not document.chunks:
+                    self._complete()
+                    continue
+                with self._lock:
+                    self._pending_kg_chunks[index] = len(document.chunks)
+                for chunk in document.chunks:
+                    kg_outbox.put((index, chunk))
+
+        return handle
+
+    def _handle_kg(self, batch: List[Tuple[int, Any]]):
+        for index, chunk in batch:
+            self._pipeline._extract_kg(chunk)
+            with self._lock:
+                self._pending_kg_chunks[index] -= 1
+                is_done = self._pending_kg_chunks[index] == 0
+            self._update_progress(kg_extracted_chunks=1)
+            if is_done:
+                self._complete()
+
+    def _handle_kg_packed(self, batch: List[Tuple[int, Any]]):
+        self._pipeline._extract_kg_packed([chunk for _, chunk in batch])
+        done = []
+        with self._lock:
+            for index, _ in batch:
+                self._pending_kg_chunks[index] -= 1
+                if self._pending_kg_chunks[index] == 0:
+                    done.append(index)
+        self._update_progress(kg_extracted_chunks=len(batch))
+        for _ in done:
+            self._complete()
+
+    # Bookkeeping.
+
+    def _fail(self, stage: str, error: BaseException):
+        logger.error("Ingestion failed at the %s stage: %s", stage, error)
+        with self._lock:
+            if self._error is None:
+                self._error = error
+
+    def _update_progress(self, **increments: int):
+        with self._lock:
+            for name, value in increments.items():
+                setattr(self._progress, name, getattr(self._progress, name) + value)
+            self._progress.elapsed = time.perf_counter() - self._started_at
+
+    def _complete(self):
+        self._update_progress(completed=1)
+        if self._progress_callback is not None:
+            with self._lock:
+                progress = IngestionProgress(**vars(self._progress))
+            self._progress_callback(progress)
@@ -1,4 +1,5 @@
 from abc import abstractmethod
+from typing import List
 
 from autoflow.types import BaseComponent
 from autoflow.knowledge_graph.types import GeneratedKnowledgeGraph
@@ -11,3 +12,7 @@ class KGExtractor(BaseComponent):
     @abstractmethod
     def extract(self, text: str) -> GeneratedKnowledgeGraph:
         raise NotImplementedError()
+
+    def extract_many(self, texts: List[str]) -> List[GeneratedKnowledgeGraph]:
+        """Extract the knowledge graph of each text, in the order of the input."""
+        return [self.extract(text) for text in texts]
@@ -0,0 +1,102 @@
+import json
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import dspy
+from pydantic import BaseModel
+
+from autoflow.utils.hash import sha256
+
+# The LM settings which do not change the output of the model.
+_IGNORED_LM_KWARGS = {"api_key", "timeout", "num_retries"}
+
+
+class KGExtractionCache(ABC):
+    """
+    A persistent cache of the knowledge graphs extracted from the chunks, keyed
+    by `get_extraction_cache_key`.
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError()
+
+    @abstractmethod
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        raise NotImplementedError()
+
+
+class SQLiteKGExtractionCache(KGExtractionCache):
+    """A KGExtractionCache stored in a local SQLite database file."""
+
+    def __init__(self, path: str | Path):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS kg_extraction_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+            )
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM kg_extraction_cache WHERE key = ?", (key,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO kg_extraction_cache (key, value) VALUES (?, ?)",
+                (key, json.dumps(value)),
+            )
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def get_program_version(*programs: dspy.Module) -> str:
+    """
+    The version of the extraction programs: a digest of the instructions, the
+    fields and the demos of their predictors, which make up the prompts.
+    """
+    parts = []
+    for program in programs:
+        for name, predictor in program.named_predictors():
+            signature = predictor.signature
+            parts.append(
+                {
+                    "name": name,
+                    "instructions": signature.instructions,
+                    "fields": {
+                        field_name: [
+                            _describe_type(field.annotation),
+                            field.json_schema_extra,
+                        ]
+                        for field_name, field in signature.fields.items()
+                    },
+                    "demos": predictor.demos,
+                }
+            )
+    return sha256(json.dumps(parts, sort_keys=True, default=str))
+
+
+def _describe_type(annotation: Any) -> Any:
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation.model_json_schema()
+    return str(annotation)
+
+
+def get_lm_identity(dspy_lm: dspy.LM) -> str:
+    """The model and the settings of the LM which affect its output."""
+    kwargs = {k: v for k, v in dspy_lm.kwargs.items() if k not in _IGNORED_LM_KWARGS}
+    return json.dumps({"model": dspy_lm.model, **kwargs}, sort_keys=True, default=str)
+
+
+def get_extraction_cache_key(text: str, program_version: str, lm_identity: str) -> str:
+    return sha256(f"{sha256(text)}:{program_version}:{lm_identity}")
@@ -0,0 +1,131 @@
+import logging
+import math
+from typing import List, Optional
+
+import dspy
+
+from autoflow.knowledge_graph.extractors.cache import (
+    KGExtractionCache,
+    get_program_version,
+)
+from autoflow.knowledge_graph.extractors.simple import SimpleKGExtractor
+from autoflow.knowledge_graph.programs.extract_packed_graph import (
+    PackedKnowledgeGraphExtractor,
+)
+from autoflow.knowledge_graph.types import GeneratedKnowledgeGraph
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PACK_TOKEN_BUDGET = 2048
+DEFAULT_MAX_CHUNKS_PER_PACK = 8
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    A rough estimation of the tokens of the text (~4 characters per token), which
+    is enough to bound the size of a packed prompt without loading the tokenizer
+    of the LM.
+    """
+    return math.ceil(len(text) / 4)
+
+
+class PackedKGExtractor(SimpleKGExtractor):
+    """
+    Extracts the knowledge graphs of several short chunks with a single LLM call,
+    which also extracts the covariates of the entities, instead of two calls per
+    chunk.
+
+    The chunks missing in the output of a packed call are extracted one by one,
+    the same way as the `SimpleKGExtractor`.
+    """
+
+    def __init__(
+        self,
+        dspy_lm: dspy.LM,
+        token_budget: int = DEFAULT_PACK_TOKEN_BUDGET,
+        max_chunks_per_pack: int = DEFAULT_MAX_CHUNKS_PER_PACK,
+        cache: Optional[KGExtractionCache] = None,
+    ):
+        """
+        Args:
+            token_budget: The max estimated tokens of the chunks packed into one
+                call, a longer chunk is extracted in a call of its own.
+            max_chunks_per_pack: The max number of chunks packed into one call.
+        """
+        super().__init__(dspy_lm, cache=cache)
+        self._token_budget = token_budget
+        self._max_chunks_per_pack = max_chunks_per_pack
+        self._packed_extractor = PackedKnowledgeGraphExtractor(dspy_lm)
+        if cache is not None:
+            self._program_version = get_program_version(
+                self._graph_extractor,
+                self._entity_metadata_extractor,
+                self._packed_extractor,
+            )
+
+    def extract(self, text: str) -> GeneratedKnowledgeGraph:
+        return self.extract_many([text])[0]
+
+    def extract_many(self, texts: List[str]) -> List[GeneratedKnowledgeGraph]:
+        results: List[Optional[GeneratedKnowledgeGraph]] = [None] * len(texts)
+        if self._cache is not None:
+            for i, text in enumerate(texts):
+                results[i] = self._get_cached(text)
+
+        pending = [
+            i for i, knowledge_graph in enumerate(results) if knowledge_graph is None
+        ]
+        for pack in self._pack([texts[i] for i in pending]):
+            positions = [pending[j] for j in pack]
+            knowledge_graphs = self._extract_pack([texts[i] for i in positions])
+            for i, knowledge_graph in zip(positions, knowledge_graphs):
+                if knowledge_graph is None:
+                    logger.warning(
+                        "Chunk %d is missing in the packed extraction, "
+                        "extracting it on its own.",
+                        i,
+                    )
+                    knowledge_graph = self._extract(texts[i])
+                if self._cache is not None:
+                    self._set_cached(texts[i], knowledge_graph)
+                results[i] = knowledge_graph
+
+        return results
+
+    def _pack(self, texts: List[str]) -> List[List[int]]:
+        """
+        Pack the texts greedily in the order of the input, returns the indexes of
+        the texts of each pack.
+        """
+        packs, pack, pack_tokens = [], [], 0
+        for i, text in enumerate(texts):
+            tokens = estimate_tokens(text)
+            if pack and (
+                pack_tokens + tokens > self._token_budget
+                or len(pack) >= self._max_chunks_per_pack
+            ):
+                packs.append(pack)
+                pack, pack_tokens = [], 0
+            pack.append(i)
+            pack_tokens += tokens
+        if pack:
+            packs.append(pack)
+        return packs
+
+    def _extract_pack(
+        self, texts: List[str]
+    ) -> List[Optional[GeneratedKnowledgeGraph]]:
+        if len(texts) == 1 and estimate_tokens(texts[0]) > self._token_budget:
+            # A long chunk gains nothing from the packed prompt, keep the prompts
+            # tuned for a single text.
+            return [self._extract(texts[0])]
+        try:
+            return self._packed_extractor.forward(texts)
+        except Exception as e:
+            logger.warning(
+                "Failed to extract %d chunks in a packed call, extracting them "
+                "one by one: %s",
+                len(texts),
+                e,
+            )
+            return [None] * len(texts)
@@ -1,21 +1,65 @@
+import logging
+from typing import Optional
+
 import dspy
 
 from autoflow.knowledge_graph.extractors.base import KGExtractor
+from autoflow.knowledge_graph.extractors.cache import (
+    KGExtractionCache,
+    get_extraction_cache_key,
+    get_lm_identity,
+    get_program_version,
+)
 from autoflow.knowledge_graph.programs.extract_covariates import (
     EntityCovariateExtractor,
 )
 from autoflow.knowledge_graph.programs.extract_graph import KnowledgeGraphExtractor
 from autoflow.knowledge_graph.types import GeneratedKnowledgeGraph
 
+logger = logging.getLogger(__name__)
+
 
 class SimpleKGExtractor(KGExtractor):
-    def __init__(self, dspy_lm: dspy.LM):
+    def __init__(self, dspy_lm: dspy.LM, cache: Optional[KGExtractionCache] = None):
+        """
+        Args:
+            cache: If set, the knowledge graph extracted from a text is replayed
+                from the cache, as long as the programs and the LM are unchanged.
+        """
         super().__init__()
         self._dspy_lm = dspy_lm
         self._graph_extractor = KnowledgeGraphExtractor(dspy_lm)
         self._entity_metadata_extractor = EntityCovariateExtractor(dspy_lm)
+        self._cache = cache
+        if cache is not None:
+            self._program_version = get_program_version(
+                self._graph_extractor, self._entity_metadata_extractor
+            )
+            self._lm_identity = get_lm_identity(dspy_lm)
 
     def extract(self, text: str) -> GeneratedKnowledgeGraph:
+        if self._cache is None:
+            return self._extract(text)
+
+        knowledge_graph = self._get_cached(text)
+        if knowledge_graph is None:
+            knowledge_graph = self._extract(text)
+            self._set_cached(text, knowledge_graph)
+        return knowledge_graph
+
+    def _get_cached(self, text: str) -> Optional[GeneratedKnowledgeGraph]:
+        key = get_extraction_cache_key(text, self._program_version, self._lm_identity)
+        cached = self._cache.get(key)
+        if cached is None:
+            return None
+        logger.debug("Replaying the cached knowledge graph <key: %s>.", key)
+        return GeneratedKnowledgeGraph.model_validate(cached)
+
+    def _set_cached(self, text: str, knowledge_graph: GeneratedKnowledgeGraph):
+        key = get_extraction_cache_key(text, self._program_version, self._lm_identity)
+        self._cache.set(key, knowledge_graph.model_dump(mode="json"))
+
+    def _extract(self, text: str) -> GeneratedKnowledgeGraph:
         knowledge_graph = self._graph_extractor.forward(text)
         knowledge_graph.entities = self._entity_metadata_extractor.forward(
             text, knowledge_graph.entities
@@ -1,8 +1,10 @@
 import logging
-from typing import Optional
+from typing import List, Optional
 
 import dspy
 
+from autoflow.knowledge_graph.extractors.cache import KGExtractionCache
+from autoflow.knowledge_graph.extractors.packed import PackedKGExtractor
 from autoflow.knowledge_graph.extractors.simple import SimpleKGExtractor
 from autoflow.knowledge_graph.retrievers.weighted import WeightedGraphRetriever
 from autoflow.knowledge_graph.types import (
@@ -24,12 +26,29 @@ class KnowledgeGraphIndex(BaseComponent):
         kg_store: GraphStore,
         dspy_lm: dspy.LM,
         embedding_model: EmbeddingModel,
+        extraction_cache: Optional[KGExtractionCache] = None,
+        pack_token_budget: int = 0,
     ):
+        """
+        Args:
+            pack_token_budget: If greater than 0, `add_chunks` packs the short
+                chunks into one extraction call, within this estimated number of
+                tokens, instead of extracting each chunk with its own calls.
+        """
         super().__init__()
         self._kg_store = kg_store
         self._dspy_lm = dspy_lm
         self._embedding_model = embedding_model
-        self._kg_extractor = SimpleKGExtractor(self._dspy_lm)
+        if pack_token_budget > 0:
+            self._kg_extractor = PackedKGExtractor(
+                self._dspy_lm,
+                token_budget=pack_token_budget,
+                cache=extraction_cache,
+            )
+        else:
+            self._kg_extractor = SimpleKGExtractor(
+                self._dspy_lm, cache=extraction_cache
+            )
 
     def add_text(self, text: str) -> Optional[KnowledgeGraph]:
         knowledge_graph = self._kg_extractor.extract(text)
@@ -45,10 +64,47 @@ class KnowledgeGraphIndex(BaseComponent):
             return None
 
         logger.info("Extracting knowledge graph from chunk %s", chunk.id)
-        knowledge_graph = self._kg_extractor.extract(chunk)
+        knowledge_graph = self._kg_extractor.extract(chunk.text)
         logger.info("Knowledge graph extracted from chunk %s", chunk.id)
 
-        return self._kg_store.add(knowledge_graph.to_create())
+        return self._kg_store.add(
+            knowledge_graph.to_create(chunk_id=chunk.id, document_id=chunk.document_id)
+        )
+
+    def add_chunks(self, chunks: List[Chunk]) -> List[Optional[KnowledgeGraph]]:
+        """
+        Add the chunks to the knowledge graph, extracting their knowledge graphs
+        together, returns the subgraph added for each chunk, or None if the chunk
+        has been added before.
+        """
+        exists_chunk_ids = {
+            rel.chunk_id
+            for rel in self._kg_store.list_relationships(
+                chunk_id=[chunk.id for chunk in chunks]
+            )
+        }
+        new_chunks = [chunk for chunk in chunks if chunk.id not in exists_chunk_ids]
+        if len(new_chunks) < len(chunks):
+            logger.warning(
+                "The subgraphs of %d chunks have already been added, skip.",
+                len(chunks) - len(new_chunks),
+            )
+
+        logger.info("Extracting knowledge graph from %d chunks", len(new_chunks))
+        knowledge_graphs = self._kg_extractor.extract_many(
+            [chunk.text for chunk in new_chunks]
+        )
+        logger.info("Knowledge graph extracted from %d chunks", len(new_chunks))
+
+        added = {
+            chunk.id: self._kg_store.add(
+                knowledge_graph.to_create(
+                    chunk_id=chunk.id, document_id=chunk.document_id
+                )
+            )
+            for chunk, knowledge_graph in zip(new_chunks, knowledge_graphs)
+        }
+        return [added.get(chunk.id) for chunk in chunks]
 
     def retrieve(
         self,
@@ -1,4 +1,9 @@
 from .extract_graph import ExtractKnowledgeGraph
 from .extract_covariates import ExtractEntityCovariate
+from .extract_packed_graph import ExtractPackedKnowledgeGraph
 
-__all__ = ["ExtractKnowledgeGraph", "ExtractEntityCovariate"]
+__all__ = [
+    "ExtractKnowledgeGraph",
+    "ExtractEntityCovariate",
+    "ExtractPackedKnowledgeGraph",
+]
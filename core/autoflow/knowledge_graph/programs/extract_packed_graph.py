@@ -0,0 +1,165 @@
+import logging
+from typing import Any, Dict, List, Mapping, Optional
+
+import dspy
+from dspy import Predict
+from pydantic import BaseModel, Field
+
+from autoflow.knowledge_graph.programs.extract_graph import (
+    ExtractKnowledgeGraph,
+    PredictEntity,
+    PredictRelationship,
+)
+from autoflow.knowledge_graph.types import (
+    GeneratedEntity,
+    GeneratedKnowledgeGraph,
+    GeneratedRelationship,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class PackedChunk(BaseModel):
+    """A chunk of text packed into the extraction request."""
+
+    chunk_index: int = Field(description="Index of the chunk in the request")
+    text: str = Field(description="Text of the chunk")
+
+
+class PredictEntityWithCovariates(PredictEntity):
+    """Entity extracted from the chunk, with the covariates to claim it"""
+
+    covariates: Mapping[str, Any] = Field(
+        description=(
+            "The attributes (which is a comprehensive json TREE, the first field is always: 'topic') to claim the entity. "
+        )
+    )
+
+
+class PredictChunkKnowledgeGraph(BaseModel):
+    """Graph representation of the knowledge for one chunk."""
+
+    chunk_index: int = Field(
+        description="Index of the chunk the knowledge is extracted from"
+    )
+    entities: List[PredictEntityWithCovariates] = Field(
+        description="List of entities in the knowledge graph of the chunk"
+    )
+    relationships: List[PredictRelationship] = Field(
+        description="List of relationships in the knowledge graph of the chunk"
+    )
+
+
+class ExtractPackedKnowledgeGraph(dspy.Signature):
+    # The instructions of the single chunk extraction, extended with the
+    # covariate extraction and the rules to keep the chunks apart.
+    __doc__ = (
+        ExtractKnowledgeGraph.__doc__.replace(
+            "Please only response in JSON format.", ""
+        ).rstrip()
+        + """
+
+    The input is a list of independent chunks, each one is identified by its chunk_index.
+
+    3. Extract Covariates:
+      - For each entity, extract the covariates (which is a comprehensive json TREE, the first field is always: "topic") to claim the entity.
+      - Ensure that all extracted covariates are factual and verifiable within the chunk itself, without relying on external knowledge or assumptions.
+
+    4. Keep the Chunks Apart:
+      - Respond exactly one knowledge graph for each chunk, with the chunk_index of the chunk.
+      - Only extract the entities, relationships and covariates of a chunk from the text of this chunk.
+      - Every relationship must connect two entities of the same chunk, repeat an entity in each chunk it appears in.
+
+    Please only response in JSON format.
+    """
+    )
+
+    chunks: List[PackedChunk] = dspy.InputField(
+        desc="the chunks of text to extract entities and relationships to form a knowledge graph per chunk"
+    )
+    knowledge: List[PredictChunkKnowledgeGraph] = dspy.OutputField(
+        desc="Graph representation of the knowledge extracted from each chunk."
+    )
+
+
+class PackedKnowledgeGraphExtractor(dspy.Module):
+    """
+    Extracts the knowledge graphs and the entity covariates of several chunks
+    with a single LLM call.
+    """
+
+    def __init__(self, dspy_lm: dspy.LM):
+        super().__init__()
+        self.dspy_lm = dspy_lm
+        self.program = Predict(ExtractPackedKnowledgeGraph)
+
+    def forward(self, texts: List[str]) -> List[Optional[GeneratedKnowledgeGraph]]:
+        """
+        Returns the knowledge graph of each text, in the order of the input, or
+        None for the texts missing in the output of the LM.
+        """
+        with dspy.settings.context(lm=self.dspy_lm):
+            prediction = self.program(
+                chunks=[
+                    PackedChunk(chunk_index=i, text=text)
+                    for i, text in enumerate(texts)
+                ]
+            )
+
+        results: Dict[int, GeneratedKnowledgeGraph] = {}
+        for graph in prediction.knowledge:
+            if not 0 <= graph.chunk_index < len(texts):
+                logger.warning(
+                    "Unknown chunk index %d in the packed extraction, skip.",
+                    graph.chunk_index,
+                )
+                continue
+            knowledge_graph = results.setdefault(
+                graph.chunk_index,
+                GeneratedKnowledgeGraph(entities=[], relationships=[]),
+            )
+            knowledge_graph.entities.extend(
+                GeneratedEntity(
+                    name=entity.name,
+                    description=entity.description,
+                    meta=dict(entity.covariates or {}),
+                )
+                for entity in graph.entities
+            )
+            knowledge_graph.relationships.extend(
+                GeneratedRelationship(
+                    source_entity_name=relationship.source_entity,
+                    target_entity_name=relationship.target_entity,
+                    description=relationship.relationship_desc,
+                    meta={},
+                )
+                for relationship in graph.relationships
+            )
+
+        _attach_borrowed_entities(results)
+        return [results.get(i) for i in range(len(texts))]
+
+
+def _attach_borrowed_entities(results: Dict[int, GeneratedKnowledgeGraph]) -> None:
+    """
+    A relationship of a chunk may refer to an entity the LM only listed under
+    another chunk of the request, copy such entities to the chunk, so that each
+    graph is complete on its own.
+    """
+    entities_by_name = {}
+    for knowledge_graph in results.values():
+        for entity in knowledge_graph.entities:
+            entities_by_name.setdefault(entity.name, entity)
+
+    for knowledge_graph in results.values():
+        names = {entity.name for entity in knowledge_graph.entities}
+        for relationship in knowledge_graph.relationships:
+            for name in (
+                relationship.source_entity_name,
+                relationship.target_entity_name,
+            ):
+                if name not in names and name in entities_by_name:
+                    knowledge_graph.entities.append(
+                        entities_by_name[name].model_copy(deep=True)
+                    )
+                    names.add(name)
@@ -1,5 +1,5 @@
-from collections import defaultdict
-from typing import List, Set, Tuple, Optional
+from typing import Dict, List, Set, Tuple, Optional
+from uuid import UUID
 
 from autoflow.knowledge_graph.types import (
     RetrievedKnowledgeGraph,
@@ -75,12 +75,18 @@ class WeightedGraphRetriever(KGRetriever):
 
         visited_relationships = set()
         visited_entities = set()
+        # The entities and degrees fetched by this retrieval, by entity id, so
+        # none of them is fetched twice across the hops.
+        entity_map: Dict[UUID, Entity] = {}
+        entity_degrees: Dict[UUID, EntityDegree] = {}
 
         new_relationships = self._weighted_search_relationships(
             query_embedding=query_embedding,
             visited_relationships=visited_relationships,
             visited_entities=visited_entities,
             metadata_filters=metadata_filters,
+            entity_map=entity_map,
+            entity_degrees=entity_degrees,
         )
 
         if len(new_relationships) == 0:
@@ -126,6 +132,8 @@ class WeightedGraphRetriever(KGRetriever):
                     search_distance_range=search_distance_range,
                     top_k=expected_number,
                     metadata_filters=metadata_filters,
+                    entity_map=entity_map,
+                    entity_degrees=entity_degrees,
                 )
 
                 for rel, score in new_relationships:
@@ -153,12 +161,12 @@ class WeightedGraphRetriever(KGRetriever):
             ),
         )
         if len(synopsis_entities) > 0:
-            visited_entities.update(synopsis_entities)
+            visited_entities.update(entity for entity, _ in synopsis_entities)
 
         # Rerank final relationships.
         return_relationships = list(visited_relationships)
         return_relationships.sort(key=lambda x: x.score, reverse=True)
-        self._fill_entity(return_relationships)
+        self._fill_entity(return_relationships, entity_map)
 
         return_entities = [Entity(**e.model_dump()) for e in visited_entities]
 
@@ -167,14 +175,20 @@ class WeightedGraphRetriever(KGRetriever):
             relationships=return_relationships,
         )
 
-    def _fill_entity(self, relationships: List[RetrievedRelationship]):
+    def _fill_entity(
+        self,
+        relationships: List[RetrievedRelationship],
+        entity_map: Dict[UUID, Entity],
+    ):
         # FIXME: pytidb should return the relationship field: target_entity, source_entity.
-        entity_ids = [item.target_entity_id for item in relationships]
-        entity_ids.extend([item.source_entity_id for item in relationships])
-        entities = self._kg_store.list_entities(
-            filters=EntityFilters(entity_id=entity_ids)
-        )
-        entity_map = {entity.id: entity for entity in entities}
+        entity_ids = {item.target_entity_id for item in relationships}
+        entity_ids.update(item.source_entity_id for item in relationships)
+        missing_entity_ids = list(entity_ids - entity_map.keys())
+        if missing_entity_ids:
+            entities = self._kg_store.list_entities(
+                filters=EntityFilters(entity_id=missing_entity_ids)
+            )
+            entity_map.update((entity.id, entity) for entity in entities)
         for rel in relationships:
             rel.target_entity = Entity(**entity_map[rel.target_entity_id].model_dump())
             rel.source_entity = Entity(**entity_map[rel.source_entity_id].model_dump())
@@ -187,6 +201,8 @@ class WeightedGraphRetriever(KGRetriever):
         search_distance_range: Tuple[float, float] = (0, 1),
         top_k: int = 10,
         metadata_filters: Optional[dict] = None,
+        entity_map: Optional[Dict[UUID, Entity]] = None,
+        entity_degrees: Optional[Dict[UUID, EntityDegree]] = None,
     ) -> List[RetrievedRelationship]:
         visited_entity_ids = [e.id for e in visited_entities]
         visited_relationship_ids = [r.id for r in visited_relationships]
@@ -199,36 +215,48 @@ class WeightedGraphRetriever(KGRetriever):
             ),
             distance_range=search_distance_range,
             top_k=top_k,
+            entity_map=entity_map,
         )
 
         return self._rank_relationships(
             relationships_with_score=relationships_with_score,
             top_k=top_k,
+            entity_degrees=entity_degrees,
         )
 
     def _rank_relationships(
         self,
         relationships_with_score: List[Tuple[Relationship, float]],
         top_k: int = 10,
+        entity_degrees: Optional[Dict[UUID, EntityDegree]] = None,
     ) -> List[Tuple[Relationship, float]]:
         """
         Rerank the relationship based on distance and weight
         """
         # TODO: the degree can br pre-calc and stored in the database in advanced.
+        entity_degrees = entity_degrees if entity_degrees is not None else {}
         if self.with_degree:
             entity_ids = set()
             for r, _ in relationships_with_score:
                 entity_ids.add(r.source_entity_id)
                 entity_ids.add(r.target_entity_id)
-            entity_degrees = self._kg_store.bulk_calc_entities_degrees(entity_ids)
-        else:
-            entity_degrees = defaultdict(EntityDegree)
+            # The degrees of all the new entities of the hop in a single query.
+            missing_entity_ids = entity_ids - entity_degrees.keys()
+            if missing_entity_ids:
+                entity_degrees.update(
+                    self._kg_store.calc_entities_degrees(missing_entity_ids)
+                )
 
+        no_degree = EntityDegree()
         reranked_relationships = []
         for r, similarity_score in relationships_with_score:
             embedding_distance = 1 - similarity_score
-            source_in_degree = entity_degrees[r.source_entity_id].in_degree
-            target_out_degree = entity_degrees[r.target_entity_id].out_degree
+            source_in_degree = entity_degrees.get(
+                r.source_entity_id, no_degree
+            ).in_degree
+            target_out_degree = entity_degrees.get(
+                r.target_entity_id, no_degree
+            ).out_degree
             final_score = self._calc_relationship_weighted_score(
                 embedding_distance,
                 r.weight,
@@ -0,0 +1,282 @@
+"""
+Concurrent web crawler used by the `WebpageLoader`.
+
+Pages are first fetched with plain HTTP. Only pages that look like they need
+JavaScript to render their content (or every page, if the loader asks for it)
+are rendered with Chromium, using a bounded pool of browser contexts that
+are recycled after a number of pages to bound their memory. The number of
+concurrent requests is limited both globally and per host.
+
+The crawler runs on an event loop in a background thread, the pages are handed
+over to the synchronous `crawl_web_pages` generator through a bounded queue, so
+the crawling continues while the consumer processes the previous pages.
+
+The backend has its own crawler (`app.rag.datasource.web_crawler`), which adds
+the conditional requests of the incremental syncs: the backend does not depend
+on this package.
+"""
+
+import asyncio
+import logging
+import queue
+import re
+import threading
+from dataclasses import dataclass
+from typing import AsyncIterator, Generator, Optional, Tuple
+from urllib.parse import urlparse
+
+import httpx
+from bs4 import BeautifulSoup
+
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = "Mozilla/5.0 (compatible; AutoFlowCrawler/1.0)"
+
+# Markers of client-side rendered pages, whose static HTML is only a shell.
+JS_APP_MARKERS = re.compile(
+    r'<div[^>]+id=["\'](root|app|__next|__nuxt)["\'][^>]*>\s*</div>'
+    r"|enable javascript to run this app"
+    r"|you need to enable javascript",
+    re.IGNORECASE,
+)
+# A page whose static HTML has less visible text than this is rendered by the
+# browser, in case its content is loaded by scripts.
+MIN_STATIC_TEXT_LENGTH = 200
+
+
+@dataclass
+class WebPage:
+    url: str
+    final_url: str
+    html: str
+    title: str
+
+
+def inspect_static_html(html: str) -> Tuple[str, bool]:
+    """Returns the title of the page and whether it needs JavaScript to render."""
+    soup = BeautifulSoup(html, "html.parser")
+    title = soup.title.get_text(strip=True) if soup.title else ""
+    if JS_APP_MARKERS.search(html):
+        return title, True
+    for tag in soup(["script", "style", "noscript", "template"]):
+        tag.extract()
+    body = soup.body or soup
+    return title, len(body.get_text(" ", strip=True)) < MIN_STATIC_TEXT_LENGTH
+
+
+class BrowserPool:
+    """
+    A bounded pool of Chromium browser contexts. The browser is launched on the
+    first use, and a context is closed and replaced after it has rendered
+    `pages_per_context` pages.
+    """
+
+    def __init__(self, max_contexts: int, pages_per_context: int, timeout: float):
+        self._max_contexts = max_contexts
+        self._pages_per_context = pages_per_context
+        self._timeout = timeout
+        self._playwright = None
+        self._browser = None
+        self._launch_lock = asyncio.Lock()
+        self._contexts: Optional[asyncio.Queue] = None
+
+    async def _ensure_browser(self):
+        async with self._launch_lock:
+            if self._browser is not None:
+                return
+            from playwright.async_api import async_playwright
+
+            self._playwright = await async_playwright().start()
+            self._browser = await self._playwright.chromium.launch(headless=True)
+            self._contexts = asyncio.Queue()
+            for _ in range(self._max_contexts):
+                self._contexts.put_nowait((await self._new_context(), 0))
+
+    async def _new_context(self):
+        return await self._browser.new_context(user_agent=USER_AGENT)
+
+    async def render(self, url: str) -> Optional[WebPage]:
+        await self._ensure_browser()
+        context, used = await self._contexts.get()
+        page = None
+        try:
+            page = await context.new_page()
+            response = await page.goto(url, timeout=self._timeout * 1000)
+            if response is None or response.status >= 400:
+                logger.error(
+                    f"Failed to load page: {url}, response status: "
+                    f"{response.status if response else 'None'}, skipping"
+                )
+                return None
+            return WebPage(
+                url=url,
+                final_url=page.url,
+                html=await page.content(),
+                title=await page.title(),
+            )
+        finally:
+            if page is not None:
+                await page.close()
+            used += 1
+            if used >= self._pages_per_context:
+                await context.close()
+                context, used = await self._new_context(), 0
+            self._contexts.put_nowait((context, used))
+
+    async def close(self):
+        if self._browser is not None:
+            await self._browser.close()
+            await self._playwright.stop()
+
+
+class WebCrawler:
+    def __init__(
+        self,
+        render_js: Optional[bool] = None,
+        max_concurrency: int = 32,
+        max_concurrency_per_host: int = 8,
+        max_browser_contexts: int = 4,
+        pages_per_context: int = 50,
+        timeout: float = 30,
+    ):
+        """
+        Args:
+            render_js: Whether to render the pages with the browser, if None, only
+                the pages that look like they need JavaScript are rendered.
+        """
+        self._render_js = render_js
+        self._max_concurrency = max_concurrency
+        self._max_concurrency_per_host = max_concurrency_per_host
+        self._timeout = timeout
+        self._browser_pool = BrowserPool(
+            max_browser_contexts, pages_per_context, timeout
+        )
+        self._host_semaphores: dict[str, asyncio.Semaphore] = {}
+
+    def _host_semaphore(self, url: str) -> asyncio.Semaphore:
+        host = urlparse(url).netloc
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(
+                self._max_concurrency_per_host
+            )
+        return self._host_semaphores[host]
+
+    async def _fetch_static(
+        self, client: httpx.AsyncClient, url: str
+    ) -> Tuple[Optional[WebPage], bool]:
+        """Returns the page and whether it should be rendered by the browser instead."""
+        response = await client.get(url)
+        if response.status_code >= 400:
+            logger.error(
+                f"Failed to load page: {url}, response status: {response.status_code}, skipping"
+            )
+            return None, False
+        content_type = response.headers.get("content-type", "text/html")
+        if "html" not in content_type:
+            logger.error(f"Skip page {url} with content type {content_type}")
+            return None, False
+        html = response.text
+        # Parse in a thread, so the event loop keeps serving the other requests.
+        title, needs_js = await asyncio.to_thread(inspect_static_html, html)
+        if self._render_js is None and needs_js:
+            return None, True
+        page = WebPage(url=url, final_url=str(response.url), html=html, title=title)
+        return page, False
+
+    async def _crawl_one(
+        self, client: httpx.AsyncClient, url: str
+    ) -> Optional[WebPage]:
+        async with self._host_semaphore(url):
+            try:
+                if not self._render_js:
+                    page, needs_browser = await self._fetch_static(client, url)
+                    if not needs_browser:
+                        return page
+                return await self._browser_pool.render(url)
+            except Exception as e:
+                logger.error(f"Error processing URL {url}: {e}")
+                return None
+
+    async def crawl(self, urls: list[str]) -> AsyncIterator[WebPage]:
+        """Crawl the URLs concurrently, yielding the pages as they complete."""
+        visited = set()
+        pending: set[asyncio.Task] = set()
+        url_iter = iter(dict.fromkeys(urls))
+        async with httpx.AsyncClient(
+            follow_redirects=True,
+            timeout=self._timeout,
+            headers={"User-Agent": USER_AGENT},
+            limits=httpx.Limits(max_connections=self._max_concurrency),
+        ) as client:
+            try:
+                while True:
+                    for url in url_iter:
+                        pending.add(asyncio.create_task(self._crawl_one(client, url)))
+                        if len(pending) >= self._max_concurrency:
+                            break
+                    if not pending:
+                        break
+                    done, pending = await asyncio.wait(
+                        pending, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    for task in done:
+                        page = task.result()
+                        if page is None or page.final_url in visited:
+                            continue
+                        visited.add(page.final_url)
+                        yield page
+            finally:
+                for task in pending:
+                    task.cancel()
+                await self._browser_pool.close()
+
+
+_DONE = object()
+
+
+def crawl_web_pages(
+    urls: list[str], **crawler_kwargs
+) -> Generator[WebPage, None, None]:
+    """Crawl the URLs with a `WebCrawler` running in a background thread."""
+    max_pending = crawler_kwargs.get("max_concurrency", 32)
+    pages: queue.Queue = queue.Queue(maxsize=max_pending)
+    stopped = threading.Event()
+
+    def put(item):
+        # Block until the consumer takes the item, unless it has stopped.
+        while not stopped.is_set():
+            try:
+                pages.put(item, timeout=1)
+                return
+            except queue.Full:
+                continue
+
+    async def produce():
+        crawler = WebCrawler(**crawler_kwargs)
+        loop = asyncio.get_running_loop()
+        async for page in crawler.crawl(urls):
+            await loop.run_in_executor(None, put, page)
+            if stopped.is_set():
+                break
+
+    def run():
+        try:
+            asyncio.run(produce())
+            put(_DONE)
+        except BaseException as e:
+            put(e)
+
+    thread = threading.Thread(target=run, name="web-crawler", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = pages.get()
+            if item is _DONE:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stopped.set()
+        thread.join()
@@ -1,11 +1,11 @@
 import logging
 from datetime import datetime, UTC
 from typing import Generator, Optional, List
-from playwright.sync_api import sync_playwright
 from bs4 import BeautifulSoup
 from markdownify import MarkdownConverter
 
 from autoflow.loaders.base import Loader
+from autoflow.loaders.web_crawler import crawl_web_pages
 from autoflow.storage.doc_store import Document
 from autoflow.data_types import DataType
 
@@ -30,71 +30,62 @@ class WebpageLoader(Loader):
         self,
         ignore_tags: Optional[List[str]] = None,
         ignore_classes: Optional[List[str]] = None,
+        render_js: Optional[bool] = None,
+        max_concurrency: int = 32,
+        max_concurrency_per_host: int = 8,
+        max_browser_contexts: int = 4,
     ):
+        """
+        Args:
+            render_js: Render every page with the browser if True, never if False,
+                and only the pages that look like they need JavaScript if None.
+        """
         super().__init__()
         self._ignore_tags = ignore_tags or IGNORE_TAGS
         self._ignore_classes = ignore_classes or IGNORE_CLASSES
+        self._crawler_kwargs = dict(
+            render_js=render_js,
+            max_concurrency=max_concurrency,
+            max_concurrency_per_host=max_concurrency_per_host,
+            max_browser_contexts=max_browser_contexts,
+        )
 
     def load(self, urls: str | list[str], **kwargs) -> Generator[Document, None, None]:
         if isinstance(urls, str):
             urls = [urls]
 
-        visited = set()
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=True)
+        for page in crawl_web_pages(urls, **self._crawler_kwargs):
             try:
-                for url in urls:
-                    try:
-                        page = browser.new_page()
-                        response = page.goto(url)
-                        final_url = page.url
-
-                        if final_url in visited:
-                            continue
-
-                        if response is None or response.status >= 400:
-                            logger.error(
-                                f"Failed to load page: {url}, response status: {response.status if response else 'None'}, skipping"
-                            )
-                            continue
-
-                        # Parse the content
-                        soup = BeautifulSoup(page.content(), "html.parser")
-
-                        # Remove unwanted elements
-                        for tag in self._ignore_tags:
-                            for element in soup.find_all(tag):
-                                element.extract()
-
-                        for class_name in self._ignore_classes:
-                            for element in soup.find_all(class_=class_name):
-                                element.extract()
-
-                        # Convert to markdown
-                        content = MarkdownConverter().convert_soup(soup)
-                        title = page.title() or final_url
-
-                        visited.add(final_url)
-
-                        # Create document
-                        document = Document(
-                            name=title,
-                            content=content,
-                            data_type=DataType.HTML,
-                            meta={
-                                "source_uri": final_url,
-                                "original_uri": url,
-                                "last_modified": datetime.now(UTC).isoformat(),
-                            },
-                        )
-
-                        yield document
-
-                    except Exception as e:
-                        logger.error(f"Error processing URL {url}: {str(e)}")
-                        continue
-                    finally:
-                        if "page" in locals():
-                            page.close()
-            finally:
-                browser.close()
+                # Parse the content
+                soup = BeautifulSoup(page.html, "html.parser")
+
+                # Remove unwanted elements
+                for tag in self._ignore_tags:
+                    for element in soup.find_all(tag):
+                        element.extract()
+
+                for class_name in self._ignore_classes:
+                    for element in soup.find_all(class_=class_name):
+                        element.extract()
+
+                # Convert to markdown
+                content = MarkdownConverter().convert_soup(soup)
+                title = page.title or page.final_url
+
+                # Create document
+                document = Document(
+                    name=title,
+                    content=content,
+                    data_type=DataType.HTML,
+                    meta={
+                        "source_uri": page.final_url,
+                        "original_uri": page.url,
+                        "last_modified": datetime.now(UTC).isoformat(),
+                    },
+                )
+
+                yield document
+
+            except Exception as e:
+                logger.error(f"Error processing URL {page.url}: {str(e)}")
+                continue
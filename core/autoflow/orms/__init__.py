@@ -1,5 +1,6 @@
-from .base import UUIDBaseModel
+from .base import UUIDBaseModel, insert_many
 
 __all__ = [
     "UUIDBaseModel",
+    "insert_many",
 ]
@@ -1,10 +1,12 @@
 import uuid
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional, Type
 
 from pytidb.schema import TableModel, Field
 from pytidb.datatype import DateTime
 from pytidb.sql import func
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
 
 from autoflow.utils import uuid6
 
@@ -23,3 +25,26 @@ class UUIDBaseModel(TableModel):
             "onupdate": func.now(),
         },
     )
+
+
+def insert_many(
+    session: Session, db_model: Type[UUIDBaseModel], items: List[UUIDBaseModel]
+) -> None:
+    """
+    Insert the items with multi-row inserts, then fill in the timestamps
+    generated by the database.
+    """
+    if not items:
+        return
+    rows = [item.model_dump(exclude={"created_at", "updated_at"}) for item in items]
+    session.execute(insert(db_model), rows)
+
+    stmt = select(db_model.id, db_model.created_at, db_model.updated_at).where(
+        db_model.id.in_([item.id for item in items])
+    )
+    timestamps = {
+        item_id: (created_at, updated_at)
+        for item_id, created_at, updated_at in session.execute(stmt)
+    }
+    for item in items:
+        item.created_at, item.updated_at = timestamps[item.id]
@@ -13,7 +13,7 @@ from sqlalchemy.dialects.mysql import LONGTEXT
 
 from autoflow.data_types import DataType
 from autoflow.models.embedding_models import EmbeddingModel
-from autoflow.orms.base import UUIDBaseModel
+from autoflow.orms.base import UUIDBaseModel, insert_many
 from autoflow.storage.doc_store.types import (
     Document,
     DocumentDescriptor,
@@ -140,25 +140,54 @@ class TiDBDocumentStore(DocumentStore):
     def add(self, documents: List[Document]) -> List[Document]:
         """
         Add documents.
+
+        The chunks of all the documents are embedded together, in batches of the
+        size of the embedding model, and the documents and chunks are inserted
+        with multi-row inserts in a single transaction.
         """
-        return_documents = []
-        for doc in documents:
-            db_document = self._document_db_model(**doc.model_dump(exclude={"chunks"}))
-            db_document = self._document_table.insert(db_document)
-
-            return_chunks = []
-            if doc.chunks is not None and len(doc.chunks) > 0:
-                db_chunks = self.add_doc_chunks(db_document.id, doc.chunks)
-                return_chunks = [
-                    Chunk(**db_chunk.model_dump(exclude={"document"}))
-                    for db_chunk in db_chunks
-                ]
-
-            return_documents.append(
-                Document(**db_document.model_dump(), chunks=return_chunks)
+        db_documents = [
+            self._document_db_model(**doc.model_dump(exclude={"chunks"}))
+            for doc in documents
+        ]
+        db_chunks_by_doc = [
+            [
+                self._chunk_db_model(
+                    **c.model_dump(exclude={"document_id"}), document_id=db_doc.id
+                )
+                for c in doc.chunks or []
+            ]
+            for doc, db_doc in zip(documents, db_documents)
+        ]
+        db_chunks = [c for chunks in db_chunks_by_doc for c in chunks]
+        self._embed_chunks(db_chunks)
+
+        with self._client.session() as session:
+            insert_many(session, self._document_db_model, db_documents)
+            insert_many(session, self._chunk_db_model, db_chunks)
+
+        return [
+            Document(
+                **db_document.model_dump(),
+                chunks=[Chunk(**c.model_dump(exclude={"document"})) for c in chunks],
             )
+            for db_document, chunks in zip(db_documents, db_chunks_by_doc)
+        ]
 
-        return return_documents
+    def _embed_chunks(self, db_chunks: List[TableModel]) -> None:
+        """
+        Embed the chunks without a vector, the embedding model splits the texts
+        into requests of its `embed_batch_size`.
+        """
+        if self._embedding_model is None:
+            return
+        chunks = [c for c in db_chunks if c.text_vec is None]
+        if not chunks:
+            return
+        vectors = self._embedding_model.get_text_embedding_batch(
+            [c.text for c in chunks]
+        )
+        for chunk, vector in zip(chunks, vectors):
+            chunk.text_vec = vector
 
     def update(self, document_id: UUID, update: Dict[str, Any]) -> None:
         """
@@ -260,7 +289,9 @@ class TiDBDocumentStore(DocumentStore):
             )
             for c in chunks
         ]
-        db_chunks = self._chunk_table.bulk_insert(db_chunks)
+        self._embed_chunks(db_chunks)
+        with self._client.session() as session:
+            insert_many(session, self._chunk_db_model, db_chunks)
         return [Chunk(**c.model_dump(exclude={"document"})) for c in db_chunks]
 
     def list_doc_chunks(self, document_id: UUID) -> List[Chunk]:
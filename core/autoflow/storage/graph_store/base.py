@@ -142,6 +142,7 @@ class GraphStore(BaseComponent, ABC):
         distance_threshold: Optional[float] = None,
         distance_range: Optional[Tuple[float, float]] = None,
         filters: Optional[RelationshipFilters] = None,
+        entity_map: Optional[Dict[UUID, Entity]] = None,
     ) -> List[Tuple[Relationship, float]]:
         """
 
@@ -152,6 +153,9 @@ class GraphStore(BaseComponent, ABC):
             distance_threshold:
             distance_range:
             filters:
+            entity_map: The entities already fetched by the caller, by id. Only
+                the missing source and target entities are fetched, and they are
+                added to it.
         """
         raise NotImplementedError
 
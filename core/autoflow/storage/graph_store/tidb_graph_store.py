@@ -2,6 +2,7 @@ import logging
 from typing import Collection, Dict, List, Optional, Tuple, Type, Any
 from uuid import UUID
 
+import numpy as np
 from pydantic import PrivateAttr
 from pytidb import Table, TiDBClient
 from pytidb.datatype import JSON, Text
@@ -14,10 +15,10 @@ from pytidb.schema import (
 )
 from pytidb.sql import func, select, or_
 from pytidb.embeddings import EmbeddingFunction
-from sqlalchemy import Index
+from sqlalchemy import Index, literal_column, union_all
 
 from autoflow.models.embedding_models import EmbeddingModel
-from autoflow.orms.base import UUIDBaseModel
+from autoflow.orms.base import UUIDBaseModel, insert_many
 from autoflow.storage.graph_store.base import GraphStore
 from autoflow.storage.graph_store.types import (
     Entity,
@@ -37,6 +38,45 @@ from autoflow.storage.types import QueryBundle
 logger = logging.getLogger(__name__)
 
 
+def get_entity_embedding_str(name: str, description: str) -> str:
+    return f"{name}: {description}"
+
+
+def get_relationship_embedding_str(
+    source_entity_name: str,
+    source_entity_description: str,
+    target_entity_name: str,
+    target_entity_description: str,
+    relationship_desc: str,
+) -> str:
+    return (
+        f"{source_entity_name}({source_entity_description}) -> "
+        f"{relationship_desc} -> {target_entity_name}({target_entity_description}) "
+    )
+
+
+def find_nearest_embedding(
+    embedding: List[float],
+    candidates: List[List[float]],
+    distance_threshold: Optional[float] = None,
+) -> Optional[int]:
+    """
+    The index of the candidate with the smallest cosine distance to the
+    embedding, if within the distance threshold.
+    """
+    if not candidates:
+        return None
+    query = np.asarray(embedding, dtype=float)
+    matrix = np.asarray(candidates, dtype=float)
+    distances = 1 - matrix @ query / (
+        np.linalg.norm(matrix, axis=1) * np.linalg.norm(query)
+    )
+    nearest = int(np.argmin(distances))
+    if distance_threshold is not None and distances[nearest] > distance_threshold:
+        return None
+    return nearest
+
+
 def dynamic_create_models(
     namespace: Optional[str] = None,
     embedding_model: Optional[EmbeddingModel] = None,
@@ -247,7 +287,7 @@ class TiDBGraphStore(GraphStore):
         return self._entity_table.insert(entity)
 
     def _get_entity_embedding(self, name: str, description: str) -> list[float]:
-        embedding_str = f"{name}: {description}"
+        embedding_str = get_entity_embedding_str(name, description)
         return self._embedding_model.get_text_embedding(embedding_str)
 
     def find_or_create_entity(
@@ -337,30 +377,50 @@ class TiDBGraphStore(GraphStore):
     def calc_entities_degrees(
         self, entity_ids: Collection[UUID]
     ) -> Dict[UUID, EntityDegree]:
-        entity_table_name = self._entity_table.table_name
-        relationship_table_name = self._relationship_table.table_name
-        stmt = f"""
-            SELECT
-                e.id as id,
-                COALESCE(SUM(CASE WHEN r.target_entity_id = e.id THEN 1 ELSE 0 END), 0) AS in_degree,
-                COALESCE(SUM(CASE WHEN r.source_entity_id = e.id THEN 1 ELSE 0 END), 0) AS out_degree,
-                COALESCE(COUNT(e.id), 0) AS degree
-            FROM {entity_table_name} e
-            LEFT JOIN {relationship_table_name} r ON e.id = r.source_entity_id OR e.id = r.target_entity_id
-            WHERE e.id IN :entity_ids
-            GROUP BY e.id
         """
-        results = self._db.query(
-            stmt, {"entity_ids": [entity_id.hex for entity_id in entity_ids]}
-        ).to_list()
-        return {
-            UUID(item["id"]): EntityDegree(
-                in_degree=item["in_degree"],
-                out_degree=item["out_degree"],
-                degrees=item["degree"],
+        Calculate the in- and out-degrees of the entities in a single query, by
+        counting the relationships on each side with the index of the column,
+        instead of joining the entities with the relationships on either side.
+        """
+        entity_ids = list(set(entity_ids))
+        if not entity_ids:
+            return {}
+
+        rel = self._relationship_db_model
+        out_degrees = (
+            select(
+                rel.source_entity_id.label("entity_id"),
+                literal_column("0").label("in_degree"),
+                func.count().label("out_degree"),
             )
-            for item in results
-        }
+            .where(rel.source_entity_id.in_(entity_ids))
+            .group_by(rel.source_entity_id)
+        )
+        in_degrees = (
+            select(
+                rel.target_entity_id.label("entity_id"),
+                func.count().label("in_degree"),
+                literal_column("0").label("out_degree"),
+            )
+            .where(rel.target_entity_id.in_(entity_ids))
+            .group_by(rel.target_entity_id)
+        )
+        degrees = union_all(out_degrees, in_degrees).subquery()
+        stmt = select(
+            degrees.c.entity_id,
+            func.sum(degrees.c.in_degree).label("in_degree"),
+            func.sum(degrees.c.out_degree).label("out_degree"),
+        ).group_by(degrees.c.entity_id)
+
+        entity_degrees = {entity_id: EntityDegree() for entity_id in entity_ids}
+        for item in self._db.query(stmt).to_list():
+            in_degree, out_degree = int(item["in_degree"]), int(item["out_degree"])
+            entity_degrees[item["entity_id"]] = EntityDegree(
+                in_degree=in_degree,
+                out_degree=out_degree,
+                degrees=in_degree + out_degree,
+            )
+        return entity_degrees
 
     # Relationship Basic Operations
 
@@ -383,6 +443,7 @@ class TiDBGraphStore(GraphStore):
         distance_threshold: Optional[float] = None,
         distance_range: Optional[Tuple[float, float]] = None,
         filters: Optional[RelationshipFilters] = None,
+        entity_map: Optional[Dict[UUID, Entity]] = None,
     ) -> List[Tuple[Relationship, float]]:
         filter_dict = self._convert_relationship_filters(filters)
         results = (
@@ -396,10 +457,15 @@ class TiDBGraphStore(GraphStore):
         )
 
         # FIXME: pytidb should return the relationship field: target_entity, source_entity.
-        entity_ids = [item.hit.target_entity_id for item in results]
-        entity_ids.extend([item.hit.source_entity_id for item in results])
-        entities = self.list_entities(filters=EntityFilters(entity_id=entity_ids))
-        entity_map = {entity.id: entity for entity in entities}
+        entity_map = entity_map if entity_map is not None else {}
+        entity_ids = {item.hit.target_entity_id for item in results}
+        entity_ids.update(item.hit.source_entity_id for item in results)
+        missing_entity_ids = list(entity_ids - entity_map.keys())
+        if missing_entity_ids:
+            entities = self.list_entities(
+                filters=EntityFilters(entity_id=missing_entity_ids)
+            )
+            entity_map.update((entity.id, entity) for entity in entities)
         for item in results:
             item.hit.target_entity = entity_map[item.hit.target_entity_id]
             item.hit.source_entity = entity_map[item.hit.source_entity_id]
@@ -520,9 +586,12 @@ class TiDBGraphStore(GraphStore):
         target_entity_description: str,
         relationship_desc: str,
     ) -> List[float]:
-        embedding_str = (
-            f"{source_entity_name}({source_entity_description}) -> "
-            f"{relationship_desc} -> {target_entity_name}({target_entity_description}) "
+        embedding_str = get_relationship_embedding_str(
+            source_entity_name,
+            source_entity_description,
+            target_entity_name,
+            target_entity_description,
+            relationship_desc,
         )
         return self._embedding_model.get_text_embedding(embedding_str)
 
@@ -555,44 +624,101 @@ class TiDBGraphStore(GraphStore):
     # Knowledge Graph Operations
 
     def add(self, knowledge_graph: KnowledgeGraphCreate) -> Optional[KnowledgeGraph]:
-        with self._db.session():
-            # Create or find entities
-            entity_map = {}
-            for entity in knowledge_graph.entities:
-                created_entity = self.find_or_create_entity(
+        """
+        Add a knowledge graph in bulk:
+
+        1. The entities are embedded in one batched call, and matched with their
+           nearest existing entities in one query, the others with the near-
+           identical new entities of the graph in memory.
+        2. The relationships are embedded in one batched call, with the names and
+           descriptions of the entities they are connected to.
+        3. The new entities and the relationships are inserted with multi-row
+           inserts in one transaction.
+        """
+        # The entities are referenced by name in the relationships.
+        entity_creates = {e.name: e for e in knowledge_graph.entities}
+        entity_embeddings = self._get_entity_embeddings(
+            [(e.name, e.description) for e in entity_creates.values()]
+        )
+        nearest_entities = self._find_nearest_entities(entity_embeddings)
+
+        entity_map = {}
+        new_entities = []
+        new_entity_embeddings = []
+        for entity, embedding, nearest_entity in zip(
+            entity_creates.values(), entity_embeddings, nearest_entities
+        ):
+            if nearest_entity is None:
+                nearest = find_nearest_embedding(
+                    embedding, new_entity_embeddings, self._entity_distance_threshold
+                )
+                if nearest is not None:
+                    nearest_entity = new_entities[nearest]
+            if nearest_entity is None:
+                nearest_entity = self._entity_db_model(
                     entity_type=EntityType.original,
                     name=entity.name,
                     description=entity.description,
                     meta=entity.meta,
+                    embedding=embedding,
                 )
-                entity_map[entity.name] = created_entity
-            entities = list(entity_map.values())
-
-            # Create relationships
-            relationships = []
-            for rel in knowledge_graph.relationships:
-                logger.info("Saving relationship: %s", rel.description)
-                source_entity = entity_map.get(rel.source_entity_name)
-                if not source_entity:
-                    logger.warning(
-                        "Source entity not found for relationship: %s", str(rel)
-                    )
-                    continue
-
-                target_entity = entity_map.get(rel.target_entity_name)
-                if not target_entity:
-                    logger.warning(
-                        "Target entity not found for relationship: %s", str(rel)
-                    )
-                    continue
-
-                relationship = self.create_relationship(
-                    source_entity=source_entity,
-                    target_entity=target_entity,
-                    description=rel.description,
-                    meta=rel.meta,
+                new_entities.append(nearest_entity)
+                new_entity_embeddings.append(embedding)
+            entity_map[entity.name] = nearest_entity
+        # Several entities of the graph may be merged into one.
+        entities = list(dict.fromkeys(entity_map.values()))
+
+        connected_relationships = []
+        for rel in knowledge_graph.relationships:
+            source_entity = entity_map.get(rel.source_entity_name)
+            if not source_entity:
+                logger.warning("Source entity not found for relationship: %s", str(rel))
+                continue
+
+            target_entity = entity_map.get(rel.target_entity_name)
+            if not target_entity:
+                logger.warning("Target entity not found for relationship: %s", str(rel))
+                continue
+
+            connected_relationships.append((rel, source_entity, target_entity))
+
+        relationship_embeddings = self._get_relationship_embeddings(
+            [
+                (
+                    source_entity.name,
+                    source_entity.description,
+                    target_entity.name,
+                    target_entity.description,
+                    rel.description,
                 )
-                relationships.append(relationship)
+                for rel, source_entity, target_entity in connected_relationships
+            ]
+        )
+        relationships = [
+            self._relationship_db_model(
+                source_entity_id=source_entity.id,
+                target_entity_id=target_entity.id,
+                description=rel.description,
+                meta=rel.meta,
+                weight=rel.weight,
+                chunk_id=rel.chunk_id,
+                document_id=rel.document_id,
+                embedding=embedding,
+            )
+            for (rel, source_entity, target_entity), embedding in zip(
+                connected_relationships, relationship_embeddings
+            )
+        ]
+
+        with self._db.session() as session:
+            insert_many(session, self._entity_db_model, new_entities)
+            insert_many(session, self._relationship_db_model, relationships)
+        logger.info(
+            "Saved %d new entities (%d matched existing ones) and %d relationships.",
+            len(new_entities),
+            len(entities) - len(new_entities),
+            len(relationships),
+        )
 
         return KnowledgeGraph(
             entities=[Entity(**entity.model_dump()) for entity in entities],
@@ -602,6 +728,69 @@ class TiDBGraphStore(GraphStore):
             ],
         )
 
+    def _get_entity_embeddings(
+        self, entities: List[Tuple[str, str]]
+    ) -> List[List[float]]:
+        if not entities:
+            return []
+        return self._embedding_model.get_text_embedding_batch(
+            [
+                get_entity_embedding_str(name, description)
+                for name, description in entities
+            ]
+        )
+
+    def _get_relationship_embeddings(
+        self, relationships: List[Tuple[str, str, str, str, str]]
+    ) -> List[List[float]]:
+        if not relationships:
+            return []
+        return self._embedding_model.get_text_embedding_batch(
+            [get_relationship_embedding_str(*r) for r in relationships]
+        )
+
+    def _find_nearest_entities(
+        self, embeddings: List[List[float]]
+    ) -> List[Optional[Entity]]:
+        """
+        Find the nearest existing entity of each embedding within the entity
+        distance threshold, with the vector searches of all the embeddings
+        combined into one query.
+        """
+        if not embeddings:
+            return []
+
+        entity = self._entity_db_model
+        searches = [
+            select(
+                literal_column(str(i)).label("idx"),
+                entity.id.label("entity_id"),
+                entity.embedding.cosine_distance(embedding).label("distance"),
+            )
+            .order_by("distance")
+            .limit(1)
+            .subquery()
+            for i, embedding in enumerate(embeddings)
+        ]
+        stmt = union_all(*[select(search) for search in searches])
+
+        threshold = self._entity_distance_threshold
+        nearest_entity_ids = {
+            item["idx"]: item["entity_id"]
+            for item in self._db.query(stmt).to_list()
+            if threshold is None or item["distance"] <= threshold
+        }
+        if not nearest_entity_ids:
+            return [None] * len(embeddings)
+
+        entities = self.list_entities(
+            filters=EntityFilters(entity_id=list(set(nearest_entity_ids.values())))
+        )
+        entity_map = {e.id: e for e in entities}
+        return [
+            entity_map.get(nearest_entity_ids.get(i)) for i in range(len(embeddings))
+        ]
+
     # Graph Store Operations
 
     def reset(self):
@@ -0,0 +1,51 @@
+import threading
+import time
+from typing import Dict, Optional
+
+
+class RateLimiter:
+    """
+    A thread-safe limiter spacing the requests evenly to stay under
+    `requests_per_minute`.
+    """
+
+    def __init__(self, requests_per_minute: int):
+        if requests_per_minute <= 0:
+            raise ValueError("requests_per_minute must be positive")
+        self._interval = 60.0 / requests_per_minute
+        self._next_at = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, requests: int = 1) -> float:
+        """Block until the requests are allowed, returns the seconds waited."""
+        with self._lock:
+            now = time.monotonic()
+            start_at = max(now, self._next_at)
+            self._next_at = start_at + requests * self._interval
+        wait = start_at - now
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+def get_model_provider(model_name: str) -> str:
+    try:
+        from litellm import get_llm_provider
+
+        return get_llm_provider(model_name)[1]
+    except Exception:
+        return model_name.split("/", 1)[0] if "/" in model_name else model_name
+
+
+class ProviderRateLimiters:
+    """The rate limiters by model provider, shared by the models of the same provider."""
+
+    def __init__(self, rate_limits: Dict[str, int]):
+        self._limiters = {
+            provider: RateLimiter(rpm) for provider, rpm in rate_limits.items()
+        }
+
+    def for_model(self, model_name: Optional[str]) -> Optional[RateLimiter]:
+        if not model_name or not self._limiters:
+            return None
+        return self._limiters.get(get_model_provider(model_name))
@@ -0,0 +1,199 @@
+import logging
+import threading
+import time
+from typing import List
+
+import pytest
+
+from autoflow.chunkers.base import Chunker
+from autoflow.configs.knowledge_base import IngestionConfig
+from autoflow.knowledge_base.ingestion import IngestionPipeline
+from autoflow.storage.doc_store import Chunk, Document
+from autoflow.utils.rate_limit import ProviderRateLimiters, RateLimiter
+
+logger = logging.getLogger(__name__)
+
+CHUNKS_PER_DOCUMENT = 4
+CHUNK_LATENCY = 0.01
+EMBED_LATENCY = 0.02
+STORE_LATENCY = 0.02
+KG_LATENCY = 0.02
+
+
+class ConcurrencyTracker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.current = 0
+        self.max = 0
+        self.calls = 0
+
+    def __enter__(self):
+        with self._lock:
+            self.current += 1
+            self.calls += 1
+            self.max = max(self.max, self.current)
+
+    def __exit__(self, *args):
+        with self._lock:
+            self.current -= 1
+
+
+class FakeChunker(Chunker):
+    def chunk(self, document: Document) -> Document:
+        time.sleep(CHUNK_LATENCY)
+        document.chunks = [
+            Chunk(text=f"{document.content} #{i}") for i in range(CHUNKS_PER_DOCUMENT)
+        ]
+        return document
+
+
+class FakeEmbeddingModel:
+    model_name = "openai/fake-embedding"
+    embed_batch_size = 64
+
+    def __init__(self):
+        self.tracker = ConcurrencyTracker()
+        self.batch_sizes = []
+
+    def get_text_embedding_batch(self, texts: List[str]) -> List[List[float]]:
+        with self.tracker:
+            self.batch_sizes.append(len(texts))
+            time.sleep(EMBED_LATENCY)
+            return [[float(len(text)), 1.0] for text in texts]
+
+
+class FakeDocumentStore:
+    def __init__(self, fail_on: str = None):
+        self.tracker = ConcurrencyTracker()
+        self.fail_on = fail_on
+
+    def add(self, documents: List[Document]) -> List[Document]:
+        with self.tracker:
+            time.sleep(STORE_LATENCY)
+            if any(d.content == self.fail_on for d in documents):
+                raise RuntimeError(f"Failed to store {self.fail_on}")
+            assert all(c.text_vec is not None for d in documents for c in d.chunks)
+            return [
+                d.model_copy(
+                    update={
+                        "chunks": [
+                            c.model_copy(update={"document_id": d.id}) for c in d.chunks
+                        ]
+                    }
+                )
+                for d in documents
+            ]
+
+
+class FakeKGIndex:
+    def __init__(self):
+        self.tracker = ConcurrencyTracker()
+        self.chunk_ids = set()
+
+    def add_chunk(self, chunk: Chunk):
+        with self.tracker:
+            time.sleep(KG_LATENCY)
+            self.chunk_ids.add(chunk.id)
+
+    def add_chunks(self, chunks: List[Chunk]):
+        with self.tracker:
+            time.sleep(KG_LATENCY)
+            self.chunk_ids.update(chunk.id for chunk in chunks)
+
+
+def new_documents(n: int) -> List[Document]:
+    return [Document(name=f"doc-{i}", content=f"Document {i}") for i in range(n)]
+
+
+def new_pipeline(config: IngestionConfig, doc_store=None):
+    return IngestionPipeline(
+        doc_store=doc_store or FakeDocumentStore(),
+        embedding_model=FakeEmbeddingModel(),
+        kg_index=FakeKGIndex(),
+        chunker=FakeChunker(),
+        config=config,
+    )
+
+
+def test_pipeline_ingests_documents_in_order():
+    config = IngestionConfig(queue_size=4, embed_batch_size=16, kg_workers=3)
+    pipeline = new_pipeline(config)
+    progresses = []
+
+    documents = pipeline.run(new_documents(20), progress_callback=progresses.append)
+
+    assert [d.name for d in documents] == [f"doc-{i}" for i in range(20)]
+    assert all(len(d.chunks) == CHUNKS_PER_DOCUMENT for d in documents)
+    assert all(c.document_id == d.id for d in documents for c in d.chunks)
+    # Every chunk is added to the knowledge graph.
+    assert len(pipeline._kg_index.chunk_ids) == 20 * CHUNKS_PER_DOCUMENT
+    assert progresses[-1].completed == 20
+    assert progresses[-1].embedded_chunks == 20 * CHUNKS_PER_DOCUMENT
+
+    # The stages never exceed their configured concurrency.
+    assert pipeline._kg_index.tracker.max <= config.kg_workers
+    assert pipeline._embedding_model.tracker.max <= config.embed_workers
+    assert pipeline._doc_store.tracker.max <= config.store_workers
+    assert max(pipeline._embedding_model.batch_sizes) <= config.embed_batch_size
+
+
+def test_pipeline_packs_chunks_for_kg_extraction():
+    # A chunk has ~4 tokens, 2 chunks fit in the budget.
+    config = IngestionConfig(kg_workers=1, kg_pack_token_budget=10)
+    pipeline = new_pipeline(config)
+
+    pipeline.run(new_documents(10))
+
+    assert len(pipeline._kg_index.chunk_ids) == 10 * CHUNKS_PER_DOCUMENT
+    assert pipeline._kg_index.tracker.calls < 10 * CHUNKS_PER_DOCUMENT
+
+
+def test_pipeline_raises_the_first_error():
+    pipeline = new_pipeline(
+        IngestionConfig(queue_size=2), doc_store=FakeDocumentStore("Document 3")
+    )
+    with pytest.raises(RuntimeError, match="Failed to store Document 3"):
+        pipeline.run(new_documents(30))
+
+
+def test_rate_limiter_spaces_requests():
+    limiter = RateLimiter(requests_per_minute=60 * 50)
+    start = time.perf_counter()
+    for _ in range(10):
+        limiter.acquire()
+    # 10 requests at 50 requests/s take at least 9 intervals of 20ms.
+    assert time.perf_counter() - start >= 0.17
+
+    limiters = ProviderRateLimiters({"openai": 100})
+    assert limiters.for_model("openai/gpt-4o-mini") is not None
+    assert limiters.for_model("openai/text-embedding-3-small") is limiters.for_model(
+        "openai/gpt-4o-mini"
+    )
+
+
+def test_ingestion_benchmark():
+    n = 40
+    # The time of processing the documents one stage after another, without
+    # any concurrency.
+    sequential = n * (
+        CHUNK_LATENCY + EMBED_LATENCY + STORE_LATENCY + CHUNKS_PER_DOCUMENT * KG_LATENCY
+    )
+
+    pipeline = new_pipeline(IngestionConfig(kg_workers=8))
+    start = time.perf_counter()
+    pipeline.run(new_documents(n))
+    elapsed = time.perf_counter() - start
+
+    logger.info(
+        "Ingested %d documents in %.2fs (%.1f documents/s), sequential: %.2fs, "
+        "embedding requests: %d, store calls: %d",
+        n,
+        elapsed,
+        n / elapsed,
+        sequential,
+        pipeline._embedding_model.tracker.calls,
+        pipeline._doc_store.tracker.calls,
+    )
+    assert elapsed < sequential / 3
+    # The chunks of several documents are embedded per request.
+    assert pipeline._embedding_model.tracker.calls < n
@@ -0,0 +1,54 @@
+import logging
+import time
+from pathlib import Path
+
+import pytest
+
+from autoflow.knowledge_graph.programs.eval_graph import KnowledgeGraphEvaluator
+from autoflow.knowledge_graph.programs.extract_graph import KnowledgeGraphExtractor
+from autoflow.knowledge_graph.programs.extract_packed_graph import (
+    PackedKnowledgeGraphExtractor,
+)
+from autoflow.models.llms.dspy import get_dspy_lm_by_llm
+
+logger = logging.getLogger(__name__)
+
+
+@pytest.fixture(scope="module")
+def dspy_lm(llm):
+    return get_dspy_lm_by_llm(llm)
+
+
+def test_extract_packed_graph(dspy_lm):
+    text = Path("tests/fixtures/tidb-overview.md").read_text()
+    # The paragraphs of the document as small chunks.
+    chunks = [
+        p.strip()
+        for p in text.split("\n\n")
+        if len(p.strip()) > 200 and not p.startswith(("---", "<"))
+    ][:4]
+
+    start = time.perf_counter()
+    expected_graphs = [KnowledgeGraphExtractor(dspy_lm).forward(c) for c in chunks]
+    single_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    actual_graphs = PackedKnowledgeGraphExtractor(dspy_lm).forward(chunks)
+    packed_elapsed = time.perf_counter() - start
+
+    # Compare the graph of each chunk to the one extracted from the chunk alone.
+    evaluator = KnowledgeGraphEvaluator(dspy_lm)
+    scores = []
+    for expected, actual in zip(expected_graphs, actual_graphs):
+        assert actual is not None, "Every chunk should have its knowledge graph."
+        scores.append(evaluator.forward(actual, expected).score)
+    final_score = sum(scores) / len(scores)
+
+    logger.info(
+        "Packed extraction of %d chunks: %.2fs, single extraction: %.2fs, score: %.2f",
+        len(chunks),
+        packed_elapsed,
+        single_elapsed,
+        final_score,
+    )
+    assert final_score > 0.4, "The completeness score should be greater than 0.4."
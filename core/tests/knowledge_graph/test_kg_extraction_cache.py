@@ -0,0 +1,73 @@
+import dspy
+
+from autoflow.knowledge_graph.extractors.cache import (
+    SQLiteKGExtractionCache,
+    get_program_version,
+)
+from autoflow.knowledge_graph.extractors.simple import SimpleKGExtractor
+from autoflow.knowledge_graph.types import (
+    GeneratedEntity,
+    GeneratedKnowledgeGraph,
+    GeneratedRelationship,
+)
+
+TEXT = "TiDB uses TiKV as its storage engine."
+
+
+def new_extractor(cache, calls, **lm_kwargs):
+    extractor = SimpleKGExtractor(
+        dspy.LM(model="openai/gpt-4o-mini", api_key="fake", **lm_kwargs), cache=cache
+    )
+
+    def extract_graph(text):
+        calls.append(text)
+        return GeneratedKnowledgeGraph(
+            entities=[
+                GeneratedEntity(name="TiDB", description="A database."),
+                GeneratedEntity(name="TiKV", description="A storage engine."),
+            ],
+            relationships=[
+                GeneratedRelationship(
+                    source_entity_name="TiDB",
+                    target_entity_name="TiKV",
+                    description="TiDB uses TiKV.",
+                )
+            ],
+        )
+
+    def extract_covariates(text, entities):
+        for entity in entities:
+            entity.meta = {"topic": entity.name}
+        return entities
+
+    extractor._graph_extractor.forward = extract_graph
+    extractor._entity_metadata_extractor.forward = extract_covariates
+    return extractor
+
+
+def test_extraction_is_replayed_from_cache(tmp_path):
+    path = tmp_path / "kg_extraction_cache.db"
+    calls = []
+
+    knowledge_graph = new_extractor(SQLiteKGExtractionCache(path), calls).extract(TEXT)
+    assert len(calls) == 1
+
+    # A rebuild in another process replays the cached knowledge graph.
+    extractor = new_extractor(SQLiteKGExtractionCache(path), calls)
+    assert extractor.extract(TEXT) == knowledge_graph
+    assert knowledge_graph.entities[0].meta == {"topic": "TiDB"}
+    assert len(calls) == 1
+
+    # A different text, LM setting or prompt is extracted again.
+    extractor.extract(TEXT + " TiKV is written in Rust.")
+    assert len(calls) == 2
+    new_extractor(SQLiteKGExtractionCache(path), calls, temperature=0.7).extract(TEXT)
+    assert len(calls) == 3
+
+    # The prompt of the programs is part of the key.
+    graph_extractor = extractor._graph_extractor
+    version = get_program_version(graph_extractor)
+    graph_extractor.program.signature = (
+        graph_extractor.program.signature.with_instructions("Extract the graph.")
+    )
+    assert get_program_version(graph_extractor) != version
@@ -0,0 +1,120 @@
+from types import SimpleNamespace
+
+import dspy
+
+from autoflow.knowledge_graph.extractors.cache import SQLiteKGExtractionCache
+from autoflow.knowledge_graph.extractors.packed import PackedKGExtractor
+from autoflow.knowledge_graph.programs.extract_graph import PredictRelationship
+from autoflow.knowledge_graph.programs.extract_packed_graph import (
+    PredictChunkKnowledgeGraph,
+    PredictEntityWithCovariates,
+)
+from autoflow.knowledge_graph.types import (
+    GeneratedEntity,
+    GeneratedKnowledgeGraph,
+)
+
+TEXTS = [f"Component {i} depends on component {i + 1}." for i in range(10)]
+
+
+def new_extractor(calls, token_budget=30, cache=None, drop_chunk=None):
+    extractor = PackedKGExtractor(
+        dspy.LM(model="openai/gpt-4o-mini", api_key="fake"),
+        token_budget=token_budget,
+        max_chunks_per_pack=4,
+        cache=cache,
+    )
+
+    def extract_packed(chunks):
+        calls.append(("packed", [c.text for c in chunks]))
+        graphs = []
+        for chunk in chunks:
+            if chunk.text == drop_chunk:
+                continue
+            i = TEXTS.index(chunk.text)
+            # The entity of the next component is only listed under the next
+            # chunk when both are in the same call.
+            entities = [
+                PredictEntityWithCovariates(
+                    name=f"Component {i}",
+                    description=f"Component {i}.",
+                    covariates={"topic": f"component {i}"},
+                )
+            ]
+            if not any(c.text == TEXTS[(i + 1) % len(TEXTS)] for c in chunks):
+                entities.append(
+                    PredictEntityWithCovariates(
+                        name=f"Component {i + 1}",
+                        description=f"Component {i + 1}.",
+                        covariates={"topic": f"component {i + 1}"},
+                    )
+                )
+            graphs.append(
+                PredictChunkKnowledgeGraph(
+                    chunk_index=chunk.chunk_index,
+                    entities=entities,
+                    relationships=[
+                        PredictRelationship(
+                            source_entity=f"Component {i}",
+                            target_entity=f"Component {i + 1}",
+                            relationship_desc=chunk.text,
+                        )
+                    ],
+                )
+            )
+        return SimpleNamespace(knowledge=graphs)
+
+    def extract_graph(text):
+        calls.append(("graph", [text]))
+        return GeneratedKnowledgeGraph(
+            entities=[GeneratedEntity(name="Single", description="Single.")],
+            relationships=[],
+        )
+
+    def extract_covariates(text, entities):
+        calls.append(("covariates", [text]))
+        return entities
+
+    extractor._packed_extractor.program = extract_packed
+    extractor._graph_extractor.forward = extract_graph
+    extractor._entity_metadata_extractor.forward = extract_covariates
+    return extractor
+
+
+def test_packed_extraction_splits_the_graph_per_chunk():
+    calls = []
+    knowledge_graphs = new_extractor(calls).extract_many(TEXTS)
+
+    # 10 chunks of ~9 tokens are packed by 3 within the budget of 30 tokens,
+    # instead of 2 calls per chunk.
+    assert [kind for kind, _ in calls] == ["packed"] * 4
+    assert [len(texts) for _, texts in calls] == [3, 3, 3, 1]
+
+    for i, (text, knowledge_graph) in enumerate(zip(TEXTS, knowledge_graphs)):
+        assert [r.description for r in knowledge_graph.relationships] == [text]
+        # The entities referred by the relationships of a chunk are part of its
+        # graph, even if the LM listed them under another chunk.
+        entities = {e.name: e for e in knowledge_graph.entities}
+        assert entities.keys() == {f"Component {i}", f"Component {i + 1}"}
+        assert entities[f"Component {i}"].meta == {"topic": f"component {i}"}
+
+
+def test_packed_extraction_falls_back_to_single_extraction(tmp_path):
+    calls = []
+    cache = SQLiteKGExtractionCache(tmp_path / "kg_extraction_cache.db")
+    extractor = new_extractor(calls, cache=cache, drop_chunk=TEXTS[1])
+
+    knowledge_graphs = extractor.extract_many(TEXTS[:3])
+    assert [kind for kind, _ in calls] == ["packed", "graph", "covariates"]
+    assert knowledge_graphs[1].entities[0].name == "Single"
+
+    # The cached graphs are replayed, only the new chunks are extracted.
+    calls.clear()
+    knowledge_graphs = extractor.extract_many(TEXTS[:4])
+    assert calls == [("packed", [TEXTS[3]])]
+    assert knowledge_graphs[1].entities[0].name == "Single"
+
+    # A chunk over the budget is extracted on its own.
+    calls.clear()
+    extractor.extract_many([TEXTS[4] * 20])
+    assert [kind for kind, _ in calls] == ["graph", "covariates"]
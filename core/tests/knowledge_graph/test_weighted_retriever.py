@@ -0,0 +1,138 @@
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID, uuid4
+
+from autoflow.knowledge_graph.retrievers.weighted import WeightedGraphRetriever
+from autoflow.knowledge_graph.types import RetrievedEntity
+from autoflow.storage.graph_store.types import (
+    EntityDegree,
+    EntityFilters,
+    Relationship,
+    RelationshipFilters,
+)
+
+
+class FakeEmbeddingModel:
+    def get_query_embedding(self, query: str) -> List[float]:
+        return [1.0]
+
+
+class InMemoryGraphStore:
+    """A chain of entities, where each relationship is less similar than the previous one."""
+
+    def __init__(self, length: int):
+        self._entities = {
+            e.id: e
+            for e in (
+                RetrievedEntity(
+                    id=uuid4(),
+                    name=f"Entity {i}",
+                    description=f"Entity {i}",
+                    created_at=None,
+                    updated_at=None,
+                )
+                for i in range(length)
+            )
+        }
+        entities = list(self._entities.values())
+        self._relationships = [
+            (
+                Relationship(
+                    id=uuid4(),
+                    source_entity_id=source.id,
+                    target_entity_id=target.id,
+                    description=f"{source.name} -> {target.name}",
+                    weight=10,
+                ),
+                0.9 - i * 0.05,
+            )
+            for i, (source, target) in enumerate(zip(entities, entities[1:]))
+        ]
+        self.calls = Counter()
+        self.fetched_entity_ids = []
+        self.degree_entity_ids = []
+
+    def list_entities(
+        self, filters: Optional[EntityFilters] = EntityFilters()
+    ) -> List[RetrievedEntity]:
+        self.calls["list_entities"] += 1
+        self.fetched_entity_ids.extend(filters.entity_id)
+        return [self._entities[entity_id] for entity_id in filters.entity_id]
+
+    def search_entities(self, query, top_k=10, filters=None, **kwargs):
+        self.calls["search_entities"] += 1
+        return []
+
+    def calc_entities_degrees(self, entity_ids) -> Dict[UUID, EntityDegree]:
+        self.calls["calc_entities_degrees"] += 1
+        self.degree_entity_ids.extend(entity_ids)
+        degrees = {entity_id: EntityDegree() for entity_id in entity_ids}
+        for rel, _ in self._relationships:
+            if rel.source_entity_id in degrees:
+                degrees[rel.source_entity_id].out_degree += 1
+            if rel.target_entity_id in degrees:
+                degrees[rel.target_entity_id].in_degree += 1
+        return degrees
+
+    def search_relationships(
+        self,
+        query,
+        top_k: int = 10,
+        distance_range: Optional[Tuple[float, float]] = None,
+        filters: Optional[RelationshipFilters] = None,
+        entity_map: Optional[Dict[UUID, RetrievedEntity]] = None,
+        **kwargs,
+    ) -> List[Tuple[Relationship, float]]:
+        self.calls["search_relationships"] += 1
+        min_distance, max_distance = distance_range
+        results = [
+            (rel.model_copy(), score)
+            for rel, score in self._relationships
+            if (
+                not filters.source_entity_id
+                or rel.source_entity_id in filters.source_entity_id
+            )
+            and rel.id not in filters.exclude_relationship_ids
+            and min_distance <= 1 - score < max_distance
+        ][:top_k]
+
+        entity_map = entity_map if entity_map is not None else {}
+        missing_entity_ids = {
+            entity_id
+            for rel, _ in results
+            for entity_id in (rel.source_entity_id, rel.target_entity_id)
+        } - entity_map.keys()
+        if missing_entity_ids:
+            entity_map.update(
+                (e.id, e)
+                for e in self.list_entities(
+                    EntityFilters(entity_id=list(missing_entity_ids))
+                )
+            )
+        for rel, _ in results:
+            rel.source_entity = entity_map[rel.source_entity_id]
+            rel.target_entity = entity_map[rel.target_entity_id]
+        return results
+
+
+def test_weighted_retrieval_fetches_each_entity_once():
+    kg_store = InMemoryGraphStore(length=8)
+    retriever = WeightedGraphRetriever(kg_store, FakeEmbeddingModel(), with_degree=True)
+
+    depth = 4
+    knowledge_graph = retriever.retrieve("query", depth=depth)
+
+    assert len(knowledge_graph.relationships) > 2
+    for rel in knowledge_graph.relationships:
+        assert rel.source_entity.id == rel.source_entity_id
+        assert rel.target_entity.id == rel.target_entity_id
+
+    # No entity or degree is fetched twice across the hops.
+    assert len(kg_store.fetched_entity_ids) == len(set(kg_store.fetched_entity_ids))
+    assert len(kg_store.degree_entity_ids) == len(set(kg_store.degree_entity_ids))
+    # The round trips are bounded by the hops and the range searches per hop,
+    # not by the number of relationships.
+    searches = kg_store.calls["search_relationships"]
+    assert searches <= 1 + (depth - 1) * len(retriever.search_range_config)
+    assert kg_store.calls["list_entities"] <= searches
+    assert kg_store.calls["calc_entities_degrees"] <= searches
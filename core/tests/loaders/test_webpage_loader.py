@@ -0,0 +1,48 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from autoflow.loaders.webpage import WebpageLoader
+
+PARAGRAPH = "TiDB is an open-source distributed SQL database. " * 10
+
+
+@pytest.fixture
+def site():
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/old":
+                self.send_response(301)
+                self.send_header("Location", "/page/0")
+                self.end_headers()
+                return
+            body = (
+                f"<html><head><title>{self.path}</title></head>"
+                f"<body><nav>Menu</nav><p>{self.path}: {PARAGRAPH}</p></body></html>"
+            )
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.end_headers()
+            self.wfile.write(body.encode())
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+def test_static_pages_are_loaded_concurrently_without_browser(site):
+    urls = [f"{site}/page/{i}" for i in range(20)] + [f"{site}/old"]
+    loader = WebpageLoader(render_js=False, max_concurrency=4)
+
+    documents = list(loader.load(urls))
+
+    # The redirect to a page already loaded is skipped.
+    assert sorted(d.meta["source_uri"] for d in documents) == sorted(urls[:20])
+    document = next(d for d in documents if d.name == "/page/0")
+    assert "/page/0: TiDB is" in document.content
+    assert "Menu" not in document.content
@@ -1,4 +1,7 @@
+from typing import List
+
 import pytest
+from sqlalchemy import event
 
 from pytidb import TiDBClient
 from autoflow.models.embedding_models import EmbeddingModel
@@ -24,6 +27,32 @@ def doc_store_with_auto_embed():
     )
 
 
+class LocalEmbeddingModel(EmbeddingModel):
+    """Embeds the texts locally, records the size of each embedding request."""
+
+    requests: List[int] = []
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        self.requests.append(len(texts))
+        return [[float(len(text)), float(text.count(" ")), 1.0] for text in texts]
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._get_text_embeddings([text])[0]
+
+
+@pytest.fixture(scope="session")
+def doc_store_with_local_embed():
+    tidb_client = TiDBClient.connect()
+    embedding_model = LocalEmbeddingModel(
+        "openai/local-embedding", dimensions=3, embed_batch_size=4
+    )
+    return TiDBDocumentStore(
+        namespace="doc_store_with_local_embed",
+        client=tidb_client,
+        embedding_model=embedding_model,
+    )
+
+
 def test_crud(doc_store):
     doc_store.reset()
 
@@ -164,3 +193,53 @@ def test_crud_with_auto_embed(doc_store_with_auto_embed):
     doc_store_with_auto_embed.delete_chunk(new_chunk.id)
     chunks = doc_store_with_auto_embed.list_doc_chunks(document_id)
     assert len(chunks) == 0
+
+
+def test_bulk_add(doc_store_with_local_embed):
+    doc_store = doc_store_with_local_embed
+    doc_store.reset()
+    embedding_model = doc_store._embedding_model
+    embedding_model.requests.clear()
+
+    statements = []
+    engine = doc_store._db_engine
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        documents = doc_store.add(
+            [
+                Document(
+                    name=f"Document {i}",
+                    content=f"Content of document {i}.",
+                    chunks=[
+                        Chunk(text=f"Chunk {j} of document {i}.") for j in range(3)
+                    ],
+                )
+                for i in range(5)
+            ]
+        )
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    # The chunks of all the documents are embedded together, in batches of the
+    # size of the embedding model.
+    assert embedding_model.requests == [4, 4, 4, 3]
+    # The documents and the chunks are inserted with a statement each.
+    inserts = [s for s in statements if s.lstrip().upper().startswith("INSERT")]
+    assert len(inserts) == 2
+
+    assert [d.name for d in documents] == [f"Document {i}" for i in range(5)]
+    for i, doc in enumerate(documents):
+        assert doc.created_at is not None
+        assert [c.text for c in doc.chunks] == [
+            f"Chunk {j} of document {i}." for j in range(3)
+        ]
+        for chunk in doc.chunks:
+            assert chunk.document_id == doc.id
+            assert chunk.created_at is not None
+            assert chunk.text_vec == [float(len(chunk.text)), 4.0, 1.0]
+
+    assert len(doc_store.list_doc_chunks(documents[0].id)) == 3
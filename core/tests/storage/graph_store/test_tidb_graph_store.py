@@ -3,9 +3,13 @@ import logging
 import pytest
 
 from autoflow.storage.graph_store import TiDBGraphStore
+from autoflow.storage.graph_store.tidb_graph_store import find_nearest_embedding
 from autoflow.storage.graph_store.types import (
+    EntityCreate,
     EntityType,
     EntityUpdate,
+    KnowledgeGraphCreate,
+    RelationshipCreate,
     RelationshipUpdate,
 )
 
@@ -213,3 +217,107 @@ def test_entity_degree(graph_store: TiDBGraphStore):
     assert degrees[tiflash_entity.id].degrees == 1
 
     graph_store.reset()
+
+
+def test_add_knowledge_graph(graph_store: TiDBGraphStore):
+    graph_store.reset()
+
+    knowledge_graph = graph_store.add(
+        KnowledgeGraphCreate(
+            entities=[
+                EntityCreate(name="TiDB", description="TiDB is a relational database."),
+                EntityCreate(
+                    name="TiKV",
+                    description="TiKV is a distributed key-value storage engine.",
+                ),
+            ],
+            relationships=[
+                RelationshipCreate(
+                    source_entity_name="TiDB",
+                    target_entity_name="TiKV",
+                    description="TiDB uses TiKV as its storage engine.",
+                ),
+                RelationshipCreate(
+                    source_entity_name="TiDB",
+                    target_entity_name="PD",
+                    description="The target entity is missing.",
+                ),
+            ],
+        )
+    )
+    assert len(knowledge_graph.entities) == 2
+    assert all(e.created_at is not None for e in knowledge_graph.entities)
+    assert len(knowledge_graph.relationships) == 1
+    tidb_entity = knowledge_graph.entities[0]
+
+    # The existing entities are matched instead of being created again.
+    knowledge_graph = graph_store.add(
+        KnowledgeGraphCreate(
+            entities=[
+                EntityCreate(name="TiDB", description="TiDB is a relational database."),
+                EntityCreate(
+                    name="TiFlash",
+                    description="TiFlash is a column-oriented database engine.",
+                ),
+            ],
+            relationships=[
+                RelationshipCreate(
+                    source_entity_name="TiDB",
+                    target_entity_name="TiFlash",
+                    description="TiDB uses TiFlash as its analytical engine.",
+                ),
+            ],
+        )
+    )
+    assert knowledge_graph.entities[0].id == tidb_entity.id
+    assert knowledge_graph.relationships[0].source_entity_id == tidb_entity.id
+    assert len(graph_store.list_entities()) == 3
+    assert graph_store.calc_entity_out_degree(tidb_entity.id) == 2
+
+    graph_store.reset()
+
+
+def test_add_knowledge_graph_merges_near_identical_entities(
+    graph_store: TiDBGraphStore,
+):
+    graph_store.reset()
+
+    # The near-identical entities of the graph are merged into one, as when
+    # they were created one after another.
+    knowledge_graph = graph_store.add(
+        KnowledgeGraphCreate(
+            entities=[
+                EntityCreate(name="TiDB", description="TiDB is a relational database."),
+                EntityCreate(
+                    name="TiDB.", description="TiDB is a relational database."
+                ),
+                EntityCreate(
+                    name="TiKV",
+                    description="TiKV is a distributed key-value storage engine.",
+                ),
+            ],
+            relationships=[
+                RelationshipCreate(
+                    source_entity_name="TiDB.",
+                    target_entity_name="TiKV",
+                    description="TiDB uses TiKV as its storage engine.",
+                ),
+            ],
+        )
+    )
+    assert len(knowledge_graph.entities) == 2
+    assert len(graph_store.list_entities()) == 2
+    tidb_entity = knowledge_graph.entities[0]
+    assert knowledge_graph.relationships[0].source_entity_id == tidb_entity.id
+
+    graph_store.reset()
+
+
+def test_find_nearest_embedding():
+    candidates = [[1.0, 0.0], [0.6, 0.8]]
+    assert find_nearest_embedding([0.8, 0.6], candidates) == 1
+    assert find_nearest_embedding([0.8, 0.6], candidates, distance_threshold=0.1) == 1
+    assert (
+        find_nearest_embedding([0.0, 1.0], candidates, distance_threshold=0.1) is None
+    )
+    assert find_nearest_embedding([1.0, 0.0], []) is None